@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark response transfer size and JSON decoding for large client lists.
+
+Builds a synthetic ``rest/sta`` payload shaped like real controller output
+and compares the current path (uncompressed + ``json``) with gzip/brotli
+transfer and the orjson/msgspec backends from ``beast_unifi.utils.codec``.
+
+Usage:
+    python scripts/benchmark_decoding.py [--clients 50000] [--repeat 5]
+"""
+
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from beast_unifi.utils import codec
+
+
+@dataclass
+class Client:
+    mac: str
+    ip: Optional[str] = None
+    hostname: Optional[str] = None
+    ap_mac: Optional[str] = None
+
+
+def make_payload(n: int) -> bytes:
+    rng = random.Random(42)
+    clients = []
+    for i in range(n):
+        clients.append({
+            '_id': f"{i:024x}",
+            'mac': ':'.join(f"{rng.randrange(256):02x}" for _ in range(6)),
+            'ip': f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+            'hostname': f"client-{i}",
+            'oui': rng.choice(['Apple', 'Samsung', 'Google', 'Espressif']),
+            'is_wired': rng.random() < 0.2,
+            'ap_mac': f"aa:bb:cc:00:{i % 64:02x}:01",
+            'essid': rng.choice(['Home', 'IoT', 'Guest']),
+            'vlan': rng.choice([1, 20, 30]),
+            'first_seen': 1700000000 + i,
+            'last_seen': 1762000000 + i,
+            'tx_bytes': rng.randrange(10**9),
+            'rx_bytes': rng.randrange(10**9),
+            'signal': -rng.randrange(30, 90),
+            'satisfaction': rng.randrange(50, 100),
+            'usergroup_id': '',
+            'noted': False,
+        })
+    return json.dumps({'meta': {'rc': 'ok'}, 'data': clients}).encode()
+
+
+def best_of(repeat: int, fn) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_payload(args.clients)
+    print(f"Payload: {args.clients} clients, {len(payload) / 1e6:.1f} MB uncompressed")
+    print()
+    print("Transfer size")
+    print(f"  identity  {len(payload) / 1e6:8.2f} MB")
+    print(f"  gzip      {len(gzip.compress(payload, 6)) / 1e6:8.2f} MB")
+    try:
+        import brotli
+        print(f"  br        {len(brotli.compress(payload, quality=5)) / 1e6:8.2f} MB")
+    except ImportError:
+        print("  br        (brotli not installed)")
+
+    print()
+    print(f"Decode time (best of {args.repeat})")
+    baseline = best_of(args.repeat, lambda: json.loads(payload)['data'])
+    print(f"  json (current path)          {baseline * 1000:8.1f} ms  1.00x")
+    for backend in codec.available_backends():
+        if backend == 'json':
+            continue
+        codec.set_backend(backend)
+        elapsed = best_of(args.repeat, lambda: codec.decode_data(payload))
+        print(f"  {backend:<28} {elapsed * 1000:8.1f} ms  {baseline / elapsed:.2f}x")
+    codec.set_backend(codec.available_backends()[-1])
+    elapsed = best_of(args.repeat, lambda: codec.decode_data(payload, Client))
+    label = f"typed ({'msgspec' if codec.msgspec else 'json + convert'})"
+    print(f"  {label:<28} {elapsed * 1000:8.1f} ms  {baseline / elapsed:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Analysis engines over collected UniFi data."""
+
+from beast_unifi.analysis.alerts import AlertEngine, Rule, Alert
+from beast_unifi.analysis.drift import DriftAnalyzer
+from beast_unifi.analysis.health import SiteHealth
+from beast_unifi.analysis.presence import PresenceTracker
+from beast_unifi.analysis.topology import Topology, TopologyNode
+from beast_unifi.analysis.reconcile import (
+    Reconciler,
+    ReconciliationResult,
+    Conflict,
+    reconcile_devices,
+)
+
+__all__ = [
+    "AlertEngine",
+    "Rule",
+    "Alert",
+    "DriftAnalyzer",
+    "SiteHealth",
+    "PresenceTracker",
+    "Topology",
+    "TopologyNode",
+    "Reconciler",
+    "ReconciliationResult",
+    "Conflict",
+    "reconcile_devices",
+]
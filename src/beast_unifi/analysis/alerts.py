@@ -0,0 +1,525 @@
+"""Declarative alert rules compiled to vectorised predicates over snapshots."""
+
+import ast
+import time
+from typing import Dict, List, Optional, Any, Callable, Iterable, Set, Tuple
+
+import numpy as np
+
+from beast_unifi.utils.normalize import VERSION_PATTERN, dig
+
+
+# Record identity per collection (first present field wins)
+KEY_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'devices': ('mac', '_id'),
+    'clients': ('mac', '_id'),
+    'sites': ('siteId', '_id', 'name'),
+    'hosts': ('id',),
+    'health': ('subsystem',),
+}
+
+SEVERITIES = ('info', 'warning', 'critical')
+
+# Column kinds: float64 with NaN for missing, object with None, version keys
+NUMBER = 'number'
+OBJECT = 'object'
+VERSION = 'version'
+
+_COMPARE = {
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+}
+_ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+Columns = Dict[Tuple[str, str], np.ndarray]
+
+
+def version_number(value: Any) -> float:
+    """Sortable number for a dotted version (``"4.0.21"``), NaN if unparsable."""
+    match = VERSION_PATTERN.match(str(value)) if value is not None else None
+    if match is None:
+        return np.nan
+    major, minor, patch, build = (int(part or 0) for part in match.groups())
+    return float(((major * 10000 + minor) * 10000 + patch) * 100000 + build)
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return np.nan
+
+
+_CONVERT: Dict[str, Callable[[Any], Any]] = {
+    NUMBER: _number,
+    OBJECT: lambda value: value,
+    VERSION: version_number,
+}
+
+
+def _present(values: Any, kind: str) -> Any:
+    """Mask of non-missing values (None for objects, NaN otherwise)."""
+    if kind == OBJECT:
+        return np.not_equal(values, None)
+    return ~np.isnan(values)
+
+
+class _Compiler:
+    """
+    Compile a condition into a function of typed columns.
+
+    Supported: field paths (``state``, ``statistics.counts.offlineWifiDevice``),
+    constants, comparisons (chained too), ``in``/``not in`` with literal
+    lists, ``and``/``or``/``not``, ``+ - * /`` and ``version(x)``,
+    ``exists(field)``. A comparison with a missing (or, for numbers,
+    non-numeric) field is False, for ``!=`` and ``not in`` too, so
+    ``state != 1`` does not match records without a ``state``; use
+    ``not exists(field)`` to match those.
+    """
+
+    def __init__(self, condition: str):
+        self.fields: Set[Tuple[str, str]] = set()
+        try:
+            tree = ast.parse(condition, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Invalid rule condition {condition!r}: {e.msg}") from None
+        self.predicate = self._boolean(tree.body)
+
+    @staticmethod
+    def _path(node: ast.AST) -> Optional[str]:
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            parent = _Compiler._path(node.value)
+            return f"{parent}.{node.attr}" if parent else None
+        return None
+
+    def _field(self, path: str, kind: str) -> Callable[[Columns], np.ndarray]:
+        self.fields.add((path, kind))
+        return lambda columns: columns[(path, kind)]
+
+    def _kind(self, node: ast.AST) -> Optional[str]:
+        """Kind an operand implies for a field compared with it (None: undecided)."""
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, str):
+                return OBJECT
+            return NUMBER
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)) and node.elts:
+            return self._kind(node.elts[0])
+        if isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'version':
+            return VERSION
+        if isinstance(node, ast.BinOp):
+            return NUMBER
+        return None
+
+    def _value(self, node: ast.AST, kind: str) -> Callable[[Columns], Any]:
+        path = self._path(node)
+        if path is not None:
+            return self._field(path, kind)
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if kind == VERSION:
+                value = version_number(value)
+            elif kind == NUMBER and not isinstance(value, (int, float)):
+                raise ValueError(f"Cannot compare a number with {value!r}")
+            return lambda columns: value
+        if isinstance(node, ast.Call):
+            name = getattr(node.func, 'id', None)
+            if name == 'version' and len(node.args) == 1:
+                return self._value(node.args[0], VERSION)
+            raise ValueError(f"Unknown function in rule: {ast.unparse(node)}")
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            op = _ARITHMETIC[type(node.op)]
+            left, right = self._value(node.left, NUMBER), self._value(node.right, NUMBER)
+            return lambda columns: op(left(columns), right(columns))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            operand = self._value(node.operand, NUMBER)
+            return lambda columns: -operand(columns)
+        raise ValueError(f"Unsupported expression in rule: {ast.unparse(node)}")
+
+    def _compare(self, left: ast.AST, op: ast.cmpop, right: ast.AST) -> Callable[[Columns], np.ndarray]:
+        ordering = type(op) in _COMPARE and not isinstance(op, (ast.Eq, ast.NotEq))
+        # Two fields: ordering implies numbers (``num_sta > max_sta``), equality anything
+        kind = self._kind(right) or self._kind(left) or (NUMBER if ordering else OBJECT)
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(right, (ast.List, ast.Tuple, ast.Set)):
+                raise ValueError("'in' needs a literal list, e.g. type in ['ugw', 'udm']")
+            values = [self._value(e, kind)({}) for e in right.elts]
+            operand = self._value(left, kind)
+            negate = isinstance(op, ast.NotIn)
+
+            allowed = set(values)
+
+            def member(columns):
+                column = operand(columns)
+                if kind == OBJECT:
+                    # np.isin sorts, which fails on mixed objects such as None
+                    found = np.fromiter((v in allowed for v in column), dtype=bool, count=len(column))
+                else:
+                    found = np.isin(column, values)
+                return ~found & _present(column, kind) if negate else found
+            return member
+        if type(op) not in _COMPARE:
+            raise ValueError(f"Unsupported comparison in rule: {type(op).__name__}")
+        if kind == OBJECT and not isinstance(op, (ast.Eq, ast.NotEq)):
+            raise ValueError("Ordering comparisons need numbers or version()")
+        compare = _COMPARE[type(op)]
+        a, b = self._value(left, kind), self._value(right, kind)
+        if isinstance(op, ast.NotEq):
+            # NaN != 1 and None != 'uap' hold; a missing field must not match
+            def unequal(columns):
+                x, y = a(columns), b(columns)
+                return np.asarray(compare(x, y) & _present(x, kind) & _present(y, kind), dtype=bool)
+            return unequal
+        return lambda columns: np.asarray(compare(a(columns), b(columns)), dtype=bool)
+
+    def _boolean(self, node: ast.AST) -> Callable[[Columns], np.ndarray]:
+        if isinstance(node, ast.BoolOp):
+            parts = [self._boolean(v) for v in node.values]
+            reduce = np.logical_and.reduce if isinstance(node.op, ast.And) else np.logical_or.reduce
+            return lambda columns: reduce([part(columns) for part in parts])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = self._boolean(node.operand)
+            return lambda columns: ~operand(columns)
+        if isinstance(node, ast.Compare):
+            parts = []
+            left = node.left
+            for op, right in zip(node.ops, node.comparators, strict=True):
+                parts.append(self._compare(left, op, right))
+                left = right
+            if len(parts) == 1:
+                return parts[0]
+            return lambda columns: np.logical_and.reduce([part(columns) for part in parts])
+        if isinstance(node, ast.Call) and getattr(node.func, 'id', None) == 'exists' and len(node.args) == 1:
+            path = self._path(node.args[0])
+            if path is None:
+                raise ValueError("exists() takes a field name")
+            column = self._field(path, OBJECT)
+            return lambda columns: np.not_equal(column(columns), None)
+        path = self._path(node)
+        if path is not None:
+            # Bare field: truthy numbers/booleans
+            column = self._field(path, NUMBER)
+            return lambda columns: np.nan_to_num(column(columns)) != 0
+        raise ValueError(f"Rule condition must be a comparison or boolean: {ast.unparse(node)}")
+
+
+class Rule:
+    """
+    One declarative alert rule.
+
+    Example::
+
+        Rule('ap-offline', 'devices', "type == 'uap' and state != 1", severity='critical',
+             message='AP {name} is offline', for_polls=2)
+    """
+
+    __slots__ = (
+        'name', 'collection', 'condition', 'severity', 'message', 'for_polls', 'cooldown',
+        'fields', 'predicate',
+    )
+
+    def __init__(
+        self,
+        name: str,
+        collection: str,
+        condition: str,
+        severity: str = 'warning',
+        message: Optional[str] = None,
+        for_polls: int = 1,
+        cooldown: float = 0.0,
+    ):
+        """
+        Compile a rule.
+
+        Args:
+            name: Unique rule name
+            collection: Snapshot it applies to (``devices``, ``clients``, ``sites``, ...)
+            condition: Expression over record fields, e.g.
+                ``"type in ['ugw', 'udm'] and version(version) < version('4.0.21')"``
+            severity: ``info``, ``warning`` or ``critical``
+            message: ``str.format`` template over the record's top-level fields
+            for_polls: Consecutive matching polls before the alert fires
+            cooldown: Seconds after a resolution during which it cannot re-fire
+
+        Raises:
+            ValueError: If the condition uses unsupported syntax
+        """
+        if severity not in SEVERITIES:
+            raise ValueError(f"Unknown severity: {severity!r} (expected one of {SEVERITIES})")
+        if for_polls < 1:
+            raise ValueError("for_polls must be at least 1")
+        self.name = name
+        self.collection = collection
+        self.condition = condition
+        self.severity = severity
+        self.message = message
+        self.for_polls = for_polls
+        self.cooldown = cooldown
+        compiler = _Compiler(condition)
+        self.fields = frozenset(compiler.fields)
+        self.predicate = compiler.predicate
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Rule":
+        """Build a rule from configuration (keys as in ``__init__``)."""
+        return cls(**data)
+
+    def render(self, record: Dict[str, Any]) -> str:
+        """Alert message for a matching record."""
+        if self.message is None:
+            return f"{self.name}: {self.condition}"
+        try:
+            return self.message.format_map(_Defaults(record))
+        except (ValueError, IndexError, AttributeError):
+            return self.message
+
+
+class _Defaults(dict):
+    def __missing__(self, key: str) -> str:
+        return '?'
+
+
+class Alert:
+    """State of one rule firing for one record."""
+
+    __slots__ = ('rule', 'key', 'severity', 'message', 'since', 'fired', 'resolved')
+
+    def __init__(self, rule: Rule, key: str, message: str, since: float):
+        self.rule = rule.name
+        self.key = key
+        self.severity = rule.severity
+        self.message = message
+        # First matching poll; ``fired`` once for_polls and suppressions allow
+        self.since = since
+        self.fired: Optional[float] = None
+        self.resolved: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"Alert({self.rule!r}, {self.key!r}, {self.severity})"
+
+
+class AlertEngine:
+    """
+    Evaluate compiled rules against successive snapshots.
+
+    Rules are compiled once. For each snapshot the engine extracts only the
+    fields the collection's rules reference, compares them with the
+    previous snapshot and evaluates each rule, as NumPy operations, on the
+    records whose referenced fields changed (and only for rules that use a
+    changed field). Unchanged records keep their previous result.
+
+    Alert state is de-duplicated per (rule, record): an alert fires once
+    when its rule starts matching (after ``for_polls`` consecutive polls,
+    outside ``cooldown`` and any ``suppress()`` window) and resolves once
+    when it stops matching or the record disappears.
+    """
+
+    def __init__(self, rules: Iterable[Any] = (), clock: Callable[[], float] = time.time):
+        """
+        Initialize alert engine.
+
+        Args:
+            rules: ``Rule`` objects or dicts for ``Rule.from_dict``
+            clock: Seconds since the epoch (for tests)
+        """
+        self.clock = clock
+        self.rules: Dict[str, Rule] = {}
+        # collection -> (field, kind) -> rules using it
+        self._by_field: Dict[str, Dict[Tuple[str, str], List[Rule]]] = {}
+        # collection -> rules referencing no field (evaluated for every changed record)
+        self._constant: Dict[str, List[Rule]] = {}
+        self._fields: Dict[str, List[Tuple[str, str]]] = {}
+        # collection -> record key -> raw values of the referenced fields
+        self._values: Dict[str, Dict[str, Tuple]] = {}
+        # Collections whose field set changed since their last snapshot
+        self._stale: Set[str] = set()
+        # rule -> record key -> pending or active alert
+        self._matched: Dict[str, Dict[str, Alert]] = {}
+        self._polls: Dict[str, Dict[str, int]] = {}
+        self._resolved_at: Dict[Tuple[str, str], float] = {}
+        self._suppressions: List[Tuple[Optional[str], Optional[str], float]] = []
+        self.stats = {'polls': 0, 'records': 0, 'changed': 0, 'evaluations': 0, 'fired': 0, 'resolved': 0}
+        for rule in rules:
+            self.add_rule(rule if isinstance(rule, Rule) else Rule.from_dict(rule))
+
+    def add_rule(self, rule: Rule) -> None:
+        """
+        Register a rule; records already known are evaluated on the next snapshot.
+
+        Raises:
+            ValueError: If a rule with the same name exists
+        """
+        if rule.name in self.rules:
+            raise ValueError(f"Duplicate rule name: {rule.name!r}")
+        self.rules[rule.name] = rule
+        self._matched[rule.name] = {}
+        self._polls[rule.name] = {}
+        by_field = self._by_field.setdefault(rule.collection, {})
+        for field in rule.fields:
+            by_field.setdefault(field, []).append(rule)
+        if not rule.fields:
+            self._constant.setdefault(rule.collection, []).append(rule)
+        self._fields[rule.collection] = sorted(by_field)
+        # Field set changed: re-evaluate everything next time, but keep the
+        # keys so records gone by then still resolve
+        self._stale.add(rule.collection)
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _key(collection: str, record: Dict[str, Any]) -> Optional[str]:
+        for field in KEY_FIELDS.get(collection, ('id', '_id', 'mac')):
+            value = record.get(field)
+            if value:
+                return str(value).lower() if field == 'mac' else str(value)
+        return None
+
+    def evaluate(self, collection: str, records: Iterable[Dict[str, Any]]) -> Dict[str, List[Alert]]:
+        """
+        Apply a full snapshot of one collection.
+
+        Args:
+            collection: Collection name the rules were declared for
+            records: Every current record of the collection
+
+        Returns:
+            ``{"fired": [...], "resolved": [...]}`` alerts that changed state
+        """
+        now = self.clock()
+        fields = self._fields.get(collection, [])
+        by_field = self._by_field.get(collection, {})
+        previous = self._values.get(collection, {})
+        # Stored tuples no longer line up with the fields after add_rule()
+        stale = collection in self._stale
+        current: Dict[str, Tuple] = {}
+        changed_keys: List[str] = []
+        changed_records: List[Dict[str, Any]] = []
+        changed_fields: Set[Tuple[str, str]] = set()
+        paths = [path for path, _ in fields]
+
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            key = self._key(collection, record)
+            if key is None:
+                continue
+            values = tuple(dig(record, path) for path in paths)
+            current[key] = values
+            old = None if stale else previous.get(key)
+            if old == values:
+                continue
+            changed_keys.append(key)
+            changed_records.append(record)
+            if old is None:
+                changed_fields.update(fields)
+            else:
+                changed_fields.update(f for f, a, b in zip(fields, old, values, strict=True) if a != b)
+        self._values[collection] = current
+        self._stale.discard(collection)
+        removed = [key for key in previous if key not in current]
+
+        self.stats['polls'] += 1
+        self.stats['records'] += len(current)
+        self.stats['changed'] += len(changed_keys)
+        events: Dict[str, List[Alert]] = {'fired': [], 'resolved': []}
+        rules = {rule.name: rule for f in changed_fields for rule in by_field.get(f, ())}
+        rules.update((rule.name, rule) for rule in self._constant.get(collection, ()))
+
+        if changed_keys and rules:
+            index = {field: i for i, field in enumerate(fields)}
+            keys = np.array(changed_keys, dtype=object)
+            columns: Columns = {}
+            needed = {f for rule in rules.values() for f in rule.fields}
+            for field in needed:
+                convert = _CONVERT[field[1]]
+                position = index[field]
+                dtype = object if field[1] == OBJECT else np.float64
+                columns[field] = np.array(
+                    [convert(current[k][position]) for k in changed_keys], dtype=dtype,
+                )
+            lookup = dict(zip(changed_keys, changed_records, strict=True))
+            for rule in rules.values():
+                self.stats['evaluations'] += 1
+                mask = rule.predicate(columns)
+                hits = set(keys[mask]) if np.ndim(mask) else (set(changed_keys) if mask else set())
+                matched = self._matched[rule.name]
+                for key in hits - matched.keys():
+                    matched[key] = Alert(rule, key, rule.render(lookup[key]), now)
+                    self._polls[rule.name][key] = 0
+                for key in (matched.keys() & set(changed_keys)) - hits:
+                    self._clear(rule, key, now, events)
+
+        for key in removed:
+            for rule in self.rules.values():
+                if rule.collection == collection and key in self._matched[rule.name]:
+                    self._clear(rule, key, now, events)
+
+        for rule in self.rules.values():
+            if rule.collection != collection:
+                continue
+            polls = self._polls[rule.name]
+            for key, alert in self._matched[rule.name].items():
+                polls[key] += 1
+                if alert.fired is None and polls[key] >= rule.for_polls and self._may_fire(rule, key, now):
+                    alert.fired = now
+                    events['fired'].append(alert)
+        self._resolved_at = {
+            (name, key): resolved for (name, key), resolved in self._resolved_at.items()
+            if now - resolved < self.rules[name].cooldown
+        }
+        self.stats['fired'] += len(events['fired'])
+        self.stats['resolved'] += len(events['resolved'])
+        return events
+
+    def _clear(self, rule: Rule, key: str, now: float, events: Dict[str, List[Alert]]) -> None:
+        alert = self._matched[rule.name].pop(key)
+        self._polls[rule.name].pop(key, None)
+        if alert.fired is not None:
+            alert.resolved = now
+            if rule.cooldown > 0:
+                self._resolved_at[(rule.name, key)] = now
+            events['resolved'].append(alert)
+
+    def _may_fire(self, rule: Rule, key: str, now: float) -> bool:
+        resolved = self._resolved_at.get((rule.name, key))
+        if resolved is not None and now - resolved < rule.cooldown:
+            return False
+        self._suppressions = [s for s in self._suppressions if s[2] > now]
+        return not any(
+            (name is None or name == rule.name) and (match is None or match == key)
+            for name, match, _ in self._suppressions
+        )
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def suppress(self, rule: Optional[str] = None, key: Optional[str] = None, seconds: float = 3600) -> None:
+        """
+        Hold back new alerts (e.g. during maintenance) for a rule, a record or both.
+
+        Matching conditions stay pending and fire when the window ends if
+        they still hold. Device and client keys are lowercase MACs.
+        """
+        if rule is not None and rule not in self.rules:
+            raise ValueError(f"Unknown rule: {rule!r}")
+        self._suppressions.append((rule, key, self.clock() + seconds))
+
+    def active(self, rule: Optional[str] = None, severity: Optional[str] = None) -> List[Alert]:
+        """Alerts that have fired and not resolved, most severe first."""
+        alerts = [
+            alert
+            for name, matched in self._matched.items() if rule is None or name == rule
+            for alert in matched.values() if alert.fired is not None
+            and (severity is None or alert.severity == severity)
+        ]
+        return sorted(alerts, key=lambda a: (-SEVERITIES.index(a.severity), a.fired, a.rule, a.key))
@@ -0,0 +1,267 @@
+"""Fleet-wide firmware and configuration drift analysis."""
+
+import hashlib
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import pandas as pd
+
+from beast_unifi.utils.archive import canonical_json
+from beast_unifi.utils.normalize import VERSION_PATTERN, dig, normalize_mac
+
+
+# Output column -> dotted path in a Site Manager host record
+HOST_FIELDS: Dict[str, str] = {
+    'hostname': 'reportedState.hostname',
+    'type': 'type',
+    'model': 'reportedState.hardware.shortname',
+    'version': 'reportedState.version',
+    'firmware_version': 'reportedState.firmware_version',
+    'release_channel': 'reportedState.release_channel',
+    'update_frequency': 'reportedState.autoUpdate.schedule.frequency',
+    'update_day': 'reportedState.autoUpdate.schedule.day',
+    'update_hour': 'reportedState.autoUpdate.schedule.hour',
+}
+
+# Output column -> key in a Site Manager device record
+DEVICE_FIELDS: Dict[str, str] = {
+    'hostId': 'hostId',
+    'name': 'name',
+    'model': 'model',
+    'product_line': 'productLine',
+    'version': 'version',
+    'firmware_status': 'firmwareStatus',
+}
+
+# networkconf keys that differ between sites by construction: ids and the
+# per-site addressing plan (each site gets its own subnet and DHCP range)
+NETWORK_VOLATILE_KEYS = frozenset({
+    '_id', 'site_id', 'external_id', 'attr_hidden_id', 'attr_no_delete',
+    'ip_subnet', 'dhcpd_start', 'dhcpd_stop', 'dhcpd_gateway',
+    'dhcpd_dns_1', 'dhcpd_dns_2', 'dhcpd_dns_3', 'dhcpd_dns_4',
+    'dhcpd_wins_1', 'dhcpd_wins_2', 'dhcpd_ntp_1', 'dhcpd_ntp_2',
+    'dhcpd_tftp_server', 'dhcpd_unifi_controller', 'dhcp_relay_servers',
+    'ipv6_subnet', 'ipv6_pd_start', 'ipv6_pd_stop', 'ipv6_ra_priority',
+    'dhcpdv6_start', 'dhcpdv6_stop', 'dhcpdv6_dns_1', 'dhcpdv6_dns_2',
+    'domain_name', 'nat_outbound_ip_addresses',
+})
+
+
+def fingerprint(record: Dict[str, Any], exclude: Iterable[str] = ()) -> str:
+    """Short stable hash of a record's content, ignoring excluded keys."""
+    excluded = set(exclude)
+    content = {k: v for k, v in record.items() if k not in excluded}
+    return hashlib.sha1(canonical_json(content)).hexdigest()[:16]
+
+
+def version_key(versions: pd.Series) -> pd.Series:
+    """
+    Vectorised sortable key for dotted versions (``"4.0.21"``, ``"6.6.77.15402"``).
+
+    Returns:
+        Int64 series; missing or unparsable versions are <NA>
+    """
+    parts = versions.astype('string').str.extract(VERSION_PATTERN.pattern)
+    numeric = parts.apply(pd.to_numeric).astype('Int64')
+    key = ((numeric[0] * 10000 + numeric[1].fillna(0)) * 10000 + numeric[2].fillna(0)) * 100000
+    return key + numeric[3].fillna(0)
+
+
+class DriftAnalyzer:
+    """
+    Track firmware versions and configuration fingerprints across a fleet.
+
+    Each ``update_*`` call takes a fresh snapshot, upserts only the rows
+    whose content changed and reports what changed. Analyses run as pandas
+    group-bys over the maintained tables, so they stay fast at tens of
+    thousands of hosts and need no re-export between polls.
+    """
+
+    def __init__(self):
+        """Initialize an empty analyzer."""
+        # table -> row id -> (row fingerprint, row)
+        self._rows: Dict[str, Dict[str, Tuple[str, Dict[str, Any]]]] = {
+            'hosts': {}, 'devices': {}, 'networks': {},
+        }
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def update_hosts(self, hosts: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Apply a snapshot from ``SiteManagerClient.get_hosts()``.
+
+        Returns:
+            Host ids ``added``, ``changed`` and ``removed`` since the last snapshot
+        """
+        rows = {}
+        for host in hosts:
+            if host.get('id'):
+                row = {name: dig(host, path) for name, path in HOST_FIELDS.items()}
+                row['update_schedule'] = fingerprint({
+                    k: row[k] for k in ('update_frequency', 'update_day', 'update_hour')
+                })
+                rows[host['id']] = row
+        return self._apply('hosts', rows)
+
+    def update_devices(self, groups: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Apply a snapshot from ``SiteManagerClient.get_devices()``.
+
+        Returns:
+            Device MACs ``added``, ``changed`` and ``removed`` since the last snapshot
+        """
+        rows = {}
+        for group in groups:
+            for device in group.get('devices') or []:
+                mac = normalize_mac(device.get('mac'))
+                if mac is not None:
+                    row = {name: device.get(key) for name, key in DEVICE_FIELDS.items()}
+                    row['hostId'] = row['hostId'] or group.get('hostId')
+                    rows[mac] = row
+        return self._apply('devices', rows)
+
+    def update_networks(self, site: str, networks: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+        """
+        Apply one site's ``rest/networkconf`` snapshot from ``LocalControllerClient``.
+
+        Networks of other sites are left untouched.
+
+        Returns:
+            Network keys (``site/name``) ``added``, ``changed`` and ``removed``
+        """
+        rows = {}
+        for network in networks:
+            name = network.get('name') or network.get('_id')
+            rows[f"{site}/{name}"] = {
+                'site': site,
+                'name': name,
+                'purpose': network.get('purpose'),
+                'vlan': network.get('vlan'),
+                'fingerprint': fingerprint(network, NETWORK_VOLATILE_KEYS),
+            }
+        return self._apply('networks', rows, scope=lambda key: key.startswith(f"{site}/"))
+
+    def _apply(self, table: str, rows: Dict[str, Dict[str, Any]], scope=None) -> Dict[str, List[str]]:
+        current = self._rows[table]
+        changes: Dict[str, List[str]] = {'added': [], 'changed': [], 'removed': []}
+        for key, row in rows.items():
+            digest = fingerprint(row)
+            previous = current.get(key)
+            if previous is None:
+                changes['added'].append(key)
+            elif previous[0] != digest:
+                changes['changed'].append(key)
+            else:
+                continue
+            current[key] = (digest, row)
+        for key in [k for k in current if k not in rows and (scope is None or scope(k))]:
+            del current[key]
+            changes['removed'].append(key)
+        if any(changes.values()):
+            self._frames.pop(table, None)
+        return changes
+
+    def frame(self, table: str) -> pd.DataFrame:
+        """Current rows of ``hosts``, ``devices`` or ``networks`` as a DataFrame."""
+        if table not in self._rows:
+            raise ValueError(f"Unknown table: {table!r}")
+        frame = self._frames.get(table)
+        if frame is None:
+            rows = self._rows[table]
+            frame = pd.DataFrame.from_records(
+                [row for _, row in rows.values()],
+                index=pd.Index(list(rows), name='id'),
+            )
+            self._frames[table] = frame
+        return frame
+
+    # ------------------------------------------------------------------
+    # Analyses
+    # ------------------------------------------------------------------
+
+    def version_distribution(
+        self,
+        table: str = 'hosts',
+        column: str = 'version',
+        by: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Count rows per version, optionally within groups.
+
+        Args:
+            table: ``hosts`` or ``devices``
+            column: Version column
+            by: Grouping column (e.g. ``model`` or ``release_channel``)
+
+        Returns:
+            DataFrame with the grouping column(s), ``count`` and ``share`` of group
+        """
+        frame = self.frame(table)
+        if frame.empty:
+            return pd.DataFrame(columns=[c for c in (by, column) if c] + ['count', 'share'])
+        keys = [by, column] if by else [column]
+        counts = frame.groupby(keys, dropna=False).size().rename('count').reset_index()
+        totals = counts.groupby(by, dropna=False)['count'].transform('sum') if by else counts['count'].sum()
+        counts['share'] = counts['count'] / totals
+        return counts.sort_values(keys).reset_index(drop=True)
+
+    def outliers(
+        self,
+        table: str = 'hosts',
+        column: str = 'version',
+        by: str = 'model',
+    ) -> pd.DataFrame:
+        """
+        Rows that are behind their group's newest version or off its modal value.
+
+        Args:
+            table: ``hosts`` or ``devices``
+            column: Version column (or any column, e.g. ``update_schedule``)
+            by: Column defining peer groups
+
+        Returns:
+            Outlier rows with ``modal``, ``latest`` and ``behind`` columns
+        """
+        frame = self.frame(table)
+        if frame.empty:
+            return frame
+        frame = frame[frame[column].notna()].copy()
+        group = frame[by].fillna('unknown')
+
+        counts = frame.groupby([group, frame[column]]).size().rename('n').reset_index()
+        counts.columns = ['_group', column, 'n']
+        modal = counts.sort_values('n', ascending=False).drop_duplicates('_group')
+        frame['modal'] = group.map(modal.set_index('_group')[column])
+
+        keys = version_key(frame[column])
+        if keys.notna().any():
+            latest_key = keys.groupby(group).transform('max')
+            frame['behind'] = (keys < latest_key).fillna(False).astype(bool)
+            # Unparsable versions must not become a group's "latest"
+            parsed = frame.assign(_key=keys, _group=group).dropna(subset=['_key'])
+            latest = parsed.sort_values('_key').groupby('_group')[column].last()
+            frame['latest'] = group.map(latest)
+        else:
+            frame['behind'] = False
+            frame['latest'] = None
+        return frame[(frame[column] != frame['modal']) | frame['behind']]
+
+    def config_drift(self) -> pd.DataFrame:
+        """
+        Networks whose configuration differs from the fleet majority for that name.
+
+        Returns:
+            Network rows with the ``majority`` fingerprint and ``sites`` sharing it
+        """
+        frame = self.frame('networks')
+        if frame.empty:
+            return frame
+        counts = frame.groupby(['name', 'fingerprint']).size().rename('sites').reset_index()
+        majority = counts.sort_values('sites', ascending=False).drop_duplicates('name').set_index('name')
+        frame = frame.assign(
+            majority=frame['name'].map(majority['fingerprint']),
+            sites=frame['name'].map(majority['sites']),
+        )
+        return frame[frame['fingerprint'] != frame['majority']]
@@ -0,0 +1,288 @@
+"""Incremental per-site and fleet-wide health rollups."""
+
+import time
+from typing import Dict, List, Optional, Any, Callable, Iterable, Set, Tuple
+
+
+# Integer counters kept per site and summed across the fleet
+COUNTERS = (
+    'devices',
+    'devices_offline',
+    'gateways',
+    'gateways_offline',
+    'wifi_clients',
+    'wired_clients',
+    'guest_clients',
+    'critical_notifications',
+    'pending_updates',
+)
+
+WAN_STATES = ('up', 'down', 'unknown')
+STATUSES = ('healthy', 'degraded', 'down')
+
+
+def _count(value: Any) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return 0
+    return int(value)
+
+
+def site_manager_metrics(site: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Health metrics of a Site Manager ``get_sites()`` record.
+
+    Reads ``statistics.counts.*`` and ``statistics.percentages.wanUptime``;
+    WAN is ``down`` when the site's gateway is offline and ``unknown`` when
+    it has none.
+    """
+    statistics = site.get('statistics') or {}
+    counts = statistics.get('counts') or {}
+    gateways = _count(counts.get('gatewayDevice'))
+    gateways_offline = _count(counts.get('offlineGatewayDevice'))
+    if not gateways:
+        wan = 'unknown'
+    else:
+        wan = 'down' if gateways_offline >= gateways else 'up'
+    uptime = (statistics.get('percentages') or {}).get('wanUptime')
+    return {
+        'devices': _count(counts.get('totalDevice')),
+        'devices_offline': _count(counts.get('offlineDevice')),
+        'gateways': gateways,
+        'gateways_offline': gateways_offline,
+        'wifi_clients': _count(counts.get('wifiClient')),
+        'wired_clients': _count(counts.get('wiredClient')),
+        'guest_clients': _count(counts.get('guestClient')),
+        'critical_notifications': _count(counts.get('criticalNotification')),
+        'pending_updates': _count(counts.get('pendingUpdateDevice')),
+        'wan': wan,
+        'wan_uptime': float(uptime) if isinstance(uptime, (int, float)) else None,
+    }
+
+
+def controller_health_metrics(subsystems: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Health metrics of a local controller ``get_health()`` (``stat/health``) list.
+
+    Devices are the adopted APs, switches and gateways of the ``wlan``,
+    ``lan`` and ``wan`` subsystems; WAN is ``up`` when the ``wan``
+    subsystem reports ``ok``.
+    """
+    by_name = {s.get('subsystem'): s for s in subsystems if isinstance(s, dict)}
+    metrics: Dict[str, Any] = dict.fromkeys(COUNTERS, 0)
+    for name in ('wlan', 'lan', 'wan'):
+        subsystem = by_name.get(name) or {}
+        metrics['devices'] += _count(subsystem.get('num_adopted'))
+        metrics['devices_offline'] += _count(subsystem.get('num_disconnected'))
+    for name, counter in (('wlan', 'wifi_clients'), ('lan', 'wired_clients')):
+        subsystem = by_name.get(name) or {}
+        metrics[counter] = _count(subsystem.get('num_user')) + _count(subsystem.get('num_guest'))
+        metrics['guest_clients'] += _count(subsystem.get('num_guest'))
+    wan = by_name.get('wan')
+    if wan is None or not _count(wan.get('num_gw')):
+        metrics['wan'] = 'unknown'
+    else:
+        metrics['gateways'] = _count(wan.get('num_gw'))
+        metrics['gateways_offline'] = _count(wan.get('num_disconnected'))
+        metrics['wan'] = 'up' if wan.get('status') == 'ok' else 'down'
+    metrics['wan_uptime'] = None
+    return metrics
+
+
+class SiteHealth:
+    """
+    Running health rollups for thousands of sites.
+
+    Each update replaces one site's counters and adjusts fleet-wide totals by
+    the difference, so ingesting a snapshot costs O(changed sites) and every
+    query below is O(1), except ``sites()``, which sorts the k sites in a
+    status (O(k log k)). Feed it
+    Site Manager ``get_sites()`` snapshots via ``observe_sites()``, local
+    controller ``get_health()`` results via ``observe_health()``, or
+    pre-computed metrics via ``update()``.
+
+    A site's ``score`` (0-100) weighs device availability 60 % and WAN 40 %
+    (the WAN uptime percentage when reported, otherwise 100 for up or
+    unknown and 0 for down). Its ``status`` is ``down`` when the WAN is down
+    or every device is offline, ``degraded`` when any device is offline or
+    a critical notification is open, else ``healthy``.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        """
+        Initialize empty rollups.
+
+        Args:
+            clock: Seconds since the epoch, stamped on updates (for tests)
+        """
+        self.clock = clock
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._totals: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._wan: Dict[str, int] = dict.fromkeys(WAN_STATES, 0)
+        self._by_status: Dict[str, Set[str]] = {status: set() for status in STATUSES}
+        self._score_sum = 0.0
+        self.stats = {'updates': 0, 'unchanged': 0, 'removed': 0}
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _assess(metrics: Dict[str, Any]) -> Tuple[float, str]:
+        devices, offline = metrics['devices'], metrics['devices_offline']
+        availability = (devices - offline) / devices if devices else 1.0
+        if metrics.get('wan_uptime') is not None:
+            wan = min(max(metrics['wan_uptime'], 0.0), 100.0) / 100
+        else:
+            wan = 0.0 if metrics['wan'] == 'down' else 1.0
+        score = round(100 * (0.6 * availability + 0.4 * wan), 1)
+        if metrics['wan'] == 'down' or (devices and offline >= devices):
+            status = 'down'
+        elif offline or metrics['critical_notifications']:
+            status = 'degraded'
+        else:
+            status = 'healthy'
+        return score, status
+
+    def update(self, site: str, metrics: Dict[str, Any]) -> bool:
+        """
+        Replace one site's metrics.
+
+        Args:
+            site: Site identifier (``siteId`` or controller site name)
+            metrics: Counters from ``COUNTERS`` plus ``wan`` (one of
+                ``WAN_STATES``) and optional ``wan_uptime`` percentage
+
+        Returns:
+            True if anything changed
+        """
+        if metrics.get('wan', 'unknown') not in WAN_STATES:
+            raise ValueError(f"Unknown WAN state: {metrics['wan']!r} (expected one of {WAN_STATES})")
+        counters = tuple(_count(metrics.get(name)) for name in COUNTERS)
+        wan = metrics.get('wan', 'unknown')
+        uptime = metrics.get('wan_uptime')
+        previous = self._sites.get(site)
+        if previous is not None and (previous['counters'], previous['wan'], previous['wan_uptime']) == (counters, wan, uptime):
+            previous['updated'] = self.clock()
+            self.stats['unchanged'] += 1
+            return False
+        if previous is not None:
+            self._retract(site, previous)
+        state = dict(zip(COUNTERS, counters, strict=True), wan=wan, wan_uptime=uptime)
+        score, status = self._assess(state)
+        self._sites[site] = {
+            'counters': counters, 'wan': wan, 'wan_uptime': uptime,
+            'score': score, 'status': status, 'updated': self.clock(),
+        }
+        for name, value in zip(COUNTERS, counters, strict=True):
+            self._totals[name] += value
+        self._wan[wan] += 1
+        self._by_status[status].add(site)
+        self._score_sum += score
+        self.stats['updates'] += 1
+        return True
+
+    def _retract(self, site: str, state: Dict[str, Any]) -> None:
+        for name, value in zip(COUNTERS, state['counters'], strict=True):
+            self._totals[name] -= value
+        self._wan[state['wan']] -= 1
+        self._by_status[state['status']].discard(site)
+        self._score_sum -= state['score']
+
+    def remove(self, site: str) -> bool:
+        """Drop a site from the rollups; returns False if it was unknown."""
+        state = self._sites.pop(site, None)
+        if state is None:
+            return False
+        self._retract(site, state)
+        if not self._sites:
+            # Clear accumulated float error once nothing is left
+            self._score_sum = 0.0
+        self.stats['removed'] += 1
+        return True
+
+    def observe_sites(self, sites: Iterable[Dict[str, Any]], complete: bool = True) -> Dict[str, int]:
+        """
+        Apply a Site Manager ``get_sites()`` snapshot.
+
+        Args:
+            sites: Site records
+            complete: The snapshot lists every site, so sites missing from
+                it are removed
+
+        Returns:
+            Counts of ``changed``, ``unchanged`` and ``removed`` sites
+        """
+        counts = {'changed': 0, 'unchanged': 0, 'removed': 0}
+        seen = set()
+        for record in sites:
+            site = record.get('siteId') if isinstance(record, dict) else None
+            if not site:
+                continue
+            seen.add(site)
+            counts['changed' if self.update(site, site_manager_metrics(record)) else 'unchanged'] += 1
+        if complete:
+            for site in [s for s in self._sites if s not in seen]:
+                self.remove(site)
+                counts['removed'] += 1
+        return counts
+
+    def observe_health(self, site: str, subsystems: Iterable[Dict[str, Any]]) -> bool:
+        """Apply a local controller ``get_health()`` result for ``site``."""
+        return self.update(site, controller_health_metrics(subsystems))
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def __contains__(self, site: str) -> bool:
+        return site in self._sites
+
+    def site(self, site: str) -> Optional[Dict[str, Any]]:
+        """
+        Current health of one site.
+
+        Returns:
+            Counters plus ``availability``, ``clients``, ``wan``,
+            ``wan_uptime``, ``score``, ``status`` and ``updated``; None if
+            the site is unknown
+        """
+        state = self._sites.get(site)
+        if state is None:
+            return None
+        result: Dict[str, Any] = dict(zip(COUNTERS, state['counters'], strict=True))
+        result['availability'] = self._availability(result['devices'], result['devices_offline'])
+        result['clients'] = result['wifi_clients'] + result['wired_clients']
+        for name in ('wan', 'wan_uptime', 'score', 'status', 'updated'):
+            result[name] = state[name]
+        return result
+
+    @staticmethod
+    def _availability(devices: int, offline: int) -> Optional[float]:
+        return (devices - offline) / devices if devices else None
+
+    def fleet(self) -> Dict[str, Any]:
+        """
+        Fleet-wide rollup.
+
+        Returns:
+            Summed counters plus ``sites``, ``availability`` (online share
+            of all devices), ``clients``, ``wan`` and ``status`` site counts
+            and the mean ``score``
+        """
+        result: Dict[str, Any] = dict(self._totals)
+        result['sites'] = len(self._sites)
+        result['availability'] = self._availability(result['devices'], result['devices_offline'])
+        result['clients'] = result['wifi_clients'] + result['wired_clients']
+        result['wan'] = dict(self._wan)
+        result['status'] = {status: len(members) for status, members in self._by_status.items()}
+        result['score'] = round(self._score_sum / len(self._sites), 1) if self._sites else None
+        return result
+
+    def sites(self, status: str) -> List[str]:
+        """Sites currently in ``status`` (``healthy``, ``degraded`` or ``down``), sorted (O(k log k))."""
+        if status not in self._by_status:
+            raise ValueError(f"Unknown status: {status!r} (expected one of {STATUSES})")
+        return sorted(self._by_status[status])
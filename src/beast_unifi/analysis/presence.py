@@ -0,0 +1,364 @@
+"""Client presence and roaming history from successive snapshots or events."""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterable, Tuple
+
+import numpy as np
+
+from beast_unifi.utils.normalize import normalize_mac
+
+
+# Controller event keys (``stat/event``) understood by ``apply_event``
+CONNECT_EVENTS = frozenset({'EVT_WU_Connected', 'EVT_WG_Connected'})
+ROAM_EVENTS = frozenset({'EVT_WU_Roam', 'EVT_WU_RoamRadio', 'EVT_WG_Roam'})
+DISCONNECT_EVENTS = frozenset({'EVT_WU_Disconnected', 'EVT_WG_Disconnected'})
+
+COLUMNS = ('client', 'ap', 'essid', 'start', 'end')
+
+# Bits of the packed (client, start) sort key holding the start time (until 2514)
+_START_BITS = 34
+# Starts outside [0, _START_MAX) are clipped into the key; the top value is
+# reserved for them so clipped and exact keys never tie
+_START_MAX = (1 << _START_BITS) - 1
+
+
+def _pack(clients: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Packed ``client << 34 | start`` keys, ordered like ``(client, start)``."""
+    return (clients.astype(np.int64) << _START_BITS) | np.clip(starts, 0, _START_MAX)
+
+
+class _Dictionary:
+    """Dictionary encoding of repeated strings to dense integer codes."""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class IntervalStore:
+    """
+    Append-only columnar store of presence intervals.
+
+    Each column is a NumPy array grown geometrically; strings are dictionary
+    encoded, so one interval costs 24 bytes regardless of MAC or SSID length.
+    A ``(client, start)`` sort index is built lazily; rows appended since it
+    was last built are sorted on their own and merged into it. The index
+    keeps the packed key of every sorted row, so a client's rows are found
+    with a binary search.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.client = np.empty(capacity, dtype=np.int32)
+        self.ap = np.empty(capacity, dtype=np.int32)
+        self.essid = np.empty(capacity, dtype=np.int32)
+        self.start = np.empty(capacity, dtype=np.int64)
+        self.end = np.empty(capacity, dtype=np.int64)
+        # Sorted (client, start) index over the first ``_indexed`` rows
+        self._order = np.empty(0, dtype=np.int64)
+        self._keys = np.empty(0, dtype=np.int64)
+        self._indexed = 0
+
+    def append(self, client: int, ap: int, essid: int, start: int, end: int) -> None:
+        if self.size == len(self.start):
+            for name in COLUMNS:
+                column = getattr(self, name)
+                grown = np.empty(max(1024, 2 * len(column)), dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+        i = self.size
+        self.client[i], self.ap[i], self.essid[i] = client, ap, essid
+        self.start[i], self.end[i] = start, end
+        self.size += 1
+
+    def column(self, name: str) -> np.ndarray:
+        """View of a column's filled rows."""
+        return getattr(self, name)[:self.size]
+
+    def by_client(self) -> np.ndarray:
+        """Row order sorted by (client, start)."""
+        if self._indexed < self.size:
+            rows = np.arange(self._indexed, self.size)
+            starts = self.start[rows]
+            if starts.min() < 0 or starts.max() >= _START_MAX:
+                # Outside the packed key range: keys tie, so order by a full sort
+                self._order = np.lexsort((self.column('start'), self.column('client')))
+                self._keys = _pack(self.client[self._order], self.start[self._order])
+            else:
+                keys = _pack(self.client[rows], starts)
+                new = np.argsort(keys, kind='stable')
+                positions = np.searchsorted(self._keys, keys[new], 'right')
+                self._order = np.insert(self._order, positions, rows[new])
+                self._keys = np.insert(self._keys, positions, keys[new])
+            self._indexed = self.size
+        return self._order
+
+    def client_rows(self, client: int) -> np.ndarray:
+        """Rows of one client, ordered by start (binary search of the index)."""
+        order = self.by_client()
+        first = np.int64(client) << _START_BITS
+        lo, hi = np.searchsorted(self._keys, [first, first + (1 << _START_BITS)], 'left')
+        return order[lo:hi]
+
+
+class PresenceTracker:
+    """
+    Build per-client session intervals (AP, SSID, start, end).
+
+    Feed it successive ``LocalControllerClient.get_clients()`` snapshots via
+    ``observe()`` or controller events via ``apply_event()``. A client
+    opens an interval when it first appears, closes it and opens another
+    when it roams to a different AP or SSID, and closes it when it is gone
+    from a snapshot. Closed intervals go to an ``IntervalStore``; queries
+    combine them with intervals still open.
+    """
+
+    def __init__(self):
+        """Initialize an empty tracker."""
+        self.store = IntervalStore()
+        self._clients = _Dictionary()
+        self._aps = _Dictionary([''])
+        self._essids = _Dictionary([''])
+        # client code -> [ap code, essid code, start, last seen]
+        self._open: Dict[int, List[int]] = {}
+
+    # ------------------------------------------------------------------
+    # Ingestion
+    # ------------------------------------------------------------------
+
+    def observe(self, clients: Iterable[Dict[str, Any]], timestamp: int) -> Dict[str, int]:
+        """
+        Apply one client snapshot taken at ``timestamp`` (epoch seconds).
+
+        Returns:
+            Counts of ``joined``, ``roamed`` and ``left`` clients
+        """
+        counts = {'joined': 0, 'roamed': 0, 'left': 0}
+        seen = set()
+        for record in clients:
+            mac = normalize_mac(record.get('mac'))
+            if mac is None:
+                continue
+            uplink = record.get('sw_mac') if record.get('is_wired') else record.get('ap_mac')
+            client = self._clients.encode(mac)
+            seen.add(client)
+            event = self._visit(client, normalize_mac(uplink) or '', record.get('essid') or '', timestamp)
+            if event:
+                counts[event] += 1
+        for client in [c for c in self._open if c not in seen]:
+            self._close(client)
+            counts['left'] += 1
+        return counts
+
+    def apply_event(self, event: Dict[str, Any]) -> Optional[str]:
+        """
+        Apply one controller event (``EVT_WU_Connected``, ``EVT_WU_Roam``, ...).
+
+        Returns:
+            ``joined``, ``roamed``, ``left`` or None if the event was ignored
+        """
+        key = event.get('key')
+        mac = normalize_mac(event.get('user') or event.get('guest'))
+        if mac is None:
+            return None
+        timestamp = int(event.get('time', 0) / 1000) if event.get('time') else int(event.get('datetime', 0))
+        client = self._clients.encode(mac)
+        if key in DISCONNECT_EVENTS:
+            if client in self._open:
+                self._open[client][3] = timestamp
+                self._close(client)
+                return 'left'
+            return None
+        if key in CONNECT_EVENTS or key in ROAM_EVENTS:
+            ap = normalize_mac(event.get('ap_to') or event.get('ap')) or ''
+            return self._visit(client, ap, event.get('ssid') or '', timestamp)
+        return None
+
+    def _visit(self, client: int, ap: str, essid: str, timestamp: int) -> Optional[str]:
+        ap_code, essid_code = self._aps.encode(ap), self._essids.encode(essid)
+        current = self._open.get(client)
+        if current is None:
+            self._open[client] = [ap_code, essid_code, timestamp, timestamp]
+            return 'joined'
+        if current[0] == ap_code and current[1] == essid_code:
+            current[3] = max(current[3], timestamp)
+            return None
+        current[3] = timestamp
+        self._close(client)
+        self._open[client] = [ap_code, essid_code, timestamp, timestamp]
+        return 'roamed'
+
+    def _close(self, client: int) -> None:
+        ap, essid, start, last_seen = self._open.pop(client)
+        self.store.append(client, ap, essid, start, last_seen)
+
+    def close_all(self) -> None:
+        """Close every open interval at its last observation (e.g. on shutdown)."""
+        for client in list(self._open):
+            self._close(client)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """Closed intervals plus open intervals (ending at their last observation)."""
+        columns = {name: self.store.column(name) for name in COLUMNS}
+        if self._open:
+            open_rows = np.array(
+                [[client, *values] for client, values in self._open.items()], dtype=np.int64
+            )
+            for i, name in enumerate(COLUMNS):
+                columns[name] = np.concatenate([columns[name], open_rows[:, i].astype(columns[name].dtype)])
+        return columns
+
+    def where(self, mac: str, start: int, end: int) -> List[Dict[str, Any]]:
+        """
+        Where a client was between ``start`` and ``end``.
+
+        Uses the ``(client, start)`` index: a binary search finds the
+        client's rows, then the window within them.
+
+        Returns:
+            Intervals overlapping the window, oldest first, as
+            ``{"ap", "essid", "start", "end"}``
+        """
+        client = self._clients.codes.get(normalize_mac(mac) or '')
+        if client is None:
+            return []
+        rows: List[Tuple[int, int, int, int]] = []
+        mine = self.store.client_rows(client)
+        # A client's closed intervals never overlap, so both bounds are sorted
+        starts, ends = self.store.column('start')[mine], self.store.column('end')[mine]
+        first, last = np.searchsorted(ends, start, 'left'), np.searchsorted(starts, end, 'right')
+        for row in mine[first:last]:
+            rows.append((self.store.ap[row], self.store.essid[row], self.store.start[row], self.store.end[row]))
+        current = self._open.get(client)
+        if current is not None and current[2] <= end and current[3] >= start:
+            rows.append(tuple(current))
+        return [
+            {'ap': self._aps.values[ap], 'essid': self._essids.values[essid], 'start': int(s), 'end': int(e)}
+            for ap, essid, s, e in rows
+        ]
+
+    def dwell_times(
+        self,
+        by: str = 'ap',
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        mac: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """
+        Total client-seconds spent per AP or SSID, clipped to a window.
+
+        Args:
+            by: ``ap`` or ``essid``
+            start: Window start (default: unbounded)
+            end: Window end (default: unbounded)
+            mac: Only this client
+
+        Returns:
+            Mapping of AP MAC or SSID to seconds
+        """
+        if by not in ('ap', 'essid'):
+            raise ValueError("by must be 'ap' or 'essid'")
+        columns = self._columns()
+        starts, ends = columns['start'], columns['end']
+        if start is not None:
+            starts = np.maximum(starts, start)
+        if end is not None:
+            ends = np.minimum(ends, end)
+        durations = np.clip(ends - starts, 0, None)
+        if mac is not None:
+            client = self._clients.codes.get(normalize_mac(mac) or '', -1)
+            durations = np.where(columns['client'] == client, durations, 0)
+        names = (self._aps if by == 'ap' else self._essids).values
+        totals = np.bincount(columns[by], weights=durations, minlength=len(names))
+        return {names[i]: int(total) for i, total in enumerate(totals) if total > 0}
+
+    def peak_concurrency(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        Peak number of simultaneous clients per AP.
+
+        A sweep over start (+1) and end (-1) events sorted by (AP, time),
+        with running sums computed per AP in one vectorised pass.
+
+        Returns:
+            Mapping of AP MAC to ``(peak clients, time the peak was reached)``
+        """
+        columns = self._columns()
+        starts, ends, aps = columns['start'], columns['end'], columns['ap']
+        mask = np.ones(len(starts), dtype=bool)
+        if start is not None:
+            mask &= ends >= start
+            starts = np.maximum(starts, start)
+        if end is not None:
+            mask &= starts <= end
+        starts, ends, aps = starts[mask], ends[mask], aps[mask]
+        if not len(starts):
+            return {}
+
+        times = np.concatenate([starts, ends])
+        deltas = np.concatenate([np.ones(len(starts), np.int64), -np.ones(len(ends), np.int64)])
+        groups = np.concatenate([aps, aps])
+        # Ends sort after starts at the same instant: touching intervals overlap
+        order = np.lexsort((-deltas, times, groups))
+        times, deltas, groups = times[order], deltas[order], groups[order]
+        running = np.cumsum(deltas)
+        boundaries = np.flatnonzero(np.diff(groups)) + 1
+        group_starts = np.concatenate([[0], boundaries])
+        offsets = np.repeat(
+            np.concatenate([[0], running[boundaries - 1]]),
+            np.diff(np.concatenate([group_starts, [len(running)]])),
+        )
+        running -= offsets
+
+        result = {}
+        for lo, hi in zip(group_starts, np.concatenate([boundaries, [len(running)]]), strict=True):
+            peak = lo + int(np.argmax(running[lo:hi]))
+            result[self._aps.values[groups[lo]]] = (int(running[peak]), int(times[peak]))
+        return result
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: Path) -> None:
+        """Save closed intervals and dictionaries to a compressed ``.npz`` file."""
+        # Fixed-width unicode arrays: loading never needs pickle
+        np.savez_compressed(
+            path,
+            **{name: self.store.column(name) for name in COLUMNS},
+            clients=np.array(self._clients.values, dtype=str),
+            aps=np.array(self._aps.values, dtype=str),
+            essids=np.array(self._essids.values, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "PresenceTracker":
+        """Load a tracker saved with ``save()`` (open intervals are not persisted)."""
+        tracker = cls()
+        with np.load(path, allow_pickle=False) as data:
+            tracker._clients = _Dictionary(data['clients'].tolist())
+            tracker._aps = _Dictionary(data['aps'].tolist())
+            tracker._essids = _Dictionary(data['essids'].tolist())
+            rows = data['start'].shape[0]
+            store = IntervalStore(capacity=max(rows, 1024))
+            for name in COLUMNS:
+                getattr(store, name)[:rows] = data[name]
+            store.size = rows
+            tracker.store = store
+        return tracker
@@ -0,0 +1,274 @@
+"""Reconcile cloud (Site Manager) and local controller device views."""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+from beast_unifi.utils.normalize import normalize_mac
+
+
+CLOUD = 'cloud'
+LOCAL = 'local'
+
+Getter = Callable[[Dict[str, Any]], Any]
+
+
+def _path(*keys: str) -> Getter:
+    def get(record: Dict[str, Any]) -> Any:
+        value: Any = record
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get
+
+
+# Canonical field -> (cloud getter, local getter)
+FIELDS: Dict[str, Tuple[Getter, Getter]] = {
+    'name': (_path('name'), _path('name')),
+    'ip': (_path('ip'), _path('ip')),
+    'model': (_path('model'), _path('model')),
+    'version': (_path('version'), _path('version')),
+    'online': (
+        lambda r: r.get('status') == 'online' if r.get('status') is not None else None,
+        lambda r: r.get('state') == 1 if r.get('state') is not None else None,
+    ),
+}
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    """Parse epoch seconds/milliseconds or ISO 8601 strings to epoch seconds."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000.0 if value > 1e11 else float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _versions_match(a: Any, b: Any) -> bool:
+    """Compare firmware versions on their common dotted prefix (ignores build suffixes)."""
+    left, right = str(a).split('.'), str(b).split('.')
+    n = min(len(left), len(right))
+    return left[:n] == right[:n]
+
+
+def flatten_cloud_devices(
+    groups: Iterable[Dict[str, Any]],
+    hosts: Optional[Iterable[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Flatten Site Manager ``get_devices()`` groups into one record per device.
+
+    Each device keeps its ``hostId`` and the group's ``updatedAt``. Hosts from
+    ``get_hosts()`` are added as records too (keyed by ``reportedState.mac``)
+    when they are not already listed as a device.
+
+    Args:
+        groups: Records from ``SiteManagerClient.get_devices()``
+        hosts: Records from ``SiteManagerClient.get_hosts()`` (optional)
+
+    Returns:
+        Flat list of cloud device records
+    """
+    records = []
+    seen = set()
+    for group in groups:
+        for device in group.get('devices') or []:
+            records.append({
+                **device,
+                'hostId': group.get('hostId'),
+                'updatedAt': device.get('updatedAt') or group.get('updatedAt'),
+            })
+            seen.add(normalize_mac(device.get('mac')))
+    for host in hosts or []:
+        state = host.get('reportedState') or {}
+        mac = normalize_mac(state.get('mac'))
+        if mac is not None and mac in seen:
+            continue
+        records.append({
+            'mac': state.get('mac'),
+            'name': state.get('name') or state.get('hostname'),
+            'ip': host.get('ipAddress'),
+            'hostId': host.get('id'),
+            'hardwareId': host.get('hardwareId'),
+            'status': 'online' if state.get('state') == 'connected' else state.get('state'),
+            'updatedAt': host.get('lastConnectionStateChange'),
+        })
+    return records
+
+
+@dataclass
+class Conflict:
+    """A disagreement between the two sources for one device."""
+
+    key: str
+    kind: str
+    field: Optional[str] = None
+    cloud: Any = None
+    local: Any = None
+
+
+@dataclass
+class ReconciliationResult:
+    """Outcome of reconciling cloud and local device records."""
+
+    matched: List[Dict[str, Any]] = field(default_factory=list)
+    cloud_only: List[Dict[str, Any]] = field(default_factory=list)
+    local_only: List[Dict[str, Any]] = field(default_factory=list)
+    conflicts: List[Conflict] = field(default_factory=list)
+
+    def conflicts_by_kind(self) -> Dict[str, List[Conflict]]:
+        """Group conflicts by kind (``version_mismatch``, ``missing_local``, ...)."""
+        grouped: Dict[str, List[Conflict]] = {}
+        for conflict in self.conflicts:
+            grouped.setdefault(conflict.kind, []).append(conflict)
+        return grouped
+
+
+class Reconciler:
+    """
+    Match cloud and local device records with hash joins on normalised keys.
+
+    Records are joined on normalised MAC first and serial number second,
+    building one hash table per key over the local side, so a run is
+    O(cloud + local). Local records sharing a key are all kept: each is
+    matched by at most one cloud record and the key is reported as a
+    ``duplicate_local`` conflict listing their ``_id`` values. For each matched pair, every canonical field is taken
+    from whichever source reported most recently (``updatedAt`` on the cloud
+    side, ``last_seen`` locally), and disagreements are reported as conflicts.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[Dict[str, Tuple[Getter, Getter]]] = None,
+        compare_fields: Iterable[str] = ('name', 'ip', 'model', 'version'),
+    ):
+        """
+        Initialize reconciler.
+
+        Args:
+            fields: Canonical field getters (default: ``FIELDS``)
+            compare_fields: Fields whose disagreement is reported as a conflict
+        """
+        self.fields = fields or FIELDS
+        self.compare_fields = tuple(compare_fields)
+
+    @staticmethod
+    def _keys(record: Dict[str, Any]) -> List[str]:
+        keys = []
+        mac = normalize_mac(record.get('mac'))
+        if mac:
+            keys.append(f"mac:{mac}")
+        serial = record.get('serial') or record.get('serialNumber')
+        if serial:
+            keys.append(f"serial:{str(serial).strip().upper()}")
+        return keys
+
+    def reconcile(
+        self,
+        cloud_records: Iterable[Dict[str, Any]],
+        local_records: Iterable[Dict[str, Any]],
+    ) -> ReconciliationResult:
+        """
+        Reconcile flat cloud records with local controller devices.
+
+        Args:
+            cloud_records: Output of ``flatten_cloud_devices()``
+            local_records: Records from ``LocalControllerClient.get_devices()``
+
+        Returns:
+            ReconciliationResult with merged records, one-sided records and conflicts
+        """
+        result = ReconciliationResult()
+        local_list = list(local_records)
+        index: Dict[str, List[int]] = {}
+        for position, record in enumerate(local_list):
+            for key in self._keys(record):
+                index.setdefault(key, []).append(position)
+        for key, positions in index.items():
+            if len(positions) > 1:
+                ids = [local_list[p].get('_id') for p in positions]
+                result.conflicts.append(Conflict(key, 'duplicate_local', local=ids))
+
+        claimed = set()
+        for cloud in cloud_records:
+            keys = self._keys(cloud)
+            position = next(
+                (p for k in keys for p in index.get(k, ()) if p not in claimed),
+                None,
+            )
+            if position is None:
+                result.cloud_only.append(cloud)
+                result.conflicts.append(Conflict(keys[0] if keys else '', 'missing_local'))
+                continue
+            claimed.add(position)
+            local = local_list[position]
+            result.matched.append(self._merge(cloud, local, keys[0], result.conflicts))
+
+        for position, local in enumerate(local_list):
+            if position not in claimed:
+                keys = self._keys(local)
+                result.local_only.append(local)
+                result.conflicts.append(Conflict(keys[0] if keys else '', 'missing_cloud'))
+        return result
+
+    def _merge(
+        self,
+        cloud: Dict[str, Any],
+        local: Dict[str, Any],
+        key: str,
+        conflicts: List[Conflict],
+    ) -> Dict[str, Any]:
+        cloud_time = _timestamp(cloud.get('updatedAt'))
+        local_time = _timestamp(local.get('last_seen'))
+        prefer_local = local_time is not None and (cloud_time is None or local_time >= cloud_time)
+
+        merged: Dict[str, Any] = {
+            'key': key,
+            'mac': normalize_mac(local.get('mac') or cloud.get('mac')),
+            'hostId': cloud.get('hostId'),
+            'local_id': local.get('_id'),
+            'source': {},
+        }
+        for name, (get_cloud, get_local) in self.fields.items():
+            cloud_value, local_value = get_cloud(cloud), get_local(local)
+            if cloud_value is None or (local_value is not None and prefer_local):
+                merged[name], merged['source'][name] = local_value, LOCAL
+            else:
+                merged[name], merged['source'][name] = cloud_value, CLOUD
+
+            if name not in self.compare_fields or cloud_value is None or local_value is None:
+                continue
+            if name == 'version':
+                same = _versions_match(cloud_value, local_value)
+            else:
+                same = cloud_value == local_value
+            if not same:
+                conflicts.append(Conflict(key, f"{name}_mismatch", name, cloud_value, local_value))
+        return merged
+
+
+def reconcile_devices(
+    cloud_devices: Iterable[Dict[str, Any]],
+    local_devices: Iterable[Dict[str, Any]],
+    cloud_hosts: Optional[Iterable[Dict[str, Any]]] = None,
+) -> ReconciliationResult:
+    """
+    Reconcile Site Manager and local controller device lists.
+
+    Args:
+        cloud_devices: Records from ``SiteManagerClient.get_devices()``
+        local_devices: Records from ``LocalControllerClient.get_devices()``
+        cloud_hosts: Records from ``SiteManagerClient.get_hosts()`` (optional)
+
+    Returns:
+        ReconciliationResult
+    """
+    return Reconciler().reconcile(flatten_cloud_devices(cloud_devices, cloud_hosts), local_devices)
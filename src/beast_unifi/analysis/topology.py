@@ -0,0 +1,467 @@
+"""Network topology graph of gateways, switches, APs and clients."""
+
+from typing import Dict, List, Optional, Any, Iterable, Set
+from xml.etree import ElementTree
+
+from beast_unifi.utils.normalize import normalize_mac
+
+
+GATEWAY = 'gateway'
+SWITCH = 'switch'
+AP = 'ap'
+CLIENT = 'client'
+DEVICE = 'device'
+
+# UniFi device ``type`` -> node kind
+DEVICE_KINDS: Dict[str, str] = {
+    'ugw': GATEWAY,
+    'udm': GATEWAY,
+    'uxg': GATEWAY,
+    'usw': SWITCH,
+    'uap': AP,
+}
+
+# Mermaid node shapes per kind
+_MERMAID_SHAPES = {
+    GATEWAY: ('{{', '}}'),
+    SWITCH: ('[', ']'),
+    AP: ('([', '])'),
+    CLIENT: ('(', ')'),
+    DEVICE: ('[', ']'),
+}
+
+
+class TopologyNode:
+    """A device or client in the topology. Slotted to keep large graphs compact."""
+
+    __slots__ = (
+        'mac', 'kind', 'name', 'model', 'ip', 'uplink', 'uplink_port',
+        'link', 'ports', 'counters', 'updated',
+    )
+
+    def __init__(self, mac: str, kind: str):
+        self.mac = mac
+        self.kind = kind
+        self.name: Optional[str] = None
+        self.model: Optional[str] = None
+        self.ip: Optional[str] = None
+        self.uplink: Optional[str] = None
+        self.uplink_port: Optional[int] = None
+        self.link: Optional[str] = None
+        # port_idx -> port state (up, speed, rx/tx rates, poe)
+        self.ports: Dict[int, Dict[str, Any]] = {}
+        # port_idx -> (rx_bytes, tx_bytes) at ``updated``
+        self.counters: Dict[int, tuple] = {}
+        self.updated: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"TopologyNode({self.kind} {self.mac})"
+
+
+def device_uplink(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Current uplink of a device, falling back to the last known one when it is down."""
+    uplink = record.get('uplink')
+    if isinstance(uplink, dict) and uplink.get('uplink_mac'):
+        return uplink
+    last = record.get('last_uplink')
+    return last if isinstance(last, dict) else {}
+
+
+class Topology:
+    """
+    Uplink graph built from ``LocalControllerClient`` devices and clients.
+
+    Each node stores its parent (uplink) and the graph keeps a children set
+    per node with children, so ``upsert_device()`` for a single changed
+    device re-links one edge instead of rebuilding the graph. Path and
+    blast-radius queries walk only the affected branch.
+    """
+
+    def __init__(self):
+        """Initialize an empty topology."""
+        self._nodes: Dict[str, TopologyNode] = {}
+        self._children: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, mac: object) -> bool:
+        return isinstance(mac, str) and normalize_mac(mac) in self._nodes
+
+    def get(self, mac: str) -> Optional[TopologyNode]:
+        """Node by MAC address."""
+        return self._nodes.get(normalize_mac(mac) or '')
+
+    def nodes(self, kind: Optional[str] = None) -> List[TopologyNode]:
+        """All nodes, optionally of one kind."""
+        return [n for n in self._nodes.values() if kind is None or n.kind == kind]
+
+    # ------------------------------------------------------------------
+    # Building and incremental updates
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_records(
+        cls,
+        devices: Iterable[Dict[str, Any]],
+        clients: Iterable[Dict[str, Any]] = (),
+    ) -> "Topology":
+        """Build a topology from device and client snapshots."""
+        topology = cls()
+        for device in devices:
+            topology.upsert_device(device)
+        for client in clients:
+            topology.upsert_client(client)
+        return topology
+
+    def upsert_device(self, record: Dict[str, Any], timestamp: Optional[float] = None) -> Optional[str]:
+        """
+        Add or update one device from a ``stat/device`` record.
+
+        Port byte counters are turned into rates using the previous update
+        of the same device, so repeated upserts keep utilization current.
+
+        Args:
+            record: Device record
+            timestamp: Observation time in epoch seconds (default: ``last_seen``)
+
+        Returns:
+            ``added``, ``moved`` (uplink changed), ``updated`` or None if the MAC is invalid
+        """
+        mac = normalize_mac(record.get('mac'))
+        if mac is None:
+            return None
+        kind = DEVICE_KINDS.get(record.get('type'), DEVICE)
+        node, change = self._node(mac, kind)
+        node.name = record.get('name') or record.get('hostname')
+        node.model = record.get('model')
+        node.ip = record.get('ip')
+        uplink = device_uplink(record)
+        node.link = uplink.get('type')
+        node.uplink_port = uplink.get('uplink_remote_port')
+        self._update_ports(node, record, timestamp if timestamp is not None else record.get('last_seen'))
+        if self._link(node, normalize_mac(uplink.get('uplink_mac'))) and change == 'updated':
+            change = 'moved'
+        return change
+
+    def upsert_client(self, record: Dict[str, Any]) -> Optional[str]:
+        """
+        Add or update one client from a ``stat/sta`` record.
+
+        Returns:
+            ``added``, ``moved`` (roamed or re-patched), ``updated`` or None
+        """
+        mac = normalize_mac(record.get('mac'))
+        if mac is None:
+            return None
+        node, change = self._node(mac, CLIENT)
+        node.name = record.get('hostname') or record.get('name')
+        node.ip = record.get('ip')
+        if record.get('is_wired'):
+            parent, node.link, node.uplink_port = record.get('sw_mac'), 'wire', record.get('sw_port')
+        else:
+            parent, node.link, node.uplink_port = record.get('ap_mac'), 'wireless', None
+        if self._link(node, normalize_mac(parent)) and change == 'updated':
+            change = 'moved'
+        return change
+
+    def remove(self, mac: str) -> Optional[TopologyNode]:
+        """
+        Remove a node. Its children keep their uplink and become roots until it returns.
+
+        The node's own children set survives only while such children
+        exist; it is dropped once the last of them is removed or re-linked.
+
+        Returns:
+            The removed node, or None if it was not present
+        """
+        node = self._nodes.pop(normalize_mac(mac) or '', None)
+        if node is None:
+            return None
+        if node.uplink is not None:
+            self._detach(node.mac, node.uplink)
+        return node
+
+    def sync(
+        self,
+        devices: Iterable[Dict[str, Any]],
+        clients: Optional[Iterable[Dict[str, Any]]] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Apply full snapshots: upsert everything present and remove what is gone.
+
+        Args:
+            devices: Complete device snapshot
+            clients: Complete client snapshot (clients untouched when omitted)
+
+        Returns:
+            MACs ``added``, ``moved`` and ``removed``
+        """
+        changes: Dict[str, List[str]] = {'added': [], 'moved': [], 'removed': []}
+        batches = [(DEVICE, devices, self.upsert_device)]
+        if clients is not None:
+            batches.append((CLIENT, clients, self.upsert_client))
+        for scope, records, upsert in batches:
+            seen = set()
+            for record in records:
+                change = upsert(record)
+                mac = normalize_mac(record.get('mac'))
+                seen.add(mac)
+                if change in ('added', 'moved'):
+                    changes[change].append(mac)
+            stale = [
+                n.mac for n in self._nodes.values()
+                if n.mac not in seen and (n.kind == CLIENT) == (scope == CLIENT)
+            ]
+            for mac in stale:
+                self.remove(mac)
+                changes['removed'].append(mac)
+        return changes
+
+    def _node(self, mac: str, kind: str) -> tuple:
+        node = self._nodes.get(mac)
+        if node is None:
+            # Children that arrived before their parent are already in its set
+            node = self._nodes[mac] = TopologyNode(mac, kind)
+            return node, 'added'
+        node.kind = kind
+        return node, 'updated'
+
+    def _link(self, node: TopologyNode, parent: Optional[str]) -> bool:
+        """Point ``node`` at ``parent``, refusing links that would form a cycle."""
+        if parent == node.mac or (parent is not None and node.mac in self._ancestors(parent)):
+            parent = None
+        if parent == node.uplink:
+            return False
+        if node.uplink is not None:
+            self._detach(node.mac, node.uplink)
+        node.uplink = parent
+        if parent is not None:
+            self._children.setdefault(parent, set()).add(node.mac)
+        return True
+
+    def _detach(self, child: str, parent: str) -> None:
+        """Drop ``child`` from ``parent``'s children, and the set once it is empty."""
+        children = self._children.get(parent)
+        if children is not None:
+            children.discard(child)
+            if not children:
+                del self._children[parent]
+
+    def _update_ports(self, node: TopologyNode, record: Dict[str, Any], timestamp: Optional[float]) -> None:
+        elapsed = None
+        if timestamp is not None and node.updated is not None and timestamp > node.updated:
+            elapsed = timestamp - node.updated
+        ports: Dict[int, Dict[str, Any]] = {}
+        counters: Dict[int, tuple] = {}
+        for port in record.get('port_table') or []:
+            idx = port.get('port_idx')
+            if idx is None:
+                continue
+            rx, tx = port.get('rx_bytes') or 0, port.get('tx_bytes') or 0
+            counters[idx] = (rx, tx)
+            state = {
+                'name': port.get('name'),
+                'up': bool(port.get('up')),
+                'speed': port.get('speed') or 0,
+                'is_uplink': bool(port.get('is_uplink')),
+                'poe_power': float(port.get('poe_power') or 0),
+                'rx_rate': None,
+                'tx_rate': None,
+            }
+            previous = node.counters.get(idx)
+            # Counter resets (reboot) show up as negative deltas and are skipped
+            if elapsed and previous and rx >= previous[0] and tx >= previous[1]:
+                state['rx_rate'] = (rx - previous[0]) / elapsed
+                state['tx_rate'] = (tx - previous[1]) / elapsed
+            ports[idx] = state
+        node.ports, node.counters = ports, counters
+        if timestamp is not None:
+            node.updated = timestamp
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _ancestors(self, mac: str) -> List[str]:
+        chain: List[str] = []
+        seen: Set[str] = set()
+        current: Optional[str] = mac
+        while current is not None and current not in seen:
+            seen.add(current)
+            chain.append(current)
+            node = self._nodes.get(current)
+            current = node.uplink if node is not None else None
+        return chain
+
+    def roots(self) -> List[TopologyNode]:
+        """Nodes without a known uplink (normally the gateway, plus orphans)."""
+        return [
+            n for n in self._nodes.values()
+            if n.uplink is None or n.uplink not in self._nodes
+        ]
+
+    def children(self, mac: str) -> List[TopologyNode]:
+        """Nodes directly attached to a node."""
+        return [self._nodes[m] for m in self._children.get(normalize_mac(mac) or '', ()) if m in self._nodes]
+
+    def path_to_root(self, mac: str) -> List[TopologyNode]:
+        """Nodes from ``mac`` up to its root."""
+        mac = normalize_mac(mac)
+        if mac not in self._nodes:
+            return []
+        return [self._nodes[m] for m in self._ancestors(mac) if m in self._nodes]
+
+    def path(self, source: str, target: str) -> List[TopologyNode]:
+        """
+        Path between two nodes through their lowest common uplink.
+
+        Returns:
+            Nodes from ``source`` to ``target`` inclusive; empty if they are
+            not connected
+        """
+        up = [n.mac for n in self.path_to_root(source)]
+        down = [n.mac for n in self.path_to_root(target)]
+        if not up or not down:
+            return []
+        positions = {mac: i for i, mac in enumerate(up)}
+        for j, mac in enumerate(down):
+            if mac in positions:
+                macs = up[:positions[mac] + 1] + list(reversed(down[:j]))
+                return [self._nodes[m] for m in macs]
+        return []
+
+    def descendants(self, mac: str) -> List[TopologyNode]:
+        """Every node downstream of ``mac``, breadth first."""
+        start = normalize_mac(mac)
+        found: List[TopologyNode] = []
+        seen = {start}
+        frontier = [start]
+        while frontier:
+            next_frontier = []
+            for parent in frontier:
+                for child in self._children.get(parent, ()):
+                    if child not in seen and child in self._nodes:
+                        seen.add(child)
+                        found.append(self._nodes[child])
+                        next_frontier.append(child)
+            frontier = next_frontier
+        return found
+
+    def blast_radius(self, mac: str) -> Dict[str, Any]:
+        """
+        What loses connectivity if a node fails.
+
+        Returns:
+            ``{"devices": [...], "clients": [...], "counts": {kind: n}}``
+        """
+        affected = self.descendants(mac)
+        counts: Dict[str, int] = {}
+        for node in affected:
+            counts[node.kind] = counts.get(node.kind, 0) + 1
+        return {
+            'devices': [n.mac for n in affected if n.kind != CLIENT],
+            'clients': [n.mac for n in affected if n.kind == CLIENT],
+            'counts': counts,
+        }
+
+    def port_utilization(self, mac: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Per-port state and utilization for one device or all switches and gateways.
+
+        ``utilization`` is the busier direction's rate over link speed
+        (0-1), available from the second update of a device onwards.
+
+        Returns:
+            One row per port with ``device``, ``port``, ``up``, ``speed``,
+            ``rx_rate``/``tx_rate`` (bytes/s), ``utilization`` and ``clients``
+        """
+        if mac is not None:
+            node = self.get(mac)
+            devices = [node] if node is not None else []
+        else:
+            devices = [n for n in self._nodes.values() if n.ports]
+        rows = []
+        for device in devices:
+            attached: Dict[int, int] = {}
+            for child in self._children.get(device.mac, ()):
+                port = self._nodes[child].uplink_port if child in self._nodes else None
+                if port is not None:
+                    attached[port] = attached.get(port, 0) + 1
+            for idx, port in sorted(device.ports.items()):
+                utilization = None
+                if port['speed'] and port['rx_rate'] is not None:
+                    busiest = max(port['rx_rate'], port['tx_rate'])
+                    utilization = min(1.0, busiest * 8 / (port['speed'] * 1_000_000))
+                rows.append({
+                    'device': device.mac,
+                    'port': idx,
+                    **port,
+                    'utilization': utilization,
+                    'clients': attached.get(idx, 0),
+                })
+        return rows
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def to_mermaid(self, include_clients: bool = False) -> str:
+        """
+        Render a Mermaid ``graph TD`` diagram (as used for ``docs/unifi_erd.mmd``).
+
+        Args:
+            include_clients: Also draw client nodes (large on busy sites)
+
+        Returns:
+            Mermaid diagram text
+        """
+        lines = ["graph TD"]
+        shown = {n.mac for n in self._nodes.values() if include_clients or n.kind != CLIENT}
+        for node in sorted(self._nodes.values(), key=lambda n: n.mac):
+            if node.mac not in shown:
+                continue
+            left, right = _MERMAID_SHAPES[node.kind]
+            label = (node.name or node.mac).replace('"', "'")
+            lines.append(f"    {_mermaid_id(node.mac)}{left}\"{label}\"{right}")
+        lines.append("")
+        for node in sorted(self._nodes.values(), key=lambda n: n.mac):
+            if node.mac in shown and node.uplink in shown:
+                arrow = '-.->' if node.link == 'wireless' else '-->'
+                label = f"|port {node.uplink_port}|" if node.uplink_port is not None else ''
+                lines.append(f"    {_mermaid_id(node.uplink)} {arrow}{label} {_mermaid_id(node.mac)}")
+        return "\n".join(lines) + "\n"
+
+    def to_graphml(self) -> str:
+        """
+        Render the topology as GraphML (readable by yEd, Gephi and networkx).
+
+        Returns:
+            GraphML document text
+        """
+        ns = 'http://graphml.graphdrawing.org/xmlns'
+        root = ElementTree.Element('graphml', xmlns=ns)
+        node_keys = ('kind', 'name', 'model', 'ip')
+        edge_keys = ('link', 'port')
+        for name in node_keys:
+            ElementTree.SubElement(root, 'key', id=name, attrib={'for': 'node', 'attr.name': name, 'attr.type': 'string'})
+        for name in edge_keys:
+            ElementTree.SubElement(root, 'key', id=name, attrib={'for': 'edge', 'attr.name': name, 'attr.type': 'string'})
+        graph = ElementTree.SubElement(root, 'graph', id='topology', edgedefault='directed')
+        for node in self._nodes.values():
+            element = ElementTree.SubElement(graph, 'node', id=node.mac)
+            for name in node_keys:
+                value = getattr(node, name)
+                if value is not None:
+                    ElementTree.SubElement(element, 'data', key=name).text = str(value)
+        for node in self._nodes.values():
+            if node.uplink in self._nodes:
+                edge = ElementTree.SubElement(graph, 'edge', source=node.uplink, target=node.mac)
+                for name, value in (('link', node.link), ('port', node.uplink_port)):
+                    if value is not None:
+                        ElementTree.SubElement(edge, 'data', key=name).text = str(value)
+        return ElementTree.tostring(root, encoding='unicode', xml_declaration=True)
+
+
+def _mermaid_id(mac: str) -> str:
+    return 'n' + mac.replace(':', '')
@@ -2,9 +2,20 @@
 
 from beast_unifi.api.site_manager import SiteManagerClient
 from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.api.backup import BackupDownloader
+from beast_unifi.api.federation import FederatedCollector
+from beast_unifi.api.session import SiteSession
+from beast_unifi.api.reports import ReportIngestor
+from beast_unifi.api.sharding import ShardCoordinator, ShardWorker, run_local
 
 __all__ = [
     "SiteManagerClient",
     "LocalControllerClient",
+    "FederatedCollector",
+    "SiteSession",
+    "BackupDownloader",
+    "ReportIngestor",
+    "ShardCoordinator",
+    "ShardWorker",
+    "run_local",
 ]
-
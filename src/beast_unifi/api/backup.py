@@ -0,0 +1,262 @@
+"""Streaming, resumable controller backup downloads."""
+
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import requests
+
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.utils.rate_limit import RateLimiter
+
+
+CHUNK_SIZE = 1024 * 1024
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+def sha256_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupDownloader:
+    """
+    Download controller backups to disk in chunks.
+
+    Bytes go straight from the response to ``<file>.part``, so memory use
+    is one chunk regardless of backup size. An
+    interrupted transfer (dropped connection, crash) resumes from the
+    bytes already on disk with an HTTP ``Range`` request; a controller
+    that ignores the range answers 200 and the file starts over. A
+    finished file is checked against the expected size, hashed, renamed
+    into place and gets a ``<file>.sha256`` sidecar, which later runs use to
+    skip backups already downloaded intact.
+
+    Bandwidth can be capped per transfer and across all transfers (a
+    shared ``RateLimiter`` counting bytes), so nightly runs over slow WAN
+    links leave room for production traffic.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        chunk_size: int = CHUNK_SIZE,
+        bandwidth: Optional[float] = None,
+        total_bandwidth: Optional[float] = None,
+        max_workers: int = 4,
+        retries: int = 3,
+    ):
+        """
+        Initialize backup downloader.
+
+        Args:
+            directory: Destination; each controller gets a subdirectory
+            chunk_size: Bytes read and written per chunk
+            bandwidth: Cap per transfer in bytes per second (default: none)
+            total_bandwidth: Cap across all transfers in bytes per second
+            max_workers: Controllers backed up in parallel
+            retries: Resume attempts after a failed transfer
+        """
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self.bandwidth = bandwidth
+        self.total_limiter = (
+            RateLimiter(total_bandwidth, burst=chunk_size) if total_bandwidth else None
+        )
+        self.max_workers = max_workers
+        self.retries = retries
+        self.errors: Dict[str, str] = {}
+
+    def download(
+        self,
+        client: LocalControllerClient,
+        path: str,
+        destination: Path,
+        expected_size: Optional[int] = None,
+        skip_existing: bool = True,
+    ) -> Dict[str, Any]:
+        """
+        Download one backup file, resuming a previous partial transfer.
+
+        Args:
+            client: Controller client (its session carries the API token)
+            path: Controller download path (``/dl/backup/...`` or ``/dl/autobackup/...``)
+            destination: Final file path
+            expected_size: Size reported by ``list_backups()``, if known
+            skip_existing: Skip the download when ``destination`` matches its
+                ``.sha256`` sidecar (only safe when the path names one
+                immutable backup)
+
+        Returns:
+            ``{"path", "size", "sha256", "resumed_from", "skipped"}``;
+            ``resumed_from`` is the number of bytes kept from an earlier
+            transfer (0 when the server ignored the range and resent everything)
+
+        Raises:
+            ValueError: If the downloaded size does not match the expected size
+        """
+        destination = Path(destination)
+        sidecar = destination.with_name(destination.name + '.sha256')
+        if skip_existing and destination.exists() and sidecar.exists():
+            recorded = sidecar.read_text().split()[0]
+            if (expected_size is None or destination.stat().st_size == expected_size) and \
+                    sha256_file(destination, self.chunk_size) == recorded:
+                return {'path': destination, 'size': destination.stat().st_size,
+                        'sha256': recorded, 'resumed_from': 0, 'skipped': True}
+
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        part = destination.with_name(destination.name + '.part')
+        limiter = RateLimiter(self.bandwidth, burst=self.chunk_size) if self.bandwidth else None
+        # Offset each attempt actually continued from
+        starts: List[int] = []
+        for attempt in range(self.retries + 1):
+            try:
+                total = self._transfer(client, client.download_url(path), part, limiter, starts)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt == self.retries:
+                    raise
+
+        size = part.stat().st_size
+        expected = expected_size if expected_size is not None else total
+        if expected is not None and size != expected:
+            part.unlink()
+            raise ValueError(f"Backup {path} is {size} bytes, expected {expected}")
+        digest = sha256_file(part, self.chunk_size)
+        os.replace(part, destination)
+        sidecar.write_text(f"{digest}  {destination.name}\n")
+        resumed_from = 0 if 0 in starts else starts[0]
+        return {'path': destination, 'size': size, 'sha256': digest,
+                'resumed_from': resumed_from, 'skipped': False}
+
+    def _transfer(
+        self,
+        client: LocalControllerClient,
+        url: str,
+        part: Path,
+        limiter: Optional[RateLimiter],
+        starts: List[int],
+    ) -> Optional[int]:
+        """
+        Append the rest of ``url`` to ``part``; returns the total size if the server sent it.
+
+        The offset the transfer really continued from is appended to ``starts``.
+        """
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        response = client._send('get', url, stream=True, headers=headers)
+        with closing(response):
+            if response.status_code == 416 and offset:
+                # Nothing left to send: the part file already holds everything
+                starts.append(offset)
+                match = re.search(r'/(\d+)', response.headers.get('Content-Range', ''))
+                return int(match.group(1)) if match else offset
+            response.raise_for_status()
+            total = None
+            if response.status_code == 206:
+                match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                if match is None or int(match.group(1)) != offset:
+                    raise ValueError(f"Unexpected Content-Range for {url}: {response.headers.get('Content-Range')}")
+                total = int(match.group(3)) if match.group(3) != '*' else None
+            else:
+                # Range ignored: start over
+                offset = 0
+                length = response.headers.get('Content-Length')
+                total = int(length) if length else None
+            starts.append(offset)
+            with open(part, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    if limiter is not None:
+                        limiter.acquire(len(chunk))
+                    if self.total_limiter is not None:
+                        self.total_limiter.acquire(len(chunk))
+                    f.write(chunk)
+            return total
+
+    def backup(self, name: str, client: LocalControllerClient, create: bool = False) -> Dict[str, Any]:
+        """
+        Download the newest backup of one controller.
+
+        Args:
+            name: Controller name (subdirectory of ``directory``)
+            client: Controller client
+            create: Create a fresh settings backup instead of fetching the
+                newest autobackup; the controller reuses its download name
+                (``<version>.unf``) for every backup, so the file is saved
+                under a UTC timestamp and never skipped
+
+        Returns:
+            Result of ``download()``
+        """
+        if create:
+            path = client.create_backup()
+            expected_size = None
+        else:
+            backups = client.list_backups()
+            if not backups:
+                raise ValueError(f"No autobackups on controller {name}")
+            latest = max(backups, key=lambda b: b.get('time') or 0)
+            path = f"/dl/autobackup/{latest['filename']}"
+            expected_size = latest.get('size')
+        filename = path.rstrip('/').rsplit('/', 1)[-1]
+        if create:
+            stem, dot, suffix = filename.rpartition('.')
+            stamp = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+            filename = f"{stem}-{stamp}.{suffix}" if dot else f"{filename}-{stamp}"
+        return self.download(client, path, self.directory / name / filename, expected_size, skip_existing=not create)
+
+    def run(
+        self,
+        clients: Dict[str, LocalControllerClient],
+        create: bool = False,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Back up many controllers in parallel.
+
+        Failures are recorded in ``errors`` (by controller name) instead of
+        stopping the others; partial files stay on disk for the next run.
+
+        Returns:
+            Controller name to download result, for the successful ones
+        """
+        self.errors = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                name: pool.submit(self.backup, name, client, create)
+                for name, client in clients.items()
+            }
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    self.errors[name] = str(e)
+        return results
+
+    def prune(self, name: str, keep: int = 7) -> List[Path]:
+        """
+        Delete all but the ``keep`` newest verified backups of a controller.
+
+        Returns:
+            Deleted files
+        """
+        files = sorted(
+            (p for p in (self.directory / name).glob('*.unf') if p.with_name(p.name + '.sha256').exists()),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        deleted: List[Path] = []
+        for path in files[keep:]:
+            path.unlink()
+            path.with_name(path.name + '.sha256').unlink()
+            deleted.append(path)
+        return deleted
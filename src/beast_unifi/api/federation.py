@@ -0,0 +1,143 @@
+"""Parallel collection across multiple UniFi Site Manager accounts."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+from beast_unifi.api.site_manager import SiteManagerClient
+from beast_unifi.credentials.env import load_accounts_from_env
+from beast_unifi.credentials.onepassword import load_accounts_from_1password
+from beast_unifi.utils.rate_limit import RateLimiter
+
+
+# Collection name -> (client method, fields identifying a record across accounts)
+COLLECTIONS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'hosts': ('get_hosts', ('id',)),
+    'sites': ('get_sites', ('siteId',)),
+    'devices': ('get_devices', ('hostId',)),
+    'sd-wan-configs': ('get_sd_wan_configs', ('id',)),
+    'isp-metrics': ('get_isp_metrics', ('hostId', 'siteId')),
+}
+
+ACCOUNTS_FIELD = '_accounts'
+
+
+def _records(payload: Any) -> List[Dict[str, Any]]:
+    """Normalise a client method result to a list of records."""
+    if isinstance(payload, dict):
+        payload = payload.get('data', [])
+    return [r for r in payload or [] if isinstance(r, dict)]
+
+
+class FederatedCollector:
+    """
+    Collect Site Manager data for many accounts concurrently.
+
+    Each account gets its own ``SiteManagerClient`` and ``RateLimiter``, so
+    accounts are paced independently while all (account, collection) pairs
+    run in one thread pool. Results are merged per collection and
+    de-duplicated on each collection's identity fields; every merged record
+    lists the accounts it was seen in under ``_accounts``.
+    """
+
+    def __init__(
+        self,
+        api_keys: Dict[str, str],
+        requests_per_minute: int = 100,
+        max_workers: int = 16,
+        client_factory: Optional[Callable[[str, RateLimiter], SiteManagerClient]] = None,
+    ):
+        """
+        Initialize federated collector.
+
+        Args:
+            api_keys: Mapping of account name to Site Manager API key
+            requests_per_minute: Request quota applied to each account
+            max_workers: Maximum concurrent requests across all accounts
+            client_factory: Builds a client from (api_key, limiter); for tests
+        """
+        if not api_keys:
+            raise ValueError(
+                "At least one API key required. Set UNIFI_API_KEY_<ACCOUNT> in ~/.env "
+                "or tag items in 1Password"
+            )
+
+        factory = client_factory or (
+            lambda key, limiter: SiteManagerClient(api_key=key, rate_limiter=limiter)
+        )
+        self.max_workers = max_workers
+        self.clients: Dict[str, SiteManagerClient] = {
+            account: factory(key, RateLimiter.per_minute(requests_per_minute))
+            for account, key in api_keys.items()
+        }
+        self.errors: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def from_env(cls, env_path: Optional[Path] = None, **kwargs) -> "FederatedCollector":
+        """Create a collector for every account found in the environment."""
+        return cls(load_accounts_from_env(env_path), **kwargs)
+
+    @classmethod
+    def from_1password(cls, vault_name: str = "Beastmaster", **kwargs) -> "FederatedCollector":
+        """Create a collector for every tagged account in a 1Password vault."""
+        return cls(load_accounts_from_1password(vault_name), **kwargs)
+
+    def collect(
+        self,
+        collections: Optional[Iterable[str]] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Fetch collections for all accounts concurrently and merge them.
+
+        Failures are isolated per (account, collection) and recorded in
+        ``self.errors``; the remaining results are still returned.
+
+        Args:
+            collections: Collection names (default: all of ``COLLECTIONS``)
+
+        Returns:
+            Dictionary mapping collection name to de-duplicated records
+        """
+        names = list(collections) if collections is not None else list(COLLECTIONS)
+        unknown = [name for name in names if name not in COLLECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown collection(s): {', '.join(unknown)}")
+
+        self.errors = {}
+        tasks = [(account, name) for account in self.clients for name in names]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._fetch, account, name) for account, name in tasks]
+            results = [future.result() for future in futures]
+
+        merged: Dict[str, Dict[Any, Dict[str, Any]]] = {name: {} for name in names}
+        for (account, name), (records, error) in zip(tasks, results, strict=True):
+            if error is not None:
+                self.errors.setdefault(account, {})[name] = error
+                continue
+            self._merge(merged[name], records, account, COLLECTIONS[name][1])
+        return {name: list(records.values()) for name, records in merged.items()}
+
+    def _fetch(self, account: str, name: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        method = getattr(self.clients[account], COLLECTIONS[name][0])
+        try:
+            return _records(method()), None
+        except Exception as e:
+            return [], str(e)
+
+    @staticmethod
+    def _merge(
+        target: Dict[Any, Dict[str, Any]],
+        records: List[Dict[str, Any]],
+        account: str,
+        key_fields: Tuple[str, ...],
+    ) -> None:
+        for record in records:
+            key = tuple(record.get(field) for field in key_fields)
+            if all(part is None for part in key):
+                # No identity: cannot be de-duplicated, keep per account
+                key = (account, id(record))
+            existing = target.get(key)
+            if existing is None:
+                target[key] = {**record, ACCOUNTS_FIELD: [account]}
+            elif account not in existing[ACCOUNTS_FIELD]:
+                existing[ACCOUNTS_FIELD].append(account)
@@ -1,21 +1,36 @@
 """UniFi Local Network Application API client."""
 
+import asyncio
 import requests
-from typing import Dict, List, Optional, Any
+from contextlib import closing
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Sequence, Type
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from beast_unifi.utils.codec import accept_encoding, decode_data, response_json
+from beast_unifi.utils.concurrency import AdaptiveLimiter
+from beast_unifi.utils.memory import MemoryBudget, iter_json_array
+from beast_unifi.utils.registry import SchemaRegistry, table_name
+from beast_unifi.utils.singleflight import SingleFlight, request_key
+
 
 class LocalControllerClient:
     """Client for UniFi Network Application API (local controller)."""
     
+    # Above this many MACs, one full stat/sta request beats per-MAC queries
+    PER_MAC_QUERY_LIMIT = 10
+    
     def __init__(
         self,
         base_url: str,
         api_token: Optional[str] = None,
         site: str = "default",
         verify_ssl: bool = False,
+        concurrency_limiter: Optional[AdaptiveLimiter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        schema_registry: Optional[SchemaRegistry] = None,
     ):
         """
         Initialize Local Network Application API client.
@@ -25,6 +40,14 @@ class LocalControllerClient:
             api_token: API token for authentication (required, 2FA needed for UniFi OS)
             site: Site name (default: "default")
             verify_ssl: Whether to verify SSL certificates (default: False for local)
+            concurrency_limiter: Optional adaptive limiter bounding in-flight
+                requests to this controller (see ``controller_limiter()``)
+            single_flight: Optional coalescer so concurrent identical GETs share
+                one request (may be shared between clients)
+            memory_budget: Optional budget; large device and client listings
+                are then streamed and spilled to disk
+            schema_registry: Optional registry fingerprinting the shape of
+                every listing fetched through ``_get_data``/``iter_records``
         """
         if api_token is None:
             # Try to load from environment
@@ -42,86 +65,389 @@ class LocalControllerClient:
         self.base_url = base_url.rstrip('/')
         self.api_token = api_token
         self.site = site
+        self.concurrency_limiter = concurrency_limiter
+        self.single_flight = single_flight
+        self.memory_budget = memory_budget
+        self.schema_registry = schema_registry
         self.session = requests.Session()
         self.session.verify = verify_ssl
         self.session.headers.update({
             'Authorization': f'Bearer {api_token}',
             'Content-Type': 'application/json',
+            'Accept-Encoding': accept_encoding(),
         })
     
-    def _get_endpoint(self, path: str) -> str:
-        """Build full API endpoint URL."""
+    def _get_endpoint(self, path: str, site: Optional[str] = None) -> str:
+        """Build full API endpoint URL (for ``site``, default: this client's site)."""
+        site = site or self.site
         # Try different endpoint patterns
         patterns = [
-            f"{self.base_url}/proxy/network/api/s/{self.site}/{path}",
-            f"{self.base_url}/api/s/{self.site}/{path}",
+            f"{self.base_url}/proxy/network/api/s/{site}/{path}",
+            f"{self.base_url}/api/s/{site}/{path}",
         ]
         return patterns[0]
     
+    def _send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send a request, holding a concurrency slot when a limiter is set.
+        
+        The slot covers the whole transfer: for ``stream=True`` it is held
+        until the response is closed, so a streamed body counts against
+        the limit while it is read and its latency sample is the full
+        download, not the time to first byte. Streaming callers must close
+        the response (``with closing(response)``).
+        """
+        send = getattr(self.session, method)
+        if self.concurrency_limiter is None:
+            return send(url, timeout=10, **kwargs)
+        limiter = self.concurrency_limiter
+        started = limiter.acquire()
+        try:
+            response = send(url, timeout=10, **kwargs)
+        except BaseException:
+            limiter.release(started, False)
+            raise
+        # 429 and 5xx mean the controller is overloaded; 4xx are our problem
+        success = response.status_code != 429 and response.status_code < 500
+        if not kwargs.get('stream'):
+            limiter.release(started, success)
+            return response
+        close = response.close
+        released = False
+        
+        def close_and_release() -> None:
+            nonlocal released
+            try:
+                close()
+            finally:
+                if not released:
+                    released = True
+                    limiter.release(started, success)
+        
+        response.close = close_and_release
+        return response
+    
     def get(self, endpoint: str, **kwargs) -> requests.Response:
-        """Make GET request to API endpoint."""
+        """
+        Make GET request to API endpoint.
+        
+        With a ``single_flight`` coalescer, concurrent calls for the same URL
+        and parameters share one request and receive the same response.
+        """
+        url = self._get_endpoint(endpoint.lstrip('/'))
+        if self.single_flight is None or set(kwargs) - {'params'}:
+            return self._send('get', url, **kwargs)
+        key = request_key('GET', url, self.api_token, kwargs.get('params'))
+        return self.single_flight.do(key, lambda: self._fetch(url, **kwargs))
+    
+    async def aget(self, endpoint: str, **kwargs) -> requests.Response:
+        """Make GET request from async code, coalescing concurrent tasks too."""
+        if self.single_flight is None or set(kwargs) - {'params'}:
+            return await asyncio.to_thread(self.get, endpoint, **kwargs)
         url = self._get_endpoint(endpoint.lstrip('/'))
-        return self.session.get(url, timeout=10, **kwargs)
+        key = request_key('GET', url, self.api_token, kwargs.get('params'))
+        return await self.single_flight.do_async(key, lambda: asyncio.to_thread(self._fetch, url, **kwargs))
+    
+    def _fetch(self, url: str, **kwargs) -> requests.Response:
+        response = self._send('get', url, **kwargs)
+        # Read the body now so callers sharing the response never race on it
+        _ = response.content
+        return response
     
     def post(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> requests.Response:
         """Make POST request to API endpoint."""
         url = self._get_endpoint(endpoint.lstrip('/'))
-        return self.session.post(url, json=data, timeout=10, **kwargs)
+        return self._send('post', url, json=data, **kwargs)
     
     def put(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> requests.Response:
         """Make PUT request to API endpoint."""
         url = self._get_endpoint(endpoint.lstrip('/'))
-        return self.session.put(url, json=data, timeout=10, **kwargs)
+        return self._send('put', url, json=data, **kwargs)
     
     def get_sites(self) -> List[Dict[str, Any]]:
         """Get all sites."""
-        response = self.session.get(
-            f"{self.base_url}/proxy/network/api/self/sites",
-            timeout=10
-        )
+        response = self._send('get', f"{self.base_url}/proxy/network/api/self/sites")
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
     
-    def get_devices(self) -> List[Dict[str, Any]]:
-        """Get all devices for the site."""
-        response = self.get('rest/device')
+    def get_devices(
+        self,
+        macs: Optional[Iterable[str]] = None,
+        types: Optional[Iterable[str]] = None,
+    ) -> Sequence[Dict[str, Any]]:
+        """
+        Get devices for the site, filtered on the controller when possible.
+        
+        Args:
+            macs: Only these device MACs (uses a filtered ``stat/device`` query)
+            types: Only these device types, e.g. ``["uap", "usw"]`` (resolved
+                via the lightweight ``stat/device-basic`` listing first)
+        
+        Returns:
+            List of device records. Unfiltered calls return the
+            ``rest/device`` configuration shape; filtered calls return
+            ``stat/device`` records, which carry the same identity and
+            config fields plus live statistics (``uptime``, ``num_sta``,
+            ``state``, ...). Large unfiltered listings come back as a
+            ``SpillList``.
+        """
+        if types is not None:
+            wanted = set(types)
+            matched = {
+                d['mac'].lower() for d in self.get_devices_basic()
+                if d.get('type') in wanted and d.get('mac')
+            }
+            macs = matched if macs is None else [m for m in macs if m.lower() in matched]
+        if macs is not None:
+            return self.get_device_stats(macs)
+        return self._get_data('rest/device')
+    
+    def get_clients(
+        self,
+        macs: Optional[Iterable[str]] = None,
+        active_only: bool = False,
+    ) -> Sequence[Dict[str, Any]]:
+        """
+        Get clients for the site.
+        
+        Args:
+            macs: Only these client MACs (implies currently connected clients)
+            active_only: Only currently connected clients, from ``stat/sta``
+                instead of the full ``rest/sta`` history
+        
+        Returns:
+            List of client records (a ``SpillList`` when over the memory
+            budget)
+        """
+        if macs is not None or active_only:
+            return self.get_active_clients(macs)
+        return self._get_data('rest/sta')
+    
+    def iter_records(self, endpoint: str, chunk_size: int = 65536) -> Iterator[Dict[str, Any]]:
+        """
+        Stream an endpoint's ``data`` records without loading the whole body.
+        
+        Args:
+            endpoint: API endpoint (e.g. ``"rest/sta"``)
+            chunk_size: Bytes read per chunk
+        
+        Yields:
+            Records, one at a time
+        """
+        response = self._send('get', self._get_endpoint(endpoint.lstrip('/')), stream=True)
+        with closing(response):
+            response.raise_for_status()
+            records = iter_json_array(response.iter_content(chunk_size))
+            if self.schema_registry is not None:
+                records = self.schema_registry.track(table_name(endpoint), records)
+            yield from records
+    
+    def _get_data(self, endpoint: str) -> Sequence[Dict[str, Any]]:
+        """
+        GET a listing, streaming it when it exceeds the memory budget.
+        
+        Returns:
+            A list, or a disk-backed ``SpillList`` (indexable, sliceable,
+            not mutable) when the records exceed the budget
+        """
+        if self.memory_budget is None:
+            response = self.get(endpoint)
+            response.raise_for_status()
+            return self._observe(endpoint, response_json(response).get('data', []))
+        response = self._send('get', self._get_endpoint(endpoint.lstrip('/')), stream=True)
+        with closing(response):
+            response.raise_for_status()
+            if not self.memory_budget.should_stream(
+                response.headers.get('Content-Length'), response.headers.get('Content-Encoding'),
+            ):
+                return self._observe(endpoint, response_json(response).get('data', []))
+            records = iter_json_array(response.iter_content(65536))
+            if self.schema_registry is not None:
+                records = self.schema_registry.track(table_name(endpoint), records)
+            return self.memory_budget.collect(records)
+    
+    def _observe(self, endpoint: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fingerprint a fetched listing with the schema registry, if any."""
+        if self.schema_registry is not None:
+            self.schema_registry.observe_many(table_name(endpoint), records)
+        return records
+    
+    def get_devices_basic(self) -> List[Dict[str, Any]]:
+        """Get the minimal device listing (mac, type, model, state, adopted)."""
+        return self.get_records('stat/device-basic')
+    
+    def get_device_stats(self, macs: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get device statistics, optionally only for some MACs.
+        
+        Args:
+            macs: Device MACs to return (filtered by the controller)
+        
+        Returns:
+            List of device records
+        """
+        if macs is None:
+            return self.get_records('stat/device')
+        macs = [mac.lower() for mac in macs]
+        if not macs:
+            return []
+        response = self.post('stat/device', {'macs': macs})
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
     
-    def get_clients(self) -> List[Dict[str, Any]]:
-        """Get all clients for the site."""
-        response = self.get('rest/sta')
+    def get_active_clients(self, macs: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get currently connected clients (``stat/sta``).
+        
+        Args:
+            macs: Only these client MACs. Small lists are fetched one
+                ``stat/sta/<mac>`` at a time; larger ones filter the full list.
+        
+        Returns:
+            List of client records
+        """
+        if macs is None:
+            return self.get_records('stat/sta')
+        macs = [mac.lower() for mac in macs]
+        if len(macs) > self.PER_MAC_QUERY_LIMIT:
+            wanted = set(macs)
+            return [c for c in self.get_records('stat/sta') if c.get('mac', '').lower() in wanted]
+        clients = []
+        for mac in macs:
+            response = self.get(f'stat/sta/{mac}')
+            if response.status_code in (400, 404):
+                # Controller answers unknown or offline MACs with an error
+                continue
+            response.raise_for_status()
+            clients.extend(response_json(response).get('data', []))
+        return clients
+    
+    def get_health(self) -> List[Dict[str, Any]]:
+        """Get per-subsystem health (wan, lan, wlan, www, vpn)."""
+        return self.get_records('stat/health')
+    
+    def get_report(
+        self,
+        interval: str,
+        kind: str,
+        start: int,
+        end: int,
+        attrs: Iterable[str],
+        macs: Optional[Iterable[str]] = None,
+        site: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get one time window of a ``stat/report`` series.
+        
+        Args:
+            interval: ``"5minutes"``, ``"hourly"`` or ``"daily"``
+            kind: ``"site"``, ``"ap"``, ``"user"`` or ``"gw"``
+            start: Window start, epoch milliseconds
+            end: Window end, epoch milliseconds
+            attrs: Attributes to report (``"time"`` is always included)
+            macs: Only these APs/clients/gateways
+            site: Site name (default: this client's site)
+        
+        Returns:
+            Report rows, one per bucket (and per MAC for ap/user/gw)
+        """
+        body: Dict[str, Any] = {'attrs': ['time', *(a for a in attrs if a != 'time')], 'start': start, 'end': end}
+        if macs is not None:
+            body['macs'] = [mac.lower() for mac in macs]
+        url = self._get_endpoint(f"stat/report/{interval}.{kind}", site)
+        response = self._send('post', url, json=body)
+        response.raise_for_status()
+        return response_json(response).get('data', [])
+    
+    def create_backup(self, days: int = 0) -> str:
+        """
+        Create a backup on the controller.
+        
+        Args:
+            days: Days of statistics to include (0: settings only, -1: all)
+        
+        Returns:
+            Download path of the new ``.unf`` file (e.g. ``"/dl/backup/9.0.114.unf"``)
+        """
+        response = self.post('cmd/backup', {'cmd': 'backup', 'days': days})
+        response.raise_for_status()
+        data = response_json(response).get('data', [])
+        if not data or not data[0].get('url'):
+            raise ValueError("Controller did not return a backup URL")
+        return data[0]['url']
+    
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """List stored autobackups (``filename``, ``size``, ``time``, ``version``, ...)."""
+        response = self.post('cmd/backup', {'cmd': 'list-backups'})
+        response.raise_for_status()
+        return response_json(response).get('data', [])
+    
+    def download_url(self, path: str) -> str:
+        """Absolute URL of a controller download path such as ``/dl/autobackup/<file>``."""
+        return f"{self.base_url}/proxy/network/{path.lstrip('/')}"
+    
+    def count_clients(self) -> int:
+        """Count connected clients from ``stat/health`` without listing them."""
+        return sum(
+            (subsystem.get('num_user') or 0) + (subsystem.get('num_guest') or 0)
+            for subsystem in self.get_health()
+            if subsystem.get('subsystem') in ('lan', 'wlan')
+        )
+    
+    def count_devices(self) -> Dict[str, int]:
+        """Count devices by type from the lightweight ``stat/device-basic`` listing."""
+        counts: Dict[str, int] = {}
+        for device in self.get_devices_basic():
+            device_type = device.get('type', 'unknown')
+            counts[device_type] = counts.get(device_type, 0) + 1
+        return counts
+    
+    def get_records(self, endpoint: str, item_type: Optional[Type] = None) -> List[Any]:
+        """
+        GET an endpoint and return its ``data`` list.
+        
+        Args:
+            endpoint: Site-relative endpoint (e.g. ``"stat/sta"``)
+            item_type: Dataclass or ``msgspec.Struct`` to decode records into
+                (default: plain dicts)
+        
+        Returns:
+            List of records
+        """
+        response = self.get(endpoint)
         response.raise_for_status()
-        data = response.json()
+        if item_type is not None:
+            return decode_data(response.content, item_type)
+        data = response_json(response)
         return data.get('data', [])
     
     def get_networks(self) -> List[Dict[str, Any]]:
         """Get network configurations."""
         response = self.get('rest/networkconf')
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
     
     def get_vpn_tunnels(self) -> List[Dict[str, Any]]:
         """Get VPN tunnel configurations."""
         response = self.get('rest/vpntunnel')
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
     
     def get_dynamic_dns(self) -> List[Dict[str, Any]]:
         """Get Dynamic DNS configurations."""
         response = self.get('rest/dynamicdns')
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
     
     def get_routing(self) -> List[Dict[str, Any]]:
         """Get routing configurations."""
         response = self.get('rest/routing')
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
 
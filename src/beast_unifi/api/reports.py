@@ -0,0 +1,218 @@
+"""Batched ingestion of controller ``stat/report`` time series."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+import numpy as np
+
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.utils.timeseries import TimeSeriesStore
+
+
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Bucket width per report interval (milliseconds)
+INTERVALS = {'5minutes': 5 * MINUTE, 'hourly': HOUR, 'daily': DAY}
+
+# Time span requested per call: a few hundred buckets per MAC
+CHUNK_SPANS = {'5minutes': 12 * HOUR, 'hourly': 14 * DAY, 'daily': 180 * DAY}
+
+# Field identifying the row's subject (site reports have one row per bucket)
+KEY_FIELDS = {'site': None, 'ap': 'ap', 'user': 'user', 'gw': 'gw'}
+
+DEFAULT_ATTRS = {
+    'site': ['bytes', 'wan-tx_bytes', 'wan-rx_bytes', 'wlan_bytes', 'num_sta', 'lan-num_sta', 'wlan-num_sta'],
+    'ap': ['bytes', 'tx_bytes', 'rx_bytes', 'num_sta'],
+    'user': ['tx_bytes', 'rx_bytes'],
+    'gw': ['mem', 'cpu', 'loadavg_5', 'wan-tx_bytes', 'wan-rx_bytes', 'lan-tx_bytes', 'lan-rx_bytes'],
+}
+
+
+def series_name(site: str, interval: str, kind: str) -> str:
+    """Store series for one report, e.g. ``"default/hourly.ap"``."""
+    return f"{site}/{interval}.{kind}"
+
+
+def report_windows(start: int, end: int, interval: str, span: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split ``[start, end)`` into request windows aligned to a fixed grid.
+
+    Windows always start on multiples of ``span`` (itself a multiple of the
+    bucket width), so repeated or overlapping runs produce the same windows
+    and the store can recognise those already ingested.
+
+    Returns:
+        ``(window_start, window_end)`` pairs in milliseconds
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Unknown report interval: {interval!r} (expected one of {sorted(INTERVALS)})")
+    bucket = INTERVALS[interval]
+    span = span or CHUNK_SPANS[interval]
+    if span % bucket:
+        raise ValueError(f"Window span must be a multiple of {bucket} ms for {interval}")
+    first = start - start % span
+    return [(s, s + span) for s in range(first, end, span)]
+
+
+def to_arrays(
+    rows: Iterable[Dict[str, Any]],
+    attrs: Iterable[str],
+    key_field: Optional[str],
+) -> Tuple[np.ndarray, List[str], Dict[str, np.ndarray]]:
+    """
+    Convert report rows to typed arrays.
+
+    Returns:
+        (int64 times, keys, {attribute: float64 values}); missing or
+        non-numeric values become NaN
+    """
+    rows = [r for r in rows if isinstance(r, dict) and 'time' in r]
+    times = np.fromiter((int(r['time']) for r in rows), dtype=np.int64, count=len(rows))
+    keys = [str(r.get(key_field) or '').lower() if key_field else '' for r in rows]
+    columns = {}
+    for attr in attrs:
+        values = np.full(len(rows), np.nan)
+        for i, row in enumerate(rows):
+            value = row.get(attr)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[i] = value
+        columns[attr] = values
+    return times, keys, columns
+
+
+class ReportIngestor:
+    """
+    Fetch ``stat/report`` windows in parallel and append them to a store.
+
+    Each (site, window) pair is one ``get_report()`` call; calls run in a
+    thread pool (bounded further by the client's ``concurrency_limiter``,
+    if any) and results are appended from the calling thread as they
+    complete. Windows the store already holds as complete are not
+    requested again, so backfills can be rerun or resumed freely. The
+    window containing the present is ingested as open: later runs fetch
+    only the buckets after the last one stored.
+
+    The controller prunes old buckets (by default roughly a day of
+    5-minute, a month of hourly and a year of daily data), so backfill
+    months of history from ``hourly`` and ``daily`` reports.
+    """
+
+    def __init__(
+        self,
+        client: LocalControllerClient,
+        store: TimeSeriesStore,
+        max_workers: int = 8,
+        chunk_spans: Optional[Dict[str, int]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Initialize report ingestor.
+
+        Args:
+            client: Controller client (its ``site`` is the default site)
+            store: Destination time-series store
+            max_workers: Concurrent report requests
+            chunk_spans: Override request window span per interval (ms)
+            clock: Seconds since the epoch (for tests)
+        """
+        self.client = client
+        self.store = store
+        self.max_workers = max_workers
+        self.chunk_spans = {**CHUNK_SPANS, **(chunk_spans or {})}
+        self.clock = clock
+        self.stats = {'requests': 0, 'skipped': 0, 'rows': 0, 'errors': 0}
+        # "<series>@<window start>" -> error of the last failed request; retried next run
+        self.errors: Dict[str, str] = {}
+
+    def ingest(
+        self,
+        interval: str,
+        kind: str,
+        start: float,
+        end: Optional[float] = None,
+        sites: Optional[Iterable[str]] = None,
+        attrs: Optional[Iterable[str]] = None,
+    ) -> Dict[str, int]:
+        """
+        Ingest a report for a time range across sites.
+
+        Args:
+            interval: ``"5minutes"``, ``"hourly"`` or ``"daily"``
+            kind: ``"site"``, ``"ap"``, ``"user"`` or ``"gw"``
+            start: Range start, epoch seconds
+            end: Range end, epoch seconds (default: now)
+            sites: Site names (default: the client's site)
+            attrs: Attributes to store (default: ``DEFAULT_ATTRS[kind]``)
+
+        Returns:
+            Counts for this run: ``requests``, ``skipped`` windows, ``rows``
+            appended and failed windows (``errors``)
+        """
+        if kind not in KEY_FIELDS:
+            raise ValueError(f"Unknown report type: {kind!r} (expected one of {sorted(KEY_FIELDS)})")
+        attrs = list(attrs or DEFAULT_ATTRS[kind])
+        bucket = INTERVALS.get(interval)
+        if bucket is None:
+            raise ValueError(f"Unknown report interval: {interval!r} (expected one of {sorted(INTERVALS)})")
+        # Only whole buckets: the current one is still accumulating
+        now = int((self.clock() if end is None else end) * 1000)
+        now -= now % bucket
+        start_ms = int(start * 1000)
+
+        jobs = []
+        skipped = 0
+        for site in sites or [self.client.site]:
+            series = series_name(site, interval, kind)
+            # Windows are requested whole, so the first may reach back before ``start``
+            for window in report_windows(start_ms, now, interval, self.chunk_spans[interval]):
+                through = self.store.partial_through(series, window[0])
+                request_start = window[0] if through is None else through + bucket
+                request_end = min(window[1], now)
+                if self.store.covered(series, *window):
+                    skipped += 1
+                    continue
+                if request_start >= request_end:
+                    # Open window already stored through its end: just close it
+                    if window[1] <= now:
+                        self.store.append(series, np.empty(0, np.int64), [], {}, window)
+                    skipped += 1
+                    continue
+                jobs.append((site, series, window, request_start, request_end))
+        counts = {'requests': len(jobs), 'skipped': skipped, 'rows': 0, 'errors': 0}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self.client.get_report, interval, kind, request_start, request_end, attrs, site=site):
+                    (series, window)
+                for site, series, window, request_start, request_end in jobs
+            }
+            for future in as_completed(futures):
+                series, window = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    self.errors[f"{series}@{window[0]}"] = str(e)
+                    counts['errors'] += 1
+                    continue
+                times, keys, columns = to_arrays(rows, attrs, KEY_FIELDS[kind])
+                counts['rows'] += self.store.append(
+                    series, times, keys, columns, window, complete=window[1] <= now,
+                )
+
+        for name, value in counts.items():
+            self.stats[name] += value
+        return counts
+
+    def backfill(
+        self,
+        interval: str,
+        kind: str,
+        days: float,
+        sites: Optional[Iterable[str]] = None,
+        attrs: Optional[Iterable[str]] = None,
+    ) -> Dict[str, int]:
+        """Ingest the last ``days`` of a report, skipping windows already stored."""
+        return self.ingest(interval, kind, self.clock() - days * 86400, sites=sites, attrs=attrs)
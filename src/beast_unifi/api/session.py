@@ -0,0 +1,235 @@
+"""Lazy, memoised per-site view over the local controller API."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple, Union
+
+from beast_unifi.api.local_controller import LocalControllerClient
+
+
+# Collection name -> (client method, endpoint it reads)
+COLLECTIONS: Dict[str, Tuple[str, str]] = {
+    'devices': ('get_devices', 'rest/device'),
+    'clients': ('get_clients', 'rest/sta'),
+    'networks': ('get_networks', 'rest/networkconf'),
+    'vpn_tunnels': ('get_vpn_tunnels', 'rest/vpntunnel'),
+    'dynamic_dns': ('get_dynamic_dns', 'rest/dynamicdns'),
+    'routing': ('get_routing', 'rest/routing'),
+}
+
+# Command and legacy update endpoints -> collections their writes change
+WRITE_ENDPOINTS: Dict[str, Tuple[str, ...]] = {
+    'cmd/devmgr': ('devices',),
+    'cmd/stamgr': ('clients',),
+    'upd/device': ('devices',),
+    'upd/user': ('clients',),
+    'upd/networkconf': ('networks',),
+}
+
+# Invalidating a collection also invalidates the collections that depend on it
+DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    'networks': ('routing', 'clients', 'vpn_tunnels'),
+    'devices': ('clients',),
+}
+
+
+class SiteSession:
+    """
+    Per-site session exposing controller collections as lazy attributes.
+
+    Nothing is fetched until a collection is first read; the result is then
+    memoised until it expires (``ttl``) or is invalidated. Collections named
+    in ``prefetch`` are loaded together in one concurrent burst the first
+    time any of them is read, so a script that declares what it needs pays
+    one round-trip latency instead of one per collection. Writes made through
+    the session invalidate the collection they touch and its dependents.
+
+    Example:
+        session = SiteSession(client, prefetch=['devices', 'networks'])
+        for device in session.devices:   # fetches devices and networks together
+            ...
+    """
+
+    def __init__(
+        self,
+        client: LocalControllerClient,
+        prefetch: Iterable[str] = (),
+        ttl: Union[None, float, Dict[str, float]] = None,
+        max_workers: int = 6,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize site session.
+
+        Args:
+            client: Local controller client for the site
+            prefetch: Collections to fetch together on first access
+            ttl: Seconds a cached collection stays valid, globally or per
+                collection (default: until invalidated)
+            max_workers: Maximum concurrent requests during prefetch
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.client = client
+        self.prefetch_hints = self._check(prefetch)
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self._clock = clock
+        self._cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._locks = {name: threading.Lock() for name in COLLECTIONS}
+        self._prefetched = False
+        self.stats = {'hits': 0, 'fetches': 0}
+
+    @staticmethod
+    def _check(names: Iterable[str]) -> Tuple[str, ...]:
+        names = tuple(names)
+        unknown = [n for n in names if n not in COLLECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown collection(s): {', '.join(unknown)}")
+        return names
+
+    # ------------------------------------------------------------------
+    # Collections
+    # ------------------------------------------------------------------
+
+    @property
+    def devices(self) -> List[Dict[str, Any]]:
+        """Devices (``rest/device``)."""
+        return self.get('devices')
+
+    @property
+    def clients(self) -> List[Dict[str, Any]]:
+        """Clients (``rest/sta``)."""
+        return self.get('clients')
+
+    @property
+    def networks(self) -> List[Dict[str, Any]]:
+        """Network configurations (``rest/networkconf``)."""
+        return self.get('networks')
+
+    @property
+    def vpn_tunnels(self) -> List[Dict[str, Any]]:
+        """VPN tunnel configurations (``rest/vpntunnel``)."""
+        return self.get('vpn_tunnels')
+
+    @property
+    def dynamic_dns(self) -> List[Dict[str, Any]]:
+        """Dynamic DNS configurations (``rest/dynamicdns``)."""
+        return self.get('dynamic_dns')
+
+    @property
+    def routing(self) -> List[Dict[str, Any]]:
+        """Routing configurations (``rest/routing``)."""
+        return self.get('routing')
+
+    def get(self, name: str) -> List[Dict[str, Any]]:
+        """
+        Return a collection, fetching it only if not cached.
+
+        Args:
+            name: Collection name (see ``COLLECTIONS``)
+
+        Returns:
+            List of records
+        """
+        self._check([name])
+        if not self._prefetched and name in self.prefetch_hints:
+            self.prefetch(*self.prefetch_hints)
+
+        cached = self._fresh(name)
+        if cached is not None:
+            self.stats['hits'] += 1
+            return cached
+        with self._locks[name]:
+            # Another thread may have loaded it while we waited
+            cached = self._fresh(name)
+            if cached is not None:
+                self.stats['hits'] += 1
+                return cached
+            return self._load(name)
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether a collection is cached and not expired."""
+        return self._fresh(name) is not None
+
+    def _ttl(self, name: str) -> Optional[float]:
+        if isinstance(self.ttl, dict):
+            return self.ttl.get(name)
+        return self.ttl
+
+    def _fresh(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._cache.get(name)
+        if entry is None:
+            return None
+        loaded_at, records = entry
+        ttl = self._ttl(name)
+        if ttl is not None and self._clock() - loaded_at > ttl:
+            return None
+        return records
+
+    def _load(self, name: str) -> List[Dict[str, Any]]:
+        records = getattr(self.client, COLLECTIONS[name][0])()
+        self.stats['fetches'] += 1
+        self._cache[name] = (self._clock(), records)
+        return records
+
+    def prefetch(self, *names: str) -> None:
+        """
+        Fetch several collections concurrently, skipping ones already cached.
+
+        Args:
+            *names: Collection names (default: the session's prefetch hints)
+        """
+        self._prefetched = True
+        wanted = [n for n in self._check(names or self.prefetch_hints) if not self.is_loaded(n)]
+        if not wanted:
+            return
+        if len(wanted) == 1:
+            self.get(wanted[0])
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(wanted))) as pool:
+            for future in [pool.submit(self.get, n) for n in wanted]:
+                future.result()
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+
+    def invalidate(self, *names: str) -> None:
+        """
+        Drop cached collections and everything that depends on them.
+
+        Args:
+            *names: Collection names (default: all)
+        """
+        pending = list(self._check(names)) if names else list(COLLECTIONS)
+        seen = set()
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            self._cache.pop(name, None)
+            pending.extend(DEPENDENCIES.get(name, ()))
+        self._prefetched = False
+
+    def _invalidate_endpoint(self, endpoint: str) -> None:
+        endpoint = endpoint.lstrip('/')
+        touched = [n for n, (_, path) in COLLECTIONS.items() if endpoint.startswith(path)]
+        for path, names in WRITE_ENDPOINTS.items():
+            if endpoint.startswith(path):
+                touched.extend(names)
+        if touched:
+            self.invalidate(*touched)
+
+    def post(self, endpoint: str, data: Optional[Dict] = None, **kwargs):
+        """POST through the client and invalidate the collection it writes to."""
+        response = self.client.post(endpoint, data, **kwargs)
+        self._invalidate_endpoint(endpoint)
+        return response
+
+    def put(self, endpoint: str, data: Optional[Dict] = None, **kwargs):
+        """PUT through the client and invalidate the collection it writes to."""
+        response = self.client.put(endpoint, data, **kwargs)
+        self._invalidate_endpoint(endpoint)
+        return response
@@ -0,0 +1,454 @@
+"""Sharded collection across worker processes with file-based coordination."""
+
+import bisect
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Callable, Iterable, Tuple
+
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.api.site_manager import SiteManagerClient
+
+
+CONTROLLER = 'controller'
+ACCOUNT = 'account'
+
+# Target kind -> collections fetched by ``collect_target``
+TARGET_COLLECTIONS: Dict[str, Tuple[str, ...]] = {
+    CONTROLLER: ('devices', 'clients', 'networks'),
+    ACCOUNT: ('hosts', 'sites', 'devices'),
+}
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+def _write_json(path: Path, data: Any) -> None:
+    """Write JSON atomically so readers on other processes never see partial files."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, separators=(',', ':'), default=str))
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path, default: Any = None) -> Any:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes.
+
+    Adding or removing a worker moves only the targets on the ring arcs it
+    gains or loses (about ``1/n`` of them), so caches and rate-limit state
+    on the other workers stay warm.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 64):
+        """
+        Initialize hash ring.
+
+        Args:
+            nodes: Initial node (worker) ids
+            replicas: Virtual nodes per node; more gives a more even spread
+        """
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self.nodes: set = set()
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        """Add a node."""
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            self._owners[point] = node
+            bisect.insort(self._points, point)
+
+    def remove(self, node: str) -> None:
+        """Remove a node."""
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.pop(bisect.bisect_left(self._points, point))
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node responsible for a key (None when the ring is empty)."""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[self._points[index]]
+
+    def assign(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Group keys by owning node."""
+        assignment: Dict[str, List[str]] = {node: [] for node in sorted(self.nodes)}
+        for key in keys:
+            owner = self.owner(key)
+            if owner is not None:
+                assignment[owner].append(key)
+        return assignment
+
+
+def _credential(target: Dict[str, Any], field: str, default: str) -> str:
+    name = target.get(field, default)
+    value = os.getenv(name)
+    if not value:
+        raise ValueError(f"Target {target.get('id')!r}: environment variable {name} is not set")
+    return value
+
+
+def collect_target(target: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Default collection for one target.
+
+    Credentials are read from the environment variable named in the target
+    (``token_env`` or ``api_key_env``) so they never pass through the
+    shared coordination directory. An unset variable is an error rather
+    than a fall back to the client's ``.env`` credentials, which belong to
+    some other account.
+
+    Args:
+        target: ``{"id", "kind": "controller", "base_url", "site", "token_env"}``
+            or ``{"id", "kind": "account", "api_key_env"}``
+
+    Returns:
+        Collection name to records, materialised as lists so spilled
+        listings serialise into the result file
+    """
+    if target['kind'] == CONTROLLER:
+        client = LocalControllerClient(
+            base_url=target['base_url'],
+            api_token=_credential(target, 'token_env', 'UNIFI_LOCAL_TOKEN'),
+            site=target.get('site', 'default'),
+        )
+        return {
+            'devices': list(client.get_devices()),
+            'clients': list(client.get_clients()),
+            'networks': client.get_networks(),
+        }
+    if target['kind'] == ACCOUNT:
+        client = SiteManagerClient(api_key=_credential(target, 'api_key_env', 'UNIFI_API_KEY'))
+        return {
+            'hosts': list(client.get_hosts()),
+            'sites': list(client.get_sites()),
+            'devices': list(client.get_devices()),
+        }
+    raise ValueError(f"Unknown target kind: {target['kind']!r}")
+
+
+class ShardCoordinator:
+    """
+    Assign collection targets to live workers with consistent hashing.
+
+    Coordination happens through a shared directory, so workers can be
+    local processes or hosts sharing a network filesystem::
+
+        targets.json        targets to collect (no credentials)
+        assignments.json    epoch, live workers and target ids per worker
+        workers/<id>.json   worker heartbeats
+        results/<id>.json   latest result per target
+
+    ``rebalance()`` detects joined and departed (heartbeat expired)
+    workers and publishes a new assignment epoch when membership changes.
+    """
+
+    def __init__(self, root: Path, heartbeat_ttl: float = 30.0, replicas: int = 64):
+        """
+        Initialize coordinator.
+
+        Args:
+            root: Shared coordination directory
+            heartbeat_ttl: Seconds after which a silent worker is considered gone
+            replicas: Virtual nodes per worker on the hash ring
+        """
+        self.root = Path(root)
+        for name in ('workers', 'results'):
+            (self.root / name).mkdir(parents=True, exist_ok=True)
+        self.heartbeat_ttl = heartbeat_ttl
+        self.ring = HashRing(replicas=replicas)
+
+    def set_targets(self, targets: Iterable[Dict[str, Any]]) -> None:
+        """Publish the targets to collect; each needs a unique ``id`` and a ``kind``."""
+        targets = list(targets)
+        ids = [t.get('id') for t in targets]
+        if None in ids or len(set(ids)) != len(ids):
+            raise ValueError("Every target needs a unique 'id'")
+        _write_json(self.root / 'targets.json', targets)
+
+    def targets(self) -> List[Dict[str, Any]]:
+        """Published targets."""
+        return _read_json(self.root / 'targets.json', [])
+
+    def live_workers(self) -> List[str]:
+        """Workers whose heartbeat is newer than ``heartbeat_ttl``."""
+        now = time.time()
+        workers = []
+        for path in (self.root / 'workers').glob('*.json'):
+            beat = _read_json(path, {})
+            if now - beat.get('time', 0) <= self.heartbeat_ttl:
+                workers.append(path.stem)
+        return sorted(workers)
+
+    def assignments(self) -> Dict[str, Any]:
+        """Current published assignment (``epoch``, ``workers``, ``assignments``)."""
+        return _read_json(self.root / 'assignments.json', {'epoch': 0, 'workers': [], 'assignments': {}})
+
+    def rebalance(self) -> Dict[str, Any]:
+        """
+        Recompute assignments if workers or targets changed.
+
+        Returns:
+            ``{"epoch", "changed", "moved"}`` where ``moved`` counts targets
+            that changed owner
+        """
+        current = self.assignments()
+        workers = self.live_workers()
+        target_ids = sorted(t['id'] for t in self.targets())
+        for worker in set(self.ring.nodes) - set(workers):
+            self.ring.remove(worker)
+        for worker in workers:
+            self.ring.add(worker)
+        assignments = self.ring.assign(target_ids)
+        # Compare the outcome, not the inputs: with no live workers the
+        # targets stay unassigned and must not bump the epoch every call
+        if workers == current['workers'] and assignments == current['assignments']:
+            return {'epoch': current['epoch'], 'changed': False, 'moved': 0}
+
+        previous = {t: w for w, ids in current['assignments'].items() for t in ids}
+        moved = sum(1 for w, ids in assignments.items() for t in ids if previous.get(t, w) != w)
+        epoch = current['epoch'] + 1
+        _write_json(self.root / 'assignments.json', {
+            'epoch': epoch,
+            'workers': workers,
+            'assignments': assignments,
+        })
+        return {'epoch': epoch, 'changed': True, 'moved': moved}
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Latest result per target id (``worker``, ``epoch``, ``time``, ``data`` or ``error``).
+
+        Results of earlier epochs are kept only while their worker still
+        owns the target; a result written by a previous owner after a
+        rebalance, or for a target no longer published, is stale and left out.
+        """
+        current = self.assignments()
+        owners = {t: w for w, ids in current['assignments'].items() for t in ids}
+        results = {}
+        for path in (self.root / 'results').glob('*.json'):
+            result = _read_json(path)
+            if result is None or path.stem not in owners:
+                continue
+            if result.get('epoch') == current['epoch'] or result.get('worker') == owners[path.stem]:
+                results[path.stem] = result
+        return results
+
+    def merged(self, collection: str) -> List[Dict[str, Any]]:
+        """Records of one collection from every target, tagged with ``_target``."""
+        records = []
+        for target_id, result in sorted(self.results().items()):
+            for record in (result.get('data') or {}).get(collection, []):
+                records.append({**record, '_target': target_id})
+        return records
+
+
+class ShardWorker:
+    """
+    Collect the targets the coordinator assigned to this worker.
+
+    Each ``run_once()`` heartbeats, reads the current assignment and
+    collects its targets concurrently, writing one result file per target.
+    ``run()`` also heartbeats from a background thread every
+    ``heartbeat_interval`` seconds, so a worker stays live through long
+    rounds and long waits between them.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        worker_id: Optional[str] = None,
+        collect: Callable[[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]] = collect_target,
+        max_workers: int = 8,
+        heartbeat_interval: float = 10.0,
+    ):
+        """
+        Initialize worker.
+
+        Args:
+            root: Shared coordination directory
+            worker_id: Unique worker id (default: ``<hostname>-<pid>``)
+            collect: Target to collections function (must be picklable for
+                ``run_local``)
+            max_workers: Targets collected concurrently
+            heartbeat_interval: Seconds between heartbeats while ``run()``
+                is active; keep it well under the coordinator's
+                ``heartbeat_ttl`` (a third of it by default)
+        """
+        self.root = Path(root)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.collect = collect
+        self.max_workers = max_workers
+        if heartbeat_interval <= 0:
+            raise ValueError("heartbeat_interval must be positive")
+        self.heartbeat_interval = heartbeat_interval
+        (self.root / 'workers').mkdir(parents=True, exist_ok=True)
+        (self.root / 'results').mkdir(parents=True, exist_ok=True)
+
+    def heartbeat(self) -> None:
+        """Announce that this worker is alive."""
+        _write_json(self.root / 'workers' / f"{self.worker_id}.json", {
+            'time': time.time(),
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+        })
+
+    def leave(self) -> None:
+        """Withdraw from the pool; the coordinator reassigns the targets."""
+        (self.root / 'workers' / f"{self.worker_id}.json").unlink(missing_ok=True)
+
+    def assigned(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """Current epoch and the targets assigned to this worker."""
+        assignment = _read_json(self.root / 'assignments.json', {'epoch': 0, 'assignments': {}})
+        ids = set(assignment['assignments'].get(self.worker_id, []))
+        targets = [t for t in _read_json(self.root / 'targets.json', []) if t['id'] in ids]
+        return assignment['epoch'], targets
+
+    def run_once(self) -> Dict[str, Optional[str]]:
+        """
+        Heartbeat and collect every assigned target once.
+
+        Returns:
+            Target id to error message (None on success)
+        """
+        self.heartbeat()
+        epoch, targets = self.assigned()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            outcomes = list(pool.map(lambda t: self._collect(t, epoch), targets))
+        return dict(zip((t['id'] for t in targets), outcomes, strict=True))
+
+    def _collect(self, target: Dict[str, Any], epoch: int) -> Optional[str]:
+        result: Dict[str, Any] = {'worker': self.worker_id, 'epoch': epoch, 'time': time.time()}
+        error = None
+        try:
+            result['data'] = self.collect(target)
+        except Exception as e:
+            error = result['error'] = str(e)
+        current, targets = self.assigned()
+        if current != epoch and target['id'] not in {t['id'] for t in targets}:
+            # Reassigned while collecting; the new owner's result must not be overwritten
+            return error
+        _write_json(self.root / 'results' / f"{target['id']}.json", result)
+        return error
+
+    def run(self, interval: float = 60.0, stop: Optional[threading.Event] = None, rounds: Optional[int] = None) -> None:
+        """
+        Collect repeatedly until ``stop`` is set or ``rounds`` are done.
+
+        Args:
+            interval: Seconds between rounds; may exceed the heartbeat TTL,
+                since heartbeats run on their own timer
+            stop: Event ending the loop
+            rounds: Number of rounds (default: unlimited)
+        """
+        stop = stop or threading.Event()
+        finished = threading.Event()
+        beats = threading.Thread(
+            target=self._heartbeat_loop, args=(finished,),
+            name=f"heartbeat-{self.worker_id}", daemon=True,
+        )
+        beats.start()
+        done = 0
+        try:
+            while not stop.is_set() and (rounds is None or done < rounds):
+                self.run_once()
+                done += 1
+                stop.wait(interval)
+        finally:
+            finished.set()
+            beats.join()
+            self.leave()
+
+    def _heartbeat_loop(self, finished: threading.Event) -> None:
+        while not finished.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+
+def _run_worker(root: str, worker_id: str, collect: Callable, interval: float, rounds: int) -> None:
+    ShardWorker(root, worker_id, collect).run(interval=interval, rounds=rounds)
+
+
+def run_local(
+    root: Path,
+    targets: Iterable[Dict[str, Any]],
+    processes: int = 4,
+    collect: Callable[[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]] = collect_target,
+    timeout: float = 300.0,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Collect targets once with local worker processes and return the results.
+
+    Workers register, the coordinator assigns targets once all have joined,
+    and each worker collects its share.
+
+    Args:
+        root: Coordination directory
+        targets: Targets to collect
+        processes: Worker processes
+        collect: Picklable (module-level) collection function
+        timeout: Seconds to wait for all results; workers still running
+            then are terminated
+
+    Returns:
+        Latest result per target id
+    """
+    coordinator = ShardCoordinator(root)
+    coordinator.set_targets(targets)
+    target_ids = {t['id'] for t in coordinator.targets()}
+    for path in (coordinator.root / 'results').glob('*.json'):
+        path.unlink()
+    worker_ids = [f"local-{i}" for i in range(processes)]
+    for worker_id in worker_ids:
+        ShardWorker(root, worker_id, collect).heartbeat()
+    coordinator.rebalance()
+
+    context = multiprocessing.get_context('spawn')
+    workers = [
+        context.Process(target=_run_worker, args=(str(root), worker_id, collect, 0.0, 1))
+        for worker_id in worker_ids
+    ]
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + timeout
+    try:
+        for worker in workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+                worker.join(5)
+                if worker.is_alive():
+                    worker.kill()
+                    worker.join()
+    results = coordinator.results()
+    missing = target_ids - set(results)
+    if missing:
+        raise TimeoutError(f"No result for {len(missing)} target(s): {', '.join(sorted(missing))}")
+    return results
@@ -1,23 +1,45 @@
 """UniFi Site Manager API client."""
 
+import asyncio
 import requests
-from typing import Dict, List, Optional, Any
+from contextlib import closing
+from typing import Dict, List, Optional, Any, Iterator, Sequence, Type
 from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from beast_unifi.utils.codec import accept_encoding, decode_data, response_json
+from beast_unifi.utils.memory import MemoryBudget, iter_json_array
+from beast_unifi.utils.rate_limit import RateLimiter
+from beast_unifi.utils.registry import SchemaRegistry, table_name
+from beast_unifi.utils.singleflight import SingleFlight, request_key
+
 
 class SiteManagerClient:
     """Client for UniFi Site Manager API (cloud/remote API)."""
     
     BASE_URL = "https://api.ui.com/v1"
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        memory_budget: Optional[MemoryBudget] = None,
+        schema_registry: Optional[SchemaRegistry] = None,
+    ):
         """
         Initialize Site Manager API client.
         
         Args:
             api_key: UniFi Site Manager API key. If not provided, loads from ~/.env
+            rate_limiter: Optional limiter applied to every request on this key
+            single_flight: Optional coalescer so concurrent identical GETs share
+                one request (may be shared between clients)
+            memory_budget: Optional budget; large host, site and device
+                listings are then streamed and spilled to disk
+            schema_registry: Optional registry fingerprinting the shape of
+                every listing fetched through ``_get_data``/``iter_records``
         """
         if api_key is None:
             # Try to load from environment
@@ -30,49 +52,145 @@ class SiteManagerClient:
             raise ValueError("API key required. Provide via parameter or set UNIFI_API_KEY in ~/.env")
         
         self.api_key = api_key
+        self.rate_limiter = rate_limiter
+        self.single_flight = single_flight
+        self.memory_budget = memory_budget
+        self.schema_registry = schema_registry
         self.session = requests.Session()
         self.session.headers.update({
             'X-API-Key': api_key,
             'Accept': 'application/json',
+            'Accept-Encoding': accept_encoding(),
             'Content-Type': 'application/json',
         })
     
     def get(self, endpoint: str, **kwargs) -> requests.Response:
-        """Make GET request to API endpoint."""
+        """
+        Make GET request to API endpoint.
+        
+        With a ``single_flight`` coalescer, concurrent calls for the same URL
+        and parameters share one request and receive the same response.
+        """
         url = f"{self.BASE_URL}/{endpoint.lstrip('/')}"
+        if self.single_flight is None or set(kwargs) - {'params'}:
+            # Not shared, so the body stays lazy (e.g. ``stream=True``)
+            return self._send(url, **kwargs)
+        key = request_key('GET', url, self.api_key, kwargs.get('params'))
+        return self.single_flight.do(key, lambda: self._fetch(url, **kwargs))
+    
+    async def aget(self, endpoint: str, **kwargs) -> requests.Response:
+        """Make GET request from async code, coalescing concurrent tasks too."""
+        if self.single_flight is None or set(kwargs) - {'params'}:
+            return await asyncio.to_thread(self.get, endpoint, **kwargs)
+        url = f"{self.BASE_URL}/{endpoint.lstrip('/')}"
+        key = request_key('GET', url, self.api_key, kwargs.get('params'))
+        return await self.single_flight.do_async(key, lambda: asyncio.to_thread(self._fetch, url, **kwargs))
+    
+    def iter_records(self, endpoint: str, chunk_size: int = 65536) -> Iterator[Dict[str, Any]]:
+        """
+        Stream an endpoint's ``data`` records without loading the whole body.
+        
+        Args:
+            endpoint: API endpoint (e.g. ``"devices"``)
+            chunk_size: Bytes read per chunk
+        
+        Yields:
+            Records, one at a time
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.session.get(f"{self.BASE_URL}/{endpoint.lstrip('/')}", timeout=15, stream=True)
+        with closing(response):
+            response.raise_for_status()
+            records = iter_json_array(response.iter_content(chunk_size))
+            if self.schema_registry is not None:
+                records = self.schema_registry.track(table_name(endpoint), records)
+            yield from records
+    
+    def _get_data(self, endpoint: str) -> Sequence[Dict[str, Any]]:
+        """
+        GET a listing, streaming it when it exceeds the memory budget.
+        
+        Returns:
+            A list, or a disk-backed ``SpillList`` (indexable, sliceable,
+            not mutable) when the records exceed the budget
+        """
+        if self.memory_budget is None:
+            response = self.get(endpoint)
+            response.raise_for_status()
+            return self._observe(endpoint, response_json(response).get('data', []))
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        response = self.session.get(f"{self.BASE_URL}/{endpoint.lstrip('/')}", timeout=15, stream=True)
+        with closing(response):
+            response.raise_for_status()
+            if not self.memory_budget.should_stream(
+                response.headers.get('Content-Length'), response.headers.get('Content-Encoding'),
+            ):
+                return self._observe(endpoint, response_json(response).get('data', []))
+            records = iter_json_array(response.iter_content(65536))
+            if self.schema_registry is not None:
+                records = self.schema_registry.track(table_name(endpoint), records)
+            return self.memory_budget.collect(records)
+    
+    def _observe(self, endpoint: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fingerprint a fetched listing with the schema registry, if any."""
+        if self.schema_registry is not None:
+            self.schema_registry.observe_many(table_name(endpoint), records)
+        return records
+    
+    def _send(self, url: str, **kwargs) -> requests.Response:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
         return self.session.get(url, timeout=15, **kwargs)
     
-    def get_hosts(self) -> List[Dict[str, Any]]:
-        """Fetch all hosts (gateway devices)."""
-        response = self.get('hosts')
-        response.raise_for_status()
-        data = response.json()
-        return data.get('data', [])
+    def _fetch(self, url: str, **kwargs) -> requests.Response:
+        response = self._send(url, **kwargs)
+        # Read the body now so callers sharing the response never race on it
+        _ = response.content
+        return response
     
-    def get_sites(self) -> List[Dict[str, Any]]:
-        """Fetch all sites."""
-        response = self.get('sites')
+    def get_records(self, endpoint: str, item_type: Optional[Type] = None) -> List[Any]:
+        """
+        GET an endpoint and return its ``data`` list.
+        
+        Args:
+            endpoint: API endpoint (e.g. ``"hosts"``)
+            item_type: Dataclass or ``msgspec.Struct`` to decode records into
+                (default: plain dicts)
+        
+        Returns:
+            List of records
+        """
+        response = self.get(endpoint)
         response.raise_for_status()
-        data = response.json()
+        if item_type is not None:
+            return decode_data(response.content, item_type)
+        data = response_json(response)
         return data.get('data', [])
     
-    def get_devices(self) -> List[Dict[str, Any]]:
-        """Fetch all devices."""
-        response = self.get('devices')
-        response.raise_for_status()
-        data = response.json()
-        return data.get('data', [])
+    def get_hosts(self) -> Sequence[Dict[str, Any]]:
+        """Fetch all hosts (gateway devices) (a ``SpillList`` when over the memory budget)."""
+        return self._get_data('hosts')
+    
+    def get_sites(self) -> Sequence[Dict[str, Any]]:
+        """Fetch all sites (a ``SpillList`` when over the memory budget)."""
+        return self._get_data('sites')
+    
+    def get_devices(self) -> Sequence[Dict[str, Any]]:
+        """Fetch all devices (a ``SpillList`` when over the memory budget)."""
+        return self._get_data('devices')
     
     def get_sd_wan_configs(self) -> List[Dict[str, Any]]:
         """Fetch SD-WAN configurations (for WAN/HA setup)."""
         response = self.get('sd-wan-configs')
         response.raise_for_status()
-        data = response.json()
+        data = response_json(response)
         return data.get('data', [])
     
     def get_isp_metrics(self) -> Dict[str, Any]:
         """Fetch ISP metrics."""
         response = self.get('isp-metrics')
         response.raise_for_status()
-        return response.json()
+        return response_json(response)
 
@@ -1,10 +1,15 @@
 """Credential management utilities."""
 
-from beast_unifi.credentials.env import load_credentials_from_env
-from beast_unifi.credentials.onepassword import load_credentials_from_1password
+from beast_unifi.credentials.env import load_credentials_from_env, load_accounts_from_env
+from beast_unifi.credentials.onepassword import (
+    load_credentials_from_1password,
+    load_accounts_from_1password,
+)
 
 __all__ = [
     "load_credentials_from_env",
     "load_credentials_from_1password",
+    "load_accounts_from_env",
+    "load_accounts_from_1password",
 ]
 
@@ -45,3 +45,34 @@ def load_credentials_from_env(env_path: Optional[Path] = None) -> Dict[str, str]
     
     return credentials
 
+
+def load_accounts_from_env(env_path: Optional[Path] = None) -> Dict[str, str]:
+    """
+    Load Site Manager API keys for multiple UniFi accounts.
+    
+    ``UNIFI_API_KEY`` is returned as account ``default``; every
+    ``UNIFI_API_KEY_<NAME>`` variable becomes account ``<name>`` (lowercase).
+    
+    Args:
+        env_path: Path to .env file (default: ~/.env)
+        
+    Returns:
+        Dictionary mapping account name to API key
+    """
+    if env_path is None:
+        env_path = Path.home() / '.env'
+    
+    if env_path.exists():
+        load_dotenv(env_path)
+    
+    accounts = {}
+    prefix = 'UNIFI_API_KEY_'
+    for name, value in sorted(os.environ.items()):
+        if name.startswith(prefix) and value:
+            accounts[name[len(prefix):].lower()] = value
+    
+    api_key = os.getenv('UNIFI_API_KEY')
+    if api_key and api_key not in accounts.values():
+        accounts['default'] = api_key
+    
+    return accounts
@@ -58,7 +58,7 @@ def load_credentials_from_1password(vault_name: str = "Beastmaster") -> Dict[str
                     # Sometimes op returns plain text
                     value = result.stdout.strip()
                     # Check if value is actually a revealed secret or just a placeholder
-                    if value and not value.startswith("[use 'op item get") and not "--reveal" in value.lower():
+                    if value and not value.startswith("[use 'op item get") and "--reveal" not in value.lower():
                         credentials[env_var] = value
                         os.environ[env_var] = value
         except Exception:
@@ -67,3 +67,71 @@ def load_credentials_from_1password(vault_name: str = "Beastmaster") -> Dict[str
     
     return credentials
 
+
+def load_accounts_from_1password(
+    vault_name: str = "Beastmaster",
+    tag: str = "unifi-site-manager",
+    field_name: str = "api_key",
+) -> Dict[str, str]:
+    """
+    Load Site Manager API keys for multiple UniFi accounts from 1Password.
+    
+    Every item in the vault carrying ``tag`` is treated as one account; the
+    item title becomes the account name.
+    
+    Args:
+        vault_name: Name of the 1Password vault (default: "Beastmaster")
+        tag: Tag marking Site Manager API key items
+        field_name: Field holding the API key
+        
+    Returns:
+        Dictionary mapping account name to API key
+    """
+    accounts = {}
+    
+    try:
+        result = subprocess.run(
+            ['op', 'item', 'list', '--vault', vault_name,
+             '--tags', tag, '--format', 'json'],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        if result.returncode != 0:
+            return accounts
+        items = json.loads(result.stdout)
+    except Exception:
+        # Silently skip if CLI not available
+        return accounts
+    
+    for item in items:
+        title = item.get('title')
+        if not title:
+            continue
+        try:
+            result = subprocess.run(
+                ['op', 'item', 'get', item.get('id', title), '--vault', vault_name,
+                 '--fields', field_name, '--format', 'json', '--reveal'],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+            if result.returncode != 0:
+                continue
+            try:
+                field_data = json.loads(result.stdout)
+                if isinstance(field_data, list) and len(field_data) > 0:
+                    value = field_data[0].get('value', '')
+                elif isinstance(field_data, dict):
+                    value = field_data.get('value', '')
+                else:
+                    value = ''
+            except json.JSONDecodeError:
+                value = result.stdout.strip()
+            # 1Password CLI returns placeholder strings when field isn't revealed
+            if value and not value.startswith("[use 'op item get"):
+                accounts[title] = value
+        except Exception:
+            pass
+    
+    return accounts
@@ -1,4 +1,8 @@
 """Data models for UniFi entities."""
 
-# Models will be added as needed
+from beast_unifi.models.inventory import Inventory, InventoryEntry
 
+__all__ = [
+    "Inventory",
+    "InventoryEntry",
+]
@@ -0,0 +1,304 @@
+"""Indexed in-memory inventory of UniFi devices and clients."""
+
+import sys
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Set, Tuple
+
+from beast_unifi.analysis.topology import Topology, device_uplink
+from beast_unifi.utils.normalize import normalize_mac
+
+
+DEVICE = 'device'
+CLIENT = 'client'
+
+# Index name -> attribute stored on each entry
+INDEXES = ('ip', 'hostname', 'site', 'network', 'vlan', 'uplink')
+
+
+class InventoryEntry:
+    """A single indexed record. Slotted to keep large inventories compact."""
+
+    __slots__ = ('mac', 'kind', 'record', 'ip', 'hostname', 'site', 'network', 'vlan', 'uplink')
+
+    def __init__(self, mac: str, kind: str, record: Dict[str, Any], **keys: Optional[str]):
+        self.mac = mac
+        self.kind = kind
+        self.record = record
+        for name in INDEXES:
+            setattr(self, name, keys.get(name))
+
+    def __repr__(self) -> str:
+        return f"InventoryEntry({self.kind} {self.mac})"
+
+
+def _key(value: Any) -> Optional[str]:
+    """Turn an index value into an interned string key (None if empty)."""
+    if value is None or value == '':
+        return None
+    return sys.intern(str(value))
+
+
+def _hostname(record: Dict[str, Any]) -> Optional[str]:
+    value = record.get('hostname') or record.get('name')
+    return _key(value.lower()) if isinstance(value, str) else None
+
+
+def _device_keys(record: Dict[str, Any], site: Optional[str]) -> Dict[str, Optional[str]]:
+    uplink = device_uplink(record)
+    return {
+        'ip': _key(record.get('ip')),
+        'hostname': _hostname(record),
+        'site': _key(site or record.get('site_id')),
+        'network': None,
+        'vlan': None,
+        'uplink': normalize_mac(uplink.get('uplink_mac')),
+    }
+
+
+def _client_keys(record: Dict[str, Any], site: Optional[str]) -> Dict[str, Optional[str]]:
+    # Wireless clients hang off an AP, wired clients off a switch port
+    if record.get('is_wired'):
+        uplink = record.get('sw_mac')
+    else:
+        uplink = record.get('ap_mac')
+    return {
+        'ip': _key(record.get('ip') or record.get('last_ip')),
+        'hostname': _hostname(record),
+        'site': _key(site or record.get('site_id')),
+        'network': _key(record.get('network_id') or record.get('network')),
+        'vlan': _key(record.get('vlan')),
+        'uplink': normalize_mac(uplink),
+    }
+
+
+class Inventory:
+    """
+    Hash-indexed view over devices and clients from one or more sites.
+
+    Every record is keyed by normalised MAC address. Secondary indexes map
+    IP, hostname, site, network, VLAN and uplink MAC to the set of MACs
+    carrying that value, so lookups are O(1) regardless of inventory size.
+    Records can be upserted or removed one at a time; only the indexes the
+    record participates in are touched. Uplink paths and the device graph
+    come from a ``Topology`` kept in step with the entries.
+    """
+
+    def __init__(self):
+        """Initialize an empty inventory."""
+        self._entries: Dict[str, InventoryEntry] = {}
+        self._indexes: Dict[str, Dict[str, Set[str]]] = {name: {} for name in INDEXES}
+        self._topology = Topology()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, mac: object) -> bool:
+        return isinstance(mac, str) and normalize_mac(mac) in self._entries
+
+    def __iter__(self) -> Iterator[InventoryEntry]:
+        return iter(self._entries.values())
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add_devices(self, devices: Iterable[Dict[str, Any]], site: Optional[str] = None) -> int:
+        """
+        Upsert devices, e.g. from ``LocalControllerClient.get_devices()``.
+
+        Args:
+            devices: Device records
+            site: Site the records belong to (default: each record's ``site_id``)
+
+        Returns:
+            Number of records indexed
+        """
+        return sum(1 for device in devices if self.upsert(device, DEVICE, site))
+
+    def add_clients(self, clients: Iterable[Dict[str, Any]], site: Optional[str] = None) -> int:
+        """
+        Upsert clients, e.g. from ``LocalControllerClient.get_clients()``.
+
+        Args:
+            clients: Client records
+            site: Site the records belong to (default: each record's ``site_id``)
+
+        Returns:
+            Number of records indexed
+        """
+        return sum(1 for client in clients if self.upsert(client, CLIENT, site))
+
+    def upsert(self, record: Dict[str, Any], kind: str, site: Optional[str] = None) -> Optional[InventoryEntry]:
+        """
+        Insert or replace a single record, updating only affected indexes.
+
+        Args:
+            record: Device or client record
+            kind: ``"device"`` or ``"client"``
+            site: Site the record belongs to
+
+        Returns:
+            The indexed entry, or None if the record has no usable MAC
+        """
+        if kind not in (DEVICE, CLIENT):
+            raise ValueError(f"Unknown record kind: {kind!r}")
+        mac = normalize_mac(record.get('mac'))
+        if mac is None:
+            return None
+        mac = sys.intern(mac)
+        keys = _device_keys(record, site) if kind == DEVICE else _client_keys(record, site)
+
+        previous = self._entries.get(mac)
+        if previous is not None:
+            self._unindex(previous)
+        entry = InventoryEntry(mac, kind, record, **keys)
+        self._entries[mac] = entry
+        self._index(entry)
+        if kind == DEVICE:
+            self._topology.upsert_device(record)
+        else:
+            self._topology.upsert_client(record)
+        return entry
+
+    def remove(self, mac: str) -> Optional[InventoryEntry]:
+        """
+        Remove a record by MAC address.
+
+        Args:
+            mac: MAC address in any common format
+
+        Returns:
+            The removed entry, or None if it was not present
+        """
+        entry = self._entries.pop(normalize_mac(mac) or '', None)
+        if entry is not None:
+            self._unindex(entry)
+            self._topology.remove(entry.mac)
+        return entry
+
+    def _index(self, entry: InventoryEntry) -> None:
+        for name in INDEXES:
+            value = getattr(entry, name)
+            if value is not None:
+                self._indexes[name].setdefault(value, set()).add(entry.mac)
+
+    def _unindex(self, entry: InventoryEntry) -> None:
+        for name in INDEXES:
+            value = getattr(entry, name)
+            if value is None:
+                continue
+            bucket = self._indexes[name].get(value)
+            if bucket is not None:
+                bucket.discard(entry.mac)
+                if not bucket:
+                    del self._indexes[name][value]
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def get(self, mac: str) -> Optional[InventoryEntry]:
+        """Look up an entry by MAC address."""
+        return self._entries.get(normalize_mac(mac) or '')
+
+    def by_ip(self, ip: str) -> List[InventoryEntry]:
+        """All entries currently holding an IP address."""
+        return self._lookup('ip', ip)
+
+    def by_hostname(self, hostname: str) -> List[InventoryEntry]:
+        """All entries with a hostname (case-insensitive)."""
+        return self._lookup('hostname', hostname.lower())
+
+    def at_site(self, site: str, kind: Optional[str] = None) -> List[InventoryEntry]:
+        """All entries at a site, optionally restricted to one kind."""
+        return self.find(site=site, kind=kind)
+
+    def attached_to(self, uplink_mac: str) -> List[InventoryEntry]:
+        """Entries (clients and downstream devices) whose uplink is a device."""
+        return self._lookup('uplink', normalize_mac(uplink_mac))
+
+    def find(self, kind: Optional[str] = None, **criteria: Any) -> List[InventoryEntry]:
+        """
+        Find entries matching all given index values.
+
+        Example: ``inventory.find(kind="client", site="default", vlan=20)``
+
+        Args:
+            kind: Restrict to ``"device"`` or ``"client"``
+            **criteria: Index name to value (ip, hostname, site, network, vlan, uplink)
+
+        Returns:
+            Matching entries
+        """
+        buckets = []
+        for name, value in criteria.items():
+            if name not in self._indexes:
+                raise ValueError(f"Unknown index: {name!r}")
+            if value is None:
+                continue
+            if name == 'uplink':
+                value = normalize_mac(value)
+            elif name == 'hostname':
+                value = str(value).lower()
+            buckets.append(self._indexes[name].get(str(value), set()))
+
+        if buckets:
+            # Intersect starting from the smallest bucket
+            buckets.sort(key=len)
+            macs: Iterable[str] = buckets[0].intersection(*buckets[1:])
+        else:
+            macs = self._entries.keys()
+        entries = (self._entries[mac] for mac in macs)
+        return [e for e in entries if kind is None or e.kind == kind]
+
+    def _lookup(self, index: str, value: Optional[str]) -> List[InventoryEntry]:
+        if value is None:
+            return []
+        return [self._entries[mac] for mac in self._indexes[index].get(value, ())]
+
+    # ------------------------------------------------------------------
+    # Topology
+    # ------------------------------------------------------------------
+
+    def uplink_of(self, mac: str) -> Optional[InventoryEntry]:
+        """The device an entry is attached to, if known."""
+        entry = self.get(mac)
+        if entry is None or entry.uplink is None:
+            return None
+        return self._entries.get(entry.uplink)
+
+    def downlinks(self, mac: str) -> List[InventoryEntry]:
+        """Devices (not clients) directly attached below a device."""
+        return [e for e in self.attached_to(mac) if e.kind == DEVICE]
+
+    def path_to_root(self, mac: str) -> List[InventoryEntry]:
+        """
+        Walk uplinks from an entry to the top of the topology (usually the gateway).
+
+        Args:
+            mac: MAC address of a client or device
+
+        Returns:
+            Entries from the given one up to the root (see
+            ``Topology.path_to_root``; uplinks that would loop are ignored)
+        """
+        return [self._entries[node.mac] for node in self._topology.path_to_root(mac)]
+
+    def topology(self) -> Dict[str, List[str]]:
+        """
+        Device uplink graph as an adjacency mapping.
+
+        Returns:
+            Mapping of each device MAC to the sorted MACs of devices
+            directly below it
+        """
+        return {
+            node.mac: sorted(c.mac for c in self._topology.children(node.mac) if c.kind != CLIENT)
+            for node in self._topology.nodes() if node.kind != CLIENT
+        }
+
+    def index_sizes(self) -> Dict[str, Tuple[int, int]]:
+        """Number of distinct keys and total postings per index."""
+        return {
+            name: (len(index), sum(len(macs) for macs in index.values()))
+            for name, index in self._indexes.items()
+        }
@@ -1,4 +1,38 @@
 """Utility functions."""
 
-# Utilities will be added as needed
+from beast_unifi.utils.archive import SnapshotArchive
+from beast_unifi.utils.broker import SnapshotBroker, SnapshotView
+from beast_unifi.utils.cassette import Cassette, cassette
+from beast_unifi.utils.concurrency import AdaptiveLimiter, controller_limiter, controller_metrics
+from beast_unifi.utils.memory import MemoryBudget, SpillList, iter_json_array
+from beast_unifi.utils.normalize import normalize_mac
+from beast_unifi.utils.rate_limit import RateLimiter
+from beast_unifi.utils.registry import SchemaRegistry, SchemaVersion
+from beast_unifi.utils.schema import TableSchema, infer_schema, infer_schema_files, to_sql, to_mermaid
+from beast_unifi.utils.singleflight import SingleFlight
+from beast_unifi.utils.timeseries import TimeSeriesStore
 
+__all__ = [
+    "normalize_mac",
+    "RateLimiter",
+    "SingleFlight",
+    "MemoryBudget",
+    "SpillList",
+    "iter_json_array",
+    "AdaptiveLimiter",
+    "controller_limiter",
+    "controller_metrics",
+    "Cassette",
+    "cassette",
+    "SnapshotArchive",
+    "SnapshotBroker",
+    "SnapshotView",
+    "TimeSeriesStore",
+    "SchemaRegistry",
+    "SchemaVersion",
+    "TableSchema",
+    "infer_schema",
+    "infer_schema_files",
+    "to_sql",
+    "to_mermaid",
+]
@@ -0,0 +1,505 @@
+"""Content-addressed, compressed archive of collection snapshots."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Any, BinaryIO, Iterable, Tuple
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: pip install beast-unifi[archive]
+    zstandard = None
+
+
+# Fields tried in order to identify a record across snapshots
+IDENTITY_FIELDS = ('_id', 'id', 'siteId', 'hostId', 'mac')
+
+# Uncompressed bytes of records compressed together; small records only
+# compress well next to their neighbours, and a read decompresses one block
+BLOCK_SIZE = 64 * 1024
+
+# Bytes of SHA-256 kept as an object's address (128 bits: collisions are
+# not a concern at any realistic archive size, and the index stays small)
+DIGEST_SIZE = 16
+
+
+def canonical_json(record: Any) -> bytes:
+    """Serialise a record deterministically so equal records hash equally."""
+    return json.dumps(record, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def record_identity(record: Dict[str, Any]) -> Optional[str]:
+    """Stable identity of a record, used to report changes between snapshots."""
+    for name in IDENTITY_FIELDS:
+        value = record.get(name)
+        if value not in (None, ''):
+            return f"{name}:{value}"
+    return None
+
+
+class _Codec:
+    """Compression codec for stored objects (zstd when available, else zlib)."""
+
+    def __init__(self, name: str, level: int):
+        if name == 'zstd' and zstandard is None:
+            raise ImportError(
+                "zstandard is required for zstd archives. Install with: "
+                "pip install beast-unifi[archive]"
+            )
+        self.name = name
+        self.level = level
+        if name == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == 'zstd':
+            return self._compressor.compress(data)
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.name == 'zstd':
+            return self._decompressor.decompress(data)
+        return zlib.decompress(data)
+
+
+class _SegmentWriter:
+    """Pack new objects into compressed blocks of one segment file."""
+
+    def __init__(self, path: Path, codec: _Codec, block_size: int):
+        self.path = path
+        self.codec = codec
+        self.block_size = block_size
+        self.tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        self.file: BinaryIO = open(self.tmp, 'wb')
+        self.blocks: List[List[int]] = []
+        self.buffer = bytearray()
+        # [object id, digest, block, start, length, identity]
+        self.entries: List[List[Any]] = []
+
+    def add(self, object_id: int, digest: str, data: bytes, identity: Optional[str]) -> None:
+        self.entries.append([object_id, digest, len(self.blocks), len(self.buffer), len(data), identity])
+        self.buffer += data
+        if len(self.buffer) >= self.block_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.buffer:
+            compressed = self.codec.compress(bytes(self.buffer))
+            self.blocks.append([self.file.tell(), len(compressed)])
+            self.file.write(compressed)
+            self.buffer = bytearray()
+
+    def finish(self) -> Dict[str, Any]:
+        """Write the last block and return the segment's index."""
+        self._flush()
+        self.file.close()
+        return {'codec': self.codec.name, 'blocks': self.blocks, 'entries': self.entries}
+
+    def abort(self) -> None:
+        self.file.close()
+        self.tmp.unlink(missing_ok=True)
+
+
+class SnapshotArchive:
+    """
+    Store snapshots of API collections as manifests over unique records.
+
+    Each record is serialised canonically and hashed (truncated SHA-256); records
+    not stored before get a sequential object id and are appended to the
+    snapshot's segment file in ``BLOCK_SIZE`` blocks compressed together, so
+    half a million small records cost a handful of files rather than one
+    file (and filesystem block) each. A compressed index next to each
+    segment maps object ids to their digest, record identity and position.
+
+    A snapshot manifest is just the object ids per collection, delta
+    encoded and compressed: unchanged records cost a few bits, snapshots
+    rebuild by decompressing only the blocks they reference, and two
+    snapshots diff from manifests and the index alone.
+
+    One process writes an archive at a time; any number may read it.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        codec: Optional[str] = None,
+        level: int = 3,
+        block_size: int = BLOCK_SIZE,
+    ):
+        """
+        Initialize snapshot archive.
+
+        Args:
+            root: Archive directory (created if missing)
+            codec: ``"zstd"`` or ``"zlib"`` (default: zstd if installed)
+            level: Compression level
+            block_size: Uncompressed bytes per compressed block
+        """
+        self.root = Path(root)
+        self.segments_dir = self.root / 'segments'
+        self.manifests_dir = self.root / 'manifests'
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        self.codec = _Codec(codec or ('zstd' if zstandard is not None else 'zlib'), level)
+        self.block_size = block_size
+        self._codecs = {self.codec.name: self.codec}
+        self._lock = threading.Lock()
+        # digest -> object id; object id -> (segment, block, start, length, digest, identity)
+        self._ids: Dict[str, int] = {}
+        self._objects: Dict[int, Tuple[int, int, int, int, str, Optional[str]]] = {}
+        # segment -> (codec name, block table)
+        self._segments: Dict[int, Tuple[str, List[List[int]]]] = {}
+        self._load_index()
+
+    def _get_codec(self, name: str) -> _Codec:
+        if name not in self._codecs:
+            self._codecs[name] = _Codec(name, self.codec.level)
+        return self._codecs[name]
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.segments_dir / f"{segment:08d}.seg"
+
+    def _index_path(self, segment: int) -> Path:
+        return self.segments_dir / f"{segment:08d}.idx"
+
+    def _load_index(self) -> None:
+        for path in sorted(self.segments_dir.glob('*.idx')):
+            segment = int(path.stem)
+            if not self._segment_path(segment).exists():
+                continue
+            self._add_segment(segment, self._read_index(path))
+
+    def _read_index(self, path: Path) -> Dict[str, Any]:
+        # First line names the codec of the rest of the file
+        codec, _, body = path.read_bytes().partition(b'\n')
+        header, _, columns = self._get_codec(codec.decode('ascii')).decompress(body).partition(b'\n')
+        index = json.loads(header)
+        count = len(index['identities'])
+        values = np.frombuffer(columns, dtype='<i4', count=4 * count).reshape(4, count)
+        digests = columns[16 * count:]
+        ids, blocks = np.cumsum(values[0]).tolist(), np.cumsum(values[1]).tolist()
+        index['entries'] = [
+            [ids[i], digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE].hex(), blocks[i],
+             int(values[2][i]), int(values[3][i]), index['identities'][i]]
+            for i in range(count)
+        ]
+        return index
+
+    def _write_index(self, segment: int, index: Dict[str, Any]) -> None:
+        entries = index['entries']
+        # Integer columns (ids and blocks delta encoded) followed by raw digests
+        columns = np.array([e[:1] + e[2:5] for e in entries], dtype=np.int64).reshape(-1, 4).T
+        columns[0] = np.diff(columns[0], prepend=0)
+        columns[1] = np.diff(columns[1], prepend=0)
+        header = {'codec': index['codec'], 'blocks': index['blocks'], 'identities': [e[5] for e in entries]}
+        body = (
+            canonical_json(header) + b'\n' + columns.astype('<i4').tobytes()
+            + b''.join(bytes.fromhex(e[1]) for e in entries)
+        )
+        self._write_atomic(
+            self._index_path(segment),
+            self.codec.name.encode('ascii') + b'\n' + self.codec.compress(body),
+        )
+
+    def _add_segment(self, segment: int, index: Dict[str, Any]) -> None:
+        self._segments[segment] = (index['codec'], index['blocks'])
+        for object_id, digest, block, start, length, identity in index['entries']:
+            # Later segments (compacted copies) supersede earlier ones
+            self._ids[digest] = object_id
+            self._objects[object_id] = (segment, block, start, length, digest, identity)
+
+    def _next_segment(self) -> int:
+        numbers = [int(p.name.split('.')[0]) for p in self.segments_dir.glob('*.seg')]
+        return max(numbers + list(self._segments) + [0]) + 1
+
+    def _commit_segment(self, segment: int, writer: _SegmentWriter) -> None:
+        index = writer.finish()
+        os.replace(writer.tmp, self._segment_path(segment))
+        # The index is written last: a segment without one is ignored and removed by gc()
+        self._write_index(segment, index)
+        self._add_segment(segment, index)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _new_snapshot_id(self) -> str:
+        now = time.time()
+        base = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now)) + f"{int(now % 1 * 1e6):06d}Z"
+        snapshot_id, n = base, 0
+        while self._manifest_path(snapshot_id).exists():
+            n += 1
+            snapshot_id = f"{base}-{n}"
+        return snapshot_id
+
+    def store(
+        self,
+        collections: Dict[str, Iterable[Dict[str, Any]]],
+        snapshot_id: Optional[str] = None,
+    ) -> str:
+        """
+        Archive one snapshot of several collections.
+
+        Args:
+            collections: Collection name to records (e.g. ``{"devices": [...]}``)
+            snapshot_id: Snapshot identifier (default: UTC timestamp with
+                microseconds, made unique if taken)
+
+        Returns:
+            The snapshot identifier
+        """
+        with self._lock:
+            snapshot_id = snapshot_id or self._new_snapshot_id()
+            segment = self._next_segment()
+            writer = _SegmentWriter(self._segment_path(segment), self.codec, self.block_size)
+            pending: Dict[str, int] = {}
+            next_id = max(self._objects, default=-1) + 1
+            ids: Dict[str, np.ndarray] = {}
+            try:
+                for name, records in collections.items():
+                    column = []
+                    for record in records:
+                        data = canonical_json(record)
+                        digest = hashlib.sha256(data).digest()[:DIGEST_SIZE].hex()
+                        object_id = self._ids.get(digest, pending.get(digest))
+                        if object_id is None:
+                            object_id = pending[digest] = next_id
+                            next_id += 1
+                            writer.add(object_id, digest, data, record_identity(record))
+                        column.append(object_id)
+                    ids[name] = np.asarray(column, dtype=np.int64)
+            except BaseException:
+                writer.abort()
+                raise
+            if pending:
+                self._commit_segment(segment, writer)
+            else:
+                writer.abort()
+            self._write_manifest(snapshot_id, ids, new_objects=len(pending))
+        return snapshot_id
+
+    def _write_manifest(self, snapshot_id: str, ids: Dict[str, np.ndarray], new_objects: int) -> None:
+        header = {
+            'id': snapshot_id,
+            'created': time.time(),
+            'new_objects': new_objects,
+            'collections': [[name, len(column)] for name, column in ids.items()],
+        }
+        # Ids of consecutive records are mostly consecutive: deltas compress to almost nothing
+        deltas = b''.join(
+            np.diff(column, prepend=0).astype('<i4').tobytes() for column in ids.values()
+        )
+        body = canonical_json(header) + b'\n' + deltas
+        self._write_atomic(
+            self._manifest_path(snapshot_id),
+            self.codec.name.encode('ascii') + b'\n' + self.codec.compress(body),
+        )
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _manifest_path(self, snapshot_id: str) -> Path:
+        return self.manifests_dir / f"{snapshot_id}.manifest"
+
+    def snapshots(self) -> List[str]:
+        """List snapshot identifiers, oldest first."""
+        return sorted(p.stem for p in self.manifests_dir.glob('*.manifest'))
+
+    def _read_manifest(self, snapshot_id: str) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        path = self._manifest_path(snapshot_id)
+        if not path.exists():
+            raise KeyError(f"Unknown snapshot: {snapshot_id}")
+        codec, _, body = path.read_bytes().partition(b'\n')
+        header, _, deltas = self._get_codec(codec.decode('ascii')).decompress(body).partition(b'\n')
+        header = json.loads(header)
+        values = np.frombuffer(deltas, dtype='<i4')
+        ids, offset = {}, 0
+        for name, count in header['collections']:
+            ids[name] = np.cumsum(values[offset:offset + count], dtype=np.int64)
+            offset += count
+        return header, ids
+
+    def manifest(self, snapshot_id: str) -> Dict[str, Any]:
+        """
+        Read a snapshot manifest.
+
+        Returns:
+            ``{"id", "created", "new_objects", "collections"}`` with
+            ``[identity, digest]`` pairs per collection
+        """
+        header, ids = self._read_manifest(snapshot_id)
+        collections = {}
+        for name, column in ids.items():
+            entries = []
+            for object_id in column.tolist():
+                _, _, _, _, digest, identity = self._object(object_id)
+                entries.append([identity, digest])
+            collections[name] = entries
+        return {**header, 'collections': collections}
+
+    def _object(self, object_id: int) -> Tuple[int, int, int, int, str, Optional[str]]:
+        location = self._objects.get(object_id)
+        if location is None:
+            raise KeyError(f"Missing archive object: {object_id}")
+        return location
+
+    def load(
+        self,
+        snapshot_id: str,
+        collections: Optional[Iterable[str]] = None,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Rebuild a snapshot.
+
+        Args:
+            snapshot_id: Snapshot identifier
+            collections: Only rebuild these collections (default: all)
+
+        Returns:
+            Collection name to records, in their original order
+        """
+        _, ids = self._read_manifest(snapshot_id)
+        wanted = set(collections) if collections is not None else None
+        blocks: Dict[Tuple[int, int], bytes] = {}
+        records: Dict[int, Dict[str, Any]] = {}
+        result = {}
+        for name, column in ids.items():
+            if wanted is not None and name not in wanted:
+                continue
+            rebuilt = []
+            for object_id in column.tolist():
+                record = records.get(object_id)
+                if record is None:
+                    segment, block, start, length, _, _ = self._object(object_id)
+                    data = blocks.get((segment, block))
+                    if data is None:
+                        data = blocks[(segment, block)] = self._read_block(segment, block)
+                    record = records[object_id] = json.loads(data[start:start + length])
+                rebuilt.append(record)
+            result[name] = rebuilt
+        return result
+
+    def _read_block(self, segment: int, block: int) -> bytes:
+        codec, table = self._segments[segment]
+        offset, length = table[block]
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return self._get_codec(codec).decompress(f.read(length))
+
+    def diff(self, old_id: str, new_id: str) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Compare two snapshots using manifests and the index only.
+
+        Args:
+            old_id: Earlier snapshot identifier
+            new_id: Later snapshot identifier
+
+        Returns:
+            Per collection, record identities that were ``added``, ``removed``
+            or ``changed``
+        """
+        old = self.manifest(old_id)['collections']
+        new = self.manifest(new_id)['collections']
+        result = {}
+        for name in sorted(set(old) | set(new)):
+            before = {identity or digest: digest for identity, digest in old.get(name, [])}
+            after = {identity or digest: digest for identity, digest in new.get(name, [])}
+            result[name] = {
+                'added': sorted(after.keys() - before.keys()),
+                'removed': sorted(before.keys() - after.keys()),
+                'changed': sorted(k for k in after.keys() & before.keys() if after[k] != before[k]),
+            }
+        return result
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def delete(self, snapshot_id: str) -> None:
+        """Delete a snapshot manifest (objects are reclaimed by ``gc()``)."""
+        self._manifest_path(snapshot_id).unlink(missing_ok=True)
+
+    def gc(self) -> int:
+        """
+        Remove objects no longer referenced by any snapshot.
+
+        Segments holding only unreferenced objects are deleted; segments
+        mixing both are compacted into a new segment first.
+
+        Returns:
+            Number of objects removed
+        """
+        with self._lock:
+            live = set()
+            for snapshot_id in self.snapshots():
+                for column in self._read_manifest(snapshot_id)[1].values():
+                    live.update(column.tolist())
+            by_segment: Dict[int, List[int]] = {}
+            for object_id, location in self._objects.items():
+                by_segment.setdefault(location[0], []).append(object_id)
+
+            removed = 0
+            for segment in sorted(self._segments):
+                members = by_segment.get(segment, [])
+                dead = [i for i in members if i not in live]
+                if members and not dead:
+                    continue
+                keep = [i for i in members if i in live]
+                if keep:
+                    target = self._next_segment()
+                    writer = _SegmentWriter(self._segment_path(target), self.codec, self.block_size)
+                    # Decompress each block once, not once per surviving object
+                    blocks: Dict[int, bytes] = {}
+                    for object_id in sorted(keep):
+                        _, block, start, length, digest, identity = self._objects[object_id]
+                        data = blocks.get(block)
+                        if data is None:
+                            data = blocks[block] = self._read_block(segment, block)
+                        writer.add(object_id, digest, data[start:start + length], identity)
+                    self._commit_segment(target, writer)
+                for object_id in dead:
+                    digest = self._objects.pop(object_id)[4]
+                    if self._ids.get(digest) == object_id:
+                        del self._ids[digest]
+                self._index_path(segment).unlink(missing_ok=True)
+                self._segment_path(segment).unlink(missing_ok=True)
+                del self._segments[segment]
+                removed += len(dead)
+            # Segments left without an index by an interrupted store()
+            for path in self.segments_dir.glob('*.seg'):
+                if int(path.stem) not in self._segments:
+                    path.unlink()
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Snapshot count, unique objects, referenced records and bytes on disk."""
+        records = 0
+        for snapshot_id in self.snapshots():
+            records += sum(len(c) for c in self._read_manifest(snapshot_id)[1].values())
+        files = [p for p in self.segments_dir.iterdir() if not p.name.startswith('.')]
+        return {
+            'snapshots': len(self.snapshots()),
+            'objects': len(self._objects),
+            'records': records,
+            'segments': len(self._segments),
+            'object_bytes': sum(p.stat().st_size for p in files),
+            'manifest_bytes': sum(p.stat().st_size for p in self.manifests_dir.glob('*.manifest')),
+        }
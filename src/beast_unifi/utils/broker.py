@@ -0,0 +1,456 @@
+"""Memory-mapped snapshot handoff between processes on one host."""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Any, BinaryIO, Iterable, Iterator, Sequence, Tuple, Union
+
+import numpy as np
+
+from beast_unifi.utils.codec import get_backend, loads
+from beast_unifi.utils.normalize import dig
+
+
+MAGIC = b'BUSNAP01'
+# magic, header length
+_PREAMBLE = struct.Struct('<8sI')
+# Record offsets are native-order uint64 (files never leave the host)
+_OFFSET = struct.Struct('=Q')
+CURRENT = 'CURRENT'
+
+
+def _padding(size: int) -> int:
+    return -size % _OFFSET.size
+
+
+def _dumps(record: Any) -> bytes:
+    return json.dumps(record, separators=(',', ':'), default=str).encode('utf-8')
+
+
+class _ColumnBuilder:
+    """
+    Accumulate one typed column while records stream past.
+
+    Numbers and booleans become float64 (NaN where missing); once a string
+    is seen the column becomes dictionary encoded: int32 codes (-1 where
+    missing) into a table of distinct strings, earlier numbers included as
+    their text.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.kind: Optional[str] = None
+        self.missing = 0
+        self.numbers = array('d')
+        self.codes = array('i')
+        self.strings: Dict[str, int] = {}
+
+    def _encode(self, text: str) -> int:
+        code = self.strings.get(text)
+        if code is None:
+            code = self.strings[text] = len(self.strings)
+        return code
+
+    def _to_strings(self) -> None:
+        self.kind = 'str'
+        self.codes = array('i', (
+            -1 if v != v else self._encode(repr(int(v)) if v.is_integer() else repr(v))
+            for v in self.numbers
+        ))
+        self.numbers = array('d')
+
+    def add(self, value: Any) -> None:
+        if value is None or isinstance(value, (list, dict)):
+            if self.kind is None:
+                self.missing += 1
+            elif self.kind == 'f8':
+                self.numbers.append(float('nan'))
+            else:
+                self.codes.append(-1)
+            return
+        number = isinstance(value, (int, float))
+        if self.kind is None:
+            self.kind = 'f8' if number else 'str'
+            if number:
+                self.numbers.extend([float('nan')] * self.missing)
+            else:
+                self.codes.extend([-1] * self.missing)
+        elif self.kind == 'f8' and not number:
+            self._to_strings()
+        if self.kind == 'f8':
+            self.numbers.append(float(value))
+        else:
+            self.codes.append(self._encode(str(value) if not isinstance(value, bool) else str(value).lower()))
+
+    def parts(self) -> Tuple[Dict[str, Any], List[bytes]]:
+        """Header entry (positions relative to the first part) and the byte parts."""
+        if self.kind != 'str':
+            values = self.numbers if self.kind == 'f8' else array('d', [float('nan')] * self.missing)
+            return {'kind': 'f8', 'count': len(values)}, [values.tobytes()]
+        table = array('Q', [0])
+        data = bytearray()
+        for text in self.strings:
+            data += text.encode('utf-8')
+            table.append(len(data))
+        entry = {'kind': 'str', 'count': len(self.codes), 'strings': len(self.strings)}
+        return entry, [self.codes.tobytes(), table.tobytes(), bytes(data)]
+
+
+class RecordSequence(Sequence):
+    """
+    Read-only records of one collection inside a mapped snapshot.
+
+    Records are decoded on access; ``raw()`` returns the undecoded JSON as a
+    zero-copy ``memoryview`` into the mapping.
+    """
+
+    def __init__(
+        self,
+        buffer: memoryview,
+        offsets_at: int,
+        count: int,
+        data_at: int,
+        columns: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        self._buffer = buffer
+        # Native-order cast; snapshots are only shared between processes on one host
+        self._offsets = buffer[offsets_at:offsets_at + (count + 1) * _OFFSET.size].cast('Q')
+        self._data_at = data_at
+        self._count = count
+        self._columns = columns or {}
+        self._decoded: Dict[str, np.ndarray] = {}
+
+    def columns(self) -> List[str]:
+        """Fields published as typed columns."""
+        return list(self._columns)
+
+    def codes(self, name: str) -> Tuple[np.ndarray, List[str]]:
+        """
+        Dictionary-encoded string column without decoding any record.
+
+        Returns:
+            (int32 codes into the table, -1 where missing; distinct strings)
+        """
+        entry = self._column_entry(name)
+        if entry['kind'] != 'str':
+            raise ValueError(f"Column {name!r} is numeric; use column()")
+        codes = np.frombuffer(self._buffer, dtype=np.int32, count=entry['count'], offset=entry['at'])
+        table = np.frombuffer(self._buffer, dtype=np.uint64, count=entry['strings'] + 1, offset=entry['table'])
+        data = bytes(self._buffer[entry['data']:entry['data'] + int(table[-1])])
+        strings = [data[table[i]:table[i + 1]].decode('utf-8') for i in range(entry['strings'])]
+        return codes, strings
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        One field of every record as an array, read straight from the mapping.
+
+        Numeric columns are zero-copy read-only float64 views (NaN where
+        missing); string columns are object arrays built from the string
+        table (None where missing), decoded once per view.
+        """
+        entry = self._column_entry(name)
+        if entry['kind'] == 'f8':
+            return np.frombuffer(self._buffer, dtype=np.float64, count=entry['count'], offset=entry['at'])
+        decoded = self._decoded.get(name)
+        if decoded is None:
+            codes, strings = self.codes(name)
+            table = np.array(strings + [None], dtype=object)
+            decoded = self._decoded[name] = table[codes]
+        return decoded
+
+    def _column_entry(self, name: str) -> Dict[str, Any]:
+        entry = self._columns.get(name)
+        if entry is None:
+            raise KeyError(f"Column {name!r} was not published (available: {sorted(self._columns)})")
+        return entry
+
+    def __len__(self) -> int:
+        return self._count
+
+    def raw(self, index: int) -> memoryview:
+        """Undecoded JSON bytes of a record."""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        start = self._data_at + self._offsets[index]
+        return self._buffer[start:self._data_at + self._offsets[index + 1]]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        raw = self.raw(index)
+        # The stdlib decoder does not accept memoryviews
+        return loads(bytes(raw) if get_backend() == 'json' else raw)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(self._count):
+            yield self[index]
+
+
+class SnapshotView:
+    """A read-only mapping of one snapshot generation."""
+
+    def __init__(self, path: Path):
+        """
+        Map a snapshot file.
+
+        Args:
+            path: Snapshot file written by ``SnapshotBroker.publish()``
+        """
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        magic, header_length = _PREAMBLE.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a snapshot file: {self.path}")
+        start = _PREAMBLE.size
+        header = json.loads(bytes(self._buffer[start:start + header_length]))
+        self.generation: int = header['generation']
+        self.created: float = header['created']
+        self._collections = header['collections']
+        self._sequences: Dict[str, RecordSequence] = {}
+
+    def collections(self) -> List[str]:
+        """Collection names in this snapshot."""
+        return list(self._collections)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._collections
+
+    def __getitem__(self, name: str) -> RecordSequence:
+        sequence = self._sequences.get(name)
+        if sequence is None:
+            entry = self._collections[name]
+            sequence = self._sequences[name] = RecordSequence(
+                self._buffer, entry['offsets'], entry['count'], entry['data'], entry.get('columns'),
+            )
+        return sequence
+
+    def close(self) -> None:
+        """Unmap the file. Sequences obtained from this view become unusable."""
+        for sequence in self._sequences.values():
+            sequence._offsets.release()
+        self._sequences.clear()
+        self._buffer.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # raw() views still held elsewhere keep the mapping alive until released
+            pass
+
+    def __enter__(self) -> "SnapshotView":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SnapshotBroker:
+    """
+    Hand collection snapshots from one collector to many local consumers.
+
+    The collector calls ``publish()``, which writes every record as JSON
+    into one flat file (header, then per collection a uint64 offset table
+    and the record bytes) and atomically points ``CURRENT`` at it. Fields
+    named in ``columns`` are also written as typed columns (float64, or
+    int32 codes into a string table), which consumers read as NumPy arrays
+    straight from the mapping without parsing any record JSON. Consumers
+    ``open()`` the current generation as an mmap, so all of them share the
+    same page-cache pages, and ``wait()`` for the next generation instead of
+    calling the controller themselves. Old generations are deleted once
+    more than ``keep`` exist; on POSIX, consumers still mapping them keep
+    reading safely.
+    """
+
+    def __init__(self, root: Path, keep: int = 3, poll_interval: float = 0.1):
+        """
+        Initialize snapshot broker.
+
+        Args:
+            root: Directory shared by the collector and consumers
+            keep: Generations kept on disk
+            poll_interval: Seconds between checks in ``wait()``
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+        self.poll_interval = poll_interval
+
+    def _path(self, generation: int) -> Path:
+        return self.root / f"gen-{generation:012d}.snap"
+
+    # ------------------------------------------------------------------
+    # Collector side
+    # ------------------------------------------------------------------
+
+    def publish(
+        self,
+        collections: Dict[str, Iterable[Dict[str, Any]]],
+        columns: Optional[Dict[str, Iterable[str]]] = None,
+    ) -> int:
+        """
+        Write a new snapshot generation.
+
+        Args:
+            collections: Collection name to records
+            columns: Per collection, fields (dotted paths for nested keys)
+                to also publish as typed columns, e.g.
+                ``{"devices": ["mac", "state", "uptime", "sys_stats.cpu"]}``
+
+        Returns:
+            The new generation number
+        """
+        columns = columns or {}
+        generation = (self.generation() or 0) + 1
+        path = self._path(generation)
+        tmp = path.with_suffix('.tmp')
+        # Record bytes are spooled to unlinked temp files so only the offset
+        # tables (and requested columns) stay in memory, whatever the snapshot size
+        header: Dict[str, Any] = {'generation': generation, 'created': time.time(), 'collections': {}}
+        parts: List[Union[bytes, BinaryIO]] = []
+        position = 0
+
+        def place(part: Union[bytes, BinaryIO], size: int) -> int:
+            # Every part starts 8-byte aligned, relative to the end of the header
+            nonlocal position
+            at = position
+            parts.append(part)
+            position += size + _padding(size)
+            return at
+
+        for name, records in collections.items():
+            spool = tempfile.TemporaryFile(dir=self.root)
+            offsets = array('Q', [0])
+            builders = [_ColumnBuilder(field) for field in columns.get(name, ())]
+            for record in records:
+                data = _dumps(record)
+                spool.write(data)
+                offsets.append(offsets[-1] + len(data))
+                for builder in builders:
+                    builder.add(dig(record, builder.path) if isinstance(record, dict) else None)
+            entry: Dict[str, Any] = {'count': len(offsets) - 1}
+            entry['offsets'] = place(offsets.tobytes(), len(offsets) * _OFFSET.size)
+            entry['data'] = place(spool, offsets[-1])
+            if builders:
+                entry['columns'] = {}
+                for builder in builders:
+                    column, column_parts = builder.parts()
+                    for key, part in zip(('at', 'table', 'data'), column_parts, strict=False):
+                        column[key] = place(part, len(part))
+                    entry['columns'][builder.path] = column
+            header['collections'][name] = entry
+
+        # Positions are relative until the header size is known; pad the
+        # header so its length cannot change once they are made absolute
+        reserve = len(_dumps(header)) + 32 * (len(parts) + 1) + 64
+        base = _PREAMBLE.size + reserve
+        base += _padding(base)
+        for entry in header['collections'].values():
+            entry['offsets'] += base
+            entry['data'] += base
+            for column in entry.get('columns', {}).values():
+                for key in ('at', 'table', 'data'):
+                    if key in column:
+                        column[key] += base
+        header_bytes = _dumps(header).ljust(base - _PREAMBLE.size)
+
+        with open(tmp, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, base - _PREAMBLE.size))
+            f.write(header_bytes)
+            for part in parts:
+                if isinstance(part, bytes):
+                    f.write(part)
+                    size = len(part)
+                else:
+                    size = part.tell()
+                    part.seek(0)
+                    shutil.copyfileobj(part, f, 1024 * 1024)
+                    part.close()
+                f.write(b'\0' * _padding(size))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        pointer = self.root / f"{CURRENT}.tmp"
+        pointer.write_text(str(generation))
+        os.replace(pointer, self.root / CURRENT)
+        self._prune(generation)
+        return generation
+
+    def _prune(self, generation: int) -> None:
+        for path in self.root.glob('gen-*.snap'):
+            if int(path.stem[4:]) <= generation - self.keep:
+                path.unlink()
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+
+    def generation(self) -> Optional[int]:
+        """Current generation number, or None before the first publish."""
+        try:
+            return int((self.root / CURRENT).read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def open(self, generation: Optional[int] = None) -> SnapshotView:
+        """
+        Map a generation read-only (default: the current one).
+
+        Raises:
+            FileNotFoundError: If nothing was published or the generation was pruned
+        """
+        generation = generation if generation is not None else self.generation()
+        if generation is None:
+            raise FileNotFoundError(f"No snapshot published in {self.root}")
+        return SnapshotView(self._path(generation))
+
+    def wait(self, after: Optional[int] = None, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Block until a generation newer than ``after`` is published.
+
+        Args:
+            after: Last generation the consumer has seen (None: any generation)
+            timeout: Maximum seconds to wait (default: forever)
+
+        Returns:
+            The new generation, or None on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.generation()
+            if current is not None and (after is None or current > after):
+                return current
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def subscribe(self, timeout: Optional[float] = None) -> Iterator[SnapshotView]:
+        """
+        Yield a view of every new generation as it is published.
+
+        Each view is closed when the consumer asks for the next one. Stops
+        when no generation arrives within ``timeout``.
+        """
+        seen = None
+        while True:
+            generation = self.wait(seen, timeout)
+            if generation is None:
+                return
+            seen = generation
+            try:
+                view = self.open(generation)
+            except FileNotFoundError:
+                # Pruned between wait() and open(): skip to the next one
+                continue
+            try:
+                yield view
+            finally:
+                view.close()
@@ -0,0 +1,260 @@
+"""Record and replay HTTP exchanges for offline pipeline runs."""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, List, Any, Deque, Iterator, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# Response headers not worth replaying (bodies are stored decoded)
+_DROPPED_HEADERS = frozenset({'content-encoding', 'content-length', 'transfer-encoding', 'set-cookie'})
+
+# Response body fields holding secrets; UniFi prefixes stored secrets with
+# ``x_`` (``x_passphrase``, ``x_ipsec_pre_shared_key``, ``x_wireguard_private_key``)
+_SECRET_MARKERS = ('passphrase', 'password', 'pre_shared_key', 'psk', 'secret', 'private_key', 'token')
+REDACTED = '[redacted]'
+
+
+def _is_secret(key: str) -> bool:
+    key = key.lower()
+    return key.startswith('x_') or any(marker in key for marker in _SECRET_MARKERS)
+
+
+def _redact(value: Any) -> Tuple[Any, bool]:
+    """Copy of a decoded JSON value with secret fields replaced, and whether any were."""
+    if isinstance(value, list):
+        items = [_redact(item) for item in value]
+        return [item for item, _ in items], any(changed for _, changed in items)
+    if not isinstance(value, dict):
+        return value, False
+    result, changed = {}, False
+    for key, item in value.items():
+        if _is_secret(key) and item not in (None, '') and not isinstance(item, (bool, int, float)):
+            result[key], changed = REDACTED, True
+        else:
+            result[key], nested = _redact(item)
+            changed = changed or nested
+    return result, changed
+
+
+def redact_body(content: bytes) -> bytes:
+    """JSON ``content`` with secret fields replaced by ``REDACTED``; other bodies unchanged."""
+    try:
+        decoded = json.loads(content)
+    except ValueError:
+        return content
+    redacted, changed = _redact(decoded)
+    return json.dumps(redacted, separators=(',', ':')).encode('utf-8') if changed else content
+
+
+def _match_key(request: requests.PreparedRequest) -> Tuple[str, str, str]:
+    """Method, URL with sorted query and body hash; credentials are never part of it."""
+    parts = urlsplit(request.url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+    body = request.body or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return request.method, url, hashlib.sha256(body).hexdigest()[:16]
+
+
+class Cassette:
+    """
+    Recorded HTTP exchanges stored as gzip-compressed JSON lines.
+
+    Each line holds the match key (method, normalised URL, request body
+    hash), the status, response headers, the decoded body (base64) and the
+    original latency. Request headers are never stored, so API keys and
+    tokens stay out of the file, and secret fields of JSON bodies (WLAN
+    passphrases, VPN pre-shared keys, passwords) are replaced by
+    ``REDACTED``.
+    """
+
+    def __init__(self, path: Path, load: bool = True):
+        """
+        Initialize cassette.
+
+        Args:
+            path: Cassette file (``.jsonl.gz``)
+            load: Read the file if it exists
+        """
+        self.path = Path(path)
+        self.interactions: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        if load and self.path.exists():
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                self.interactions = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def append(self, request: requests.PreparedRequest, response: requests.Response, elapsed: float) -> None:
+        """Record one exchange that took ``elapsed`` seconds."""
+        method, url, body = _match_key(request)
+        interaction = {
+            'method': method,
+            'url': url,
+            'body': body,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {
+                k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS
+            },
+            'content': base64.b64encode(redact_body(response.content)).decode('ascii'),
+            'elapsed': round(elapsed, 6),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def save(self) -> None:
+        """Write the cassette atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with self._lock:
+            with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+                for interaction in self.interactions:
+                    f.write(json.dumps(interaction, separators=(',', ':')) + '\n')
+        os.replace(tmp, self.path)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that performs real requests and records them."""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        # Session.send() sets response.elapsed only after the adapter returns
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # Read the body inside the timed window
+        _ = response.content
+        self.cassette.append(request, response, time.perf_counter() - started)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter that answers from a cassette without touching the network.
+
+    Requests are matched on method, URL (query order ignored) and body.
+    Repeated identical requests get the recorded responses in order; once
+    those run out the last one is served again.
+    """
+
+    def __init__(self, cassette: Cassette, latency: float = 0.0):
+        """
+        Initialize replay adapter.
+
+        Args:
+            cassette: Recorded exchanges
+            latency: Multiplier for recorded latencies (0 = full speed, 1 = original)
+        """
+        super().__init__()
+        self.latency = latency
+        self._queues: Dict[Tuple[str, str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._last: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'served': 0, 'missed': 0}
+        for interaction in cassette.interactions:
+            key = (interaction['method'], interaction['url'], interaction['body'])
+            self._queues[key].append(interaction)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        key = _match_key(request)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                interaction = self._last[key] = queue.popleft()
+            else:
+                interaction = self._last.get(key)
+            self.stats['served' if interaction else 'missed'] += 1
+        if interaction is None:
+            raise requests.ConnectionError(
+                f"No recorded response for {request.method} {request.url}", request=request
+            )
+        if self.latency:
+            time.sleep(interaction['elapsed'] * self.latency)
+        return self._build(request, interaction)
+
+    @staticmethod
+    def _build(request: requests.PreparedRequest, interaction: Dict[str, Any]) -> requests.Response:
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response.reason = interaction.get('reason')
+        response.headers = CaseInsensitiveDict(interaction['headers'])
+        content = base64.b64decode(interaction['content'])
+        response._content = content
+        # Streaming callers (iter_content, raw reads) get the same bytes
+        response._content_consumed = True
+        response.raw = io.BytesIO(content)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(seconds=interaction['elapsed'])
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+@contextmanager
+def cassette(
+    session: requests.Session,
+    path: Path,
+    mode: str = 'auto',
+    latency: float = 0.0,
+) -> Iterator[Cassette]:
+    """
+    Record or replay every request made through a session.
+
+    Mount on an API client's session, e.g.
+    ``with cassette(client.session, 'fixtures/site.jsonl.gz'): client.get_devices()``.
+
+    Args:
+        session: ``requests.Session`` of a ``SiteManagerClient``,
+            ``LocalControllerClient`` or ServiceNow client
+        path: Cassette file
+        mode: ``record`` (overwrite once the block completes; a failed
+            recording keeps the previous cassette), ``replay`` or ``auto``
+            (replay if the file exists, else record)
+        latency: Replay latency multiplier (0 = full speed, 1 = original)
+
+    Yields:
+        The cassette
+    """
+    if mode == 'auto':
+        mode = 'replay' if Path(path).exists() else 'record'
+    if mode not in ('record', 'replay'):
+        raise ValueError(f"Unknown cassette mode: {mode!r}")
+    if mode == 'replay' and not Path(path).exists():
+        raise FileNotFoundError(f"Cassette not found: {path}")
+
+    tape = Cassette(path, load=mode == 'replay')
+    adapter = RecordingAdapter(tape) if mode == 'record' else ReplayAdapter(tape, latency)
+    previous = dict(session.adapters)
+    for prefix in ('https://', 'http://'):
+        session.mount(prefix, adapter)
+    try:
+        yield tape
+    finally:
+        session.adapters.clear()
+        session.adapters.update(previous)
+    if mode == 'record':
+        # save() swaps the new file in atomically
+        tape.save()
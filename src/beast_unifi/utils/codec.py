@@ -0,0 +1,122 @@
+"""Response decoding: compressed transport and pluggable JSON backends."""
+
+import dataclasses
+import functools
+import json
+from typing import Dict, List, Optional, Any, Callable, Type
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    import orjson
+except ImportError:  # optional dependency: pip install beast-unifi[fast]
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional dependency: pip install beast-unifi[fast]
+    msgspec = None
+
+
+def accept_encoding() -> str:
+    """
+    Content codings this process can decode, for the ``Accept-Encoding`` header.
+
+    urllib3 decodes gzip and deflate natively, and brotli/zstd when the
+    ``brotli`` or ``zstandard`` packages are installed.
+    """
+    return ACCEPT_ENCODING
+
+
+_LOADERS: Dict[str, Callable[[bytes], Any]] = {'json': json.loads}
+if msgspec is not None:
+    _LOADERS['msgspec'] = msgspec.json.decode
+if orjson is not None:
+    _LOADERS['orjson'] = orjson.loads
+
+_PREFERENCE = ('orjson', 'msgspec', 'json')
+_backend = next(name for name in _PREFERENCE if name in _LOADERS)
+
+
+def available_backends() -> List[str]:
+    """JSON backends importable in this environment, fastest first."""
+    return [name for name in _PREFERENCE if name in _LOADERS]
+
+
+def get_backend() -> str:
+    """Name of the JSON backend currently used for decoding."""
+    return _backend
+
+
+def set_backend(name: str) -> None:
+    """
+    Select the JSON backend (``orjson``, ``msgspec`` or ``json``).
+
+    Raises:
+        ValueError: If the backend is not installed
+    """
+    global _backend
+    if name not in _LOADERS:
+        raise ValueError(
+            f"JSON backend {name!r} not available. Installed: {', '.join(available_backends())}"
+        )
+    _backend = name
+
+
+def loads(content: bytes) -> Any:
+    """Decode a JSON document with the selected backend."""
+    return _LOADERS[_backend](content)
+
+
+def response_json(response: Any) -> Any:
+    """
+    Decode a ``requests`` response body with the selected backend.
+
+    Falls back to ``response.json()`` when the body is not raw bytes
+    (for example, mocked responses).
+    """
+    content = getattr(response, 'content', None)
+    if isinstance(content, (bytes, bytearray)):
+        return loads(content)
+    return response.json()
+
+
+@functools.lru_cache(maxsize=64)
+def _envelope_type(item_type: Any) -> Any:
+    # Bounded: generated record types must not accumulate envelopes forever
+    return msgspec.defstruct(
+        'Envelope', [('data', List[item_type], msgspec.field(default_factory=list))]
+    )
+
+
+def _convert(item: Dict[str, Any], item_type: Type) -> Any:
+    """Build a typed record from a dict, ignoring fields the type does not declare."""
+    if dataclasses.is_dataclass(item_type):
+        names = {f.name for f in dataclasses.fields(item_type)}
+        return item_type(**{k: v for k, v in item.items() if k in names})
+    return item_type(**item)
+
+
+def decode_data(content: bytes, item_type: Optional[Type] = None) -> List[Any]:
+    """
+    Decode a UniFi ``{"data": [...]}`` envelope, optionally into typed records.
+
+    With msgspec installed and an ``item_type`` (a dataclass or
+    ``msgspec.Struct``), records are decoded straight into that type without
+    building intermediate dicts, and only declared fields are materialised.
+    Otherwise the body is decoded with the selected backend and converted.
+
+    Args:
+        content: Raw response body
+        item_type: Record type to decode into (default: plain dicts)
+
+    Returns:
+        List of records
+    """
+    if item_type is not None and msgspec is not None:
+        return msgspec.json.decode(content, type=_envelope_type(item_type)).data
+    data = loads(content)
+    records = data.get('data', []) if isinstance(data, dict) else data
+    if item_type is None:
+        return records
+    return [_convert(item, item_type) for item in records]
@@ -0,0 +1,202 @@
+"""Adaptive per-controller concurrency limiting."""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+
+class AdaptiveLimiter:
+    """
+    Limit in-flight requests to one controller and learn how many it can take.
+
+    The limit follows the Gradient2 rule of Netflix's concurrency-limits.
+    Two latency averages are kept: a short one (recent requests) and a long
+    one over roughly ``long_window`` requests, which serves as the no-load
+    baseline and absorbs ordinary jitter. Each completion proposes
+    ``limit * gradient + sqrt(limit)`` where ``gradient`` is
+    ``tolerance * long / short`` clamped to [0.5, 1]: while recent latency
+    stays within ``tolerance`` of the baseline the limit keeps growing,
+    when the controller slows under load it shrinks. Proposals are blended
+    into the limit with ``limit_smoothing``, so a single slow response
+    moves it only a little.
+
+    Errors and timeouts cut the limit by ``backoff``, at most once per
+    round trip: failures of requests started before the last cut were
+    already accounted for. A UDM that slows down under load settles at a
+    few requests, a UniFi OS server climbs towards ``max_limit``.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        long_window: int = 600,
+        limit_smoothing: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize adaptive limiter.
+
+        Args:
+            initial: Starting limit
+            min_limit: Lowest limit (never blocks everything)
+            max_limit: Highest limit
+            backoff: Factor applied to the limit on an error
+            tolerance: Short over long latency ratio still treated as healthy
+            smoothing: Weight of each new sample in the short latency average
+            long_window: Requests covered by the long (baseline) latency average
+            limit_smoothing: Weight of each proposed limit in the new limit
+            clock: Monotonic clock (injectable for tests)
+        """
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial <= max_limit")
+        if not 0 < backoff < 1:
+            raise ValueError("Backoff must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.long_smoothing = 2.0 / (long_window + 1)
+        self.limit_smoothing = limit_smoothing
+        self._clock = clock
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._latency: Optional[float] = None
+        self._last_decrease = float('-inf')
+        self._condition = threading.Condition()
+        self._counts = {'successes': 0, 'errors': 0, 'increases': 0, 'decreases': 0, 'waits': 0}
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight."""
+        return int(self._limit)
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        Block until a request slot is free.
+
+        Args:
+            timeout: Maximum seconds to wait (default: forever)
+
+        Returns:
+            Start time to pass to ``release()``
+
+        Raises:
+            TimeoutError: If no slot became free in time
+        """
+        with self._condition:
+            if self._in_flight >= self.limit:
+                self._counts['waits'] += 1
+                if not self._condition.wait_for(lambda: self._in_flight < self.limit, timeout):
+                    raise TimeoutError(f"No request slot within {timeout}s (limit {self.limit})")
+            self._in_flight += 1
+        return self._clock()
+
+    def release(self, started: float, success: bool = True) -> None:
+        """
+        Free a slot and feed the outcome back into the limit.
+
+        Args:
+            started: Value returned by ``acquire()``
+            success: False for errors, timeouts and overload responses
+        """
+        now = self._clock()
+        with self._condition:
+            self._in_flight -= 1
+            if success:
+                self._on_success(now - started)
+            else:
+                self._counts['errors'] += 1
+                if started >= self._last_decrease:
+                    self._last_decrease = now
+                    self._set_limit(self._limit * self.backoff)
+            self._condition.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        self._counts['successes'] += 1
+        if self._latency is None or self._baseline is None:
+            self._latency = self._baseline = latency
+        else:
+            self._latency += self.smoothing * (latency - self._latency)
+            self._baseline += self.long_smoothing * (latency - self._baseline)
+            if self._baseline > 2 * self._latency:
+                # Load dropped for good: let the baseline catch up faster
+                self._baseline *= 0.95
+        if self._latency <= 0:
+            gradient = 1.0
+        else:
+            gradient = max(0.5, min(1.0, self.tolerance * self._baseline / self._latency))
+        proposed = self._limit * gradient + self._limit ** 0.5
+        if self._in_flight + 1 < self._limit / 2:
+            # Only grow while the limit is actually being used
+            proposed = min(proposed, self._limit)
+        self._set_limit(self._limit + self.limit_smoothing * (proposed - self._limit))
+
+    def _set_limit(self, value: float) -> None:
+        value = min(float(self.max_limit), max(float(self.min_limit), value))
+        if int(value) > self.limit:
+            self._counts['increases'] += 1
+        elif int(value) < self.limit:
+            self._counts['decreases'] += 1
+        self._limit = value
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold a slot for the duration of a block; an exception counts as an error."""
+        started = self.acquire(timeout)
+        try:
+            yield
+        except BaseException:
+            self.release(started, success=False)
+            raise
+        self.release(started, success=True)
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Learned limit, in-flight count, latencies (seconds) and counters."""
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'in_flight': self._in_flight,
+                'latency': self._latency or 0.0,
+                'baseline_latency': self._baseline or 0.0,
+                **self._counts,
+            }
+
+
+_controller_limiters: Dict[str, AdaptiveLimiter] = {}
+_controller_lock = threading.Lock()
+
+
+def controller_limiter(base_url: str, **kwargs) -> AdaptiveLimiter:
+    """
+    Shared limiter for a controller, keyed by host and port.
+
+    Clients for different sites on the same controller share one limiter,
+    since they load the same hardware.
+
+    Args:
+        base_url: Controller URL (e.g. ``https://192.168.1.1:443``)
+        **kwargs: ``AdaptiveLimiter`` options, used when the limiter is created
+    """
+    key = urlsplit(base_url).netloc or base_url
+    with _controller_lock:
+        limiter = _controller_limiters.get(key)
+        if limiter is None:
+            limiter = _controller_limiters[key] = AdaptiveLimiter(**kwargs)
+        return limiter
+
+
+def controller_metrics() -> Dict[str, Dict[str, float]]:
+    """``stats`` of every shared controller limiter, keyed by controller host."""
+    with _controller_lock:
+        limiters = dict(_controller_limiters)
+    return {key: limiter.stats for key, limiter in limiters.items()}
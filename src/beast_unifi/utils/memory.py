@@ -0,0 +1,342 @@
+"""Memory-bounded collection: streaming JSON parsing and spill-to-disk buffers."""
+
+import codecs
+import json
+import os
+import tempfile
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import List, Optional, Any, Iterable, Iterator, Union
+
+
+# Python objects take several times their JSON size in memory
+DEFAULT_OVERHEAD = 4.0
+_NUMBER_CHARS = '0123456789.eE+-'
+# Values a chunk boundary can cut so that the start alone fails to decode
+_LITERALS = ('true', 'false', 'null', 'NaN', 'Infinity', '-Infinity')
+# Content-Encoding values that leave the body size unchanged
+_IDENTITY = ('', 'identity')
+_READ_SIZE = 1024 * 1024
+
+
+def _incomplete(error: json.JSONDecodeError, buffer: str) -> bool:
+    """Whether a decode error can still mean the value continues in the next chunk."""
+    rest = buffer[error.pos:]
+    if error.msg.startswith('Unterminated string'):
+        return True
+    if error.msg.startswith('Invalid \\uXXXX escape'):
+        return len(rest) < 6
+    return not rest.strip() or any(literal.startswith(rest) for literal in _LITERALS)
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str = 'data') -> Iterator[Any]:
+    """
+    Yield the items of ``document[key]`` from a JSON object read in chunks.
+
+    Only the current item and one unread chunk are held in memory, so a
+    200 MB ``rest/sta`` response can be processed in a few MB. Other
+    top-level values (e.g. ``meta``) are parsed and skipped. A top-level
+    array is streamed directly.
+
+    Args:
+        chunks: Raw response body chunks (e.g. ``response.iter_content(65536)``)
+        key: Top-level key holding the array
+
+    Raises:
+        ValueError: If the document is malformed or ``key`` is not an array
+    """
+    reader = _Reader(chunks)
+    first = reader.next_char()
+    if first == '[':
+        yield from reader.array_items()
+        return
+    if first != '{':
+        raise ValueError("Expected a JSON object or array")
+    while True:
+        token = reader.next_char()
+        if token == '}':
+            return
+        if token == ',':
+            continue
+        reader.pos -= 1
+        name = reader.value()
+        if reader.next_char() != ':':
+            raise ValueError("Expected ':' after object key")
+        if name == key:
+            if reader.next_char() != '[':
+                raise ValueError(f"{key!r} is not an array")
+            yield from reader.array_items()
+        else:
+            reader.value()
+
+
+class _Reader:
+    """Incremental JSON tokenizer over a chunk iterator."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._decoder = json.JSONDecoder()
+        self._exhausted = False
+        self.buffer = ''
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        for chunk in self._chunks:
+            if chunk:
+                # Drop consumed text so the buffer stays about one item long
+                self.buffer = self.buffer[self.pos:] + self._utf8.decode(chunk)
+                self.pos = 0
+                return True
+        if not self._exhausted:
+            self._exhausted = True
+            tail = self._utf8.decode(b'', final=True)
+            if tail:
+                self.buffer = self.buffer[self.pos:] + tail
+                self.pos = 0
+                return True
+        return False
+
+    def next_char(self) -> str:
+        """Next non-whitespace character (consumed)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                self.pos += 1
+                return self.buffer[self.pos - 1]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        self.next_char()
+        self.pos -= 1
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Only read on when more input could make the value valid
+                if not _incomplete(e, self.buffer):
+                    raise ValueError(f"Malformed JSON document: {e.msg}") from None
+                if not self._fill():
+                    raise ValueError("Truncated JSON document") from None
+                continue
+            # A number cut by a chunk boundary ("-1." / "2e") decodes short;
+            # only trust it once a delimiter follows
+            if (
+                isinstance(value, (int, float))
+                and (end == len(self.buffer) or self.buffer[end] in _NUMBER_CHARS)
+                and self._fill()
+            ):
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self) -> Iterator[Any]:
+        """Yield items of an array whose ``[`` was just consumed."""
+        if self.next_char() == ']':
+            return
+        self.pos -= 1
+        while True:
+            yield self.value()
+            token = self.next_char()
+            if token == ']':
+                return
+            if token != ',':
+                raise ValueError("Expected ',' or ']' in array")
+
+
+class SpillList(Sequence):
+    """
+    Append-only record sequence that moves to a temporary file when it grows.
+
+    Records stay in memory until their estimated size passes ``limit``
+    bytes; then everything is written to a JSON-lines file in ``directory``
+    and later records go straight to disk, with each line's offset kept so
+    ``records[i]`` and slices read back only what they return. Iteration
+    reads records back one at a time, so peak memory stays near ``limit``
+    whatever the count.
+    """
+
+    def __init__(self, limit: int, directory: Optional[Path] = None, overhead: float = DEFAULT_OVERHEAD):
+        """
+        Initialize spill list.
+
+        Args:
+            limit: In-memory budget in bytes before spilling
+            directory: Where to create the spill file (default: system temp dir)
+            overhead: Estimated in-memory size per JSON byte
+        """
+        self.limit = limit
+        self.directory = directory
+        self.overhead = overhead
+        self._records: List[Any] = []
+        self._estimate = 0.0
+        self._file: Optional[Any] = None
+        # Start of each spilled line, plus the end of the last one
+        self._offsets = array('Q', [0])
+        self._count = 0
+
+    @property
+    def spilled(self) -> bool:
+        """Whether records are on disk."""
+        return self._file is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('SpillList index out of range')
+        if self._file is None:
+            return self._records[index]
+        self._file.flush()
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return json.loads(os.pread(self._file.fileno(), end - start, start))
+
+    @staticmethod
+    def _line(record: Any) -> bytes:
+        return json.dumps(record, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+
+    def _write(self, record: Any) -> None:
+        line = self._line(record)
+        self._file.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))
+
+    def append(self, record: Any) -> None:
+        """Add one record."""
+        self._count += 1
+        if self._file is not None:
+            self._write(record)
+            return
+        self._records.append(record)
+        self._estimate += (len(self._line(record)) - 1) * self.overhead
+        if self._estimate > self.limit:
+            self._spill()
+
+    def extend(self, records: Iterable[Any]) -> None:
+        """Add many records."""
+        for record in records:
+            self.append(record)
+
+    def _spill(self) -> None:
+        fd, path = tempfile.mkstemp(prefix='beast-unifi-', suffix='.jsonl', dir=self.directory)
+        # Unlink right away: the file lives only as long as this object
+        self._file = os.fdopen(fd, 'w+b')
+        os.unlink(path)
+        for record in self._records:
+            self._write(record)
+        self._records = []
+        self._estimate = 0.0
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._file is None:
+            yield from list(self._records)
+            return
+        self._file.flush()
+        # Positional reads leave the append position alone
+        fd, position, end, pending = self._file.fileno(), 0, self._offsets[-1], b''
+        while position < end:
+            block = os.pread(fd, min(_READ_SIZE, end - position), position)
+            position += len(block)
+            lines = (pending + block).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                yield json.loads(line)
+
+    def close(self) -> None:
+        """Release the spill file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._records = []
+        self._offsets = array('Q', [0])
+        self._count = 0
+
+    def __enter__(self) -> "SpillList":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class MemoryBudget:
+    """
+    Memory budget for a collection run.
+
+    Responses whose ``Content-Length`` (or estimated record size) exceeds
+    ``stream_threshold`` are parsed incrementally instead of being loaded
+    whole, and collected records spill to disk once they exceed ``limit``.
+    Compressed responses are always streamed: their ``Content-Length`` is
+    the wire size, and JSON listings routinely compress 10x or more.
+    """
+
+    def __init__(
+        self,
+        limit: int = 256 * 1024 * 1024,
+        stream_threshold: Optional[int] = None,
+        spill_directory: Optional[Path] = None,
+        overhead: float = DEFAULT_OVERHEAD,
+    ):
+        """
+        Initialize memory budget.
+
+        Args:
+            limit: Bytes of records kept in memory before spilling to disk
+            stream_threshold: Response size in bytes above which bodies are
+                streamed (default: ``limit / overhead``)
+            spill_directory: Directory for spill files (default: system temp dir)
+            overhead: Estimated in-memory size per JSON byte
+        """
+        if limit <= 0:
+            raise ValueError("Memory limit must be positive")
+        self.limit = limit
+        self.overhead = overhead
+        self.stream_threshold = stream_threshold if stream_threshold is not None else int(limit / overhead)
+        self.spill_directory = spill_directory
+
+    @classmethod
+    def from_env(cls, variable: str = 'BEAST_UNIFI_MEMORY_LIMIT_MB') -> Optional["MemoryBudget"]:
+        """Budget from a megabyte value in the environment, or None when unset."""
+        value = os.getenv(variable)
+        return cls(limit=int(float(value) * 1024 * 1024)) if value else None
+
+    def should_stream(
+        self,
+        content_length: Optional[Union[int, str]],
+        content_encoding: Optional[str] = None,
+    ) -> bool:
+        """
+        Whether a response should be streamed.
+
+        Args:
+            content_length: ``Content-Length`` header (unknown sizes stream)
+            content_encoding: ``Content-Encoding`` header; any compression
+                streams, since the decoded size is unknown
+        """
+        if (content_encoding or '').strip().lower() not in _IDENTITY:
+            return True
+        if content_length in (None, ''):
+            return True
+        return int(content_length) > self.stream_threshold
+
+    def collect(self, records: Iterable[Any]) -> Union[List[Any], SpillList]:
+        """
+        Materialise records within the budget.
+
+        Returns:
+            A plain list if everything fitted, else a ``SpillList`` backed by disk
+        """
+        buffer = SpillList(self.limit, self.spill_directory, self.overhead)
+        buffer.extend(records)
+        if not buffer.spilled:
+            records = list(buffer)
+            buffer.close()
+            return records
+        return buffer
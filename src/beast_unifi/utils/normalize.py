@@ -0,0 +1,54 @@
+"""Normalisation helpers for identifiers and records shared across UniFi sources."""
+
+import re
+from typing import Any, Dict, Optional
+
+
+# Six colon- or dash-separated pairs, three dot-separated quads, or bare hex
+_MAC = re.compile(
+    r'^(?:[0-9a-f]{2}([:-])(?:[0-9a-f]{2}\1){4}[0-9a-f]{2}'
+    r'|[0-9a-f]{4}\.[0-9a-f]{4}\.[0-9a-f]{4}'
+    r'|[0-9a-f]{12})$'
+)
+_SEPARATORS = str.maketrans('', '', ':-.')
+
+# Leading dotted version (``4.0.21``, ``v6.6.77.15402``): major, minor, patch, build
+VERSION_PATTERN = re.compile(r'^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:\.(\d+))?')
+
+
+def normalize_mac(value: Any) -> Optional[str]:
+    """
+    Normalise a MAC address to lowercase colon-separated form.
+    
+    Accepts the formats seen across UniFi APIs (``AA:BB:CC:DD:EE:FF``,
+    ``aa-bb-cc-dd-ee-ff``, ``aabbccddeeff``, ``aabb.ccdd.eeff``); anything
+    else, including mixed separators or other characters, is rejected.
+    
+    Args:
+        value: Raw MAC address value
+        
+    Returns:
+        Normalised MAC (e.g. ``aa:bb:cc:dd:ee:ff``) or None if not a MAC
+    """
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    if not _MAC.match(value):
+        return None
+    digits = value.translate(_SEPARATORS)
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def dig(record: Dict[str, Any], path: str) -> Any:
+    """
+    Value at a dotted path (``"reportedState.firmware.version"``).
+
+    Returns:
+        The value, or None if any step is missing or not an object
+    """
+    value: Any = record
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
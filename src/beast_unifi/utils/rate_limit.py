@@ -0,0 +1,61 @@
+"""Thread-safe token bucket rate limiting."""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RateLimiter:
+    """Token bucket limiter shared by all threads using one API account."""
+    
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialize rate limiter.
+        
+        Args:
+            rate: Sustained requests per second
+            burst: Maximum requests allowed back to back (default: max(1, rate))
+            clock: Monotonic clock (injectable for tests)
+            sleep: Sleep function (injectable for tests)
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def per_minute(cls, requests: int, burst: Optional[int] = None) -> "RateLimiter":
+        """Create a limiter from a requests-per-minute quota."""
+        return cls(requests / 60.0, burst=burst)
+    
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Block until a request may be made.
+        
+        Args:
+            tokens: Tokens to take (e.g. bytes, when ``rate`` is a bandwidth)
+        
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now; callers queue behind each other
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._sleep(wait)
+        return wait
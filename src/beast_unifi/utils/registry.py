@@ -0,0 +1,426 @@
+"""Incremental schema versioning of API payloads by key-shape signature."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterable, Iterator, Set, Tuple
+
+from beast_unifi.utils.schema import BOOLEAN, INTEGER, REAL, TEXT, join_types, value_type
+
+# Lists and empty objects: kept out of SQL columns, as in ``to_sql()``
+NESTED = 'NESTED'
+
+# Shapes remembered per table for the in-process fast path
+MAX_SEEN_SHAPES = 4096
+
+# Column types to pandas dtypes written to Parquet (nullable extension types)
+PANDAS_TYPES = {INTEGER: 'Int64', REAL: 'float64', BOOLEAN: 'boolean', TEXT: 'string'}
+
+
+def shape(record: Dict[str, Any]) -> Tuple:
+    """
+    Key-shape of a record: its keys and value types, nested objects recursed.
+
+    Null values are left out, so a key that is sometimes null does not
+    multiply shapes. The result is hashable and cheap to build, which makes
+    it the fast-path signature for records seen before.
+    """
+    items = []
+    for key, value in record.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            items.append((key, shape(value) if value else NESTED))
+        elif isinstance(value, list):
+            items.append((key, NESTED))
+        else:
+            items.append((key, value_type(value)))
+    return tuple(items)
+
+
+def flatten_shape(record_shape: Tuple, parent: str = '') -> Dict[str, str]:
+    """Dotted column name to type for a shape (as ``flatten_record`` names them)."""
+    columns: Dict[str, str] = {}
+    for key, kind in record_shape:
+        name = f"{parent}.{key}" if parent else str(key)
+        if isinstance(kind, tuple):
+            columns.update(flatten_shape(kind, name))
+        else:
+            columns[name] = kind
+    return columns
+
+
+def signature(columns: Dict[str, str]) -> str:
+    """Stable digest of a flattened shape (independent of key order and process)."""
+    text = json.dumps(sorted(columns.items()), separators=(',', ':'))
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def table_name(endpoint: str) -> str:
+    """Registry table for an API endpoint (``"rest/sta"`` -> ``"rest_sta"``)."""
+    return endpoint.strip('/').replace('/', '_').replace('-', '_')
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SchemaVersion:
+    """Columns of one table version and what changed from the previous one."""
+
+    __slots__ = ('table', 'version', 'created', 'columns', 'added', 'widened')
+
+    def __init__(
+        self,
+        table: str,
+        version: int,
+        columns: Dict[str, str],
+        added: Optional[Dict[str, str]] = None,
+        widened: Optional[Dict[str, List[str]]] = None,
+        created: Optional[float] = None,
+    ):
+        self.table = table
+        self.version = version
+        self.created = created if created is not None else time.time()
+        self.columns = columns
+        self.added = added or {}
+        # column -> [old type, new type]
+        self.widened = widened or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'created': self.created,
+            'columns': self.columns,
+            'added': self.added,
+            'widened': self.widened,
+        }
+
+    @classmethod
+    def from_dict(cls, table: str, data: Dict[str, Any]) -> "SchemaVersion":
+        return cls(table, data['version'], data['columns'], data['added'], data['widened'], data['created'])
+
+    def __repr__(self) -> str:
+        return (
+            f"SchemaVersion({self.table!r}, v{self.version}, {len(self.columns)} columns, "
+            f"+{len(self.added)}, ~{len(self.widened)})"
+        )
+
+
+class SchemaRegistry:
+    """
+    Versioned table schemas maintained while records are collected.
+
+    Each record is reduced to its key-shape (``shape()``); shapes already
+    seen in this process cost one hash lookup. A new shape is flattened and
+    merged into the table's columns with ``join_types``. Only when that adds
+    a column or widens a type (e.g. INTEGER to REAL) is a new version
+    recorded, so firmware that adds ``reportedState.features.*`` keys yields
+    a version and a migration without re-reading earlier data. Keys that
+    disappear leave their column in place (nullable).
+
+    Versions and the stable digests of known shapes are kept in a JSON file
+    when ``path`` is given.
+    """
+
+    def __init__(self, path: Optional[Path] = None, max_seen: int = MAX_SEEN_SHAPES):
+        """
+        Initialize schema registry.
+
+        Args:
+            path: JSON file to load from and save to (default: in memory only)
+            max_seen: Shapes per table kept for the fast path; the least
+                recently seen are dropped and fall back to the digest check
+        """
+        self.path = Path(path) if path is not None else None
+        self.max_seen = max_seen
+        self._versions: Dict[str, List[SchemaVersion]] = {}
+        self._digests: Dict[str, Set[str]] = {}
+        # In-process fast path, keyed by the shape tuple itself (LRU per table)
+        self._seen: Dict[str, OrderedDict[Tuple, None]] = {}
+        self.stats = {'records': 0, 'new_shapes': 0, 'versions': 0}
+        if self.path is not None and self.path.exists():
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            for table, entry in data.get('tables', {}).items():
+                self._versions[table] = [SchemaVersion.from_dict(table, v) for v in entry['versions']]
+                self._digests[table] = set(entry['signatures'])
+
+    # ------------------------------------------------------------------
+    # Observation
+    # ------------------------------------------------------------------
+
+    def observe(self, table: str, record: Dict[str, Any]) -> Optional[SchemaVersion]:
+        """
+        Fingerprint one record.
+
+        Returns:
+            The new version if this record changed the table's schema, else None
+        """
+        changed, version = self._observe(table, record)
+        if changed and self.path is not None:
+            self.save()
+        return version
+
+    def observe_many(self, table: str, records: Iterable[Dict[str, Any]]) -> List[SchemaVersion]:
+        """
+        Fingerprint many records, saving at most once.
+
+        Returns:
+            Versions created, oldest first
+        """
+        created: List[SchemaVersion] = []
+        changed = False
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            new_shape, version = self._observe(table, record)
+            changed = changed or new_shape
+            if version is not None:
+                created.append(version)
+        if changed and self.path is not None:
+            self.save()
+        return created
+
+    def track(self, table: str, records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Pass records through unchanged, fingerprinting each (for streamed listings)."""
+        changed = False
+        try:
+            for record in records:
+                if isinstance(record, dict):
+                    changed = self._observe(table, record)[0] or changed
+                yield record
+        finally:
+            if changed and self.path is not None:
+                self.save()
+
+    def _observe(self, table: str, record: Dict[str, Any]) -> Tuple[bool, Optional[SchemaVersion]]:
+        """Whether the record's shape is new, and the version it created."""
+        self.stats['records'] += 1
+        record_shape = shape(record)
+        seen = self._seen.setdefault(table, OrderedDict())
+        if record_shape in seen:
+            seen.move_to_end(record_shape)
+            return False, None
+        seen[record_shape] = None
+        if len(seen) > self.max_seen:
+            seen.popitem(last=False)
+        columns = {
+            name: kind for name, kind in flatten_shape(record_shape).items() if kind != NESTED
+        }
+        digest = signature(columns)
+        digests = self._digests.setdefault(table, set())
+        if digest in digests:
+            return False, None
+        digests.add(digest)
+        self.stats['new_shapes'] += 1
+        return True, self._merge(table, columns)
+
+    def _merge(self, table: str, columns: Dict[str, str]) -> Optional[SchemaVersion]:
+        current = self.current(table)
+        known = dict(current.columns) if current is not None else {}
+        added: Dict[str, str] = {}
+        widened: Dict[str, List[str]] = {}
+        for name, kind in columns.items():
+            old = known.get(name)
+            if old is None:
+                added[name] = known[name] = kind
+                continue
+            new = join_types(old, kind)
+            if new != old:
+                widened[name] = [old, new]
+                known[name] = new
+        if not added and not widened:
+            return None
+        version = SchemaVersion(
+            table, current.version + 1 if current is not None else 1, known, added, widened,
+        )
+        self._versions.setdefault(table, []).append(version)
+        self.stats['versions'] += 1
+        return version
+
+    def save(self) -> None:
+        """Write versions and known signatures atomically."""
+        if self.path is None:
+            raise ValueError("Registry has no path to save to")
+        data = {
+            'tables': {
+                table: {
+                    'versions': [v.to_dict() for v in versions],
+                    'signatures': sorted(self._digests.get(table, ())),
+                }
+                for table, versions in self._versions.items()
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(data, indent=1), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------
+    # Versions
+    # ------------------------------------------------------------------
+
+    def tables(self) -> List[str]:
+        """Tables with at least one version."""
+        return list(self._versions)
+
+    def versions(self, table: str) -> List[SchemaVersion]:
+        """All versions of a table, oldest first."""
+        return list(self._versions.get(table, []))
+
+    def current(self, table: str) -> Optional[SchemaVersion]:
+        """Latest version of a table, or None if no record was seen."""
+        versions = self._versions.get(table)
+        return versions[-1] if versions else None
+
+    def version(self, table: str, number: Optional[int] = None) -> SchemaVersion:
+        """
+        A specific version (default: the current one).
+
+        Raises:
+            ValueError: If the table or version is unknown
+        """
+        versions = self._versions.get(table)
+        if not versions:
+            raise ValueError(f"No schema recorded for table {table!r}")
+        if number is None:
+            return versions[-1]
+        if not 1 <= number <= len(versions):
+            raise ValueError(f"Table {table!r} has no version {number}")
+        return versions[number - 1]
+
+    def _changes(self, table: str, since: int, until: Optional[int]) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Columns added and retyped between two versions."""
+        target = self.version(table, until)
+        previous = self.version(table, since).columns if since else {}
+        added = {n: t for n, t in target.columns.items() if n not in previous}
+        retyped = {
+            n: t for n, t in target.columns.items() if n in previous and previous[n] != t
+        }
+        return added, retyped
+
+    # ------------------------------------------------------------------
+    # SQLite
+    # ------------------------------------------------------------------
+
+    def sqlite_migration(self, table: str, since: int = 0, until: Optional[int] = None) -> List[str]:
+        """
+        SQL statements taking a SQLite table from one version to another.
+
+        New columns use ``ALTER TABLE ... ADD COLUMN``. SQLite cannot change
+        a column's type, so a widened type rebuilds the table (create, copy,
+        drop, rename). Version 0 means the table does not exist yet.
+
+        Args:
+            table: Table name
+            since: Version the database is at (0: none)
+            until: Target version (default: current)
+
+        Returns:
+            Statements to run in order (empty if already up to date)
+        """
+        target = self.version(table, until)
+        if since >= target.version:
+            return []
+        name = _quote(table)
+        definitions = ", ".join(f"{_quote(c)} {t}" for c, t in target.columns.items())
+        if since == 0:
+            return [f"CREATE TABLE IF NOT EXISTS {name} ({definitions})"]
+        added, retyped = self._changes(table, since, target.version)
+        if not retyped:
+            return [f"ALTER TABLE {name} ADD COLUMN {_quote(c)} {t}" for c, t in added.items()]
+        kept = ", ".join(_quote(c) for c in self.version(table, since).columns)
+        rebuilt = _quote(f"{table}__v{target.version}")
+        return [
+            f"CREATE TABLE {rebuilt} ({definitions})",
+            f"INSERT INTO {rebuilt} ({kept}) SELECT {kept} FROM {name}",
+            f"DROP TABLE {name}",
+            f"ALTER TABLE {rebuilt} RENAME TO {name}",
+        ]
+
+    def migrate_sqlite(self, connection: sqlite3.Connection, table: str) -> int:
+        """
+        Bring a SQLite table up to the current version in one transaction.
+
+        The applied version per table is kept in ``schema_versions``.
+
+        Returns:
+            The version the table is now at
+        """
+        target = self.version(table)
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS schema_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            row = connection.execute(
+                "SELECT version FROM schema_versions WHERE name = ?", (table,)
+            ).fetchone()
+            applied = row[0] if row else 0
+            for statement in self.sqlite_migration(table, applied):
+                connection.execute(statement)
+            connection.execute(
+                "INSERT INTO schema_versions (name, version) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET version = excluded.version",
+                (table, max(applied, target.version)),
+            )
+        return max(applied, target.version)
+
+    # ------------------------------------------------------------------
+    # Parquet
+    # ------------------------------------------------------------------
+
+    def parquet_dtypes(self, table: str, version: Optional[int] = None) -> Dict[str, str]:
+        """pandas dtypes of a version's columns, in column order."""
+        return {name: PANDAS_TYPES[kind] for name, kind in self.version(table, version).columns.items()}
+
+    def parquet_migration(self, table: str, since: int = 0, until: Optional[int] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Column changes for Parquet files written at an older version.
+
+        Parquet files are immutable, so files keep their original schema;
+        apply this (or ``conform()``) to frames read from them.
+
+        Returns:
+            ``{"add": {column: dtype}, "cast": {column: dtype}}``
+        """
+        added, retyped = self._changes(table, since, until)
+        return {
+            'add': {n: PANDAS_TYPES[t] for n, t in added.items()},
+            'cast': {n: PANDAS_TYPES[t] for n, t in retyped.items()},
+        }
+
+    def conform(self, table: str, frame: Any, version: Optional[int] = None) -> Any:
+        """
+        Align a flattened DataFrame with a version before writing Parquet.
+
+        Missing columns are added as nulls, types are cast to the version's
+        dtypes and columns are ordered as in the version, so every file of a
+        table shares one schema. Extra columns are kept at the end.
+
+        Args:
+            table: Table name
+            frame: ``pandas.DataFrame`` with dotted column names
+                (``pandas.json_normalize`` output)
+            version: Target version (default: current)
+
+        Returns:
+            A new DataFrame
+        """
+        import pandas as pd
+
+        dtypes = self.parquet_dtypes(table, version)
+        frame = frame.copy()
+        for name, dtype in dtypes.items():
+            if name not in frame.columns:
+                frame[name] = pd.Series(pd.NA, index=frame.index, dtype=dtype)
+            elif dtype == 'string':
+                # Mixed columns (e.g. numbers that became strings) stringify first
+                frame[name] = frame[name].map(lambda v: v if v is None or pd.isna(v) else str(v)).astype(dtype)
+            else:
+                frame[name] = frame[name].astype(dtype)
+        extra = [c for c in frame.columns if c not in dtypes]
+        return frame[list(dtypes) + extra]
@@ -0,0 +1,526 @@
+"""Parallel JSON flattening and SQL schema inference."""
+
+import hashlib
+import json
+import os
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Deque, Iterable, Iterator, Set
+
+import numpy as np
+
+
+INTEGER = 'INTEGER'
+REAL = 'REAL'
+TEXT = 'TEXT'
+BOOLEAN = 'BOOLEAN'
+
+# Distinct key values tracked exactly per column before switching to digests
+MAX_EXACT_VALUES = 10000
+# Key values tracked at all (as 8-byte digests, 32 MiB); larger columns are no key
+MAX_KEY_VALUES = 1 << 22
+
+
+def flatten_record(record: Dict[str, Any], parent: str = '', sep: str = '.') -> Dict[str, Any]:
+    """
+    Flatten nested dictionaries into dotted column names.
+
+    Matches ``pandas.json_normalize``: dicts are expanded
+    (``reportedState.features.webrtc.iceRestart``), lists are kept as values.
+
+    Args:
+        record: JSON object
+        parent: Prefix for nested keys
+        sep: Separator between key levels
+
+    Returns:
+        Flat dictionary
+    """
+    flat: Dict[str, Any] = {}
+    for key, value in record.items():
+        name = f"{parent}{sep}{key}" if parent else str(key)
+        if isinstance(value, dict) and value:
+            flat.update(flatten_record(value, name, sep))
+        else:
+            flat[name] = value
+    return flat
+
+
+def value_type(value: Any) -> Optional[str]:
+    """SQL type of a scalar JSON value (None for null)."""
+    # bool is a subclass of int, so test it first
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return BOOLEAN
+    if isinstance(value, int):
+        return INTEGER
+    if isinstance(value, float):
+        return REAL
+    return TEXT
+
+
+def _digest(value: Any) -> int:
+    """64-bit digest of a key value; values equal in SQL (1, 1.0, True) share one."""
+    if isinstance(value, bool) or (isinstance(value, float) and value.is_integer()):
+        value = int(value)
+    # Stable across processes, unlike hash() of str
+    return int.from_bytes(hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def join_types(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    """Least upper bound of two column types (NULL < BOOLEAN/INTEGER < REAL < TEXT)."""
+    if a is None or a == b:
+        return b
+    if b is None:
+        return a
+    if {a, b} == {INTEGER, REAL}:
+        return REAL
+    return TEXT
+
+
+def _is_key_candidate(name: str) -> bool:
+    leaf = name.rsplit('.', 1)[-1]
+    return '.' not in name and (leaf.lower().endswith('id') or leaf.lower() == 'mac')
+
+
+class DistinctSketch:
+    """
+    HyperLogLog estimate of the number of distinct values.
+
+    ``2 ** precision`` one-byte registers (4 KiB by default) whatever the
+    input size, with a standard error of about ``1.04 / sqrt(2 ** precision)``
+    (1.6 %). Sketches built in different processes merge by register-wise
+    maximum, so partial schemas stay small.
+    """
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, value: Any) -> None:
+        self.add_digest(_digest(value))
+
+    def add_digest(self, h: int) -> None:
+        """Add a value by its ``_digest``."""
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "DistinctSketch") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return m * np.log(m / zeros)
+        return float(raw)
+
+
+class ColumnSchema:
+    """
+    Inferred type and nullability of one flattened column.
+
+    Primary key candidates are checked exactly: distinct values are kept
+    up to ``MAX_EXACT_VALUES``, then every value as an 8-byte digest up to
+    ``MAX_KEY_VALUES``, alongside a ``DistinctSketch``. The sketch only
+    rules a key out early (its estimate falling well short of the count);
+    uniqueness itself is confirmed on the digests.
+    """
+
+    __slots__ = ('name', 'sql_type', 'non_null', 'nested', 'values', 'digests', 'sketch', '_unique')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.sql_type: Optional[str] = None
+        self.non_null = 0
+        self.nested = False
+        # Distinct values, kept only for primary key candidates while unique
+        # and at most MAX_EXACT_VALUES of them; past that digests take over
+        self.values: Optional[Set[Any]] = set() if _is_key_candidate(name) else None
+        self.digests: Optional[array] = None
+        self.sketch: Optional[DistinctSketch] = None
+        self._unique: Optional[bool] = None
+
+    @property
+    def unique(self) -> bool:
+        """Whether every non-null value seen was distinct (checked exactly)."""
+        if self.digests is None:
+            return self.values is not None
+        if self._unique is None:
+            digests = np.frombuffer(self.digests, dtype=np.uint64)
+            # Distinct digests imply distinct values; a collision only loses a key
+            self._unique = len(np.unique(digests)) == len(digests)
+        return self._unique
+
+    def _tracked(self) -> bool:
+        return self.values is not None or self.digests is not None
+
+    def _to_digests(self) -> None:
+        self.digests = array('Q', (_digest(value) for value in self.values))
+        self.sketch = DistinctSketch()
+        for h in self.digests:
+            self.sketch.add_digest(h)
+        self.values = None
+
+    def _drop_key(self) -> None:
+        self.values = None
+        self.digests = None
+        self.sketch = None
+
+    def _check_digests(self, force: bool = False) -> None:
+        """Drop the key once it is too large to confirm or clearly repeats values."""
+        self._unique = None
+        count = len(self.digests)
+        if count > MAX_KEY_VALUES:
+            self._drop_key()
+        elif force or count & (count - 1) == 0:
+            # At powers of two: ten standard errors short means duplicates
+            slack = 10 * 1.04 / np.sqrt(len(self.sketch.registers))
+            if self.sketch.estimate() < count * (1 - slack):
+                self._drop_key()
+
+    def observe(self, value: Any) -> None:
+        if value is None:
+            return
+        self.non_null += 1
+        if isinstance(value, (list, dict)):
+            self.nested = True
+            self.sql_type = TEXT
+            self._drop_key()
+            return
+        self.sql_type = join_types(self.sql_type, value_type(value))
+        if self.digests is not None:
+            h = _digest(value)
+            self.digests.append(h)
+            self.sketch.add_digest(h)
+            self._check_digests()
+        elif self.values is not None:
+            if value in self.values:
+                self.values = None
+            else:
+                self.values.add(value)
+                if len(self.values) > MAX_EXACT_VALUES:
+                    self._to_digests()
+
+    def merge(self, other: "ColumnSchema") -> None:
+        self.sql_type = join_types(self.sql_type, other.sql_type)
+        self.non_null += other.non_null
+        self.nested = self.nested or other.nested
+        if not self._tracked() or not other._tracked():
+            self._drop_key()
+        elif self.values is not None and other.values is not None:
+            if not self.values.isdisjoint(other.values):
+                self.values = None
+            else:
+                self.values |= other.values
+                if len(self.values) > MAX_EXACT_VALUES:
+                    self._to_digests()
+        else:
+            if self.digests is None:
+                self._to_digests()
+            if other.digests is not None:
+                self.digests.extend(other.digests)
+                self.sketch.merge(other.sketch)
+            else:
+                for value in other.values:
+                    h = _digest(value)
+                    self.digests.append(h)
+                    self.sketch.add_digest(h)
+            self._check_digests(force=True)
+
+
+class TableSchema:
+    """Column schemas for one table, mergeable across chunks."""
+
+    def __init__(self, name: str):
+        """
+        Initialize empty table schema.
+
+        Args:
+            name: Table name (e.g. ``"hosts"``)
+        """
+        self.name = name
+        self.rows = 0
+        self.columns: Dict[str, ColumnSchema] = {}
+
+    def observe(self, record: Dict[str, Any]) -> None:
+        """Add one (unflattened) record to the schema."""
+        self.rows += 1
+        for name, value in flatten_record(record).items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = ColumnSchema(name)
+            column.observe(value)
+
+    def merge(self, other: "TableSchema") -> "TableSchema":
+        """Merge another partial schema of the same table into this one."""
+        # A column new to either side has been null in every row of the other
+        for name, column in other.columns.items():
+            mine = self.columns.get(name)
+            if mine is None:
+                self.columns[name] = column
+            else:
+                mine.merge(column)
+        self.rows += other.rows
+        return self
+
+    def nullable(self, name: str) -> bool:
+        """Whether a column was null or missing in any row."""
+        return self.columns[name].non_null < self.rows
+
+    @property
+    def primary_key(self) -> Optional[str]:
+        """First top-level ``*id``/``mac`` column that is unique and never null."""
+        for column in self.columns.values():
+            if column.unique and not self.nullable(column.name) and self.rows:
+                return column.name
+        return None
+
+    def scalar_columns(self) -> List[ColumnSchema]:
+        """Columns that map to SQL columns (nested lists are excluded)."""
+        return [c for c in self.columns.values() if not c.nested]
+
+
+def infer_chunk(records: Iterable[Dict[str, Any]], table: str) -> TableSchema:
+    """Infer a partial schema from one chunk of records (runs in a worker)."""
+    schema = TableSchema(table)
+    for record in records:
+        if isinstance(record, dict):
+            schema.observe(record)
+    return schema
+
+
+def _read_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Read records from a JSON document (list or ``{"data": [...]}``) or JSON lines."""
+    with open(path, encoding='utf-8') as f:
+        if path.suffix in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('data', [data])
+    yield from data
+
+
+def infer_file(path: str, table: str) -> TableSchema:
+    """Infer a partial schema from one JSON/JSON lines file (runs in a worker)."""
+    return infer_chunk(_read_records(Path(path)), table)
+
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _reduce(table: str, submit, jobs: Iterable[Any], workers: int) -> TableSchema:
+    """Run jobs with at most ``2 * workers`` in flight and merge results in order."""
+    result = TableSchema(table)
+    pending: Deque[Future] = deque()
+    for job in jobs:
+        pending.append(submit(job))
+        if len(pending) >= 2 * workers:
+            result.merge(pending.popleft().result())
+    while pending:
+        result.merge(pending.popleft().result())
+    return result
+
+
+def infer_schema(
+    records: Iterable[Dict[str, Any]],
+    table: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 10000,
+) -> TableSchema:
+    """
+    Infer a table schema, splitting records across a process pool.
+
+    Each worker flattens and types one chunk; the partial schemas are merged
+    with ``join_types`` so the result does not depend on chunking.
+
+    Args:
+        records: Records as returned by the API clients
+        table: Table name
+        workers: Worker processes (default: CPU count; 1 runs in-process)
+        chunk_size: Records per chunk
+
+    Returns:
+        Merged TableSchema
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return infer_chunk(list(records), table)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return _reduce(
+            table,
+            lambda chunk: pool.submit(infer_chunk, chunk, table),
+            _chunks(records, chunk_size),
+            workers,
+        )
+
+
+def infer_schema_files(
+    paths: Iterable[Path],
+    table: str,
+    workers: Optional[int] = None,
+) -> TableSchema:
+    """
+    Infer a table schema from many JSON/JSON lines files in parallel.
+
+    Workers read and parse their own files, so nothing but the small partial
+    schemas crosses process boundaries. This is the path to use for large
+    client histories.
+
+    Args:
+        paths: Files holding records for one table
+        table: Table name
+        workers: Worker processes (default: CPU count)
+
+    Returns:
+        Merged TableSchema
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        result = TableSchema(table)
+        for path in paths:
+            result.merge(infer_file(str(path), table))
+        return result
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return _reduce(
+            table,
+            lambda path: pool.submit(infer_file, str(path), table),
+            paths,
+            workers,
+        )
+
+
+def find_relationships(schemas: Iterable[TableSchema]) -> List[Dict[str, str]]:
+    """
+    Detect foreign keys: a column named like another table's primary key.
+
+    Returns:
+        List of ``{"table", "foreign_key", "references", "referenced_column"}``
+    """
+    tables = list(schemas)
+    keys = {t.name: t.primary_key for t in tables}
+    relationships = []
+    for table in tables:
+        for other, pk in keys.items():
+            if other == table.name or pk is None or pk == keys[table.name]:
+                continue
+            column = table.columns.get(pk)
+            if column is not None and not column.nested:
+                relationships.append({
+                    'table': table.name,
+                    'foreign_key': pk,
+                    'references': other,
+                    'referenced_column': pk,
+                })
+    return relationships
+
+
+def _sql_name(name: str) -> str:
+    return name.replace('-', '_').replace(' ', '_')
+
+
+def to_sql(schemas: Iterable[TableSchema]) -> str:
+    """
+    Render CREATE TABLE statements in the format of ``docs/unifi_schema.sql``.
+
+    Args:
+        schemas: Inferred table schemas
+
+    Returns:
+        SQL DDL text
+    """
+    tables = list(schemas)
+    relationships = find_relationships(tables)
+    statements = []
+    for table in tables:
+        pk = table.primary_key
+        columns = []
+        for column in table.scalar_columns():
+            definition = f"    {column.name} {column.sql_type or TEXT}"
+            if not table.nullable(column.name):
+                definition += " NOT NULL"
+            if column.name == pk:
+                definition += " PRIMARY KEY"
+            columns.append(definition)
+        for fk in relationships:
+            if fk['table'] == table.name:
+                columns.append(
+                    f"    FOREIGN KEY ({fk['foreign_key']}) REFERENCES "
+                    f"{_sql_name(fk['references'])}({fk['referenced_column']})"
+                )
+        statements.append(f"CREATE TABLE {_sql_name(table.name)} (\n" + ",\n".join(columns) + "\n);")
+
+    header = (
+        "-- UniFi Database Schema\n"
+        "-- Generated from API data analysis\n"
+        f"-- {len(statements)} tables\n\n"
+    )
+    return header + "\n\n".join(statements)
+
+
+_ERD_KEYWORDS = ('id', 'name', 'type', 'status', 'ip', 'mac')
+
+
+def to_mermaid(schemas: Iterable[TableSchema], max_columns: int = 8) -> str:
+    """
+    Render a Mermaid ERD in the format of ``docs/unifi_erd.mmd``.
+
+    Args:
+        schemas: Inferred table schemas
+        max_columns: Key columns shown per table besides the primary key
+
+    Returns:
+        Mermaid ``erDiagram`` text
+    """
+    tables = list(schemas)
+    lines = ["erDiagram"]
+    for table in tables:
+        pk = table.primary_key
+        columns = table.scalar_columns()
+        lines.append(f"    {_sql_name(table.name).replace('.', '_')} {{")
+        shown = 0
+        if pk is not None:
+            lines.append(f"        {pk} string PK")
+            shown += 1
+        key_columns = [
+            c for c in columns
+            if c.name != pk and any(k in c.name.lower() for k in _ERD_KEYWORDS)
+        ][:max_columns]
+        for column in key_columns:
+            if column.sql_type in (INTEGER, REAL):
+                kind = "number"
+            elif 'time' in column.name.lower() or 'date' in column.name.lower():
+                kind = "datetime"
+            else:
+                kind = "string"
+            lines.append(f"        {column.name} {kind}")
+        shown += len(key_columns)
+        if len(columns) > shown:
+            lines.append(f"        ... {len(columns) - shown} more columns")
+        lines.append("    }")
+        lines.append("")
+    for fk in find_relationships(tables):
+        lines.append(
+            f"    {_sql_name(fk['references'])} ||--o{{ {_sql_name(fk['table'])} : \"{fk['foreign_key']}\""
+        )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,150 @@
+"""Single-flight coalescing of concurrent identical requests."""
+
+import asyncio
+import hashlib
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+def _param_pairs(params: Any) -> Tuple:
+    """
+    Query parameters as ``(key, value)`` string pairs, as ``requests`` sends them.
+
+    Accepts a mapping or a sequence of pairs; list or tuple values become
+    repeated keys and ``None`` values are dropped. Pairs are sorted by key
+    only, so repeated keys keep their order. ``str`` or ``bytes`` query
+    strings are used verbatim.
+    """
+    if not params:
+        return ()
+    if isinstance(params, (str, bytes)):
+        return (params,)
+    items = params.items() if hasattr(params, 'items') else params
+    pairs = []
+    for key, value in items:
+        values = value if isinstance(value, (list, tuple)) else [value]
+        pairs.extend((str(key), str(v)) for v in values if v is not None)
+    return tuple(sorted(pairs, key=lambda pair: pair[0]))
+
+
+def request_key(
+    method: str,
+    url: str,
+    credential: str,
+    params: Any = None,
+) -> Tuple[str, str, str, Tuple]:
+    """
+    Coalescing key for a request.
+
+    The credential is hashed so keys can be logged or kept without
+    exposing API keys or tokens. ``params`` takes anything ``requests``
+    accepts (mapping, list of pairs, list values, query string).
+    """
+    digest = hashlib.sha256(credential.encode('utf-8')).hexdigest()[:16]
+    return method.upper(), url, digest, _param_pairs(params)
+
+
+class _Call:
+    """One in-flight call shared by its leader and waiters."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Share one execution between concurrent callers with the same key.
+
+    The first caller (the leader) runs the function; callers arriving while
+    it is in flight wait and receive the same result or exception. Nothing
+    is cached: once the call finishes, the next caller runs it again. Works
+    across threads with ``do()`` and across tasks of an event loop with
+    ``do_async()``.
+    """
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._futures: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._counts = {'calls': 0, 'executions': 0, 'shared': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` unless a call with ``key`` is already in flight.
+
+        Returns:
+            ``fn()``'s result, possibly from another thread's execution
+        """
+        with self._lock:
+            self._counts['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counts['executions'] += 1
+            else:
+                self._counts['shared'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await ``fn()`` unless a call with ``key`` is in flight on this event loop.
+
+        Returns:
+            The awaited result, possibly from another task's execution
+        """
+        loop = asyncio.get_running_loop()
+        flight = (id(loop), key)
+        with self._lock:
+            self._counts['calls'] += 1
+            future = self._futures.get(flight)
+            leader = future is None
+            if leader:
+                future = self._futures[flight] = loop.create_future()
+                self._counts['executions'] += 1
+            else:
+                self._counts['shared'] += 1
+        if not leader:
+            # Shielded so a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(future)
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved: the leader re-raises it even when nobody waited
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._futures[flight]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """``calls`` made, ``executions`` run and requests ``shared`` (saved)."""
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,262 @@
+"""Append-only columnar time-series store on disk."""
+
+import bisect
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Iterable, Sequence, Tuple
+
+import numpy as np
+
+
+# Column files: name -> dtype ('time' and 'key' are always present)
+TIME_DTYPE = np.dtype('<i8')
+KEY_DTYPE = np.dtype('<i4')
+VALUE_DTYPE = np.dtype('<f8')
+
+
+class TimeSeriesStore:
+    """
+    Typed numeric time series, one directory per series.
+
+    Each series stores ``time`` (int64 epoch milliseconds), ``key`` (int32
+    codes into a per-series dictionary of MACs or other identifiers) and one
+    float64 file per attribute; appending writes to the end of each file,
+    so ingestion cost does not grow with history. The key dictionary is
+    appended to ``keys.jsonl`` (one JSON string per line) in the same way.
+    ``meta.json`` holds the committed row count, the committed size of the
+    key file and the windows already ingested: a window marked complete is
+    never appended twice, and rows of an incomplete (still open) window are
+    only appended past the last time already stored for it.
+
+    A crash between writing columns and ``meta.json`` leaves trailing bytes
+    that are ignored and truncated on the next append.
+    """
+
+    def __init__(self, root: Path):
+        """
+        Initialize time-series store.
+
+        Args:
+            root: Directory holding one subdirectory per series
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Dict[str, Any]] = {}
+
+    def _dir(self, series: str) -> Path:
+        return self.root / series.replace('/', '__')
+
+    def series(self) -> List[str]:
+        """Names of stored series."""
+        return sorted(p.name.replace('__', '/') for p in self.root.iterdir() if (p / 'meta.json').exists())
+
+    def meta(self, series: str) -> Dict[str, Any]:
+        """Committed metadata of a series (empty series if it does not exist)."""
+        meta = self._meta.get(series)
+        if meta is None:
+            directory = self._dir(series)
+            path = directory / 'meta.json'
+            if path.exists():
+                meta = json.loads(path.read_text(encoding='utf-8'))
+                meta['partial'] = {int(k): v for k, v in meta['partial'].items()}
+                if 'keys' in meta:
+                    # Older layout kept the dictionary in meta.json; rewrite it on the next commit
+                    meta['key_count'] = meta['key_bytes'] = 0
+                elif meta['key_bytes']:
+                    with open(directory / 'keys.jsonl', 'rb') as f:
+                        lines = f.read(meta['key_bytes']).splitlines()
+                    meta['keys'] = [json.loads(line) for line in lines]
+                else:
+                    meta['keys'] = []
+            else:
+                meta = {
+                    'rows': 0, 'columns': [], 'keys': [], 'key_count': 0, 'key_bytes': 0,
+                    'windows': [], 'partial': {},
+                }
+            self._meta[series] = meta
+        return meta
+
+    # ------------------------------------------------------------------
+    # Windows
+    # ------------------------------------------------------------------
+
+    def covered(self, series: str, start: int, end: int) -> bool:
+        """Whether ``[start, end)`` lies inside windows already ingested as complete."""
+        windows = self.meta(series)['windows']
+        index = bisect.bisect_right(windows, [start, float('inf')]) - 1
+        return index >= 0 and windows[index][0] <= start and end <= windows[index][1]
+
+    def partial_through(self, series: str, start: int) -> Optional[int]:
+        """Last time stored for the open window starting at ``start``, if any."""
+        return self.meta(series)['partial'].get(start)
+
+    @staticmethod
+    def _add_window(windows: List[List[int]], start: int, end: int) -> None:
+        """Insert ``[start, end)`` into sorted windows, merging touching ones."""
+        bisect.insort(windows, [start, end])
+        merged: List[List[int]] = []
+        for window in windows:
+            if merged and window[0] <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], window[1])
+            else:
+                merged.append(window)
+        windows[:] = merged
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(
+        self,
+        series: str,
+        times: np.ndarray,
+        keys: Sequence[str],
+        columns: Dict[str, np.ndarray],
+        window: Tuple[int, int],
+        complete: bool = True,
+    ) -> int:
+        """
+        Append the rows fetched for one window.
+
+        Args:
+            series: Series name (e.g. ``"default/hourly.ap"``)
+            times: Row times, epoch milliseconds
+            keys: Row keys (e.g. AP MAC; ``""`` for site-wide rows)
+            columns: Attribute name to float64 values, one per row
+            window: ``(start, end)`` milliseconds the rows were fetched for
+            complete: Whether the window is closed; complete windows are
+                never appended again
+
+        Returns:
+            Rows appended (0 if the window was already ingested)
+        """
+        start, end = window
+        times = np.asarray(times, dtype=TIME_DTYPE)
+        if len(keys) != len(times) or any(len(v) != len(times) for v in columns.values()):
+            raise ValueError("times, keys and columns must have the same length")
+        with self._lock:
+            meta = self.meta(series)
+            if self.covered(series, start, end):
+                return 0
+            through = meta['partial'].get(start)
+            mask = np.ones(len(times), dtype=bool) if through is None else times > through
+            count = int(mask.sum())
+            if count:
+                self._write(series, meta, times[mask], [k for k, m in zip(keys, mask, strict=True) if m],
+                            {name: np.asarray(v, dtype=VALUE_DTYPE)[mask] for name, v in columns.items()})
+            if complete:
+                meta['partial'].pop(start, None)
+                self._add_window(meta['windows'], start, end)
+            elif count:
+                meta['partial'][start] = int(times[mask].max())
+            self._commit(series, meta)
+            return count
+
+    def _write(
+        self,
+        series: str,
+        meta: Dict[str, Any],
+        times: np.ndarray,
+        keys: List[str],
+        columns: Dict[str, np.ndarray],
+    ) -> None:
+        directory = self._dir(series)
+        directory.mkdir(parents=True, exist_ok=True)
+        rows = meta['rows']
+        codes = {key: code for code, key in enumerate(meta['keys'])}
+        key_codes = np.empty(len(keys), dtype=KEY_DTYPE)
+        for i, key in enumerate(keys):
+            code = codes.get(key)
+            if code is None:
+                code = codes[key] = len(meta['keys'])
+                meta['keys'].append(key)
+            key_codes[i] = code
+
+        missing = np.full(len(times), np.nan, dtype=VALUE_DTYPE)
+        for name in columns:
+            if name not in meta['columns']:
+                # Earlier rows did not report this attribute
+                with open(directory / f"{name}.f8", 'wb') as f:
+                    np.full(rows, np.nan, dtype=VALUE_DTYPE).tofile(f)
+                meta['columns'].append(name)
+        files = [('time.i8', TIME_DTYPE, times), ('key.i4', KEY_DTYPE, key_codes)]
+        files += [(f"{name}.f8", VALUE_DTYPE, columns.get(name, missing)) for name in meta['columns']]
+        for filename, dtype, values in files:
+            with open(directory / filename, 'ab') as f:
+                # Drop bytes written after the last commit (interrupted append)
+                f.truncate(rows * dtype.itemsize)
+                np.asarray(values, dtype=dtype).tofile(f)
+        meta['rows'] = rows + len(times)
+
+    def _commit(self, series: str, meta: Dict[str, Any]) -> None:
+        directory = self._dir(series)
+        directory.mkdir(parents=True, exist_ok=True)
+        new_keys = meta['keys'][meta['key_count']:]
+        if new_keys:
+            data = b''.join(json.dumps(key).encode('utf-8') + b'\n' for key in new_keys)
+            with open(directory / 'keys.jsonl', 'ab') as f:
+                # Drop keys written after the last commit (interrupted append)
+                f.truncate(meta['key_bytes'])
+                f.write(data)
+            meta['key_bytes'] += len(data)
+            meta['key_count'] = len(meta['keys'])
+        tmp = directory / 'meta.json.tmp'
+        tmp.write_text(json.dumps({k: v for k, v in meta.items() if k != 'keys'}), encoding='utf-8')
+        os.replace(tmp, directory / 'meta.json')
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def read(
+        self,
+        series: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        keys: Optional[Iterable[str]] = None,
+        columns: Optional[Iterable[str]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Read rows sorted by time.
+
+        Args:
+            series: Series name
+            start: Earliest time, inclusive (epoch milliseconds)
+            end: Latest time, exclusive
+            keys: Only these keys
+            columns: Only these attributes (default: all)
+
+        Returns:
+            ``{"time": int64, "key": str, <attribute>: float64, ...}`` arrays
+        """
+        with self._lock:
+            meta = self.meta(series)
+            rows = meta['rows']
+            names = list(meta['columns'] if columns is None else columns)
+            unknown = set(names) - set(meta['columns'])
+            if unknown:
+                raise ValueError(f"Unknown columns for {series}: {sorted(unknown)}")
+            directory = self._dir(series)
+            times = np.fromfile(directory / 'time.i8', dtype=TIME_DTYPE, count=rows) if rows else np.empty(0, TIME_DTYPE)
+            codes = np.fromfile(directory / 'key.i4', dtype=KEY_DTYPE, count=rows) if rows else np.empty(0, KEY_DTYPE)
+            dictionary = np.array(meta['keys'] or [''], dtype=str)
+
+            mask = np.ones(rows, dtype=bool)
+            if start is not None:
+                mask &= times >= start
+            if end is not None:
+                mask &= times < end
+            if keys is not None:
+                selected = set(keys)
+                wanted = [i for i, k in enumerate(meta['keys']) if k in selected]
+                mask &= np.isin(codes, wanted)
+            order = np.flatnonzero(mask)
+            order = order[np.argsort(times[order], kind='stable')]
+            result = {'time': times[order], 'key': dictionary[codes[order]]}
+            for name in names:
+                values = np.fromfile(directory / f"{name}.f8", dtype=VALUE_DTYPE, count=rows)
+                result[name] = values[order]
+            return result
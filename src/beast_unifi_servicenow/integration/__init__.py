@@ -1,8 +1,19 @@
 """ServiceNow integration for UniFi data."""
 
+from beast_unifi_servicenow.integration.import_set import ImportSetWriter, verify_manifest
+from beast_unifi_servicenow.integration.lookup_cache import CMDBLookupCache
+from beast_unifi_servicenow.integration.table_api import TableAPIClient
 from beast_unifi_servicenow.integration.unifi_sync import UniFiServiceNowSync
+from beast_unifi_servicenow.integration.work_queue import WorkQueue, WorkItem, drain_parallel
 
 __all__ = [
     "UniFiServiceNowSync",
+    "CMDBLookupCache",
+    "TableAPIClient",
+    "ImportSetWriter",
+    "verify_manifest",
+    "WorkQueue",
+    "WorkItem",
+    "drain_parallel",
 ]
 
@@ -0,0 +1,269 @@
+"""Chunked, compressed import-set files for bulk ServiceNow loads."""
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Callable, Deque, Iterable, Iterator
+
+from beast_unifi.utils.schema import flatten_record
+
+
+FORMATS = ('csv', 'json')
+COMPRESSIONS = (None, 'gzip', 'zip')
+MANIFEST = 'manifest.json'
+
+# Staging tables for initial CMDB loads; transform maps on the instance
+# take these rows to cmdb_ci_netgear, cmn_location and cmdb_ci_hardware
+IMPORT_TABLES = {
+    'devices': 'u_unifi_device_import',
+    'sites': 'u_unifi_site_import',
+    'clients': 'u_unifi_client_import',
+}
+
+
+def import_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten a UniFi record into import-set columns.
+
+    Nested keys become ``parent_child`` columns (ServiceNow column names
+    cannot contain dots) and lists are written as JSON text.
+    """
+    row = {}
+    for name, value in flatten_record(record).items():
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value, separators=(',', ':'), default=str)
+        row[name.replace('.', '_').replace('-', '_')] = value
+    return row
+
+
+def _encode(rows: List[Dict[str, Any]], fmt: str, columns: Optional[List[str]] = None) -> bytes:
+    """Serialise one chunk; CSV columns default to the union of the chunk's keys."""
+    if fmt == 'json':
+        # "Path for each row" on the data source: /records
+        return json.dumps({'records': rows}, separators=(',', ':'), default=str).encode('utf-8')
+    if columns is None:
+        union: Dict[str, None] = {}
+        for row in rows:
+            union.update(dict.fromkeys(row))
+        columns = list(union)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows)
+    # Excel-style BOM so the instance detects UTF-8
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+class ImportSetWriter:
+    """
+    Stream records into numbered import-set chunk files plus a manifest.
+
+    Records are read ``rows_per_chunk`` at a time; each chunk is
+    serialised, compressed and hashed in a thread pool (zlib releases the
+    GIL) while the next one is read, with at most ``2 * max_workers``
+    chunks in flight, so memory stays bounded by chunk size whatever the
+    total. CSV rows are first spooled to a temporary file to collect the
+    table's columns, so every chunk of a table shares one header (columns
+    first seen in a later ``write()`` are appended to it). ``close()`` writes ``manifest.json`` listing every chunk with
+    its table, row count, size and SHA-256, so the instance side can load
+    chunks concurrently and verify each attachment.
+
+    Typical use::
+
+        with ImportSetWriter('export/') as writer:
+            writer.write('u_unifi_device_import', client.get_devices())
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        fmt: str = 'csv',
+        compression: Optional[str] = 'gzip',
+        rows_per_chunk: int = 50000,
+        max_workers: int = 4,
+        transform: Callable[[Dict[str, Any]], Dict[str, Any]] = import_row,
+    ):
+        """
+        Initialize import-set writer.
+
+        Args:
+            directory: Output directory (created if missing)
+            fmt: ``csv`` or ``json``
+            compression: ``gzip``, ``zip`` (one entry per archive) or None
+            rows_per_chunk: Rows per file; keep files under the instance's
+                attachment size limit
+            max_workers: Chunks encoded in parallel
+            transform: Record to row mapping (default: flattened source fields)
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt!r} (expected one of {FORMATS})")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression!r} (expected one of {COMPRESSIONS})")
+        if rows_per_chunk <= 0:
+            raise ValueError("rows_per_chunk must be positive")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.compression = compression
+        self.rows_per_chunk = rows_per_chunk
+        self.max_workers = max_workers
+        self.transform = transform
+        self.chunks: List[Dict[str, Any]] = []
+        # CSV header per table, shared by all of its chunks
+        self.columns: Dict[str, List[str]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _filename(self, table: str, index: int) -> str:
+        name = f"{table}-{index:05d}.{self.fmt}"
+        if self.compression == 'gzip':
+            return name + '.gz'
+        if self.compression == 'zip':
+            return name + '.zip'
+        return name
+
+    def _write_chunk(
+        self,
+        table: str,
+        index: int,
+        rows: List[Dict[str, Any]],
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Encode, compress and write one chunk (runs in a worker thread)."""
+        data = _encode(rows, self.fmt, columns)
+        filename = self._filename(table, index)
+        if self.compression == 'gzip':
+            # mtime=0 keeps output byte-identical across runs
+            data = gzip.compress(data, compresslevel=6, mtime=0)
+        elif self.compression == 'zip':
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr(f"{table}-{index:05d}.{self.fmt}", data)
+            data = buffer.getvalue()
+        path = self.directory / filename
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return {
+            'file': filename,
+            'table': table,
+            'index': index,
+            'rows': len(rows),
+            'bytes': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+        }
+
+    def write(self, table: str, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Write records for one import-set table as chunk files.
+
+        Args:
+            table: Import-set staging table (e.g. ``u_unifi_device_import``)
+            records: Records (a list, ``SpillList`` or any iterator)
+
+        Returns:
+            Manifest entries of the chunks written, in order
+        """
+        rows = (self.transform(r) for r in records if isinstance(r, dict))
+        index = sum(1 for c in self.chunks if c['table'] == table)
+        pending: Deque[Future] = deque()
+        written = []
+        with tempfile.TemporaryFile(dir=self.directory) as spool:
+            columns = None
+            if self.fmt == 'csv':
+                columns = self._spool(table, rows, spool)
+                rows = self._replay(spool)
+            while True:
+                chunk = list(islice(rows, self.rows_per_chunk))
+                if not chunk:
+                    break
+                pending.append(self._pool.submit(self._write_chunk, table, index, chunk, columns))
+                index += 1
+                if len(pending) >= 2 * self.max_workers:
+                    written.append(pending.popleft().result())
+            while pending:
+                written.append(pending.popleft().result())
+        self.chunks.extend(written)
+        return written
+
+    def _spool(self, table: str, rows: Iterable[Dict[str, Any]], spool: Any) -> List[str]:
+        """Write rows to ``spool`` as JSON lines; returns the table's CSV header."""
+        columns = dict.fromkeys(self.columns.get(table, []))
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+            spool.write(json.dumps(row, separators=(',', ':'), default=str).encode('utf-8') + b'\n')
+        self.columns[table] = list(columns)
+        return self.columns[table]
+
+    @staticmethod
+    def _replay(spool: Any) -> Iterator[Dict[str, Any]]:
+        spool.seek(0)
+        for line in spool:
+            yield json.loads(line)
+
+    def close(self) -> Path:
+        """
+        Finish writing and save the manifest.
+
+        Returns:
+            Path of ``manifest.json``
+        """
+        self._pool.shutdown(wait=True)
+        tables: Dict[str, Dict[str, int]] = {}
+        for chunk in self.chunks:
+            totals = tables.setdefault(chunk['table'], {'chunks': 0, 'rows': 0})
+            totals['chunks'] += 1
+            totals['rows'] += chunk['rows']
+        manifest = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'format': self.fmt,
+            'compression': self.compression,
+            'encoding': 'UTF-8',
+            'row_path': '/records' if self.fmt == 'json' else None,
+            'tables': tables,
+            'chunks': self.chunks,
+        }
+        path = self.directory / MANIFEST
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+        return path
+
+    def __enter__(self) -> "ImportSetWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True)
+
+
+def verify_manifest(directory: Path) -> List[str]:
+    """
+    Check every chunk listed in a manifest against its size and SHA-256.
+
+    Returns:
+        Files that are missing or do not match (empty if all are intact)
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST).read_text(encoding='utf-8'))
+    bad = []
+    for chunk in manifest['chunks']:
+        path = directory / chunk['file']
+        if not path.exists():
+            bad.append(chunk['file'])
+            continue
+        data = path.read_bytes()
+        if len(data) != chunk['bytes'] or hashlib.sha256(data).hexdigest() != chunk['sha256']:
+            bad.append(chunk['file'])
+    return bad
@@ -0,0 +1,166 @@
+"""In-memory CMDB sys_id lookup cache for sync runs."""
+
+from typing import Dict, List, Optional, Any, Iterable
+
+from beast_unifi.utils.normalize import normalize_mac
+from beast_unifi_servicenow.integration.table_api import TableAPIClient
+
+
+# Index name -> CMDB field holding the value
+DEFAULT_FIELDS: Dict[str, str] = {
+    'mac': 'mac_address',
+    'serial': 'serial_number',
+    'name': 'name',
+}
+
+
+def _normalize(index: str, value: Any) -> Optional[str]:
+    if value in (None, ''):
+        return None
+    if index == 'mac':
+        return normalize_mac(value)
+    return str(value).strip().lower()
+
+
+class CMDBLookupCache:
+    """
+    MAC, serial and name to ``sys_id`` indexes over CMDB tables.
+
+    ``load()`` reads the tables once with paginated bulk reads; ``refresh()``
+    only fetches records whose ``sys_updated_on`` is at or after the newest
+    one already seen. A sync run then resolves every UniFi record in memory
+    instead of issuing one Table API query per device.
+    """
+
+    def __init__(
+        self,
+        client: TableAPIClient,
+        tables: Iterable[str] = ('cmdb_ci_netgear',),
+        fields: Optional[Dict[str, str]] = None,
+    ):
+        """
+        Initialize lookup cache.
+
+        Args:
+            client: Table API client
+            tables: CMDB tables to index
+            fields: Index name to CMDB field (default: ``DEFAULT_FIELDS``)
+        """
+        self.client = client
+        self.tables = tuple(tables)
+        self.fields = fields or DEFAULT_FIELDS
+        self._indexes: Dict[str, Dict[str, str]] = {name: {} for name in self.fields}
+        # sys_id -> (table, normalised index values) so updates can drop stale keys
+        self._records: Dict[str, tuple] = {}
+        self._watermarks: Dict[str, str] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'records': 0, 'fetched': 0}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def load(self) -> int:
+        """
+        Rebuild the cache from a full read of every table.
+
+        Returns:
+            Number of records indexed
+        """
+        self._indexes = {name: {} for name in self.fields}
+        self._records = {}
+        self._watermarks = {}
+        for table in self.tables:
+            self._read(table, None)
+        return len(self._records)
+
+    def refresh(self) -> int:
+        """
+        Fetch records updated since the last load or refresh.
+
+        Deletions are not visible to incremental reads; call ``load()``
+        periodically to drop CIs removed from the CMDB.
+
+        Returns:
+            Number of records fetched
+        """
+        fetched = 0
+        for table in self.tables:
+            watermark = self._watermarks.get(table)
+            query = f"sys_updated_on>={watermark}" if watermark else None
+            fetched += self._read(table, query)
+        return fetched
+
+    def _read(self, table: str, query: Optional[str]) -> int:
+        fields = list(self.fields.values()) + ['sys_updated_on']
+        count = 0
+        for record in self.client.iter_records(table, fields, query):
+            self._upsert(table, record)
+            updated = record.get('sys_updated_on') or ''
+            if updated > self._watermarks.get(table, ''):
+                self._watermarks[table] = updated
+            count += 1
+        self.stats['fetched'] += count
+        self.stats['records'] = len(self._records)
+        return count
+
+    def _upsert(self, table: str, record: Dict[str, Any]) -> None:
+        sys_id = record['sys_id']
+        previous = self._records.get(sys_id)
+        if previous is not None:
+            for name, value in previous[1].items():
+                if value is not None and self._indexes[name].get(value) == sys_id:
+                    del self._indexes[name][value]
+        values = {name: _normalize(name, record.get(field)) for name, field in self.fields.items()}
+        for name, value in values.items():
+            if value is not None:
+                self._indexes[name][value] = sys_id
+        self._records[sys_id] = (table, values)
+
+    def lookup(self, index: str, value: Any) -> Optional[str]:
+        """
+        Look up a ``sys_id`` by one index.
+
+        Args:
+            index: ``mac``, ``serial`` or ``name``
+            value: Value to look up (normalised the same way as the index)
+
+        Returns:
+            sys_id or None
+        """
+        key = _normalize(index, value)
+        sys_id = self._indexes[index].get(key) if key is not None else None
+        self.stats['hits' if sys_id else 'misses'] += 1
+        return sys_id
+
+    def resolve(self, record: Dict[str, Any]) -> Optional[str]:
+        """
+        Find the CMDB ``sys_id`` for a UniFi record by MAC, then serial, then name.
+
+        Args:
+            record: UniFi device record
+
+        Returns:
+            sys_id or None if the device is not in the CMDB yet
+        """
+        candidates = (
+            ('mac', record.get('mac')),
+            ('serial', record.get('serial')),
+            ('name', record.get('name')),
+        )
+        for index, value in candidates:
+            if index in self._indexes and value:
+                key = _normalize(index, value)
+                sys_id = self._indexes[index].get(key) if key else None
+                if sys_id is not None:
+                    self.stats['hits'] += 1
+                    return sys_id
+        self.stats['misses'] += 1
+        return None
+
+    def table_of(self, sys_id: str) -> Optional[str]:
+        """Table a cached ``sys_id`` was read from."""
+        entry = self._records.get(sys_id)
+        return entry[0] if entry else None
+
+    def resolve_many(self, records: Iterable[Dict[str, Any]]) -> List[Optional[str]]:
+        """Resolve a batch of UniFi records; see ``resolve()``."""
+        return [self.resolve(record) for record in records]
@@ -0,0 +1,89 @@
+"""Minimal ServiceNow Table API client for bulk reads."""
+
+from typing import Dict, List, Optional, Any, Iterator, Iterable
+
+import requests
+
+from beast_unifi.utils.codec import accept_encoding, response_json
+
+
+class TableAPIClient:
+    """Read records from the ServiceNow Table API (``/api/now/table``)."""
+
+    def __init__(
+        self,
+        instance_url: str,
+        credentials: Dict[str, str],
+        page_size: int = 1000,
+        timeout: float = 30.0,
+    ):
+        """
+        Initialize Table API client.
+
+        Args:
+            instance_url: ServiceNow instance URL
+            credentials: ``{"username", "password"}`` or ``{"token"}``
+            page_size: Records per request (``sysparm_limit``)
+            timeout: Request timeout in seconds
+        """
+        self.instance_url = instance_url.rstrip('/')
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': accept_encoding(),
+        })
+        if credentials.get('token'):
+            self.session.headers['Authorization'] = f"Bearer {credentials['token']}"
+        elif credentials.get('username'):
+            self.session.auth = (credentials['username'], credentials.get('password', ''))
+        else:
+            raise ValueError("ServiceNow credentials require 'username'/'password' or 'token'")
+
+    def iter_records(
+        self,
+        table: str,
+        fields: Iterable[str],
+        query: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream all matching records, paging with a ``sys_id`` keyset.
+
+        Keyset paging (``sys_id>last^ORDERBYsys_id``) stays consistent while
+        the table is being written to, unlike ``sysparm_offset``.
+
+        Args:
+            table: Table name (e.g. ``cmdb_ci_netgear``)
+            fields: Fields to return (``sys_id`` is always included)
+            query: Encoded query to filter on
+
+        Yields:
+            Records as dictionaries of display-independent values
+        """
+        field_list = ['sys_id'] + [f for f in fields if f != 'sys_id']
+        last_sys_id = None
+        while True:
+            conditions = [query] if query else []
+            if last_sys_id is not None:
+                conditions.append(f"sys_id>{last_sys_id}")
+            conditions.append('ORDERBYsys_id')
+            page = self._get_page(table, {
+                'sysparm_query': '^'.join(conditions),
+                'sysparm_fields': ','.join(field_list),
+                'sysparm_limit': self.page_size,
+                'sysparm_exclude_reference_link': 'true',
+            })
+            yield from page
+            if len(page) < self.page_size:
+                return
+            last_sys_id = page[-1]['sys_id']
+
+    def _get_page(self, table: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = self.session.get(
+            f"{self.instance_url}/api/now/table/{table}",
+            params=params,
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response_json(response).get('result', [])
@@ -1,11 +1,49 @@
 """UniFi to ServiceNow synchronization."""
 
-from typing import Dict, List, Any, Optional
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Iterable, Sequence
 from beast_unifi import SiteManagerClient, LocalControllerClient
+from beast_unifi.analysis.reconcile import flatten_cloud_devices
+from beast_unifi_servicenow.integration.import_set import IMPORT_TABLES, MANIFEST, ImportSetWriter
+from beast_unifi_servicenow.integration.lookup_cache import CMDBLookupCache
+from beast_unifi_servicenow.integration.table_api import TableAPIClient
+from beast_unifi_servicenow.integration.work_queue import WorkQueue, idempotency_key
+
+
+# Collection -> target CMDB table
+TARGETS: Dict[str, str] = {
+    'devices': 'cmdb_ci_netgear',
+    'sites': 'cmn_location',
+    'clients': 'cmdb_ci_hardware',
+}
+
+
+def record_identity(record: Dict[str, Any]) -> Optional[str]:
+    """Identity of a UniFi record: MAC, site id, or controller/cloud id."""
+    identity = record.get('mac') or record.get('siteId') or record.get('_id') or record.get('id')
+    return str(identity) if identity is not None else None
+
+
+def staged_payload(collection: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Queue payload for one source record.
+
+    The CMDB field mapping is not applied at staging time: items carry the
+    identity and the raw UniFi record, so every change to the record is a
+    new idempotency key and the writer maps fields when it applies them.
+    """
+    return {'source': collection, 'identity': record_identity(record), 'record': record}
 
 
 class UniFiServiceNowSync:
-    """Synchronize UniFi network data to ServiceNow."""
+    """
+    Synchronize UniFi network data to ServiceNow.
+    
+    ``enqueue()`` stages collections in a durable ``WorkQueue``; the items
+    are applied by whatever handler is passed to ``WorkQueue.drain()`` or
+    ``drain_parallel()``. No Table API writer ships yet, so ``sync_*``
+    still raise NotImplementedError.
+    """
     
     def __init__(
         self,
@@ -13,6 +51,7 @@ class UniFiServiceNowSync:
         servicenow_credentials: Dict[str, str],
         unifi_client: Optional[SiteManagerClient] = None,
         local_client: Optional[LocalControllerClient] = None,
+        work_queue: Optional[WorkQueue] = None,
     ):
         """
         Initialize UniFi to ServiceNow sync.
@@ -22,11 +61,13 @@ class UniFiServiceNowSync:
             servicenow_credentials: ServiceNow authentication credentials
             unifi_client: UniFi Site Manager client (optional)
             local_client: UniFi Local Controller client (optional)
+            work_queue: Durable queue for staged upserts (optional)
         """
         self.servicenow_url = servicenow_url
         self.servicenow_credentials = servicenow_credentials
         self.unifi_client = unifi_client
         self.local_client = local_client
+        self.work_queue = work_queue
     
     def sync_devices(self) -> Dict[str, Any]:
         """
@@ -58,4 +99,108 @@ class UniFiServiceNowSync:
         """
         # TODO: Implement ServiceNow client sync
         raise NotImplementedError("ServiceNow sync implementation pending")
-
+    
+    def build_lookup_cache(self, tables: Optional[List[str]] = None) -> CMDBLookupCache:
+        """
+        Create and load a CMDB lookup cache for the target tables.
+        
+        Args:
+            tables: CMDB tables to index (default: the device and client targets)
+            
+        Returns:
+            Loaded CMDBLookupCache
+        """
+        client = TableAPIClient(self.servicenow_url, self.servicenow_credentials)
+        tables = tables or [TARGETS['devices'], TARGETS['clients']]
+        cache = CMDBLookupCache(client, tables)
+        cache.load()
+        return cache
+    
+    def _fetch(self, collection: str) -> Sequence[Dict[str, Any]]:
+        """Fetch a collection from the best available UniFi client."""
+        if collection == 'devices':
+            if self.local_client is not None:
+                return self.local_client.get_devices()
+            if self.unifi_client is not None:
+                return flatten_cloud_devices(self.unifi_client.get_devices())
+        elif collection == 'sites':
+            if self.unifi_client is not None:
+                return self.unifi_client.get_sites()
+            if self.local_client is not None:
+                return self.local_client.get_sites()
+        elif collection == 'clients':
+            if self.local_client is not None:
+                return self.local_client.get_clients()
+        else:
+            raise ValueError(f"Unknown collection: {collection!r}")
+        raise ValueError(f"No UniFi client configured that provides {collection}")
+    
+    def enqueue(self, run_id: str, collection: str) -> int:
+        """
+        Stage upserts for a collection in the work queue.
+        
+        Once a collection has been fully enqueued for ``run_id`` a checkpoint
+        is recorded, so resuming the run does not refetch it. Items carry
+        idempotency keys, so a crash mid-enqueue is safe to replay. This
+        only stages the records; draining the queue into ServiceNow needs a
+        handler (see ``WorkQueue.drain()``).
+        
+        Args:
+            run_id: Sync run identifier
+            collection: ``devices``, ``sites`` or ``clients``
+            
+        Returns:
+            Number of newly enqueued items (0 if already checkpointed)
+        """
+        if self.work_queue is None:
+            raise ValueError("A work_queue is required to stage upserts")
+        if collection not in TARGETS:
+            raise ValueError(f"Unknown collection: {collection!r}")
+        checkpoint = f"enqueued:{collection}"
+        if self.work_queue.get_checkpoint(run_id, checkpoint) is not None:
+            return 0
+        
+        table = TARGETS[collection]
+        # Fetch (or spill) the whole collection before touching the queue, so
+        # no network I/O happens while a write transaction is open
+        records = self._fetch(collection)
+        count = len(records)
+        items = (
+            (idempotency_key(table, str(payload['identity']), payload), table, payload)
+            for payload in (staged_payload(collection, record) for record in records)
+        )
+        added = self.work_queue.enqueue(run_id, items)
+        self.work_queue.set_checkpoint(run_id, checkpoint, count)
+        return added
+    
+    def export_import_sets(
+        self,
+        directory: Path,
+        collections: Iterable[str] = ('sites', 'devices', 'clients'),
+        **writer_options: Any,
+    ) -> Path:
+        """
+        Write collections as chunked import-set files for a bulk load.
+        
+        Used for initial CMDB loads that are too large for the Table API:
+        the files are attached to (or picked up by the MID Server for) the
+        ``u_unifi_*_import`` data sources, whose transform maps do the
+        mapping on the instance.
+        
+        Args:
+            directory: Output directory
+            collections: ``devices``, ``sites`` and/or ``clients``
+            **writer_options: ``ImportSetWriter`` options (``fmt``,
+                ``compression``, ``rows_per_chunk``, ``max_workers``)
+            
+        Returns:
+            Path of the manifest
+        """
+        collections = list(collections)
+        unknown = [c for c in collections if c not in IMPORT_TABLES]
+        if unknown:
+            raise ValueError(f"Unknown collections: {unknown}")
+        with ImportSetWriter(directory, **writer_options) as writer:
+            for collection in collections:
+                writer.write(IMPORT_TABLES[collection], self._fetch(collection))
+        return Path(directory) / MANIFEST
@@ -0,0 +1,348 @@
+"""Durable SQLite work queue for ServiceNow CI upserts."""
+
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any, Callable, Iterable, Iterator, Tuple
+
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    run_id TEXT NOT NULL,
+    target_table TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, lease_expires);
+CREATE INDEX IF NOT EXISTS items_run ON items (run_id, status);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (run_id, name)
+);
+"""
+
+
+def idempotency_key(target_table: str, identity: str, payload: Dict[str, Any]) -> str:
+    """
+    Key identifying one upsert of one record version.
+
+    Re-enqueueing the same record with the same content in the same run
+    is a no-op; a changed record gets a new key and is upserted again.
+    ``WorkQueue.enqueue`` re-queues a key that failed, or that a different
+    run already completed.
+
+    Args:
+        target_table: ServiceNow table (e.g. ``cmdb_ci_netgear``)
+        identity: Stable record identity (e.g. MAC address)
+        payload: ServiceNow-formatted record
+    """
+    content = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:20]
+    return f"{target_table}:{identity}:{digest}"
+
+
+class WorkItem:
+    """A leased queue item."""
+
+    __slots__ = ('id', 'key', 'run_id', 'target_table', 'payload', 'attempts')
+
+    def __init__(self, id: int, key: str, run_id: str, target_table: str, payload: str, attempts: int):
+        self.id = id
+        self.key = key
+        self.run_id = run_id
+        self.target_table = target_table
+        self.payload: Dict[str, Any] = json.loads(payload)
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"WorkItem({self.id}, {self.key!r})"
+
+
+class WorkQueue:
+    """
+    SQLite-backed queue of pending ServiceNow upserts with checkpoints.
+
+    Items are enqueued with idempotency keys, so replaying a partially
+    enqueued run never duplicates work. Applying items is up to the
+    ``drain()`` handler; this module does not write to ServiceNow itself.
+    Workers lease batches with an
+    expiry; a worker that crashes simply lets its leases expire and another
+    worker picks the items up, so a run resumes exactly where it stopped.
+    The database runs in WAL mode and is safe to share between processes
+    on one host.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        Initialize work queue.
+
+        Args:
+            path: SQLite database file (created if missing)
+            timeout: Seconds to wait for a lock held by another process
+        """
+        self.path = str(path)
+        self.timeout = timeout
+        self._conn = self._connect()
+        self._conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Cursor]:
+        """Write transaction taking the database lock up front."""
+        cursor = self._conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+
+    def __enter__(self) -> "WorkQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Producing
+    # ------------------------------------------------------------------
+
+    def enqueue(
+        self,
+        run_id: str,
+        items: Iterable[Tuple[str, str, Dict[str, Any]]],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Enqueue upserts, skipping any whose idempotency key is already queued.
+
+        A key that exists as ``failed``, or as ``done`` by another run, is
+        reset to pending under ``run_id`` (attempts and error cleared), so
+        parked items get a fresh set of attempts in the next run and a
+        later run re-applies records instead of trusting an old result.
+        Items are drawn from ``items`` one batch at a time outside any
+        transaction, then each batch is written in its own short write
+        transaction, so a slow producer never holds the database lock that
+        workers need to lease and complete items.
+
+        Args:
+            run_id: Sync run the items belong to
+            items: ``(idempotency_key, target_table, payload)`` tuples
+            batch_size: Items written per transaction
+
+        Returns:
+            Number of newly enqueued or re-queued items
+        """
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        items = iter(items)
+        added = 0
+        while True:
+            now = time.time()
+            rows = [
+                (key, run_id, table, json.dumps(payload, default=str), now)
+                for key, table, payload in itertools.islice(items, batch_size)
+            ]
+            if not rows:
+                return added
+            with self._transaction() as cursor:
+                before = self._conn.total_changes
+                cursor.executemany(
+                    "INSERT INTO items (idempotency_key, run_id, target_table, payload, updated) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (idempotency_key) DO UPDATE SET "
+                    "run_id = excluded.run_id, target_table = excluded.target_table, "
+                    "payload = excluded.payload, updated = excluded.updated, "
+                    f"status = '{PENDING}', attempts = 0, error = NULL, lease_owner = NULL, lease_expires = NULL "
+                    f"WHERE items.status = '{FAILED}' "
+                    f"OR (items.status = '{DONE}' AND items.run_id != excluded.run_id)",
+                    rows,
+                )
+                added += self._conn.total_changes - before
+
+    # ------------------------------------------------------------------
+    # Consuming
+    # ------------------------------------------------------------------
+
+    def lease(self, worker: str, batch: int = 100, lease_seconds: float = 300.0) -> List[WorkItem]:
+        """
+        Claim up to ``batch`` pending (or lease-expired) items.
+
+        Args:
+            worker: Worker identifier recorded on the lease
+            batch: Maximum items to claim
+            lease_seconds: Time after which unfinished items are reclaimable
+
+        Returns:
+            Leased items (empty when the queue is drained)
+        """
+        now = time.time()
+        with self._transaction() as cursor:
+            rows = cursor.execute(
+                "SELECT id, idempotency_key, run_id, target_table, payload, attempts FROM items "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT ?",
+                (PENDING, LEASED, now, batch),
+            ).fetchall()
+            cursor.executemany(
+                "UPDATE items SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                [(LEASED, worker, now + lease_seconds, now, row[0]) for row in rows],
+            )
+        return [WorkItem(*row[:5], attempts=row[5] + 1) for row in rows]
+
+    def complete(self, item_ids: Iterable[int], worker: str) -> int:
+        """
+        Mark leased items as done.
+
+        Only items still leased by ``worker`` are updated, so a worker whose
+        lease expired cannot overwrite another worker's claim.
+
+        Returns:
+            Number of items completed
+        """
+        ids = [(DONE, time.time(), item_id, worker) for item_id in item_ids]
+        with self._transaction() as cursor:
+            before = self._conn.total_changes
+            cursor.executemany(
+                "UPDATE items SET status = ?, updated = ?, lease_owner = NULL, lease_expires = NULL "
+                f"WHERE id = ? AND lease_owner = ? AND status = '{LEASED}'",
+                ids,
+            )
+            return self._conn.total_changes - before
+
+    def fail(self, item_id: int, worker: str, error: str, max_attempts: int = 5) -> None:
+        """
+        Release a leased item after an error.
+
+        The item returns to pending until it has been attempted
+        ``max_attempts`` times, then it is parked as failed.
+        """
+        with self._transaction() as cursor:
+            cursor.execute(
+                "UPDATE items SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (max_attempts, FAILED, PENDING, error, time.time(), item_id, worker),
+            )
+
+    def drain(
+        self,
+        handler: Callable[[List[WorkItem]], None],
+        worker: Optional[str] = None,
+        batch: int = 100,
+        lease_seconds: float = 300.0,
+        max_attempts: int = 5,
+    ) -> int:
+        """
+        Process items until the queue is empty.
+
+        ``handler`` receives each leased batch. If it raises, every item in
+        the batch is released for retry; to fail items individually, the
+        handler should catch errors itself and call ``fail()``.
+
+        Returns:
+            Number of items completed by this worker
+        """
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        completed = 0
+        while True:
+            items = self.lease(worker, batch, lease_seconds)
+            if not items:
+                return completed
+            try:
+                handler(items)
+            except Exception as e:
+                for item in items:
+                    self.fail(item.id, worker, str(e), max_attempts)
+                continue
+            completed += self.complete([item.id for item in items], worker)
+
+    # ------------------------------------------------------------------
+    # Checkpoints and progress
+    # ------------------------------------------------------------------
+
+    def set_checkpoint(self, run_id: str, name: str, value: Any) -> None:
+        """Record progress for a run (e.g. which collections were fully enqueued)."""
+        with self._transaction() as cursor:
+            cursor.execute(
+                "INSERT OR REPLACE INTO checkpoints (run_id, name, value, updated) VALUES (?, ?, ?, ?)",
+                (run_id, name, json.dumps(value), time.time()),
+            )
+
+    def get_checkpoint(self, run_id: str, name: str, default: Any = None) -> Any:
+        """Read a checkpoint value."""
+        row = self._conn.execute(
+            "SELECT value FROM checkpoints WHERE run_id = ? AND name = ?", (run_id, name)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def stats(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        """Item counts by status, optionally for one run."""
+        query = "SELECT status, COUNT(*) FROM items"
+        params: Tuple[Any, ...] = ()
+        if run_id is not None:
+            query += " WHERE run_id = ?"
+            params = (run_id,)
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(self._conn.execute(query + " GROUP BY status", params).fetchall()))
+        return counts
+
+
+def _drain_worker(path: str, handler: Callable[[List[WorkItem]], None], batch: int) -> int:
+    with WorkQueue(path) as queue:
+        return queue.drain(handler, batch=batch)
+
+
+def drain_parallel(
+    path: str,
+    handler: Callable[[List[WorkItem]], None],
+    processes: Optional[int] = None,
+    batch: int = 100,
+) -> int:
+    """
+    Drain a queue with several worker processes.
+
+    Args:
+        path: Queue database file
+        handler: Picklable (module-level) batch handler
+        processes: Worker processes (default: CPU count)
+        batch: Items leased per batch
+
+    Returns:
+        Total items completed
+    """
+    processes = processes or os.cpu_count() or 1
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        results = [pool.apply_async(_drain_worker, (str(path), handler, batch)) for _ in range(processes)]
+        return sum(result.get() for result in results)
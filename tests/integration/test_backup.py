@@ -0,0 +1,167 @@
+"""Integration tests for resumable backup downloads against a stand-in controller."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from beast_unifi.api.backup import BackupDownloader
+from beast_unifi.api.local_controller import LocalControllerClient
+
+
+BACKUP = os.urandom(300_000)
+
+
+class ControllerStandIn(BaseHTTPRequestHandler):
+    """Serves cmd/backup and backup files with Range support."""
+    
+    # Bytes sent before dropping the connection on the next full download
+    drop_after = None
+    ranges = []
+    ignore_range = False
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if body['cmd'] == 'list-backups':
+            data = [
+                {'filename': 'autobackup_old.unf', 'size': 10, 'time': 1},
+                {'filename': 'autobackup_new.unf', 'size': len(BACKUP), 'time': 2},
+            ]
+        else:
+            data = [{'url': '/dl/backup/9.0.114.unf'}]
+        self._send(200, json.dumps({'meta': {'rc': 'ok'}, 'data': data}).encode(), {})
+    
+    def do_GET(self):
+        if not self.path.startswith('/proxy/network/dl/'):
+            return self._send(404, b'', {})
+        requested = self.headers.get('Range')
+        type(self).ranges.append(requested)
+        if type(self).ignore_range:
+            requested = None
+        start = int(requested[6:-1]) if requested else 0
+        if start >= len(BACKUP):
+            return self._send(416, b'', {'Content-Range': f'bytes */{len(BACKUP)}'})
+        body = BACKUP[start:]
+        headers = {}
+        status = 200
+        if requested:
+            status = 206
+            headers['Content-Range'] = f'bytes {start}-{len(BACKUP) - 1}/{len(BACKUP)}'
+        drop = type(self).drop_after
+        if drop is not None:
+            type(self).drop_after = None
+            self.send_response(status)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body[:drop])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self._send(status, body, headers)
+    
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def controller():
+    ControllerStandIn.drop_after = None
+    ControllerStandIn.ranges = []
+    ControllerStandIn.ignore_range = False
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ControllerStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestBackupDownloader:
+    """Tests for BackupDownloader."""
+    
+    def test_latest_autobackup_with_checksum(self, controller, tmp_path):
+        """Test the newest autobackup is downloaded, verified and then skipped."""
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        downloader = BackupDownloader(tmp_path, chunk_size=16384)
+        result = downloader.backup('hq', client)
+        path = tmp_path / 'hq' / 'autobackup_new.unf'
+        assert result['path'] == path and path.read_bytes() == BACKUP
+        assert result['sha256'] == hashlib.sha256(BACKUP).hexdigest()
+        assert (tmp_path / 'hq' / 'autobackup_new.unf.sha256').read_text().startswith(result['sha256'])
+        assert downloader.backup('hq', client)['skipped']
+    
+    def test_resumes_after_dropped_connection(self, controller, tmp_path):
+        """Test a dropped transfer resumes with a Range request."""
+        ControllerStandIn.drop_after = 100_000
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        result = BackupDownloader(tmp_path, chunk_size=8192).backup('hq', client)
+        assert result['size'] == len(BACKUP)
+        assert ControllerStandIn.ranges[0] is None
+        # Resumes from what reached the disk before the drop
+        resumed = int(ControllerStandIn.ranges[1][6:-1])
+        assert 0 < resumed <= 100_000 and result['resumed_from'] == 0
+        assert result['path'].read_bytes() == BACKUP
+    
+    def test_resumes_partial_file_from_previous_run(self, controller, tmp_path):
+        """Test a leftover .part file is continued, and a corrupt one rejected."""
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        part = tmp_path / 'hq' / 'autobackup_new.unf.part'
+        part.parent.mkdir()
+        part.write_bytes(BACKUP[:50_000])
+        result = BackupDownloader(tmp_path).backup('hq', client)
+        assert result['resumed_from'] == 50_000
+        assert result['path'].read_bytes() == BACKUP
+        
+        part = tmp_path / 'other' / 'autobackup_new.unf.part'
+        part.parent.mkdir()
+        part.write_bytes(os.urandom(len(BACKUP) + 5))
+        with pytest.raises(ValueError):
+            BackupDownloader(tmp_path).backup('other', client)
+        assert not part.exists()
+    
+    def test_range_ignored_reports_restart(self, controller, tmp_path):
+        """Test resumed_from is 0 when the server resends the whole file."""
+        ControllerStandIn.ignore_range = True
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        part = tmp_path / 'hq' / 'autobackup_new.unf.part'
+        part.parent.mkdir()
+        part.write_bytes(BACKUP[:50_000])
+        result = BackupDownloader(tmp_path).backup('hq', client)
+        assert ControllerStandIn.ranges == ['bytes=50000-']
+        assert result['resumed_from'] == 0
+        assert result['path'].read_bytes() == BACKUP
+    
+    def test_created_backups_are_never_skipped(self, controller, tmp_path):
+        """Test each created backup is downloaded under a timestamped name."""
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        downloader = BackupDownloader(tmp_path)
+        first = downloader.backup('hq', client, create=True)
+        second = downloader.backup('hq', client, create=True)
+        assert not first['skipped'] and not second['skipped']
+        assert first['path'].name.startswith('9.0.114-') and first['path'].suffix == '.unf'
+        assert len(ControllerStandIn.ranges) == 2
+    
+    def test_parallel_controllers_with_bandwidth_cap(self, controller, tmp_path):
+        """Test several controllers share a total bandwidth cap; failures are isolated."""
+        clients = {name: LocalControllerClient(base_url=controller, api_token='token') for name in ('a', 'b')}
+        clients['down'] = LocalControllerClient(base_url='http://127.0.0.1:9', api_token='token')
+        downloader = BackupDownloader(tmp_path, chunk_size=32768, total_bandwidth=1_000_000, retries=0)
+        started = time.perf_counter()
+        results = downloader.run(clients, create=True)
+        elapsed = time.perf_counter() - started
+        assert set(results) == {'a', 'b'} and set(downloader.errors) == {'down'}
+        assert all(r['path'].name.startswith('9.0.114-') for r in results.values())
+        # 600 kB at 1 MB/s after a one-chunk burst
+        assert elapsed >= 0.5
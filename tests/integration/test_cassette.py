@@ -0,0 +1,150 @@
+"""Integration tests for record/replay cassettes against a stand-in controller."""
+
+import base64
+import gzip
+import json
+import threading
+import time
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.utils.cassette import REDACTED, Cassette, cassette
+
+
+class ControllerStandIn(BaseHTTPRequestHandler):
+    """Serves stat/device, counting requests and adding a little latency."""
+    
+    hits = 0
+    
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(0.05)
+        record = {'mac': 'aa:bb:cc:00:00:01', 'hits': self.hits, 'x_passphrase': 'wifi-secret'}
+        if 'networkconf' in self.path:
+            record = {'name': 'vpn', 'x_ipsec_pre_shared_key': 'vpn-secret', 'ipsec_enabled': True}
+        body = json.dumps({'meta': {'rc': 'ok'}, 'data': [record]})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def controller():
+    ControllerStandIn.hits = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ControllerStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestCassette:
+    """Tests for recording and replaying API exchanges."""
+    
+    def test_record_then_replay_offline(self, controller, tmp_path):
+        """Test a replayed run returns recorded data without network access."""
+        path = tmp_path / 'site.jsonl.gz'
+        client = LocalControllerClient(base_url=controller, api_token='secret-token')
+        with cassette(client.session, path) as tape:
+            recorded = [client.get_devices(), client.get_devices()]
+        assert len(tape) == 2
+        assert ControllerStandIn.hits == 2
+        with gzip.open(path, 'rt') as f:
+            assert 'secret-token' not in f.read()
+        assert recorded[0][0]['x_passphrase'] == 'wifi-secret'
+        
+        replayer = LocalControllerClient(base_url='http://10.255.255.1', api_token='other')
+        replayer.base_url = controller
+        with cassette(replayer.session, path):
+            started = time.perf_counter()
+            replayed = [replayer.get_devices(), replayer.get_devices(), replayer.get_devices()]
+            elapsed = time.perf_counter() - started
+        assert ControllerStandIn.hits == 2
+        assert [[d['hits'] for d in run] for run in replayed] == [[1], [2], [2]]
+        assert replayed[0][0]['x_passphrase'] == REDACTED
+        assert elapsed < 0.05
+    
+    def test_secrets_redacted_from_bodies(self, controller, tmp_path):
+        """Test WLAN passphrases and VPN pre-shared keys never reach the file."""
+        path = tmp_path / 'site.jsonl.gz'
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        with cassette(client.session, path, mode='record'):
+            client.get_devices()
+            client.get_networks()
+        text = ''.join(
+            base64.b64decode(json.loads(line)['content']).decode() for line in gzip.open(path, 'rt')
+        )
+        assert 'wifi-secret' not in text and 'vpn-secret' not in text
+        with cassette(client.session, path, mode='replay'):
+            network = client.get_networks()[0]
+        assert network == {'name': 'vpn', 'x_ipsec_pre_shared_key': REDACTED, 'ipsec_enabled': True}
+    
+    def test_streamed_replay(self, controller, tmp_path):
+        """Test stream=True consumers read replayed bodies."""
+        path = tmp_path / 'site.jsonl.gz'
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        with cassette(client.session, path, mode='record'):
+            list(client.iter_records('rest/sta'))
+        expected = [{'mac': 'aa:bb:cc:00:00:01', 'hits': 1, 'x_passphrase': REDACTED}]
+        with cassette(client.session, path, mode='replay'):
+            assert list(client.iter_records('rest/sta')) == expected
+            response = client.session.get(client._get_endpoint('rest/sta'), stream=True)
+            assert json.loads(response.raw.read())['data'] == expected
+        assert ControllerStandIn.hits == 1
+    
+    def test_failed_recording_keeps_cassette(self, controller, tmp_path):
+        """Test re-recording only replaces the cassette once the block succeeds."""
+        path = tmp_path / 'site.jsonl.gz'
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        with cassette(client.session, path, mode='record'):
+            client.get_health()
+        before = path.read_bytes()
+        with pytest.raises(RuntimeError):
+            with cassette(client.session, path, mode='record'):
+                client.get_health()
+                raise RuntimeError('collector crashed')
+        assert path.read_bytes() == before
+        with cassette(client.session, path, mode='record') as tape:
+            client.get_health()
+            client.get_health()
+        assert len(Cassette(path)) == len(tape) == 2
+    
+    def test_replay_with_original_latency(self, controller, tmp_path):
+        """Test latency=1 reproduces recorded response times."""
+        path = tmp_path / 'site.jsonl.gz'
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        with cassette(client.session, path, mode='record'):
+            client.get_health()
+        with cassette(client.session, path, mode='replay', latency=1.0):
+            started = time.perf_counter()
+            client.get_health()
+            assert time.perf_counter() - started >= 0.04
+    
+    def test_unrecorded_request_fails_like_network(self, controller, tmp_path):
+        """Test a miss raises ConnectionError and the session is restored afterwards."""
+        path = tmp_path / 'site.jsonl.gz'
+        client = LocalControllerClient(base_url=controller, api_token='token')
+        with cassette(client.session, path, mode='record'):
+            client.get_health()
+        with cassette(client.session, path, mode='replay'):
+            with pytest.raises(requests.ConnectionError):
+                client.get_networks()
+        client.get_networks()
+        assert ControllerStandIn.hits == 2
+    
+    def test_invalid_mode(self, tmp_path):
+        """Test unknown modes and missing cassettes are rejected."""
+        session = requests.Session()
+        with pytest.raises(ValueError):
+            with cassette(session, tmp_path / 'x.jsonl.gz', mode='rewind'):
+                pass
+        with pytest.raises(FileNotFoundError):
+            with cassette(session, tmp_path / 'x.jsonl.gz', mode='replay'):
+                pass
@@ -0,0 +1,115 @@
+"""Integration tests for chunked import-set file generation."""
+
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+import zipfile
+import pytest
+from unittest.mock import Mock
+from beast_unifi_servicenow.integration.import_set import ImportSetWriter, import_row, verify_manifest
+from beast_unifi_servicenow.integration.unifi_sync import UniFiServiceNowSync
+
+
+def clients(count):
+    for i in range(count):
+        yield {
+            'mac': f'cc:00:00:00:{i >> 8 & 255:02x}:{i & 255:02x}',
+            'hostname': f'host-{i}',
+            'rx_bytes': i,
+            'uptime_stats': {'WAN': {'uptime': i}},
+            'tags': ['a', 'b'],
+        }
+
+
+class TestImportSetWriter:
+    """Tests for ImportSetWriter."""
+    
+    def test_import_row(self):
+        """Test nested keys become underscore columns and lists JSON text."""
+        row = import_row(next(clients(1)))
+        assert row['uptime_stats_WAN_uptime'] == 0
+        assert row['tags'] == '["a","b"]'
+    
+    def test_csv_gzip_chunks_and_manifest(self, tmp_path):
+        """Test records are split into gzip CSV chunks listed in the manifest."""
+        with ImportSetWriter(tmp_path, rows_per_chunk=400, max_workers=3) as writer:
+            written = writer.write('u_unifi_client_import', clients(1000))
+        assert [c['rows'] for c in written] == [400, 400, 200]
+        
+        manifest = json.loads((tmp_path / 'manifest.json').read_text())
+        assert manifest['tables'] == {'u_unifi_client_import': {'chunks': 3, 'rows': 1000}}
+        assert [c['file'] for c in manifest['chunks']] == [
+            f'u_unifi_client_import-{i:05d}.csv.gz' for i in range(3)
+        ]
+        assert verify_manifest(tmp_path) == []
+        
+        rows = []
+        for chunk in manifest['chunks']:
+            text = gzip.decompress((tmp_path / chunk['file']).read_bytes()).decode('utf-8-sig')
+            rows.extend(csv.DictReader(io.StringIO(text)))
+        assert [r['hostname'] for r in rows] == [f'host-{i}' for i in range(1000)]
+        
+        (tmp_path / manifest['chunks'][1]['file']).write_bytes(b'corrupt')
+        assert verify_manifest(tmp_path) == [manifest['chunks'][1]['file']]
+    
+    def test_csv_header_shared_across_chunks(self, tmp_path):
+        """Test every chunk of a table has the same header, even for keys seen late."""
+        records = [{'mac': f'aa:{i:02x}'} for i in range(5)] + [{'mac': 'bb', 'ip': '10.0.0.1'}]
+        with ImportSetWriter(tmp_path, compression=None, rows_per_chunk=2) as writer:
+            writer.write('u_unifi_device_import', iter(records))
+            writer.write('u_unifi_device_import', [{'name': 'ap'}])
+        headers = [
+            (tmp_path / f'u_unifi_device_import-{i:05d}.csv').read_text(encoding='utf-8-sig').splitlines()[0]
+            for i in range(4)
+        ]
+        assert headers[:3] == ['mac,ip'] * 3
+        assert headers[3] == 'mac,ip,name'
+        assert writer.columns == {'u_unifi_device_import': ['mac', 'ip', 'name']}
+        assert not [p for p in tmp_path.iterdir() if p.name.startswith('tmp')]
+    
+    def test_json_zip(self, tmp_path):
+        """Test JSON chunks in zip archives expose rows under /records."""
+        with ImportSetWriter(tmp_path, fmt='json', compression='zip', rows_per_chunk=10) as writer:
+            writer.write('u_unifi_site_import', [{'siteId': 's1', 'meta': {'name': 'HQ'}}])
+        with zipfile.ZipFile(tmp_path / 'u_unifi_site_import-00000.json.zip') as archive:
+            data = json.loads(archive.read('u_unifi_site_import-00000.json'))
+        assert data == {'records': [{'siteId': 's1', 'meta_name': 'HQ'}]}
+        assert json.loads((tmp_path / 'manifest.json').read_text())['row_path'] == '/records'
+    
+    def test_invalid_options(self, tmp_path):
+        """Test unsupported formats are rejected."""
+        with pytest.raises(ValueError):
+            ImportSetWriter(tmp_path, fmt='xml')
+        with pytest.raises(ValueError):
+            ImportSetWriter(tmp_path, compression='bz2')
+    
+    def test_constant_memory(self, tmp_path):
+        """Test peak memory depends on chunk size, not record count."""
+        def peak(count):
+            tracemalloc.start()
+            try:
+                with ImportSetWriter(tmp_path / str(count), rows_per_chunk=500, max_workers=2) as writer:
+                    writer.write('u_unifi_client_import', clients(count))
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        small, large = peak(5_000), peak(40_000)
+        assert large < small * 1.5
+    
+    def test_sync_export(self, tmp_path):
+        """Test UniFiServiceNowSync exports every collection through one manifest."""
+        local = Mock()
+        local.get_devices.return_value = [{'mac': 'aa', 'model': 'U6'}]
+        local.get_sites.return_value = [{'name': 'default'}]
+        local.get_clients.return_value = list(clients(3))
+        sync = UniFiServiceNowSync('https://example.service-now.com', {'token': 't'}, local_client=local)
+        manifest = json.loads(sync.export_import_sets(tmp_path).read_text())
+        assert manifest['tables'] == {
+            'u_unifi_site_import': {'chunks': 1, 'rows': 1},
+            'u_unifi_device_import': {'chunks': 1, 'rows': 1},
+            'u_unifi_client_import': {'chunks': 1, 'rows': 3},
+        }
+        with pytest.raises(ValueError):
+            sync.export_import_sets(tmp_path, ['routers'])
@@ -0,0 +1,113 @@
+"""Integration tests for the CMDB lookup cache against a stand-in Table API."""
+
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from beast_unifi_servicenow.integration.lookup_cache import CMDBLookupCache
+from beast_unifi_servicenow.integration.table_api import TableAPIClient
+
+
+class TableAPIStandIn(BaseHTTPRequestHandler):
+    """Serves /api/now/table/<table> with encoded-query filtering and ordering."""
+    
+    tables = {}
+    requests = []
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        table = url.path.rsplit('/', 1)[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.requests.append((table, params))
+        
+        records = list(self.tables.get(table, []))
+        for condition in params.get('sysparm_query', '').split('^'):
+            for op in ('>=', '>'):
+                if op in condition and not condition.startswith('ORDERBY'):
+                    field, value = condition.split(op, 1)
+                    if op == '>=':
+                        records = [r for r in records if r[field] >= value]
+                    else:
+                        records = [r for r in records if r[field] > value]
+                    break
+        records.sort(key=lambda r: r['sys_id'])
+        fields = params['sysparm_fields'].split(',')
+        page = [{f: r.get(f, '') for f in fields} for r in records[:int(params['sysparm_limit'])]]
+        
+        body = json.dumps({'result': page}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def ci(n, updated=None, **fields):
+    record = {
+        'sys_id': f'{n:032x}',
+        'mac_address': f'AA:BB:CC:00:{n // 256:02X}:{n % 256:02X}',
+        'serial_number': f'SN{n:05d}',
+        'name': f'device-{n}',
+        'sys_updated_on': updated or f'2025-11-01 00:{n // 60:02d}:{n % 60:02d}',
+    }
+    record.update(fields)
+    return record
+
+
+@pytest.fixture
+def table_api():
+    TableAPIStandIn.tables = {'cmdb_ci_netgear': [ci(n) for n in range(250)]}
+    TableAPIStandIn.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), TableAPIStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestCMDBLookupCache:
+    """Tests for CMDBLookupCache."""
+    
+    def test_bulk_load_paginates(self, table_api):
+        """Test that a full load pages through the table in bulk."""
+        client = TableAPIClient(table_api, {'username': 'admin', 'password': 'pw'}, page_size=100)
+        cache = CMDBLookupCache(client)
+        assert cache.load() == 250
+        assert len(TableAPIStandIn.requests) == 3
+        
+        assert cache.lookup('mac', 'aabbcc000005') == f'{5:032x}'
+        assert cache.lookup('serial', 'sn00042') == f'{42:032x}'
+        assert cache.resolve({'mac': 'ff:ff:ff:ff:ff:ff', 'name': 'DEVICE-7'}) == f'{7:032x}'
+        assert cache.resolve({'mac': 'ff:ff:ff:ff:ff:ff'}) is None
+    
+    def test_incremental_refresh(self, table_api):
+        """Test that refresh only fetches records updated since the last read."""
+        client = TableAPIClient(table_api, {'token': 'secret'}, page_size=100)
+        cache = CMDBLookupCache(client)
+        cache.load()
+        
+        TableAPIStandIn.tables['cmdb_ci_netgear'][3] = ci(
+            3, updated='2025-11-02 08:00:00', mac_address='AA:BB:CC:99:99:99'
+        )
+        TableAPIStandIn.tables['cmdb_ci_netgear'].append(ci(900, updated='2025-11-02 09:00:00'))
+        TableAPIStandIn.requests.clear()
+        
+        # The record at the previous watermark is re-read (>=), plus the two changes
+        assert cache.refresh() == 3
+        assert cache.lookup('mac', 'aa:bb:cc:99:99:99') == f'{3:032x}'
+        assert cache.lookup('mac', 'aa:bb:cc:00:00:03') is None
+        assert cache.lookup('name', 'device-900') == f'{900:032x}'
+        
+        TableAPIStandIn.requests.clear()
+        assert cache.refresh() == 1
+        assert 'sys_updated_on>=2025-11-02 09:00:00' in TableAPIStandIn.requests[0][1]['sysparm_query']
+    
+    def test_credentials_required(self):
+        """Test that missing credentials raise ValueError."""
+        with pytest.raises(ValueError, match="credentials"):
+            TableAPIClient("https://test.instance.service-now.com", {})
@@ -0,0 +1,136 @@
+"""Peak-memory regression tests for 100k-record fetch, transform and export paths.
+
+Each test streams a synthetic ``rest/sta`` response of 100,000 clients
+(about 25 MB of JSON) through the real code path under ``tracemalloc``.
+Loading the same response as a list peaks at well over 60 MB; the bounds
+below leave headroom over measured values but fail if a path starts
+materialising the whole collection again.
+"""
+
+import gzip
+import io
+import tracemalloc
+from unittest.mock import Mock
+import requests
+from urllib3.response import HTTPResponse
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.utils.broker import SnapshotBroker
+from beast_unifi.utils.memory import MemoryBudget
+from beast_unifi_servicenow.integration.unifi_sync import UniFiServiceNowSync
+from beast_unifi_servicenow.integration.work_queue import WorkQueue
+
+
+RECORDS = 100_000
+MB = 1024 * 1024
+BUDGET = 8 * MB
+
+TEMPLATE = (
+    '{"_id":"%024x","mac":"cc:00:00:%02x:%02x:%02x","hostname":"host-%d",'
+    '"ip":"10.0.%d.%d","essid":"corp","ap_mac":"aa:bb:cc:00:00:01","last_seen":%d}'
+)
+
+
+def body(records, chunk_size):
+    """Generate the response body lazily so the test itself stays small."""
+    parts, size = [b'{"meta":{"rc":"ok"},"data":['], 0
+    for i in range(records):
+        part = (TEMPLATE % (i, i >> 16 & 255, i >> 8 & 255, i & 255, i, i >> 8 & 255, i & 255, i)).encode()
+        parts.append(b',' + part if i else part)
+        size += len(part)
+        if size >= chunk_size:
+            yield b''.join(parts)
+            parts, size = [], 0
+    parts.append(b']}')
+    yield b''.join(parts)
+
+
+def streaming_client(memory_budget=None):
+    client = LocalControllerClient(
+        base_url='https://192.168.1.1', api_token='test-token', memory_budget=memory_budget,
+    )
+    
+    def get(url, **kwargs):
+        response = Mock(status_code=200, headers={})
+        response.iter_content.side_effect = lambda size: body(RECORDS, size)
+        return response
+    
+    client.session = Mock()
+    client.session.get.side_effect = get
+    return client
+
+
+def gzip_client(memory_budget):
+    """Client whose responses are gzip-encoded, so Content-Length is the wire size."""
+    client = LocalControllerClient(
+        base_url='https://192.168.1.1', api_token='test-token', memory_budget=memory_budget,
+    )
+    compressed = gzip.compress(b''.join(body(RECORDS, 1 * MB)))
+    
+    def get(url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update({'Content-Encoding': 'gzip', 'Content-Length': str(len(compressed))})
+        response.raw = HTTPResponse(
+            body=io.BytesIO(compressed), headers=dict(response.headers), preload_content=False,
+        )
+        return response
+    
+    client.session = Mock()
+    client.session.get.side_effect = get
+    return client, len(compressed)
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    try:
+        result = fn()
+        return tracemalloc.get_traced_memory()[1] / MB, result
+    finally:
+        tracemalloc.stop()
+
+
+class TestMemoryRegression:
+    """Peak memory per 100k records."""
+    
+    def test_fetch_streaming(self):
+        """Test iterating a 100k-record listing stays under 2 MB."""
+        client = streaming_client()
+        peak, count = peak_mb(lambda: sum(1 for _ in client.iter_records('rest/sta')))
+        assert count == RECORDS
+        assert peak < 2
+    
+    def test_fetch_with_budget_spills(self, tmp_path):
+        """Test get_clients under an 8 MB budget spills instead of growing."""
+        client = streaming_client(MemoryBudget(limit=BUDGET, spill_directory=tmp_path))
+        peak, clients = peak_mb(client.get_clients)
+        assert clients.spilled and len(clients) == RECORDS
+        assert peak < 2 * BUDGET / MB
+    
+    def test_transform_and_enqueue(self, tmp_path):
+        """Test transforming 100k clients into the work queue stays bounded."""
+        client = streaming_client(MemoryBudget(limit=BUDGET, spill_directory=tmp_path))
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            sync = UniFiServiceNowSync('https://example.service-now.com', {'token': 't'},
+                                       local_client=client, work_queue=queue)
+            peak, _ = peak_mb(lambda: sync.enqueue('run-1', 'clients'))
+            assert queue.get_checkpoint('run-1', 'enqueued:clients') == RECORDS
+        assert peak < 2 * BUDGET / MB
+    
+    def test_export_snapshot(self, tmp_path):
+        """Test publishing 100k streamed records to the snapshot broker stays under 4 MB."""
+        client = streaming_client()
+        broker = SnapshotBroker(tmp_path)
+        peak, _ = peak_mb(lambda: broker.publish({'clients': client.iter_records('rest/sta')}))
+        with broker.open() as view:
+            assert len(view['clients']) == RECORDS
+        assert peak < 4
+    
+    def test_gzip_body_over_budget_streams(self, tmp_path):
+        """Test a gzip body whose wire size is under the threshold still streams and spills."""
+        budget = MemoryBudget(limit=BUDGET, spill_directory=tmp_path)
+        client, wire_size = gzip_client(budget)
+        assert wire_size < budget.stream_threshold
+        peak, clients = peak_mb(client.get_clients)
+        assert clients.spilled and len(clients) == RECORDS
+        assert clients[-1]['hostname'] == f"host-{RECORDS - 1}"
+        assert peak < 2 * BUDGET / MB
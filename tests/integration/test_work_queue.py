@@ -0,0 +1,167 @@
+"""Integration tests for the durable ServiceNow work queue."""
+
+import sqlite3
+import pytest
+from unittest.mock import Mock
+from beast_unifi_servicenow.integration.unifi_sync import UniFiServiceNowSync
+from beast_unifi_servicenow.integration.work_queue import (
+    WorkQueue,
+    drain_parallel,
+    idempotency_key,
+)
+
+
+def make_items(n, table='cmdb_ci_netgear'):
+    return [
+        (idempotency_key(table, f'aa:bb:cc:00:{i // 256:02x}:{i % 256:02x}', {'n': i}), table, {'n': i})
+        for i in range(n)
+    ]
+
+
+def record_batch(items):
+    """Module-level handler so worker processes can unpickle it."""
+    path = items[0].payload['db']
+    conn = sqlite3.connect(path, timeout=30)
+    with conn:
+        conn.executemany("INSERT INTO handled VALUES (?)", [(item.key,) for item in items])
+    conn.close()
+
+
+class TestWorkQueue:
+    """Tests for WorkQueue."""
+    
+    def test_enqueue_is_idempotent(self, tmp_path):
+        """Test that replaying an enqueue adds nothing."""
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            assert queue.enqueue('run-1', make_items(10)) == 10
+            assert queue.enqueue('run-1', make_items(12)) == 2
+            assert queue.stats('run-1')['pending'] == 12
+    
+    def test_enqueue_batches_release_the_lock(self, tmp_path):
+        """Test that a slow producer never holds the write lock between batches."""
+        path = tmp_path / 'queue.db'
+        with WorkQueue(path) as queue, WorkQueue(path, timeout=0) as worker:
+            def produce():
+                for item in make_items(25):
+                    # Raises "database is locked" if the producer held the lock
+                    worker.lease('worker-a', batch=1)
+                    yield item
+            
+            assert queue.enqueue('run-1', produce(), batch_size=10) == 25
+            assert sum(worker.stats('run-1').values()) == 25
+            with pytest.raises(ValueError):
+                queue.enqueue('run-1', [], batch_size=0)
+    
+    def test_resume_after_crash(self, tmp_path):
+        """Test that a crashed worker's leases are reclaimed by the next run."""
+        path = tmp_path / 'queue.db'
+        with WorkQueue(path) as queue:
+            queue.enqueue('run-1', make_items(10))
+            crashed = queue.lease('worker-a', batch=4, lease_seconds=-1)
+            assert len(crashed) == 4
+            queue.complete([item.id for item in queue.lease('worker-a', batch=2)], 'worker-a')
+        
+        handled = []
+        with WorkQueue(path) as queue:
+            completed = queue.drain(lambda items: handled.extend(i.key for i in items), worker='worker-b')
+            assert completed == 8
+            assert queue.stats() == {'pending': 0, 'leased': 0, 'done': 10, 'failed': 0}
+            # Stale worker cannot complete items it no longer holds
+            assert queue.complete([crashed[0].id], 'worker-a') == 0
+        assert len(handled) == len(set(handled)) == 8
+    
+    def test_failures_retry_then_park(self, tmp_path):
+        """Test that failing batches are retried up to max_attempts."""
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            queue.enqueue('run-1', make_items(3))
+            handler = Mock(side_effect=RuntimeError("503 Service Unavailable"))
+            assert queue.drain(handler, worker='w', max_attempts=2) == 0
+            assert handler.call_count == 2
+            assert queue.stats()['failed'] == 3
+    
+    def test_failed_and_completed_items_requeue(self, tmp_path):
+        """Test parked items retry on re-enqueue and done items only for a new run."""
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            queue.enqueue('run-1', make_items(3))
+            queue.drain(Mock(side_effect=RuntimeError("503")), worker='w', max_attempts=1)
+            assert queue.stats()['failed'] == 3
+            assert queue.enqueue('run-1', make_items(4)) == 4
+            assert queue.stats('run-1') == {'pending': 4, 'leased': 0, 'done': 0, 'failed': 0}
+            item = queue.lease('w', batch=1)[0]
+            assert item.attempts == 1
+            queue.complete([item.id], 'w')
+            
+            assert queue.enqueue('run-1', make_items(4)) == 0
+            assert queue.enqueue('run-2', make_items(4)) == 1
+            assert queue.stats('run-2')['pending'] == 1
+    
+    def test_checkpoints(self, tmp_path):
+        """Test checkpoint round trip."""
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            assert queue.get_checkpoint('run-1', 'enqueued:devices') is None
+            queue.set_checkpoint('run-1', 'enqueued:devices', 42)
+            assert queue.get_checkpoint('run-1', 'enqueued:devices') == 42
+    
+    def test_parallel_workers_process_each_item_once(self, tmp_path):
+        """Test draining with several processes."""
+        db = str(tmp_path / 'handled.db')
+        conn = sqlite3.connect(db)
+        conn.execute("CREATE TABLE handled (key TEXT)")
+        conn.commit()
+        
+        path = tmp_path / 'queue.db'
+        with WorkQueue(path) as queue:
+            queue.enqueue('run-1', [
+                (idempotency_key('t', str(i), {}), 't', {'db': db}) for i in range(200)
+            ])
+        assert drain_parallel(str(path), record_batch, processes=3, batch=10) == 200
+        keys = [row[0] for row in conn.execute("SELECT key FROM handled")]
+        assert len(keys) == len(set(keys)) == 200
+
+
+class TestSyncEnqueue:
+    """Tests for staging sync upserts."""
+    
+    def test_enqueue_devices_checkpoints(self, tmp_path):
+        """Test that a resumed run does not refetch an enqueued collection."""
+        local = Mock()
+        local.get_devices.return_value = [{'mac': 'aa:bb:cc:00:00:01'}, {'mac': 'aa:bb:cc:00:00:02'}]
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            sync = UniFiServiceNowSync(
+                servicenow_url="https://test.instance.service-now.com",
+                servicenow_credentials={"username": "test", "password": "test"},
+                local_client=local,
+                work_queue=queue,
+            )
+            assert sync.enqueue('run-1', 'devices') == 2
+            assert sync.enqueue('run-1', 'devices') == 0
+            local.get_devices.assert_called_once()
+    
+    def test_enqueue_stages_source_records(self, tmp_path):
+        """Test that items carry the source record, so changed records are not deduplicated."""
+        local = Mock()
+        local.get_devices.return_value = [{'mac': 'aa:bb:cc:00:00:01', 'version': '6.6.77'}]
+        with WorkQueue(tmp_path / 'queue.db') as queue:
+            sync = UniFiServiceNowSync(
+                servicenow_url="https://test.instance.service-now.com",
+                servicenow_credentials={"username": "test", "password": "test"},
+                local_client=local,
+                work_queue=queue,
+            )
+            sync.enqueue('run-1', 'devices')
+            local.get_devices.return_value = [{'mac': 'aa:bb:cc:00:00:01', 'version': '6.7.10'}]
+            assert sync.enqueue('run-2', 'devices') == 1
+            items = queue.lease('w1')
+            payloads = [item.payload for item in items]
+            assert [p['record']['version'] for p in payloads] == ['6.6.77', '6.7.10']
+            assert {item.target_table for item in items} == {'cmdb_ci_netgear'}
+            assert payloads[0]['identity'] == 'aa:bb:cc:00:00:01'
+    
+    def test_enqueue_requires_queue(self):
+        """Test that enqueue without a queue raises ValueError."""
+        sync = UniFiServiceNowSync(
+            servicenow_url="https://test.instance.service-now.com",
+            servicenow_credentials={"username": "test", "password": "test"},
+        )
+        with pytest.raises(ValueError, match="work_queue"):
+            sync.enqueue('run-1', 'devices')
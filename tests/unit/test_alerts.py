@@ -0,0 +1,199 @@
+"""Unit tests for the compiled alert rule engine."""
+
+import time
+import pytest
+from beast_unifi.analysis.alerts import AlertEngine, Rule, version_number
+
+
+def device(mac, **fields):
+    return {'mac': mac, 'type': 'uap', 'state': 1, 'name': mac, **fields}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestRule:
+    """Tests for rule compilation."""
+    
+    def test_fields_and_kinds(self):
+        """Test referenced fields are typed by what they are compared with."""
+        rule = Rule('gw', 'devices', "type in ['ugw', 'udm'] and version(version) < version('4.0.21')")
+        assert rule.fields == {('type', 'object'), ('version', 'version')}
+        rule = Rule('sites', 'sites', 'statistics.counts.offlineWifiDevice > 0')
+        assert rule.fields == {('statistics.counts.offlineWifiDevice', 'number')}
+    
+    def test_field_ordering_is_numeric(self):
+        """Test two fields compared by order are read as numbers."""
+        rule = Rule('full', 'devices', 'num_sta > max_sta')
+        assert rule.fields == {('num_sta', 'number'), ('max_sta', 'number')}
+        assert Rule('same', 'devices', 'name == hostname').fields == {('name', 'object'), ('hostname', 'object')}
+    
+    @pytest.mark.parametrize('condition', [
+        'state = 1', "name < 'b'", '__import__("os")', 'state in other', 'lambda: 1',
+    ])
+    def test_rejects_unsupported(self, condition):
+        """Test invalid or unsafe conditions fail at compile time."""
+        with pytest.raises(ValueError):
+            Rule('bad', 'devices', condition)
+    
+    def test_version_number(self):
+        """Test dotted versions sort numerically."""
+        assert version_number('4.0.21') < version_number('4.0.100') < version_number('v4.1')
+        assert version_number(None) != version_number(None)
+    
+    def test_message(self):
+        """Test messages render from record fields."""
+        rule = Rule('x', 'devices', 'state == 0', message='AP {name} ({missing}) offline')
+        assert rule.render({'name': 'lobby'}) == 'AP lobby (?) offline'
+
+
+class TestAlertEngine:
+    """Tests for AlertEngine evaluation and alert state."""
+    
+    def test_fire_once_and_resolve(self):
+        """Test alerts are de-duplicated while active and resolve when cleared."""
+        engine = AlertEngine([
+            Rule('ap-offline', 'devices', "type == 'uap' and state != 1", severity='critical'),
+            Rule('busy', 'devices', 'num_sta > 50'),
+        ])
+        events = engine.evaluate('devices', [device('AA', state=0), device('bb', num_sta=60)])
+        assert sorted((a.rule, a.key) for a in events['fired']) == [('ap-offline', 'aa'), ('busy', 'bb')]
+        assert engine.evaluate('devices', [device('AA', state=0), device('bb', num_sta=61)])['fired'] == []
+        assert [a.rule for a in engine.active()] == ['ap-offline', 'busy']
+        
+        events = engine.evaluate('devices', [device('aa'), device('bb', num_sta=61)])
+        assert [(a.rule, a.key) for a in events['resolved']] == [('ap-offline', 'aa')]
+        events = engine.evaluate('devices', [device('aa')])
+        assert [(a.rule, a.key) for a in events['resolved']] == [('busy', 'bb')]
+        assert engine.active() == []
+    
+    def test_only_changed_records_are_evaluated(self):
+        """Test unchanged snapshots evaluate no rules."""
+        engine = AlertEngine([Rule('down', 'devices', 'state == 0')])
+        fleet = [device(f'{i:04x}') for i in range(1000)]
+        engine.evaluate('devices', fleet)
+        evaluations = engine.stats['evaluations']
+        engine.evaluate('devices', fleet)
+        assert engine.stats['evaluations'] == evaluations
+        fleet[5] = device(fleet[5]['mac'], state=0, uptime=1)
+        assert len(engine.evaluate('devices', fleet)['fired']) == 1
+        assert engine.stats['changed'] == 1000 + 1
+    
+    def test_unrelated_field_changes_skip_rules(self):
+        """Test rules are only evaluated when one of their fields changes."""
+        engine = AlertEngine([Rule('down', 'devices', 'state == 0'), Rule('busy', 'devices', 'num_sta > 5')])
+        engine.evaluate('devices', [device('aa', num_sta=1)])
+        before = engine.stats['evaluations']
+        engine.evaluate('devices', [device('aa', num_sta=2)])
+        assert engine.stats['evaluations'] == before + 1
+    
+    def test_for_polls_cooldown_and_suppression(self):
+        """Test pending, flap suppression and maintenance windows."""
+        clock = Clock()
+        engine = AlertEngine([Rule('down', 'devices', 'state == 0', for_polls=2, cooldown=60)], clock=clock)
+        down, up = [device('aa', state=0)], [device('aa')]
+        assert engine.evaluate('devices', down)['fired'] == []
+        assert len(engine.evaluate('devices', down)['fired']) == 1
+        assert len(engine.evaluate('devices', up)['resolved']) == 1
+        
+        clock.now += 10
+        engine.evaluate('devices', down)
+        assert engine.evaluate('devices', down)['fired'] == []  # cooldown
+        clock.now += 60
+        assert len(engine.evaluate('devices', down)['fired']) == 1
+        
+        engine.evaluate('devices', up)
+        clock.now += 120
+        engine.suppress('down', 'aa', seconds=30)
+        engine.evaluate('devices', down)
+        assert engine.evaluate('devices', down)['fired'] == []
+        clock.now += 31
+        assert len(engine.evaluate('devices', down)['fired']) == 1
+        with pytest.raises(ValueError):
+            engine.suppress('unknown')
+    
+    def test_field_vs_field_rule(self):
+        """Test a field-vs-field ordering rule evaluates instead of raising."""
+        engine = AlertEngine([Rule('full', 'devices', 'num_sta > max_sta')])
+        events = engine.evaluate('devices', [device('aa', num_sta=9, max_sta=8), device('bb', num_sta=1, max_sta=8)])
+        assert [a.key for a in events['fired']] == ['aa']
+    
+    def test_rule_without_fields(self):
+        """Test a rule referencing no field applies to every record."""
+        engine = AlertEngine([Rule('audit', 'devices', '1 == 1', severity='info')])
+        assert sorted(a.key for a in engine.evaluate('devices', [device('aa'), device('bb')])['fired']) == ['aa', 'bb']
+        assert engine.evaluate('devices', [device('aa'), device('bb')])['fired'] == []
+        assert [a.key for a in engine.evaluate('devices', [device('aa')])['resolved']] == ['bb']
+    
+    def test_removed_records_resolve(self):
+        """Test alerts of records missing from the snapshot resolve."""
+        engine = AlertEngine([{'name': 'down', 'collection': 'devices', 'condition': 'state == 0'}])
+        engine.evaluate('devices', [device('aa', state=0)])
+        assert [a.key for a in engine.evaluate('devices', [])['resolved']] == ['aa']
+    
+    def test_removed_after_add_rule_resolve(self):
+        """Test records dropped after a rule is added still resolve their alerts."""
+        engine = AlertEngine([Rule('down', 'devices', 'state == 0')])
+        engine.evaluate('devices', [device('aa', state=0), device('bb')])
+        engine.add_rule(Rule('busy', 'devices', 'num_sta > 5'))
+        events = engine.evaluate('devices', [device('bb', num_sta=9)])
+        assert [(a.rule, a.key) for a in events['resolved']] == [('down', 'aa')]
+        assert [(a.rule, a.key) for a in events['fired']] == [('busy', 'bb')]
+    
+    def test_missing_fields_do_not_match_negations(self):
+        """Test != and not in are False for records without the field."""
+        engine = AlertEngine([
+            Rule('not-up', 'devices', 'state != 1'),
+            Rule('odd-type', 'devices', "model not in ['U6-LR', 'U7-Pro']"),
+            Rule('no-state', 'devices', 'not exists(state)'),
+        ])
+        records = [{'mac': 'aa', 'model': 'U6-LR', 'state': 0}, {'mac': 'bb'}]
+        fired = sorted((a.rule, a.key) for a in engine.evaluate('devices', records)['fired'])
+        assert fired == [('no-state', 'bb'), ('not-up', 'aa')]
+    
+    def test_cooldown_history_is_pruned(self):
+        """Test resolution times are forgotten once the cooldown has passed."""
+        clock = Clock()
+        engine = AlertEngine([Rule('down', 'devices', 'state == 0', cooldown=60)], clock=clock)
+        engine.evaluate('devices', [device(f'{i:04x}', state=0) for i in range(100)])
+        engine.evaluate('devices', [])
+        assert len(engine._resolved_at) == 100
+        clock.now += 61
+        engine.evaluate('devices', [])
+        assert engine._resolved_at == {}
+    
+    def test_site_statistics_and_firmware(self):
+        """Test nested Site Manager counters and version comparisons."""
+        engine = AlertEngine([
+            Rule('wifi-offline', 'sites', 'statistics.counts.offlineWifiDevice > 0'),
+            Rule('gw-behind', 'devices', "type in ['ugw', 'udm'] and version(version) < version('4.0.21')"),
+        ])
+        sites = [
+            {'siteId': 's1', 'statistics': {'counts': {'offlineWifiDevice': 2}}},
+            {'siteId': 's2', 'statistics': {'counts': {'offlineWifiDevice': 0}}},
+            {'siteId': 's3'},
+        ]
+        assert [a.key for a in engine.evaluate('sites', sites)['fired']] == ['s1']
+        devices = [
+            {'mac': 'g1', 'type': 'ugw', 'version': '4.0.20'},
+            {'mac': 'g2', 'type': 'udm', 'version': '4.0.100'},
+            {'mac': 'a1', 'type': 'uap', 'version': '1.0'},
+        ]
+        assert [a.key for a in engine.evaluate('devices', devices)['fired']] == ['g1']
+    
+    def test_thousands_of_rules_in_milliseconds(self):
+        """Test a changed-record poll over 2,000 rules stays fast."""
+        rules = [Rule(f'busy-{n}', 'devices', f'num_sta > {n} and state == 1') for n in range(2000)]
+        engine = AlertEngine(rules)
+        fleet = [device(f'{i:04x}', num_sta=i % 100) for i in range(5000)]
+        engine.evaluate('devices', fleet)
+        for i in range(20):
+            fleet[i] = device(fleet[i]['mac'], num_sta=fleet[i]['num_sta'] + 1)
+        started = time.perf_counter()
+        engine.evaluate('devices', fleet)
+        assert time.perf_counter() - started < 0.5
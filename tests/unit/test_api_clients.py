@@ -87,3 +87,63 @@ class TestLocalControllerClient:
         endpoint = client._get_endpoint("rest/device")
         assert "proxy/network/api/s/default/rest/device" in endpoint
 
+
+
+class TestLocalControllerFiltering:
+    """Tests for stat endpoints and server-side filtering."""
+    
+    @staticmethod
+    def make_client(payloads):
+        client = LocalControllerClient(base_url="https://192.168.1.1:443", api_token="test-token")
+        calls = []
+        
+        def respond(method):
+            def request(url, json=None, **kwargs):
+                calls.append((method, url.split('/s/default/')[-1], json))
+                response = Mock(status_code=200)
+                response.json.return_value = {'data': payloads.get(url.split('/s/default/')[-1], [])}
+                return response
+            return request
+        
+        client.session = Mock()
+        client.session.get.side_effect = respond('GET')
+        client.session.post.side_effect = respond('POST')
+        return client, calls
+    
+    def test_get_devices_by_mac_uses_filtered_stat(self):
+        """Test that a MAC filter is sent to stat/device."""
+        client, calls = self.make_client({'stat/device': [{'mac': 'aa:bb:cc:00:00:01'}]})
+        devices = client.get_devices(macs=['AA:BB:CC:00:00:01'])
+        assert len(devices) == 1
+        assert calls == [('POST', 'stat/device', {'macs': ['aa:bb:cc:00:00:01']})]
+    
+    def test_get_devices_by_type_resolves_via_basic(self):
+        """Test that a type filter uses stat/device-basic before fetching details."""
+        client, calls = self.make_client({'stat/device-basic': [
+            {'mac': 'aa:bb:cc:00:00:01', 'type': 'uap'},
+            {'mac': 'aa:bb:cc:00:00:02', 'type': 'usw'},
+            {'type': 'uap'},
+        ]})
+        client.get_devices(types=['uap'])
+        assert calls[0][:2] == ('GET', 'stat/device-basic')
+        assert calls[1] == ('POST', 'stat/device', {'macs': ['aa:bb:cc:00:00:01']})
+    
+    def test_active_clients_per_mac(self):
+        """Test that small MAC lists query stat/sta/<mac> individually."""
+        client, calls = self.make_client({})
+        client.get_clients(macs=['cc:cc:cc:00:00:01'])
+        assert calls == [('GET', 'stat/sta/cc:cc:cc:00:00:01', None)]
+    
+    def test_counts_from_light_endpoints(self):
+        """Test counting clients from stat/health and devices from device-basic."""
+        client, calls = self.make_client({
+            'stat/health': [
+                {'subsystem': 'wlan', 'num_user': 40, 'num_guest': 2},
+                {'subsystem': 'lan', 'num_user': 10},
+                {'subsystem': 'wan', 'num_gw': 1},
+            ],
+            'stat/device-basic': [{'type': 'uap'}, {'type': 'uap'}, {'type': 'usw'}],
+        })
+        assert client.count_clients() == 52
+        assert client.count_devices() == {'uap': 2, 'usw': 1}
+        assert [c[1] for c in calls] == ['stat/health', 'stat/device-basic']
@@ -0,0 +1,106 @@
+"""Unit tests for the snapshot archive."""
+
+import pytest
+from beast_unifi.utils.archive import SnapshotArchive, canonical_json
+
+
+def make_devices(n, changed=None):
+    devices = [{'_id': f'd{i}', 'mac': f'aa:bb:cc:00:00:{i:02x}', 'version': '6.6.77'}
+               for i in range(n)]
+    for i in changed or []:
+        devices[i]['version'] = '6.7.10'
+    return devices
+
+
+class TestSnapshotArchive:
+    """Tests for SnapshotArchive."""
+    
+    def test_roundtrip(self, tmp_path):
+        """Test that a stored snapshot rebuilds exactly."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        data = {'devices': make_devices(5), 'sites': [{'siteId': 's1', 'meta': {'name': 'HQ'}}]}
+        archive.store(data, snapshot_id='001')
+        assert archive.load('001') == data
+        assert archive.load('001', collections=['sites']) == {'sites': data['sites']}
+    
+    def test_deduplicates_unchanged_records(self, tmp_path):
+        """Test that unchanged records are stored once across snapshots."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        archive.store({'devices': make_devices(50)}, snapshot_id='001')
+        archive.store({'devices': make_devices(50, changed=[3])}, snapshot_id='002')
+        stats = archive.stats()
+        assert stats['snapshots'] == 2
+        assert stats['records'] == 100
+        assert stats['objects'] == 51
+        assert archive.manifest('002')['new_objects'] == 1
+    
+    def test_diff_from_manifests(self, tmp_path):
+        """Test comparing two snapshots by identity."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        archive.store({'devices': make_devices(4)}, snapshot_id='001')
+        devices = make_devices(5, changed=[1])[1:]
+        archive.store({'devices': devices}, snapshot_id='002')
+        diff = archive.diff('001', '002')['devices']
+        assert diff == {'added': ['_id:d4'], 'removed': ['_id:d0'], 'changed': ['_id:d1']}
+    
+    def test_delete_and_gc(self, tmp_path):
+        """Test that deleting a snapshot lets gc reclaim its unique objects."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        archive.store({'devices': make_devices(3)}, snapshot_id='001')
+        archive.store({'devices': make_devices(3, changed=[0])}, snapshot_id='002')
+        archive.delete('001')
+        assert archive.gc() == 1
+        assert archive.load('002')['devices'][0]['version'] == '6.7.10'
+        with pytest.raises(KeyError, match="Unknown snapshot"):
+            archive.load('001')
+    
+    def test_gc_decompresses_each_block_once(self, tmp_path):
+        """Test compaction reads every surviving block once, not once per object."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        archive.store({'devices': make_devices(200)}, snapshot_id='001')
+        archive.store({'devices': make_devices(200)[:100]}, snapshot_id='002')
+        archive.delete('001')
+        reads = []
+        read_block = archive._read_block
+        archive._read_block = lambda segment, block: reads.append((segment, block)) or read_block(segment, block)
+        assert archive.gc() == 100
+        assert reads and len(reads) == len(set(reads))
+        assert archive.load('002')['devices'] == make_devices(100)
+    
+    def test_packs_small_records_into_segments(self, tmp_path):
+        """Test that thousands of small records land in a few compact files."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        devices = make_devices(5000)
+        for i, device in enumerate(devices):
+            device.update(_id=f'd{i}', name=f'ap-{i:05d}', model='U6LR', state=1, uptime=86400)
+        raw = 0
+        for n in range(10):
+            devices[n] = {**devices[n], 'version': '6.7.10'}
+            archive.store({'devices': devices}, snapshot_id=f'{n:03d}')
+            raw += sum(len(canonical_json(d)) for d in devices)
+        stats = archive.stats()
+        assert stats['objects'] == 5009 and stats['segments'] == 10
+        assert len(list(tmp_path.rglob('*.seg'))) == 10
+        assert (stats['object_bytes'] + stats['manifest_bytes']) * 10 < raw
+        # Unchanged records cost a few bits of manifest each
+        assert (tmp_path / 'manifests' / '009.manifest').stat().st_size < 500
+        reopened = SnapshotArchive(tmp_path, codec='zlib')
+        assert reopened.load('009')['devices'] == devices
+        assert reopened.diff('008', '009')['devices']['changed'] == ['_id:d9']
+    
+    def test_default_ids_are_unique(self, tmp_path):
+        """Test that snapshots stored in the same second do not overwrite each other."""
+        archive = SnapshotArchive(tmp_path, codec='zlib')
+        ids = [archive.store({'devices': make_devices(2, changed=[i % 2])}) for i in range(5)]
+        assert len(set(ids)) == 5
+        assert archive.snapshots() == sorted(ids)
+    
+    def test_zstd_roundtrip(self, tmp_path):
+        """Test the default zstd codec, reading zlib segments written earlier."""
+        pytest.importorskip('zstandard')
+        SnapshotArchive(tmp_path, codec='zlib').store({'devices': make_devices(3)}, snapshot_id='001')
+        archive = SnapshotArchive(tmp_path)
+        assert archive.codec.name == 'zstd'
+        archive.store({'devices': make_devices(4, changed=[0])}, snapshot_id='002')
+        assert archive.load('001')['devices'] == make_devices(3)
+        assert archive.load('002')['devices'] == make_devices(4, changed=[0])
@@ -0,0 +1,104 @@
+"""Unit tests for the shared-memory snapshot broker."""
+
+import multiprocessing
+import threading
+import numpy as np
+import pytest
+from beast_unifi.utils.broker import SnapshotBroker
+
+
+DEVICES = [{'mac': f'aa:bb:cc:00:00:{i:02x}', 'name': f'ap-{i}', 'uptime': i * 10} for i in range(50)]
+CLIENTS = [{'mac': 'cc:cc:cc:00:00:01', 'hostname': 'laptop'}]
+
+
+def count_devices(root):
+    with SnapshotBroker(root).open() as view:
+        return len(view['devices']), view['devices'][49]['name']
+
+
+class TestSnapshotBroker:
+    """Tests for SnapshotBroker."""
+    
+    def test_publish_and_read(self, tmp_path):
+        """Test records round-trip through the mapped file."""
+        broker = SnapshotBroker(tmp_path)
+        assert broker.generation() is None
+        assert broker.publish({'devices': DEVICES, 'clients': CLIENTS}) == 1
+        with broker.open() as view:
+            assert view.generation == 1
+            assert view.collections() == ['devices', 'clients']
+            assert list(view['devices']) == DEVICES
+            assert view['devices'][-1] == DEVICES[-1]
+            assert view['devices'][1:3] == DEVICES[1:3]
+            assert bytes(view['clients'].raw(0)) == b'{"mac":"cc:cc:cc:00:00:01","hostname":"laptop"}'
+            with pytest.raises(IndexError):
+                view['clients'].raw(1)
+    
+    def test_empty_collections(self, tmp_path):
+        """Test empty collections and snapshots are valid."""
+        broker = SnapshotBroker(tmp_path)
+        broker.publish({'devices': []})
+        with broker.open() as view:
+            assert len(view['devices']) == 0
+    
+    def test_typed_columns(self, tmp_path):
+        """Test requested fields are readable as arrays without decoding records."""
+        records = [
+            {'mac': 'aa', 'state': 1, 'sys_stats': {'cpu': 12.5}, 'version': '7.0'},
+            {'mac': 'bb', 'state': None, 'version': 7},
+            {'mac': 'cc', 'state': 0, 'sys_stats': {'cpu': 3}, 'version': '7.0'},
+        ]
+        broker = SnapshotBroker(tmp_path)
+        broker.publish({'devices': records, 'clients': CLIENTS},
+                       columns={'devices': ['mac', 'state', 'sys_stats.cpu', 'version', 'absent']})
+        with broker.open() as view:
+            devices = view['devices']
+            assert devices.columns() == ['mac', 'state', 'sys_stats.cpu', 'version', 'absent']
+            assert list(devices.column('mac')) == ['aa', 'bb', 'cc']
+            state = devices.column('state')
+            assert state.dtype == np.float64 and not state.flags.writeable
+            assert state[0] == 1 and np.isnan(state[1]) and state[2] == 0
+            assert list(devices.column('sys_stats.cpu')[[0, 2]]) == [12.5, 3.0]
+            # A number seen before a string is kept as its text
+            assert list(devices.column('version')) == ['7.0', '7', '7.0']
+            codes, strings = devices.codes('version')
+            assert strings == ['7.0', '7'] and list(codes) == [0, 1, 0]
+            assert np.isnan(devices.column('absent')).all()
+            assert list(devices) == records
+            assert view['clients'].columns() == []
+            with pytest.raises(KeyError):
+                view['clients'].column('mac')
+            with pytest.raises(ValueError):
+                devices.codes('state')
+    
+    def test_old_generations_pruned(self, tmp_path):
+        """Test only the newest generations stay on disk."""
+        broker = SnapshotBroker(tmp_path, keep=2)
+        for _ in range(4):
+            broker.publish({'devices': DEVICES})
+        assert sorted(p.name for p in tmp_path.glob('*.snap')) == [
+            'gen-000000000003.snap', 'gen-000000000004.snap',
+        ]
+        with pytest.raises(FileNotFoundError):
+            broker.open(1)
+    
+    def test_wait_for_new_generation(self, tmp_path):
+        """Test consumers are woken by a new generation."""
+        broker = SnapshotBroker(tmp_path, poll_interval=0.01)
+        broker.publish({'devices': DEVICES})
+        assert broker.wait(after=1, timeout=0.05) is None
+        threading.Timer(0.05, broker.publish, ({'devices': DEVICES[:1]},)).start()
+        assert broker.wait(after=1, timeout=5) == 2
+    
+    def test_subscribe(self, tmp_path):
+        """Test subscribe yields each generation until the timeout."""
+        broker = SnapshotBroker(tmp_path, poll_interval=0.01)
+        broker.publish({'devices': DEVICES})
+        views = [(view.generation, len(view['devices'])) for view in broker.subscribe(timeout=0.05)]
+        assert views == [(1, 50)]
+    
+    def test_other_process_reads_snapshot(self, tmp_path):
+        """Test a consumer in another process maps the same file."""
+        SnapshotBroker(tmp_path).publish({'devices': DEVICES})
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            assert pool.apply(count_devices, (str(tmp_path),)) == (50, 'ap-49')
@@ -0,0 +1,70 @@
+"""Unit tests for response decoding."""
+
+import json
+import pytest
+from dataclasses import dataclass
+from typing import Optional
+from unittest.mock import Mock
+from beast_unifi.utils import codec
+
+
+@dataclass
+class Client:
+    mac: str
+    ip: Optional[str] = None
+
+
+PAYLOAD = json.dumps({'meta': {'rc': 'ok'}, 'data': [
+    {'mac': 'cc:cc:cc:00:00:01', 'ip': '10.0.0.1', 'hostname': 'laptop'},
+    {'mac': 'cc:cc:cc:00:00:02'},
+]}).encode()
+
+
+@pytest.fixture(autouse=True)
+def restore_backend():
+    backend = codec.get_backend()
+    yield
+    codec.set_backend(backend)
+
+
+class TestCodec:
+    """Tests for JSON backends and typed decoding."""
+    
+    def test_every_backend_decodes_the_same(self):
+        """Test that all installed backends agree with stdlib json."""
+        expected = json.loads(PAYLOAD)['data']
+        for backend in codec.available_backends():
+            codec.set_backend(backend)
+            assert codec.decode_data(PAYLOAD) == expected
+    
+    def test_unknown_backend_raises(self):
+        """Test that selecting a missing backend raises ValueError."""
+        with pytest.raises(ValueError, match="not available"):
+            codec.set_backend('simdjson')
+    
+    def test_typed_decoding(self):
+        """Test decoding records into a dataclass, ignoring extra fields."""
+        clients = codec.decode_data(PAYLOAD, Client)
+        assert clients == [Client('cc:cc:cc:00:00:01', '10.0.0.1'), Client('cc:cc:cc:00:00:02')]
+    
+    def test_typed_decoding_without_msgspec(self, monkeypatch):
+        """Test the stdlib fallback for typed decoding."""
+        monkeypatch.setattr(codec, 'msgspec', None)
+        codec.set_backend('json')
+        assert codec.decode_data(PAYLOAD, Client)[1] == Client('cc:cc:cc:00:00:02')
+    
+    def test_response_json_uses_raw_content(self):
+        """Test that raw bodies bypass response.json()."""
+        response = Mock(content=PAYLOAD)
+        assert codec.response_json(response)['meta'] == {'rc': 'ok'}
+        response.json.assert_not_called()
+    
+    def test_clients_negotiate_compression(self):
+        """Test that both clients send Accept-Encoding."""
+        from beast_unifi.api.local_controller import LocalControllerClient
+        from beast_unifi.api.site_manager import SiteManagerClient
+        for client in (
+            SiteManagerClient(api_key='test-key'),
+            LocalControllerClient(base_url='https://192.168.1.1', api_token='test-token'),
+        ):
+            assert 'gzip' in client.session.headers['Accept-Encoding']
@@ -0,0 +1,168 @@
+"""Unit tests for adaptive concurrency limiting."""
+
+import threading
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.utils.concurrency import AdaptiveLimiter, controller_limiter, controller_metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def run(limiter, clock, latency, requests, success=True, parallel=None):
+    """Issue requests in waves of ``parallel`` with a fixed latency."""
+    for _ in range(requests):
+        wave = parallel or limiter.limit
+        starts = [limiter.acquire() for _ in range(wave)]
+        clock.now += latency
+        for started in starts:
+            limiter.release(started, success)
+
+
+def run_jittered(limiter, clock, sample, waves):
+    """Issue waves at the current limit, each request with its own latency."""
+    for _ in range(waves):
+        started = clock.now
+        starts = [limiter.acquire() for _ in range(limiter.limit)]
+        for latency, start in sorted(zip(sample(len(starts)), starts, strict=True)):
+            clock.now = started + latency
+            limiter.release(start)
+
+
+class TestAdaptiveLimiter:
+    """Tests for AdaptiveLimiter."""
+    
+    def test_invalid_limits_raise(self):
+        """Test limit bounds are validated."""
+        with pytest.raises(ValueError):
+            AdaptiveLimiter(initial=10, max_limit=5)
+        with pytest.raises(ValueError):
+            AdaptiveLimiter(backoff=1.5)
+    
+    def test_grows_while_latency_is_flat(self):
+        """Test additive increase on a controller that keeps up."""
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=4, max_limit=32, clock=clock)
+        run(limiter, clock, 0.05, 40)
+        assert limiter.limit > 16
+        assert limiter.stats['increases'] > 0
+    
+    def test_shrinks_when_latency_rises(self):
+        """Test the gradient cut when a controller slows under load."""
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=16, max_limit=32, clock=clock)
+        run(limiter, clock, 0.05, 5)
+        before = limiter.limit
+        run(limiter, clock, 0.5, 10)
+        assert limiter.limit < before
+        assert limiter.stats['decreases'] > 0
+    
+    @pytest.mark.parametrize('sample', [
+        lambda rng, n: rng.uniform(0.02, 0.06, n),
+        lambda rng, n: 0.04 * rng.lognormal(0.0, 0.35, n),
+    ], ids=['uniform', 'lognormal'])
+    def test_jitter_does_not_collapse_limit(self, sample):
+        """Test load-independent latency noise does not drive the limit down."""
+        clock = FakeClock()
+        rng = np.random.default_rng(1)
+        limiter = AdaptiveLimiter(initial=8, max_limit=32, clock=clock)
+        run_jittered(limiter, clock, lambda n: sample(rng, n), 200)
+        assert limiter.limit >= 24
+    
+    def test_sustained_slowdown_still_shrinks_under_jitter(self):
+        """Test a real load-driven slowdown is detected through the noise."""
+        clock = FakeClock()
+        rng = np.random.default_rng(2)
+        limiter = AdaptiveLimiter(initial=32, max_limit=32, clock=clock)
+        run_jittered(limiter, clock, lambda n: rng.uniform(0.02, 0.06, n), 50)
+        run_jittered(limiter, clock, lambda n: rng.uniform(0.2, 0.6, n), 20)
+        assert limiter.limit <= 8
+    
+    def test_concurrent_errors_cut_once(self):
+        """Test failures of requests in flight together back off only once."""
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=16, clock=clock)
+        starts = [limiter.acquire() for _ in range(8)]
+        clock.now += 0.05
+        for started in starts:
+            limiter.release(started, success=False)
+        assert limiter.limit == 8 and limiter.stats['errors'] == 8
+    
+    def test_errors_back_off_to_minimum(self):
+        """Test multiplicative decrease on errors, bounded by min_limit."""
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=16, min_limit=2, clock=clock)
+        run(limiter, clock, 0.05, 1, success=False, parallel=1)
+        assert limiter.limit == 8
+        run(limiter, clock, 0.05, 10, success=False, parallel=1)
+        assert limiter.limit == 2
+        assert limiter.stats['errors'] == 11
+    
+    def test_blocks_at_limit(self):
+        """Test acquire waits for a free slot and honours its timeout."""
+        limiter = AdaptiveLimiter(initial=1, max_limit=1)
+        started = limiter.acquire()
+        with pytest.raises(TimeoutError):
+            limiter.acquire(timeout=0.01)
+        threading.Timer(0.05, limiter.release, (started,)).start()
+        limiter.release(limiter.acquire(timeout=5))
+        assert limiter.stats['in_flight'] == 0
+    
+    def test_slot_counts_exceptions_as_errors(self):
+        """Test the context manager reports failures."""
+        limiter = AdaptiveLimiter(initial=4)
+        with pytest.raises(RuntimeError):
+            with limiter.slot():
+                raise RuntimeError("boom")
+        assert limiter.limit == 2
+    
+    def test_controller_limiter_is_shared_per_host(self):
+        """Test sites on one controller share a limiter visible in metrics."""
+        a = controller_limiter('https://10.9.9.1:443', initial=2)
+        b = controller_limiter('https://10.9.9.1:443/')
+        assert a is b
+        assert controller_metrics()['10.9.9.1:443']['limit'] == 2
+    
+    def test_local_client_reports_overload(self):
+        """Test LocalControllerClient releases slots and treats 503 as an error."""
+        limiter = AdaptiveLimiter(initial=8)
+        client = LocalControllerClient(
+            base_url="https://192.168.1.1:443", api_token="test-token", concurrency_limiter=limiter,
+        )
+        client.session = Mock()
+        client.session.get.return_value = Mock(status_code=503)
+        client.get('stat/health')
+        assert limiter.stats == {**limiter.stats, 'limit': 4, 'in_flight': 0, 'errors': 1}
+    
+    def test_streamed_response_holds_slot_until_closed(self):
+        """Test stream=True keeps the slot while the body is read and times the whole transfer."""
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(initial=4, clock=clock)
+        client = LocalControllerClient(
+            base_url="https://192.168.1.1:443", api_token="test-token", concurrency_limiter=limiter,
+        )
+        in_flight = []
+        
+        def chunks(size):
+            for part in (b'{"data": [{"n": 1},', b' {"n": 2}]}'):
+                clock.now += 1.0
+                in_flight.append(limiter.stats['in_flight'])
+                yield part
+        
+        response = Mock(status_code=200, headers={})
+        response.iter_content.side_effect = chunks
+        client.session = Mock()
+        client.session.get.return_value = response
+        assert [r['n'] for r in client.iter_records('rest/sta')] == [1, 2]
+        assert in_flight == [1, 1]
+        assert limiter.stats['in_flight'] == 0
+        assert limiter.stats['latency'] == 2.0
+        response.close()
+        assert limiter.stats['successes'] == 1
@@ -0,0 +1,91 @@
+"""Unit tests for drift analysis."""
+
+import pandas as pd
+from beast_unifi.analysis.drift import DriftAnalyzer, version_key
+
+
+def host(host_id, model, version, channel='release', frequency='weekly'):
+    return {
+        'id': host_id,
+        'type': 'console',
+        'reportedState': {
+            'hostname': host_id,
+            'hardware': {'shortname': model},
+            'version': version,
+            'release_channel': channel,
+            'autoUpdate': {'schedule': {'frequency': frequency, 'day': 1, 'hour': 3}},
+        },
+    }
+
+
+HOSTS = [
+    host('h1', 'UDM', '4.0.21'),
+    host('h2', 'UDM', '4.0.21'),
+    host('h3', 'UDM', '3.2.12', frequency='monthly'),
+    host('h4', 'UCG', '4.1.3', channel='early-access'),
+    host('h5', 'UCG', '4.1.3'),
+]
+
+
+class TestDriftAnalyzer:
+    """Tests for DriftAnalyzer."""
+    
+    def test_version_key_orders_numerically(self):
+        """Test that 4.0.21 sorts above 4.0.9 and builds above releases."""
+        keys = version_key(pd.Series(['4.0.9', '4.0.21', '4.0.21.100', None]))
+        assert keys[0] < keys[1] < keys[2]
+        assert pd.isna(keys[3])
+    
+    def test_version_distribution(self):
+        """Test per-model version counts and shares."""
+        analyzer = DriftAnalyzer()
+        analyzer.update_hosts(HOSTS)
+        dist = analyzer.version_distribution(by='model')
+        udm = dist[dist['model'] == 'UDM'].set_index('version')
+        assert udm.loc['4.0.21', 'count'] == 2
+        assert udm.loc['3.2.12', 'share'] == 1 / 3
+    
+    def test_outliers(self):
+        """Test firmware and schedule outliers within peer groups."""
+        analyzer = DriftAnalyzer()
+        analyzer.update_hosts(HOSTS)
+        behind = analyzer.outliers(by='model')
+        assert list(behind.index) == ['h3']
+        assert behind.loc['h3', 'latest'] == '4.0.21'
+        assert bool(behind.loc['h3', 'behind'])
+        
+        schedules = analyzer.outliers(column='update_schedule', by='type')
+        assert list(schedules.index) == ['h3']
+    
+    def test_unparsable_version_is_not_latest(self):
+        """Test that a garbage version string never becomes the group's latest."""
+        analyzer = DriftAnalyzer()
+        analyzer.update_hosts(HOSTS + [host('h6', 'UDM', 'unknown')])
+        assert analyzer.outliers(by='model').loc['h3', 'latest'] == '4.0.21'
+    
+    def test_incremental_updates(self):
+        """Test that only changed hosts are reported between snapshots."""
+        analyzer = DriftAnalyzer()
+        assert analyzer.update_hosts(HOSTS)['added'] == ['h1', 'h2', 'h3', 'h4', 'h5']
+        upgraded = HOSTS[:2] + [host('h3', 'UDM', '4.0.21')] + HOSTS[3:4]
+        changes = analyzer.update_hosts(upgraded)
+        assert changes == {'added': [], 'changed': ['h3'], 'removed': ['h5']}
+        assert analyzer.outliers(by='model').empty
+    
+    def test_config_drift(self):
+        """Test that a network differing from the fleet majority is flagged."""
+        analyzer = DriftAnalyzer()
+        for site, vlan in (('a', 20), ('b', 20), ('c', 30)):
+            octet = ord(site)
+            analyzer.update_networks(site, [
+                {'_id': f'{site}-1', 'site_id': site, 'name': 'IoT', 'purpose': 'corporate',
+                 'vlan': vlan, 'vlan_enabled': True, 'ip_subnet': f'10.{octet}.20.1/24',
+                 'dhcpd_start': f'10.{octet}.20.6', 'dhcpd_stop': f'10.{octet}.20.254'},
+                {'_id': f'{site}-2', 'site_id': site, 'name': 'LAN', 'purpose': 'corporate'},
+            ])
+        drift = analyzer.config_drift()
+        assert list(drift.index) == ['c/IoT']
+        assert drift.loc['c/IoT', 'sites'] == 2
+        
+        assert analyzer.update_networks('c', [])['removed'] == ['c/IoT', 'c/LAN']
+        assert analyzer.config_drift().empty
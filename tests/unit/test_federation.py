@@ -0,0 +1,97 @@
+"""Unit tests for multi-account federation."""
+
+import pytest
+from unittest.mock import Mock, patch
+from beast_unifi.api.federation import FederatedCollector
+from beast_unifi.credentials.env import load_accounts_from_env
+from beast_unifi.utils.rate_limit import RateLimiter
+
+
+def make_client(hosts, sites, fail=False):
+    client = Mock()
+    client.get_hosts.return_value = hosts
+    if fail:
+        client.get_sites.side_effect = RuntimeError("429 Too Many Requests")
+    else:
+        client.get_sites.return_value = sites
+    return client
+
+
+class TestFederatedCollector:
+    """Tests for FederatedCollector."""
+    
+    def test_requires_api_keys(self):
+        """Test that an empty account mapping raises ValueError."""
+        with pytest.raises(ValueError, match="At least one API key"):
+            FederatedCollector({})
+    
+    def test_collect_merges_and_tags(self):
+        """Test that records are de-duplicated and tagged by account."""
+        clients = {
+            'key-a': make_client([{'id': 'h1'}, {'id': 'shared'}], [{'siteId': 's1'}]),
+            'key-b': make_client([{'id': 'shared'}, {'id': 'h2'}], [{'siteId': 's2'}]),
+        }
+        collector = FederatedCollector(
+            {'a': 'key-a', 'b': 'key-b'},
+            client_factory=lambda key, limiter: clients[key],
+        )
+        result = collector.collect(['hosts', 'sites'])
+        
+        hosts = {h['id']: h['_accounts'] for h in result['hosts']}
+        assert hosts == {'h1': ['a'], 'shared': ['a', 'b'], 'h2': ['b']}
+        assert len(result['sites']) == 2
+        assert collector.errors == {}
+    
+    def test_collect_isolates_failures(self):
+        """Test that one failing account does not fail the whole run."""
+        clients = {
+            'key-a': make_client([{'id': 'h1'}], [{'siteId': 's1'}]),
+            'key-b': make_client([{'id': 'h2'}], [], fail=True),
+        }
+        collector = FederatedCollector(
+            {'a': 'key-a', 'b': 'key-b'},
+            client_factory=lambda key, limiter: clients[key],
+        )
+        result = collector.collect(['hosts', 'sites'])
+        assert len(result['hosts']) == 2
+        assert [s['siteId'] for s in result['sites']] == ['s1']
+        assert 'Too Many Requests' in collector.errors['b']['sites']
+    
+    def test_unknown_collection_raises(self):
+        """Test that unknown collection names raise ValueError."""
+        collector = FederatedCollector({'a': 'key-a'}, client_factory=lambda key, limiter: Mock())
+        with pytest.raises(ValueError, match="Unknown collection"):
+            collector.collect(['firewall'])
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter."""
+    
+    def test_waits_after_burst(self):
+        """Test that requests beyond the burst are delayed."""
+        sleeps = []
+        limiter = RateLimiter(2.0, burst=2, clock=lambda: 0.0, sleep=sleeps.append)
+        limiter.acquire()
+        limiter.acquire()
+        assert sleeps == []
+        assert limiter.acquire() == pytest.approx(0.5)
+        assert sleeps == [pytest.approx(0.5)]
+    
+    def test_weighted_acquire(self):
+        """Test taking many tokens at once, as a bytes-per-second cap does."""
+        limiter = RateLimiter(1000.0, burst=100, clock=lambda: 0.0, sleep=lambda s: None)
+        assert limiter.acquire(100) == 0
+        assert limiter.acquire(500) == pytest.approx(0.5)
+
+
+class TestLoadAccountsFromEnv:
+    """Tests for multi-account environment loading."""
+    
+    @patch('beast_unifi.credentials.env.load_dotenv')
+    def test_suffixed_keys(self, mock_load_dotenv, monkeypatch):
+        """Test that UNIFI_API_KEY_<NAME> variables become accounts."""
+        monkeypatch.setenv('UNIFI_API_KEY', 'key-default')
+        monkeypatch.setenv('UNIFI_API_KEY_ACME', 'key-acme')
+        monkeypatch.setenv('UNIFI_API_KEY_GLOBEX', 'key-globex')
+        accounts = load_accounts_from_env()
+        assert accounts == {'acme': 'key-acme', 'globex': 'key-globex', 'default': 'key-default'}
@@ -0,0 +1,106 @@
+"""Unit tests for incremental site health rollups."""
+
+import pytest
+from beast_unifi.analysis.health import SiteHealth, controller_health_metrics, site_manager_metrics
+
+
+def site(site_id, total=10, offline=0, gateways=1, gateways_offline=0, wifi=20, wired=5, **percentages):
+    return {
+        'siteId': site_id,
+        'statistics': {
+            'counts': {
+                'totalDevice': total, 'offlineDevice': offline,
+                'gatewayDevice': gateways, 'offlineGatewayDevice': gateways_offline,
+                'wifiClient': wifi, 'wiredClient': wired, 'guestClient': 0,
+                'criticalNotification': 0, 'pendingUpdateDevice': 1,
+            },
+            'percentages': percentages,
+        },
+    }
+
+
+class TestMetrics:
+    """Tests for source record conversion."""
+    
+    def test_site_manager(self):
+        """Test Site Manager counts and gateway-derived WAN state."""
+        metrics = site_manager_metrics(site('s1', gateways_offline=1, wanUptime=99.5))
+        assert metrics['devices'] == 10 and metrics['wifi_clients'] == 20
+        assert metrics['wan'] == 'down' and metrics['wan_uptime'] == 99.5
+        assert site_manager_metrics({'siteId': 's2'})['wan'] == 'unknown'
+    
+    def test_controller_health(self):
+        """Test stat/health subsystems map to devices, clients and WAN."""
+        metrics = controller_health_metrics([
+            {'subsystem': 'wlan', 'num_adopted': 8, 'num_disconnected': 1, 'num_user': 40, 'num_guest': 2},
+            {'subsystem': 'lan', 'num_adopted': 3, 'num_user': 10},
+            {'subsystem': 'wan', 'num_gw': 1, 'num_adopted': 1, 'status': 'ok'},
+            {'subsystem': 'www', 'status': 'ok'},
+        ])
+        assert (metrics['devices'], metrics['devices_offline']) == (12, 1)
+        assert (metrics['wifi_clients'], metrics['wired_clients'], metrics['guest_clients']) == (42, 10, 2)
+        assert metrics['wan'] == 'up'
+        assert controller_health_metrics([{'subsystem': 'wan', 'num_gw': 1, 'status': 'error'}])['wan'] == 'down'
+
+
+class TestSiteHealth:
+    """Tests for SiteHealth updates and queries."""
+    
+    def test_rollups(self):
+        """Test per-site health and fleet totals."""
+        health = SiteHealth(clock=lambda: 100.0)
+        counts = health.observe_sites([site('a'), site('b', offline=2), site('c', gateways_offline=1)])
+        assert counts == {'changed': 3, 'unchanged': 0, 'removed': 0}
+        
+        b = health.site('b')
+        assert b['availability'] == 0.8 and b['clients'] == 25
+        assert b['status'] == 'degraded' and b['score'] == 88.0 and b['updated'] == 100.0
+        assert health.site('c')['status'] == 'down'
+        assert health.site('missing') is None
+        
+        fleet = health.fleet()
+        assert fleet['sites'] == 3 and fleet['devices'] == 30 and fleet['devices_offline'] == 2
+        assert fleet['clients'] == 75 and fleet['pending_updates'] == 3
+        assert fleet['wan'] == {'up': 2, 'down': 1, 'unknown': 0}
+        assert fleet['status'] == {'healthy': 1, 'degraded': 1, 'down': 1}
+        assert health.sites('down') == ['c']
+    
+    def test_incremental_matches_recompute(self):
+        """Test totals after many updates equal a rollup built from scratch."""
+        health = SiteHealth()
+        for round_ in range(5):
+            snapshot = [site(f's{i}', offline=(i + round_) % 4, wifi=i % 7) for i in range(200 - round_ * 10)]
+            health.observe_sites(snapshot)
+        fresh = SiteHealth()
+        fresh.observe_sites(snapshot)
+        assert health.fleet() == fresh.fleet()
+        assert health.stats['removed'] == 40
+    
+    def test_unchanged_and_removed(self):
+        """Test identical snapshots do no work and missing sites are dropped."""
+        health = SiteHealth()
+        health.observe_sites([site('a'), site('b')])
+        assert health.observe_sites([site('a'), site('b')])['unchanged'] == 2
+        assert health.stats['updates'] == 2
+        assert health.observe_sites([site('a')])['removed'] == 1
+        assert 'b' not in health and len(health) == 1
+        health.observe_sites([site('b')], complete=False)
+        assert len(health) == 2
+        assert health.remove('a') and not health.remove('a')
+        assert health.fleet()['devices'] == 10
+    
+    def test_mixed_sources(self):
+        """Test controller health and Site Manager sites share one fleet view."""
+        health = SiteHealth()
+        health.observe_sites([site('cloud')])
+        health.observe_health('default', [{'subsystem': 'wlan', 'num_adopted': 4, 'num_user': 3}])
+        assert health.site('default')['wan'] == 'unknown'
+        assert health.fleet()['devices'] == 14
+    
+    def test_invalid(self):
+        """Test unknown states are rejected."""
+        health = SiteHealth()
+        with pytest.raises(ValueError):
+            health.update('a', {'wan': 'flaky'})
+        with pytest.raises(ValueError):
+            health.sites('fine')
@@ -0,0 +1,103 @@
+"""Unit tests for the indexed inventory."""
+
+import pytest
+from beast_unifi.models.inventory import Inventory
+from beast_unifi.utils.normalize import normalize_mac
+
+
+DEVICES = [
+    {'mac': 'AA:AA:AA:00:00:01', 'name': 'Gateway', 'ip': '192.168.1.1', 'type': 'udm'},
+    {'mac': 'aa:aa:aa:00:00:02', 'name': 'Switch', 'ip': '192.168.1.2', 'type': 'usw',
+     'uplink': {'uplink_mac': 'aa:aa:aa:00:00:01'}},
+    {'mac': 'aa:aa:aa:00:00:03', 'name': 'Office AP', 'ip': '192.168.1.3', 'type': 'uap',
+     'uplink': {'uplink_mac': 'AA-AA-AA-00-00-02'}},
+]
+
+CLIENTS = [
+    {'mac': 'cc:cc:cc:00:00:01', 'hostname': 'Laptop', 'ip': '192.168.20.10',
+     'ap_mac': 'aa:aa:aa:00:00:03', 'vlan': 20, 'network': 'IoT'},
+    {'mac': 'cc:cc:cc:00:00:02', 'hostname': 'thermostat', 'ip': '192.168.20.11',
+     'ap_mac': 'aa:aa:aa:00:00:03', 'vlan': 20, 'network': 'IoT'},
+    {'mac': 'cc:cc:cc:00:00:03', 'hostname': 'nas', 'ip': '192.168.1.50',
+     'is_wired': True, 'sw_mac': 'aa:aa:aa:00:00:02', 'network': 'LAN'},
+]
+
+
+@pytest.fixture
+def inventory():
+    inv = Inventory()
+    inv.add_devices(DEVICES, site='default')
+    inv.add_clients(CLIENTS, site='default')
+    return inv
+
+
+class TestNormalizeMac:
+    """Tests for MAC normalisation."""
+    
+    def test_formats(self):
+        """Test that common MAC formats normalise to the same value."""
+        expected = 'aa:bb:cc:dd:ee:ff'
+        for raw in ('AA:BB:CC:DD:EE:FF', 'aa-bb-cc-dd-ee-ff', 'aabbccddeeff', 'aabb.ccdd.eeff'):
+            assert normalize_mac(raw) == expected
+    
+    def test_invalid(self):
+        """Test that non-MAC values return None."""
+        assert normalize_mac(None) is None
+        assert normalize_mac('not-a-mac') is None
+        for raw in ('deadbeefcafehost', 'ab:cd-ef/01..23:45', 'aa:bb:cc:dd:ee:ff:00',
+                    'aa:bb-cc:dd-ee:ff', 'aabb.ccdd.eeff.', 'aa bb cc dd ee ff', 'gg:bb:cc:dd:ee:ff'):
+            assert normalize_mac(raw) is None, raw
+
+
+class TestInventory:
+    """Tests for Inventory."""
+    
+    def test_lookups(self, inventory):
+        """Test MAC, IP and hostname lookups."""
+        assert len(inventory) == 6
+        assert inventory.get('CC-CC-CC-00-00-01').record['hostname'] == 'Laptop'
+        assert [e.mac for e in inventory.by_ip('192.168.1.50')] == ['cc:cc:cc:00:00:03']
+        assert inventory.by_hostname('LAPTOP')[0].mac == 'cc:cc:cc:00:00:01'
+    
+    def test_which_ap_is_client_on(self, inventory):
+        """Test finding the uplink of a client."""
+        assert inventory.uplink_of('cc:cc:cc:00:00:01').record['name'] == 'Office AP'
+        assert inventory.uplink_of('cc:cc:cc:00:00:03').record['name'] == 'Switch'
+    
+    def test_find_clients_on_vlan_at_site(self, inventory):
+        """Test intersecting site and VLAN indexes."""
+        found = inventory.find(kind='client', site='default', vlan=20)
+        assert {e.mac for e in found} == {'cc:cc:cc:00:00:01', 'cc:cc:cc:00:00:02'}
+        assert inventory.find(kind='client', site='other', vlan=20) == []
+    
+    def test_incremental_update(self, inventory):
+        """Test that upserts move a record between index buckets."""
+        moved = dict(CLIENTS[0], ip='192.168.20.99', ap_mac=None, is_wired=True,
+                     sw_mac='aa:aa:aa:00:00:02')
+        inventory.add_clients([moved], site='default')
+        assert inventory.by_ip('192.168.20.10') == []
+        assert inventory.by_ip('192.168.20.99')[0].mac == 'cc:cc:cc:00:00:01'
+        assert 'cc:cc:cc:00:00:01' not in {e.mac for e in inventory.attached_to('aa:aa:aa:00:00:03')}
+        
+        inventory.remove('cc:cc:cc:00:00:01')
+        assert 'cc:cc:cc:00:00:01' not in inventory
+        assert inventory.by_ip('192.168.20.99') == []
+    
+    def test_topology(self, inventory):
+        """Test uplink graph and path to root."""
+        path = [e.mac for e in inventory.path_to_root('cc:cc:cc:00:00:02')]
+        assert path == [
+            'cc:cc:cc:00:00:02', 'aa:aa:aa:00:00:03', 'aa:aa:aa:00:00:02', 'aa:aa:aa:00:00:01',
+        ]
+        graph = inventory.topology()
+        assert graph['aa:aa:aa:00:00:01'] == ['aa:aa:aa:00:00:02']
+        assert [e.mac for e in inventory.downlinks('aa:aa:aa:00:00:02')] == ['aa:aa:aa:00:00:03']
+        inventory.remove('aa:aa:aa:00:00:02')
+        path = [e.mac for e in inventory.path_to_root('cc:cc:cc:00:00:02')]
+        assert path == ['cc:cc:cc:00:00:02', 'aa:aa:aa:00:00:03']
+        assert inventory.topology()['aa:aa:aa:00:00:01'] == []
+    
+    def test_unknown_kind_raises(self):
+        """Test that an unknown record kind raises ValueError."""
+        with pytest.raises(ValueError, match="Unknown record kind"):
+            Inventory().upsert({'mac': 'aa:aa:aa:00:00:01'}, 'router')
@@ -0,0 +1,115 @@
+"""Unit tests for streaming parsing and spill-to-disk buffers."""
+
+import json
+import pytest
+from beast_unifi.utils.memory import MemoryBudget, SpillList, iter_json_array
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray:
+    """Tests for iter_json_array."""
+    
+    @pytest.mark.parametrize('size', [1, 3, 7, 64, 10_000])
+    def test_any_chunking(self, size):
+        """Test items are identical however the body is split."""
+        document = {
+            'meta': {'rc': 'ok', 'data': 'not this'},
+            'data': [{'mac': 'aa', 'name': 'café ☃'}, 12345, -1.5e3, 'x', None, [1, [2]], {}],
+            'count': 7,
+        }
+        body = json.dumps(document).encode('utf-8')
+        assert list(iter_json_array(chunked(body, size))) == document['data']
+    
+    def test_top_level_array_and_empty(self):
+        """Test bare arrays, empty arrays and missing keys."""
+        assert list(iter_json_array([b'[1, 2]'])) == [1, 2]
+        assert list(iter_json_array([b'{"data": []}'])) == []
+        assert list(iter_json_array([b'{"meta": {}}'])) == []
+    
+    def test_malformed(self):
+        """Test malformed or truncated documents raise ValueError."""
+        with pytest.raises(ValueError):
+            list(iter_json_array([b'{"data": [1, 2']))
+        with pytest.raises(ValueError):
+            list(iter_json_array([b'{"data": {"a": 1}}']))
+        with pytest.raises(ValueError):
+            list(iter_json_array([b'"text"']))
+    
+    def test_malformed_fails_before_end(self):
+        """Test a parse error is raised without reading the rest of the body."""
+        consumed = []
+        
+        def chunks():
+            yield b'{"data": [{"a": 1}, {"b": tru x'
+            for i in range(1000):
+                consumed.append(i)
+                yield b' ' * 100
+            yield b']}'
+        
+        with pytest.raises(ValueError, match='Malformed'):
+            list(iter_json_array(chunks()))
+        assert consumed == []
+
+
+class TestSpillList:
+    """Tests for SpillList and MemoryBudget."""
+    
+    def test_stays_in_memory_under_limit(self, tmp_path):
+        """Test small collections are not spilled."""
+        with SpillList(limit=1_000_000, directory=tmp_path) as records:
+            records.extend({'n': i} for i in range(10))
+            assert not records.spilled
+            assert list(records) == [{'n': i} for i in range(10)]
+    
+    def test_spills_and_reads_back(self, tmp_path):
+        """Test records move to disk past the limit and keep their order."""
+        with SpillList(limit=1_000, directory=tmp_path) as records:
+            records.extend({'n': i} for i in range(500))
+            assert records.spilled
+            assert len(records) == 500
+            first = next(iter(records))
+            records.append({'n': 500})
+            assert first == {'n': 0}
+            assert [r['n'] for r in records] == list(range(501))
+        assert list(tmp_path.iterdir()) == []
+    
+    @pytest.mark.parametrize('limit', [1_000_000, 1_000])
+    def test_indexing(self, tmp_path, limit):
+        """Test indexes and slices read the same records in memory and spilled."""
+        with SpillList(limit=limit, directory=tmp_path) as records:
+            records.extend({'n': i} for i in range(300))
+            assert records.spilled == (limit == 1_000)
+            assert records[0] == {'n': 0}
+            assert records[-1] == {'n': 299}
+            assert records[10:13] == [{'n': 10}, {'n': 11}, {'n': 12}]
+            assert [r['n'] for r in records[::-100]] == [299, 199, 99]
+            assert {'n': 42} in records
+            with pytest.raises(IndexError):
+                records[300]
+    
+    def test_budget_collect(self, tmp_path):
+        """Test collect returns a list when it fits and a SpillList otherwise."""
+        budget = MemoryBudget(limit=10_000, spill_directory=tmp_path)
+        assert budget.collect([{'n': 1}]) == [{'n': 1}]
+        spilled = budget.collect({'n': i} for i in range(1_000))
+        assert isinstance(spilled, SpillList) and len(spilled) == 1_000
+    
+    def test_should_stream(self, monkeypatch):
+        """Test the streaming threshold and environment configuration."""
+        budget = MemoryBudget(limit=4_000_000)
+        assert budget.stream_threshold == 1_000_000
+        assert budget.should_stream(None)
+        assert budget.should_stream('2000000')
+        assert not budget.should_stream(10)
+        assert not budget.should_stream(10, 'identity')
+        assert budget.should_stream(10, 'gzip')
+        assert budget.should_stream('10', 'br')
+        with pytest.raises(ValueError):
+            MemoryBudget(limit=0)
+        monkeypatch.setenv('BEAST_UNIFI_MEMORY_LIMIT_MB', '64')
+        assert MemoryBudget.from_env().limit == 64 * 1024 * 1024
+        monkeypatch.delenv('BEAST_UNIFI_MEMORY_LIMIT_MB')
+        assert MemoryBudget.from_env() is None
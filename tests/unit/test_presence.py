@@ -0,0 +1,103 @@
+"""Unit tests for client presence tracking."""
+
+import numpy as np
+from beast_unifi.analysis.presence import IntervalStore, PresenceTracker
+
+
+AP1 = 'aa:aa:aa:aa:aa:01'
+AP2 = 'aa:aa:aa:aa:aa:02'
+
+
+def client(mac, ap=AP1, essid='corp'):
+    return {'mac': mac, 'ap_mac': ap, 'essid': essid}
+
+
+def build_tracker():
+    tracker = PresenceTracker()
+    tracker.observe([client('00:00:00:00:00:01'), client('00:00:00:00:00:02')], 100)
+    tracker.observe([client('00:00:00:00:00:01', AP2), client('00:00:00:00:00:02')], 200)
+    tracker.observe([client('00:00:00:00:00:01', AP2)], 300)
+    return tracker
+
+
+class TestPresenceTracker:
+    """Tests for PresenceTracker."""
+    
+    def test_observe_counts_joins_roams_and_leaves(self):
+        """Test snapshot transitions are classified."""
+        tracker = PresenceTracker()
+        assert tracker.observe([client('00:00:00:00:00:01')], 100) == {'joined': 1, 'roamed': 0, 'left': 0}
+        assert tracker.observe([client('00:00:00:00:00:01', AP2)], 200) == {'joined': 0, 'roamed': 1, 'left': 0}
+        assert tracker.observe([], 300) == {'joined': 0, 'roamed': 0, 'left': 1}
+    
+    def test_where_returns_intervals_in_window(self):
+        """Test per-client history lookup, including the open interval."""
+        tracker = build_tracker()
+        history = tracker.where('00-00-00-00-00-01', 0, 1000)
+        assert [(h['ap'], h['start'], h['end']) for h in history] == [(AP1, 100, 200), (AP2, 200, 300)]
+        assert [h['ap'] for h in tracker.where('00:00:00:00:00:01', 250, 260)] == [AP2]
+        assert tracker.where('00:00:00:00:00:02', 250, 260) == []
+        assert tracker.where('ff:ff:ff:ff:ff:ff', 0, 1000) == []
+    
+    def test_dwell_times(self):
+        """Test dwell seconds per AP and SSID, clipped to a window."""
+        tracker = build_tracker()
+        assert tracker.dwell_times('ap') == {AP1: 200, AP2: 100}
+        assert tracker.dwell_times('essid', start=150) == {'corp': 200}
+        assert tracker.dwell_times('ap', mac='00:00:00:00:00:01') == {AP1: 100, AP2: 100}
+    
+    def test_peak_concurrency(self):
+        """Test peak simultaneous clients per AP."""
+        tracker = build_tracker()
+        assert tracker.peak_concurrency() == {AP1: (2, 100), AP2: (1, 200)}
+        assert tracker.peak_concurrency(start=250) == {AP2: (1, 250)}
+    
+    def test_apply_event(self):
+        """Test controller connect, roam and disconnect events."""
+        tracker = PresenceTracker()
+        base = {'user': '00:00:00:00:00:09', 'ssid': 'guest'}
+        assert tracker.apply_event({**base, 'key': 'EVT_WU_Connected', 'ap': AP1, 'time': 1000_000}) == 'joined'
+        assert tracker.apply_event({**base, 'key': 'EVT_WU_Roam', 'ap_to': AP2, 'time': 1060_000}) == 'roamed'
+        assert tracker.apply_event({**base, 'key': 'EVT_WU_Disconnected', 'time': 1100_000}) == 'left'
+        assert tracker.apply_event({**base, 'key': 'EVT_AP_Restarted', 'time': 1200_000}) is None
+        assert tracker.dwell_times('ap') == {AP1: 60, AP2: 40}
+    
+    def test_save_and_load(self, tmp_path):
+        """Test closed intervals round-trip through an .npz file."""
+        tracker = build_tracker()
+        tracker.close_all()
+        path = tmp_path / 'presence.npz'
+        tracker.save(path)
+        loaded = PresenceTracker.load(path)
+        assert loaded.where('00:00:00:00:00:01', 0, 1000) == tracker.where('00:00:00:00:00:01', 0, 1000)
+        assert loaded.peak_concurrency() == tracker.peak_concurrency()
+        with np.load(path, allow_pickle=False) as data:
+            assert data['clients'].dtype.kind == 'U'
+    
+    def test_index_merges_new_rows(self):
+        """Test the (client, start) index stays sorted across interleaved appends."""
+        rng = np.random.default_rng(7)
+        store = IntervalStore(capacity=4)
+        for _batch in range(5):
+            for _ in range(50):
+                start = int(rng.integers(1_700_000_000, 1_800_000_000))
+                store.append(int(rng.integers(0, 20)), 0, 0, start, start + 60)
+            order = store.by_client()
+            expected = np.lexsort((store.column('start'), store.column('client')))
+            assert np.array_equal(store.column('client')[order], store.column('client')[expected])
+            assert np.array_equal(store.column('start')[order], store.column('start')[expected])
+    
+    def test_index_after_out_of_range_starts(self):
+        """Test client lookups stay correct after the full-sort fallback."""
+        store = IntervalStore()
+        for client_code, start in [(1, 500), (0, -50), (1, 1 << 40), (0, 20), (2, 30)]:
+            store.append(client_code, 0, 0, start, start + 1)
+        store.by_client()
+        assert len(store._keys) == store.size
+        store.append(1, 0, 0, 700, 701)
+        store.append(0, 0, 0, 10, 11)
+        for client_code in range(3):
+            rows = store.client_rows(client_code)
+            mine = np.flatnonzero(store.column('client') == client_code)
+            assert list(store.column('start')[rows]) == sorted(store.column('start')[mine])
+        assert list(store.column('start')[store.client_rows(1)]) == [500, 700, 1 << 40]
@@ -0,0 +1,84 @@
+"""Unit tests for cloud/local reconciliation."""
+
+from beast_unifi.analysis.reconcile import Reconciler, flatten_cloud_devices, reconcile_devices
+
+
+CLOUD_DEVICES = [
+    {
+        'hostId': 'host-1',
+        'updatedAt': '2025-11-03T10:00:00Z',
+        'devices': [
+            {'mac': 'AABBCC000001', 'name': 'Office AP', 'ip': '192.168.1.3',
+             'model': 'U6 Pro', 'version': '6.6.77', 'status': 'online'},
+            {'mac': 'AABBCC000002', 'name': 'Core Switch', 'ip': '192.168.1.2',
+             'model': 'USW 24', 'version': '7.0.50', 'status': 'online'},
+            {'mac': 'AABBCC000009', 'name': 'Garage AP', 'model': 'U6 Lite',
+             'version': '6.6.77', 'status': 'offline'},
+        ],
+    },
+]
+
+LOCAL_DEVICES = [
+    # Seen locally after the cloud update, renamed since
+    {'_id': 'd1', 'mac': 'aa:bb:cc:00:00:01', 'name': 'Office AP 2', 'ip': '192.168.1.3',
+     'model': 'U6 Pro', 'version': '6.6.77.15402', 'state': 1, 'last_seen': 1762167600},
+    # Stale locally, cloud is fresher
+    {'_id': 'd2', 'mac': 'aa:bb:cc:00:00:02', 'name': 'Switch', 'ip': '192.168.1.2',
+     'model': 'USW 24', 'version': '7.0.23.1000', 'state': 1, 'last_seen': 1762000000},
+    {'_id': 'd3', 'mac': 'aa:bb:cc:00:00:03', 'name': 'New AP', 'state': 2},
+]
+
+
+class TestReconciler:
+    """Tests for Reconciler."""
+    
+    def test_matches_on_normalised_mac(self):
+        """Test that differently formatted MACs join."""
+        result = reconcile_devices(CLOUD_DEVICES, LOCAL_DEVICES)
+        assert sorted(m['local_id'] for m in result.matched) == ['d1', 'd2']
+        assert all(m['hostId'] == 'host-1' for m in result.matched)
+    
+    def test_prefers_fresher_source(self):
+        """Test that each merged record takes fields from the fresher source."""
+        result = reconcile_devices(CLOUD_DEVICES, LOCAL_DEVICES)
+        merged = {m['local_id']: m for m in result.matched}
+        assert merged['d1']['name'] == 'Office AP 2'
+        assert merged['d1']['source']['name'] == 'local'
+        assert merged['d2']['name'] == 'Core Switch'
+        assert merged['d2']['source']['name'] == 'cloud'
+    
+    def test_reports_conflicts(self):
+        """Test version mismatches and one-sided devices are reported."""
+        result = reconcile_devices(CLOUD_DEVICES, LOCAL_DEVICES)
+        kinds = result.conflicts_by_kind()
+        # 6.6.77 vs 6.6.77.15402 is the same release; 7.0.50 vs 7.0.23 is not
+        assert [c.key for c in kinds['version_mismatch']] == ['mac:aa:bb:cc:00:00:02']
+        assert [c.key for c in kinds['missing_local']] == ['mac:aa:bb:cc:00:00:09']
+        assert [c.key for c in kinds['missing_cloud']] == ['mac:aa:bb:cc:00:00:03']
+        assert len(result.cloud_only) == 1
+        assert len(result.local_only) == 1
+    
+    def test_hosts_added_when_not_devices(self):
+        """Test that hosts without a device entry become cloud records."""
+        hosts = [{'id': 'host-1', 'hardwareId': 'hw-1', 'ipAddress': '203.0.113.5',
+                  'reportedState': {'mac': 'AA:BB:CC:00:00:10', 'name': 'Gateway',
+                                    'state': 'connected'}}]
+        records = flatten_cloud_devices(CLOUD_DEVICES, hosts)
+        assert len(records) == 4
+        assert records[-1]['status'] == 'online'
+        
+        local = [{'_id': 'gw', 'mac': 'aa:bb:cc:00:00:10', 'name': 'Gateway', 'state': 1}]
+        result = Reconciler().reconcile(records[-1:], local)
+        assert result.matched[0]['hostId'] == 'host-1'
+        assert result.conflicts == []
+    
+    def test_duplicate_local_macs_are_kept(self):
+        """Test that every local record sharing a MAC is matched or reported."""
+        cloud = [{'mac': 'AABBCC000001', 'name': 'AP'}, {'mac': 'AABBCC000001', 'name': 'AP'}]
+        local = [{'_id': 'a', 'mac': 'aa:bb:cc:00:00:01'}, {'_id': 'b', 'mac': 'aa-bb-cc-00-00-01'},
+                 {'_id': 'c', 'mac': 'aabb.cc00.0001'}]
+        result = Reconciler().reconcile(cloud, local)
+        assert [m['local_id'] for m in result.matched] == ['a', 'b']
+        assert [r['_id'] for r in result.local_only] == ['c']
+        duplicates = result.conflicts_by_kind()['duplicate_local']
+        assert [(c.key, c.local) for c in duplicates] == [('mac:aa:bb:cc:00:00:01', ['a', 'b', 'c'])]
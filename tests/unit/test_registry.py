@@ -0,0 +1,129 @@
+"""Unit tests for the schema registry."""
+
+import sqlite3
+import pandas as pd
+import pytest
+from unittest.mock import Mock
+from beast_unifi.api.site_manager import SiteManagerClient
+from beast_unifi.utils.registry import SchemaRegistry, shape, signature, flatten_shape
+
+
+HOST = {
+    'id': 'h1',
+    'ipAddress': '10.0.0.1',
+    'owner': True,
+    'reportedState': {'version': '9.0.1', 'mgmt_port': 443, 'features': {'webrtc': {'iceRestart': True}}},
+    'tags': ['a'],
+    'note': None,
+}
+
+
+class TestShapes:
+    """Tests for key-shape signatures."""
+    
+    def test_shape_flattens_like_flatten_record(self):
+        """Test dotted names, types, and that nulls and lists are not columns."""
+        columns = flatten_shape(shape(HOST))
+        assert columns['reportedState.features.webrtc.iceRestart'] == 'BOOLEAN'
+        assert columns['reportedState.mgmt_port'] == 'INTEGER'
+        assert columns['tags'] == 'NESTED'
+        assert 'note' not in columns
+    
+    def test_signature_ignores_key_order(self):
+        """Test the stable digest does not depend on key order."""
+        a = flatten_shape(shape({'a': 1, 'b': 'x'}))
+        b = flatten_shape(shape({'b': 'y', 'a': 2}))
+        assert signature(a) == signature(b)
+
+
+class TestSchemaRegistry:
+    """Tests for SchemaRegistry versioning and migrations."""
+    
+    def test_versions_only_on_shape_change(self):
+        """Test repeated shapes are free and new keys create a version."""
+        registry = SchemaRegistry()
+        created = registry.observe_many('hosts', [dict(HOST, id=f'h{i}') for i in range(100)])
+        assert [v.version for v in created] == [1]
+        assert registry.stats['new_shapes'] == 1
+        
+        newer = {**HOST, 'reportedState': {**HOST['reportedState'], 'features': {'webrtc': {'iceRestart': True}, 'nfc': 1}}}
+        version = registry.observe('hosts', newer)
+        assert version.version == 2
+        assert version.added == {'reportedState.features.nfc': 'INTEGER'}
+        # A key disappearing is a new shape but not a new version
+        assert registry.observe('hosts', {'id': 'h9'}) is None
+        assert registry.current('hosts').version == 2
+    
+    def test_type_widening(self):
+        """Test INTEGER then REAL widens instead of adding a column."""
+        registry = SchemaRegistry()
+        registry.observe('stats', {'id': 'a', 'load': 1})
+        version = registry.observe('stats', {'id': 'b', 'load': 0.5})
+        assert version.widened == {'load': ['INTEGER', 'REAL']}
+        assert registry.observe('stats', {'id': 'c', 'load': 2}) is None
+    
+    def test_seen_shapes_bounded(self):
+        """Test the fast-path cache keeps at most max_seen shapes per table."""
+        registry = SchemaRegistry(max_seen=8)
+        # Optional keys present or absent give many distinct shapes
+        records = [{'id': i, **{f'k{b}': 1 for b in range(6) if i >> b & 1}} for i in range(64)]
+        registry.observe_many('stats', records)
+        assert len(registry._seen['stats']) == 8
+        assert registry.stats['new_shapes'] == 64
+        # Evicted shapes fall back to the digest check and stay known
+        registry.observe_many('stats', records)
+        assert registry.stats['new_shapes'] == 64
+        assert registry.current('stats').version == 7
+    
+    def test_persistence(self, tmp_path):
+        """Test versions and known signatures survive a restart."""
+        path = tmp_path / 'registry.json'
+        registry = SchemaRegistry(path)
+        registry.observe('hosts', HOST)
+        reloaded = SchemaRegistry(path)
+        assert reloaded.current('hosts').columns == registry.current('hosts').columns
+        assert reloaded.observe('hosts', HOST) is None
+        assert reloaded.stats['new_shapes'] == 0
+    
+    def test_sqlite_migrations(self):
+        """Test create, add-column and rebuild migrations keep existing rows."""
+        registry = SchemaRegistry()
+        connection = sqlite3.connect(':memory:')
+        registry.observe('devices', {'mac': 'aa', 'uptime': 10})
+        assert registry.migrate_sqlite(connection, 'devices') == 1
+        connection.execute('INSERT INTO devices VALUES (?, ?)', ('aa', 10))
+        
+        registry.observe('devices', {'mac': 'bb', 'uptime': 5, 'state': {'code': 1}})
+        assert registry.sqlite_migration('devices', 1) == ['ALTER TABLE "devices" ADD COLUMN "state.code" INTEGER']
+        registry.observe('devices', {'mac': 'cc', 'uptime': 'n/a'})
+        assert 'DROP TABLE "devices"' in registry.sqlite_migration('devices', 1)
+        
+        assert registry.migrate_sqlite(connection, 'devices') == 3
+        assert registry.migrate_sqlite(connection, 'devices') == 3
+        columns = {row[1]: row[2] for row in connection.execute('PRAGMA table_info(devices)')}
+        assert columns == {'mac': 'TEXT', 'uptime': 'TEXT', 'state.code': 'INTEGER'}
+        assert connection.execute('SELECT mac, uptime FROM devices').fetchall() == [('aa', '10')]
+    
+    def test_parquet_conform(self):
+        """Test frames are aligned with a version's columns and dtypes."""
+        registry = SchemaRegistry()
+        registry.observe('clients', {'mac': 'aa', 'rssi': -40})
+        registry.observe('clients', {'mac': 'bb', 'rssi': -41.5, 'essid': 'corp'})
+        assert registry.parquet_migration('clients', 1) == {'add': {'essid': 'string'}, 'cast': {'rssi': 'float64'}}
+        
+        frame = registry.conform('clients', pd.DataFrame({'rssi': [-40], 'mac': ['aa'], 'extra': [1]}))
+        assert list(frame.columns) == ['mac', 'rssi', 'essid', 'extra']
+        assert str(frame['rssi'].dtype) == 'float64'
+        assert frame['essid'].isna().all()
+        with pytest.raises(ValueError):
+            registry.conform('clients', frame, version=5)
+    
+    def test_client_integration(self):
+        """Test listings fetched by a client are fingerprinted."""
+        registry = SchemaRegistry()
+        client = SiteManagerClient(api_key='test-key', schema_registry=registry)
+        response = Mock(status_code=200, content=b'{"data": [{"id": "h1", "type": "console"}]}')
+        client.session = Mock()
+        client.session.get.return_value = response
+        client.get_hosts()
+        assert registry.current('hosts').columns == {'id': 'TEXT', 'type': 'TEXT'}
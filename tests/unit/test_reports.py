@@ -0,0 +1,97 @@
+"""Unit tests for stat/report ingestion."""
+
+import threading
+import pytest
+from unittest.mock import Mock
+from beast_unifi.api.local_controller import LocalControllerClient
+from beast_unifi.api.reports import HOUR, DAY, ReportIngestor, report_windows, to_arrays
+from beast_unifi.utils.timeseries import TimeSeriesStore
+
+
+NOW = 100 * DAY / 1000 + 5400  # seconds; an hour and a half into a day
+
+
+class FakeController:
+    """Hourly AP report for two APs, recording every request."""
+    
+    site = 'default'
+    
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+    
+    def get_report(self, interval, kind, start, end, attrs, site=None):
+        with self.lock:
+            self.calls.append((site, start, end))
+        return [
+            {'time': t, 'ap': ap.upper(), 'bytes': t // HOUR, 'num_sta': 3, 'o': 'ap'}
+            for t in range(start, end, HOUR)
+            for ap in ('aa:aa', 'bb:bb')
+        ]
+
+
+class TestReportWindows:
+    """Tests for window splitting and row conversion."""
+    
+    def test_aligned_grid(self):
+        """Test windows start on span multiples and cover the range."""
+        windows = report_windows(5 * HOUR, 3 * DAY, 'hourly', DAY)
+        assert windows == [(0, DAY), (DAY, 2 * DAY), (2 * DAY, 3 * DAY)]
+        with pytest.raises(ValueError):
+            report_windows(0, DAY, 'weekly')
+        with pytest.raises(ValueError):
+            report_windows(0, DAY, 'hourly', HOUR + 1)
+    
+    def test_to_arrays(self):
+        """Test rows become typed arrays with NaN for missing values."""
+        times, keys, columns = to_arrays(
+            [{'time': 0, 'ap': 'AA', 'bytes': 10}, {'time': 1, 'ap': 'bb'}, {'bytes': 1}],
+            ['bytes'], 'ap',
+        )
+        assert times.dtype.name == 'int64' and times.tolist() == [0, 1]
+        assert keys == ['aa', 'bb']
+        assert columns['bytes'][0] == 10 and columns['bytes'][1] != columns['bytes'][1]
+
+
+class TestReportIngestor:
+    """Tests for ReportIngestor."""
+    
+    def test_backfill_across_sites_without_duplicates(self, tmp_path):
+        """Test parallel backfill, rerun and later incremental runs."""
+        controller = FakeController()
+        store = TimeSeriesStore(tmp_path)
+        ingestor = ReportIngestor(controller, store, max_workers=4, chunk_spans={'hourly': DAY}, clock=lambda: NOW)
+        
+        first = ingestor.backfill('hourly', 'ap', days=10, sites=['default', 'branch'])
+        assert first['requests'] == 2 * 11 and first['errors'] == 0
+        # The open day holds a single whole hour so far
+        assert first['rows'] == 2 * (10 * 24 + 1) * 2
+        assert ingestor.backfill('hourly', 'ap', days=10, sites=['default', 'branch'])['requests'] == 0
+        
+        ingestor.clock = lambda: NOW + 2 * 3600
+        later = ingestor.ingest('hourly', 'ap', NOW - 3600, sites=['default'])
+        assert later['requests'] == 1 and later['rows'] == 2 * 2
+        data = store.read('default/hourly.ap', keys=['aa:aa'])
+        assert len(data['time']) == len(set(data['time'].tolist())) == 10 * 24 + 3
+        assert set(data['num_sta'].tolist()) == {3.0}
+    
+    def test_failed_windows_are_retried(self, tmp_path):
+        """Test a failing request is recorded and fetched on the next run."""
+        controller = FakeController()
+        original = controller.get_report
+        controller.get_report = Mock(side_effect=RuntimeError('timeout'))
+        ingestor = ReportIngestor(controller, TimeSeriesStore(tmp_path), chunk_spans={'hourly': DAY}, clock=lambda: NOW)
+        assert ingestor.backfill('hourly', 'ap', days=1)['errors'] == 2
+        assert ingestor.errors
+        controller.get_report = original
+        assert ingestor.backfill('hourly', 'ap', days=1)['requests'] == 2
+    
+    def test_client_get_report(self):
+        """Test the report request body and per-site URL."""
+        client = LocalControllerClient(base_url='https://192.168.1.1', api_token='test-token')
+        client.session = Mock()
+        client.session.post.return_value = Mock(status_code=200, content=b'{"data": [{"time": 0}]}')
+        assert client.get_report('daily', 'site', 0, DAY, ['bytes'], site='branch') == [{'time': 0}]
+        url = client.session.post.call_args[0][0]
+        assert url.endswith('/api/s/branch/stat/report/daily.site')
+        assert client.session.post.call_args[1]['json'] == {'attrs': ['time', 'bytes'], 'start': 0, 'end': DAY}
@@ -0,0 +1,139 @@
+"""Unit tests for flattening and schema inference."""
+
+import json
+from beast_unifi.utils.schema import (
+    TableSchema,
+    flatten_record,
+    infer_chunk,
+    infer_schema,
+    infer_schema_files,
+    join_types,
+    to_mermaid,
+    to_sql,
+)
+
+
+HOSTS = [
+    {'id': 'h1', 'hardwareId': 'hw1', 'owner': True,
+     'reportedState': {'mgmt_port': 443, 'firmware_version': None,
+                       'features': {'webrtc': {'iceRestart': True}}}},
+    {'id': 'h2', 'hardwareId': 'hw2', 'owner': False,
+     'reportedState': {'mgmt_port': 8443, 'firmware_version': 4.1, 'tags': ['a']}},
+]
+
+SITES = [
+    {'siteId': 's1', 'hostId': 'h1', 'statistics': {'counts': {'wifiDevice': 3}}},
+    {'siteId': 's2', 'hostId': 'h1', 'statistics': {'counts': {'wifiDevice': 2.5}}},
+]
+
+
+class TestFlatten:
+    """Tests for flatten_record and the type lattice."""
+    
+    def test_flatten_nested(self):
+        """Test that nested dicts become dotted columns and lists are kept."""
+        flat = flatten_record(HOSTS[0])
+        assert flat['reportedState.features.webrtc.iceRestart'] is True
+        assert flatten_record(HOSTS[1])['reportedState.tags'] == ['a']
+    
+    def test_join_types(self):
+        """Test least upper bounds of column types."""
+        assert join_types(None, 'INTEGER') == 'INTEGER'
+        assert join_types('INTEGER', 'REAL') == 'REAL'
+        assert join_types('BOOLEAN', 'INTEGER') == 'TEXT'
+
+
+class TestInferSchema:
+    """Tests for schema inference."""
+    
+    def test_types_and_nullability(self):
+        """Test inferred types, NOT NULL and primary key."""
+        schema = infer_chunk(HOSTS, 'hosts')
+        assert schema.columns['owner'].sql_type == 'BOOLEAN'
+        assert schema.columns['reportedState.mgmt_port'].sql_type == 'INTEGER'
+        assert schema.nullable('reportedState.firmware_version')
+        assert not schema.nullable('id')
+        assert schema.primary_key == 'id'
+    
+    def test_merge_matches_single_pass(self):
+        """Test that merging chunk schemas equals a single pass."""
+        records = SITES * 3
+        for i, record in enumerate(records):
+            record = dict(record, siteId=f's{i}')
+            records[i] = record
+        whole = infer_chunk(records, 'sites')
+        merged = TableSchema('sites')
+        for start in range(0, len(records), 2):
+            merged.merge(infer_chunk(records[start:start + 2], 'sites'))
+        assert to_sql([merged]) == to_sql([whole])
+        assert merged.primary_key == 'siteId'
+        assert merged.columns['statistics.counts.wifiDevice'].sql_type == 'REAL'
+    
+    def test_duplicate_across_chunks_is_not_key(self):
+        """Test that a value repeated in two chunks disqualifies a key."""
+        merged = infer_chunk(SITES[:1], 'sites').merge(infer_chunk(SITES[:1], 'sites'))
+        assert merged.primary_key is None
+    
+    def test_large_key_columns_use_digests(self, monkeypatch):
+        """Test that key tracking stays compact and still finds keys past the cap."""
+        monkeypatch.setattr('beast_unifi.utils.schema.MAX_EXACT_VALUES', 100)
+        chunks = [infer_chunk([{'id': f'h{c}-{i}', 'siteId': f's{i % 50}'} for i in range(400)], 'hosts')
+                  for c in range(5)]
+        merged = chunks[0]
+        for chunk in chunks[1:]:
+            merged.merge(chunk)
+        column = merged.columns['id']
+        assert column.values is None and len(column.digests) == 2000
+        assert abs(column.sketch.estimate() - 2000) < 100
+        assert merged.primary_key == 'id'
+        assert not merged.columns['siteId'].unique
+        repeated = infer_chunk([{'id': f'h{i}'} for i in range(400)], 'hosts')
+        repeated.merge(infer_chunk([{'id': f'h{i}'} for i in range(400)], 'hosts'))
+        assert repeated.primary_key is None
+    
+    def test_few_duplicates_past_the_cap_are_not_key(self, monkeypatch):
+        """Test a handful of repeats hidden in sketch noise still disqualify a key."""
+        monkeypatch.setattr('beast_unifi.utils.schema.MAX_EXACT_VALUES', 100)
+        records = [{'id': f'h{i}'} for i in range(5000)] + [{'id': 'h7'}, {'id': 'h42'}]
+        whole = infer_chunk(records, 'hosts')
+        assert whole.columns['id'].sketch.estimate() > len(records) * 0.95
+        assert whole.primary_key is None
+        merged = infer_chunk(records[:2500], 'hosts').merge(infer_chunk(records[2500:], 'hosts'))
+        assert merged.primary_key is None
+        assert 'PRIMARY KEY' not in to_sql([merged])
+    
+    def test_key_tracking_is_bounded(self, monkeypatch):
+        """Test columns too large to confirm are not declared keys."""
+        monkeypatch.setattr('beast_unifi.utils.schema.MAX_EXACT_VALUES', 10)
+        monkeypatch.setattr('beast_unifi.utils.schema.MAX_KEY_VALUES', 100)
+        schema = infer_chunk([{'id': f'h{i}'} for i in range(101)], 'hosts')
+        assert schema.columns['id'].digests is None
+        assert schema.primary_key is None
+    
+    def test_process_pool(self, tmp_path):
+        """Test inference across worker processes, from records and files."""
+        records = [dict(HOSTS[i % 2], id=f'h{i}') for i in range(50)]
+        pooled = infer_schema(records, 'hosts', workers=2, chunk_size=7)
+        assert to_sql([pooled]) == to_sql([infer_chunk(records, 'hosts')])
+        
+        paths = []
+        for i in range(3):
+            path = tmp_path / f'hosts-{i}.jsonl'
+            path.write_text('\n'.join(json.dumps(r) for r in records[i::3]))
+            paths.append(path)
+        from_files = infer_schema_files(paths, 'hosts', workers=2)
+        assert from_files.rows == 50
+        assert from_files.primary_key == 'id'
+    
+    def test_ddl_and_erd(self):
+        """Test SQL and Mermaid output formats and relationships."""
+        hosts = infer_chunk(HOSTS, 'hosts')
+        sites = infer_chunk(SITES, 'sites')
+        sql = to_sql([hosts, sites])
+        assert sql.startswith("-- UniFi Database Schema\n")
+        assert "    id TEXT NOT NULL PRIMARY KEY" in sql
+        assert "reportedState.tags" not in sql
+        assert "FOREIGN KEY (hostId) REFERENCES hosts(hostId)" not in sql
+        
+        erd = to_mermaid([hosts, sites])
+        assert erd.startswith("erDiagram\n    hosts {\n        id string PK\n")
@@ -0,0 +1,88 @@
+"""Unit tests for the lazy site session."""
+
+import threading
+import pytest
+from unittest.mock import Mock
+from beast_unifi.api.session import SiteSession
+
+
+def make_client():
+    client = Mock()
+    client.get_devices.return_value = [{'mac': 'aa:bb:cc:00:00:01'}]
+    client.get_clients.return_value = [{'mac': 'cc:cc:cc:00:00:01'}]
+    client.get_networks.return_value = [{'_id': 'n1', 'name': 'LAN'}]
+    client.get_routing.return_value = []
+    return client
+
+
+class TestSiteSession:
+    """Tests for SiteSession."""
+    
+    def test_lazy_and_memoised(self):
+        """Test that collections are fetched on first access only."""
+        client = make_client()
+        session = SiteSession(client)
+        client.get_devices.assert_not_called()
+        assert session.devices == [{'mac': 'aa:bb:cc:00:00:01'}]
+        assert session.devices is session.devices
+        client.get_devices.assert_called_once()
+        client.get_clients.assert_not_called()
+        assert session.stats == {'hits': 2, 'fetches': 1}
+    
+    def test_prefetch_hints_fetch_concurrently(self):
+        """Test that hinted collections load together in one burst."""
+        client = make_client()
+        barrier = threading.Barrier(2, timeout=5)
+        
+        def devices():
+            barrier.wait()
+            return []
+        
+        def networks():
+            barrier.wait()
+            return []
+        
+        # Both calls must be in flight at once to pass the barrier
+        client.get_devices.side_effect = devices
+        client.get_networks.side_effect = networks
+        session = SiteSession(client, prefetch=['devices', 'networks'])
+        assert session.devices == []
+        assert session.is_loaded('networks')
+        client.get_clients.assert_not_called()
+    
+    def test_ttl_expiry(self):
+        """Test that collections expire after their TTL."""
+        now = [0.0]
+        client = make_client()
+        session = SiteSession(client, ttl={'clients': 30}, clock=lambda: now[0])
+        first = (session.clients, session.devices)
+        now[0] = 60.0
+        assert (session.clients, session.devices) == first
+        assert client.get_clients.call_count == 2
+        assert client.get_devices.call_count == 1
+    
+    def test_invalidation_rules(self):
+        """Test that writes invalidate the collection and its dependents."""
+        client = make_client()
+        session = SiteSession(client)
+        loaded = [session.networks, session.routing, session.devices]
+        assert all(isinstance(records, list) for records in loaded)
+        session.put('rest/networkconf/n1', {'name': 'Office'})
+        client.put.assert_called_once_with('rest/networkconf/n1', {'name': 'Office'})
+        assert not session.is_loaded('networks')
+        assert not session.is_loaded('routing')
+        assert session.is_loaded('devices')
+    
+    def test_command_writes_invalidate(self):
+        """Test that device manager commands invalidate devices and clients."""
+        client = make_client()
+        session = SiteSession(client)
+        assert session.devices and session.networks
+        session.post('cmd/devmgr', {'cmd': 'restart', 'mac': 'aa:bb:cc:dd:ee:ff'})
+        assert not session.is_loaded('devices')
+        assert session.is_loaded('networks')
+    
+    def test_unknown_collection_raises(self):
+        """Test that unknown collection names raise ValueError."""
+        with pytest.raises(ValueError, match="Unknown collection"):
+            SiteSession(make_client(), prefetch=['firewall'])
@@ -0,0 +1,165 @@
+"""Unit tests for sharded collection."""
+
+import json
+import threading
+import time
+import pytest
+from beast_unifi.api.sharding import HashRing, ShardCoordinator, ShardWorker, collect_target, run_local
+
+
+TARGETS = [{'id': f'ctrl-{i}', 'kind': 'controller', 'base_url': f'https://10.0.{i}.1'} for i in range(40)]
+
+
+def fake_collect(target):
+    if target['id'] == 'ctrl-13':
+        raise ConnectionError("unreachable")
+    return {'devices': [{'mac': f"aa:bb:cc:00:00:{int(target['id'].split('-')[1]):02x}"}]}
+
+
+def hanging_collect(target):
+    time.sleep(60)
+    return {}
+
+
+class TestHashRing:
+    """Tests for HashRing."""
+    
+    def test_assigns_every_key_once(self):
+        """Test every key has exactly one owner and load is spread."""
+        ring = HashRing(['w1', 'w2', 'w3'])
+        assignment = ring.assign(t['id'] for t in TARGETS)
+        assert sorted(k for keys in assignment.values() for k in keys) == sorted(t['id'] for t in TARGETS)
+        assert all(keys for keys in assignment.values())
+    
+    def test_minimal_movement(self):
+        """Test adding a node only moves keys to that node."""
+        keys = [f'key-{i}' for i in range(1000)]
+        ring = HashRing(['w1', 'w2', 'w3'])
+        before = {k: ring.owner(k) for k in keys}
+        ring.add('w4')
+        after = {k: ring.owner(k) for k in keys}
+        moved = [k for k in keys if before[k] != after[k]]
+        assert all(after[k] == 'w4' for k in moved)
+        assert 100 < len(moved) < 450
+        ring.remove('w4')
+        assert {k: ring.owner(k) for k in keys} == before
+    
+    def test_empty_ring(self):
+        """Test an empty ring owns nothing."""
+        assert HashRing().owner('x') is None
+
+
+class TestShardCoordination:
+    """Tests for ShardCoordinator and ShardWorker."""
+    
+    def test_targets_need_unique_ids(self, tmp_path):
+        """Test duplicate target ids are rejected."""
+        with pytest.raises(ValueError):
+            ShardCoordinator(tmp_path).set_targets([{'id': 'a'}, {'id': 'a'}])
+    
+    def test_rebalance_on_join_and_leave(self, tmp_path):
+        """Test assignments follow worker membership."""
+        coordinator = ShardCoordinator(tmp_path)
+        coordinator.set_targets(TARGETS)
+        workers = [ShardWorker(tmp_path, f'w{i}', fake_collect) for i in range(3)]
+        for worker in workers[:2]:
+            worker.heartbeat()
+        assert coordinator.rebalance() == {'epoch': 1, 'changed': True, 'moved': 0}
+        assert coordinator.rebalance()['changed'] is False
+        
+        workers[2].heartbeat()
+        joined = coordinator.rebalance()
+        assert joined['epoch'] == 2 and 0 < joined['moved'] < len(TARGETS)
+        
+        workers[0].leave()
+        left = coordinator.rebalance()
+        assert coordinator.assignments()['workers'] == ['w1', 'w2']
+        assert left['moved'] > 0
+        assert workers[0].assigned()[1] == []
+    
+    def test_no_workers_keeps_epoch(self, tmp_path):
+        """Test rebalancing with no live workers does not publish new epochs."""
+        coordinator = ShardCoordinator(tmp_path)
+        coordinator.set_targets(TARGETS)
+        first = coordinator.rebalance()
+        assert coordinator.rebalance() == {'epoch': first['epoch'], 'changed': False, 'moved': 0}
+        assert coordinator.rebalance()['epoch'] == first['epoch']
+    
+    def test_heartbeats_between_long_rounds(self, tmp_path):
+        """Test a worker waiting longer than the TTL between rounds stays live."""
+        coordinator = ShardCoordinator(tmp_path, heartbeat_ttl=0.3)
+        worker = ShardWorker(tmp_path, 'w0', fake_collect, heartbeat_interval=0.1)
+        stop = threading.Event()
+        thread = threading.Thread(target=worker.run, kwargs={'interval': 60, 'stop': stop})
+        thread.start()
+        try:
+            time.sleep(0.8)
+            assert coordinator.live_workers() == ['w0']
+        finally:
+            stop.set()
+            thread.join(5)
+        assert coordinator.live_workers() == []
+    
+    def test_workers_write_results(self, tmp_path):
+        """Test each target is collected by its owner into the shared store."""
+        coordinator = ShardCoordinator(tmp_path)
+        coordinator.set_targets(TARGETS)
+        workers = [ShardWorker(tmp_path, f'w{i}', fake_collect) for i in range(3)]
+        for worker in workers:
+            worker.heartbeat()
+        coordinator.rebalance()
+        errors = {}
+        for worker in workers:
+            errors.update(worker.run_once())
+        assert errors['ctrl-13'] == 'unreachable'
+        results = coordinator.results()
+        assert len(results) == len(TARGETS)
+        assert results['ctrl-13']['error'] == 'unreachable'
+        assert len(coordinator.merged('devices')) == len(TARGETS) - 1
+        assert not any('token' in json.dumps(t) for t in coordinator.targets())
+    
+    def test_run_local_processes(self, tmp_path):
+        """Test collection with several local worker processes."""
+        results = run_local(tmp_path, TARGETS, processes=3, collect=fake_collect, timeout=60)
+        assert len(results) == len(TARGETS)
+        assert len({r['worker'] for r in results.values()}) == 3
+    
+    def test_run_local_terminates_on_timeout(self, tmp_path):
+        """Test workers still collecting at the deadline are stopped."""
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            run_local(tmp_path, TARGETS[:2], processes=2, collect=hanging_collect, timeout=2)
+        assert time.monotonic() - started < 30
+    
+    def test_stale_results_ignored(self, tmp_path):
+        """Test results written by a previous owner after a rebalance are dropped."""
+        coordinator = ShardCoordinator(tmp_path)
+        coordinator.set_targets(TARGETS)
+        workers = [ShardWorker(tmp_path, f'w{i}', fake_collect) for i in range(2)]
+        workers[0].heartbeat()
+        coordinator.rebalance()
+        workers[0].run_once()
+        workers[1].heartbeat()
+        coordinator.rebalance()
+        moved = workers[1].assigned()[1]
+        assert moved
+        results = coordinator.results()
+        assert len(results) == len(TARGETS) - len(moved)
+        assert all(r['worker'] == 'w0' for r in results.values())
+        # A late write from the old owner is skipped, and filtered if it lands anyway
+        assert workers[0]._collect(moved[0], 1) is None
+        assert moved[0]['id'] not in coordinator.results()
+        (tmp_path / 'results' / f"{moved[0]['id']}.json").write_text(json.dumps({'worker': 'w0', 'epoch': 1, 'data': {}}))
+        assert moved[0]['id'] not in coordinator.results()
+        workers[1].run_once()
+        assert len(coordinator.results()) == len(TARGETS)
+    
+    def test_missing_credential_variable(self, monkeypatch):
+        """Test an unset token variable fails instead of using other credentials."""
+        monkeypatch.delenv('SHARD_TOKEN', raising=False)
+        monkeypatch.delenv('UNIFI_API_KEY', raising=False)
+        target = {'id': 'a', 'kind': 'controller', 'base_url': 'https://10.0.0.1', 'token_env': 'SHARD_TOKEN'}
+        with pytest.raises(ValueError, match='SHARD_TOKEN'):
+            collect_target(target)
+        with pytest.raises(ValueError, match='UNIFI_API_KEY'):
+            collect_target({'id': 'b', 'kind': 'account'})
@@ -0,0 +1,132 @@
+"""Unit tests for single-flight request coalescing."""
+
+import asyncio
+import io
+import threading
+import time
+import pytest
+import requests
+from unittest.mock import Mock
+from beast_unifi.api.site_manager import SiteManagerClient
+from beast_unifi.utils.singleflight import SingleFlight, request_key
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight."""
+    
+    def test_request_key_hashes_credentials(self):
+        """Test keys differ by credential without containing it."""
+        a = request_key('get', 'https://x/sites', 'secret-a')
+        b = request_key('GET', 'https://x/sites', 'secret-b')
+        assert a != b
+        assert 'secret-a' not in repr(a)
+        assert request_key('GET', 'u', 'k', {'b': 1, 'a': 2}) == request_key('GET', 'u', 'k', {'a': 2, 'b': 1})
+    
+    def test_request_key_normalises_params(self):
+        """Test every params shape requests accepts gives a hashable key."""
+        as_dict = request_key('GET', 'u', 'k', {'mac': ['aa', 'bb'], 'type': 'uap', 'skip': None})
+        as_pairs = request_key('GET', 'u', 'k', [('type', 'uap'), ('mac', 'aa'), ('mac', 'bb')])
+        assert as_dict == as_pairs
+        hash(as_dict)
+        assert as_dict != request_key('GET', 'u', 'k', {'mac': ['bb', 'aa'], 'type': 'uap'})
+        assert request_key('GET', 'u', 'k', 'a=1') != request_key('GET', 'u', 'k')
+    
+    def test_concurrent_threads_share_one_call(self):
+        """Test threads arriving during a call receive its result."""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return {'data': []}
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        while flight.stats['calls'] < 8:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        assert flight.stats == {'calls': 8, 'executions': 1, 'shared': 7}
+    
+    def test_errors_propagate_and_nothing_is_cached(self):
+        """Test exceptions reach the caller and the next call runs again."""
+        flight = SingleFlight()
+        with pytest.raises(RuntimeError):
+            flight.do('k', Mock(side_effect=RuntimeError("down")))
+        assert flight.do('k', lambda: 1) == 1
+        assert flight.stats['executions'] == 2
+    
+    def test_async_tasks_share_one_call(self):
+        """Test tasks on one event loop share an in-flight awaitable."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'sites'
+        
+        async def main():
+            return await asyncio.gather(*(flight.do_async('k', fetch) for _ in range(5)))
+        
+        assert asyncio.run(main()) == ['sites'] * 5
+        assert len(calls) == 1
+        assert flight.stats['shared'] == 4
+    
+    def test_client_coalesces_get(self):
+        """Test SiteManagerClient shares one HTTP request between threads."""
+        flight = SingleFlight()
+        client = SiteManagerClient(api_key='test-key', single_flight=flight)
+        release = threading.Event()
+        
+        def get(url, **kwargs):
+            release.wait(5)
+            return Mock(status_code=200, content=b'{"data": []}')
+        
+        client.session = Mock()
+        client.session.get.side_effect = get
+        threads = [threading.Thread(target=client.get_sites) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while flight.stats['calls'] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert client.session.get.call_count == 1
+        assert flight.stats['shared'] == 3
+    
+    def test_client_stream_bypasses_coalescing(self):
+        """Test a streamed GET is neither shared nor read eagerly."""
+        flight = SingleFlight()
+        client = SiteManagerClient(api_key='test-key', single_flight=flight)
+        streamed = requests.Response()
+        streamed.raw = io.BytesIO(b'{"data": []}')
+        client.session = Mock()
+        client.session.get.return_value = streamed
+        assert client.get('devices', stream=True) is streamed
+        client.session.get.assert_called_once_with(
+            'https://api.ui.com/v1/devices', timeout=15, stream=True,
+        )
+        assert streamed._content is False
+        assert flight.stats['calls'] == 0
+    
+    def test_client_aget(self):
+        """Test async GETs through the client are coalesced."""
+        client = SiteManagerClient(api_key='test-key', single_flight=SingleFlight())
+        client.session = Mock()
+        client.session.get.side_effect = lambda url, **kwargs: time.sleep(0.05) or Mock(content=b'{}')
+        
+        async def main():
+            return await asyncio.gather(client.aget('hosts'), client.aget('hosts'), client.aget('sites'))
+        
+        first, second, third = asyncio.run(main())
+        assert first is second and first is not third
+        assert client.session.get.call_count == 2
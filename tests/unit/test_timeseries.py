@@ -0,0 +1,107 @@
+"""Unit tests for the on-disk time-series store."""
+
+import json
+import numpy as np
+import pytest
+from beast_unifi.utils.timeseries import TimeSeriesStore
+
+
+def rows(times, key='aa'):
+    times = np.array(times, dtype=np.int64)
+    return times, [key] * len(times), {'bytes': times * 2.0}
+
+
+class TestTimeSeriesStore:
+    """Tests for TimeSeriesStore."""
+    
+    def test_append_and_read_sorted(self, tmp_path):
+        """Test windows appended out of order read back sorted by time."""
+        store = TimeSeriesStore(tmp_path)
+        store.append('s/hourly.ap', *rows([300, 400]), window=(300, 500))
+        store.append('s/hourly.ap', *rows([100, 200], key='bb'), window=(100, 300))
+        data = store.read('s/hourly.ap')
+        assert data['time'].tolist() == [100, 200, 300, 400]
+        assert data['key'].tolist() == ['bb', 'bb', 'aa', 'aa']
+        assert data['bytes'].dtype == np.float64
+        assert store.read('s/hourly.ap', start=200, end=400, keys=['bb'])['time'].tolist() == [200]
+        assert store.series() == ['s/hourly.ap']
+    
+    def test_complete_windows_are_not_duplicated(self, tmp_path):
+        """Test a complete window is ingested once, even after reopening."""
+        store = TimeSeriesStore(tmp_path)
+        assert store.append('s', *rows([0, 100]), window=(0, 200)) == 2
+        assert store.append('s', *rows([0, 100]), window=(0, 200)) == 0
+        assert store.covered('s', 0, 200) and not store.covered('s', 0, 300)
+        assert TimeSeriesStore(tmp_path).append('s', *rows([0, 100]), window=(0, 200)) == 0
+    
+    def test_open_window_appends_only_new_rows(self, tmp_path):
+        """Test re-fetching an open window skips rows already stored."""
+        store = TimeSeriesStore(tmp_path)
+        store.append('s', *rows([0, 100]), window=(0, 400), complete=False)
+        assert store.partial_through('s', 0) == 100
+        assert store.append('s', *rows([0, 100, 200, 300]), window=(0, 400)) == 2
+        assert store.partial_through('s', 0) is None
+        assert store.read('s')['time'].tolist() == [0, 100, 200, 300]
+    
+    def test_new_attributes_backfill_nan(self, tmp_path):
+        """Test attributes appearing later read as NaN for earlier rows."""
+        store = TimeSeriesStore(tmp_path)
+        store.append('s', *rows([0]), window=(0, 100))
+        store.append('s', np.array([100]), ['aa'], {'num_sta': np.array([5.0])}, window=(100, 200))
+        data = store.read('s')
+        assert np.isnan(data['num_sta'][0]) and data['num_sta'][1] == 5
+        assert np.isnan(data['bytes'][1])
+        with pytest.raises(ValueError):
+            store.read('s', columns=['missing'])
+    
+    def test_uncommitted_bytes_are_discarded(self, tmp_path):
+        """Test bytes written after the last commit are truncated on append."""
+        store = TimeSeriesStore(tmp_path)
+        store.append('s', *rows([0]), window=(0, 100))
+        with open(tmp_path / 's' / 'time.i8', 'ab') as f:
+            f.write(b'\xff' * 8)
+        store = TimeSeriesStore(tmp_path)
+        assert len(store.read('s')['time']) == 1
+        store.append('s', *rows([100]), window=(100, 200))
+        assert store.read('s')['time'].tolist() == [0, 100]
+    
+    def test_keys_appended_not_rewritten(self, tmp_path):
+        """Test the key dictionary grows by appending, outside meta.json."""
+        store = TimeSeriesStore(tmp_path)
+        store.append('s', [1, 2], ['aa', 'bb'], {'v': np.array([1.0, 2.0])}, (0, 10))
+        directory = tmp_path / 's'
+        size = (directory / 'keys.jsonl').stat().st_size
+        meta = json.loads((directory / 'meta.json').read_text())
+        assert 'keys' not in meta and meta['key_bytes'] == size
+        # Uncommitted bytes from an interrupted append are dropped
+        with open(directory / 'keys.jsonl', 'ab') as f:
+            f.write(b'"torn')
+        reopened = TimeSeriesStore(tmp_path)
+        reopened.append('s', [11, 12], ['bb', 'cc'], {'v': np.array([3.0, 4.0])}, (10, 20))
+        assert (directory / 'keys.jsonl').read_text().splitlines() == ['"aa"', '"bb"', '"cc"']
+        data = TimeSeriesStore(tmp_path).read('s', keys=(k for k in ['bb', 'cc']))
+        assert data['key'].tolist() == ['bb', 'bb', 'cc']
+        assert data['v'].tolist() == [2.0, 3.0, 4.0]
+    
+    def test_empty_window_reopens(self, tmp_path):
+        """Test a series committed without rows or keys can be reopened."""
+        TimeSeriesStore(tmp_path).append('s', [], [], {}, (0, 10))
+        reopened = TimeSeriesStore(tmp_path)
+        assert reopened.covered('s', 0, 10)
+        assert reopened.read('s')['time'].tolist() == []
+    
+    def test_reads_older_layout(self, tmp_path):
+        """Test a series whose meta.json still holds the keys is migrated on append."""
+        store = TimeSeriesStore(tmp_path)
+        store.append('s', [1], ['aa'], {'v': np.array([1.0])}, (0, 10))
+        directory = tmp_path / 's'
+        meta = json.loads((directory / 'meta.json').read_text())
+        meta['keys'] = ['aa']
+        for name in ('key_count', 'key_bytes'):
+            del meta[name]
+        (directory / 'meta.json').write_text(json.dumps(meta))
+        (directory / 'keys.jsonl').unlink()
+        legacy = TimeSeriesStore(tmp_path)
+        assert legacy.read('s')['key'].tolist() == ['aa']
+        legacy.append('s', [11], ['bb'], {'v': np.array([2.0])}, (10, 20))
+        assert TimeSeriesStore(tmp_path).read('s')['key'].tolist() == ['aa', 'bb']
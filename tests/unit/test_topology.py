@@ -0,0 +1,130 @@
+"""Unit tests for the topology graph."""
+
+from xml.etree import ElementTree
+
+from beast_unifi.analysis.topology import Topology
+
+
+GW = '00:00:00:00:00:01'
+SW1 = '00:00:00:00:00:02'
+SW2 = '00:00:00:00:00:03'
+AP1 = '00:00:00:00:00:04'
+
+
+def device(mac, type_, name, uplink=None, port=None, port_table=None, last_seen=None):
+    record = {'mac': mac, 'type': type_, 'name': name, 'port_table': port_table or []}
+    if uplink:
+        record['uplink'] = {'uplink_mac': uplink, 'uplink_remote_port': port, 'type': 'wire'}
+    if last_seen is not None:
+        record['last_seen'] = last_seen
+    return record
+
+
+def ports(rx_bytes=0):
+    return [
+        {'port_idx': 1, 'up': True, 'speed': 1000, 'rx_bytes': rx_bytes, 'tx_bytes': 0},
+        {'port_idx': 2, 'up': False, 'speed': 0},
+    ]
+
+
+DEVICES = [
+    device(GW, 'udm', 'gateway'),
+    device(SW1, 'usw', 'core', GW, 1, ports(), last_seen=100),
+    device(SW2, 'usw', 'edge', SW1, 1),
+    device(AP1, 'uap', 'lobby', SW2, 5),
+]
+
+CLIENTS = [
+    {'mac': 'aa:00:00:00:00:01', 'ap_mac': AP1, 'hostname': 'phone'},
+    {'mac': 'aa:00:00:00:00:02', 'is_wired': True, 'sw_mac': SW1, 'sw_port': 1},
+]
+
+
+class TestTopology:
+    """Tests for Topology."""
+    
+    def test_build_and_kinds(self):
+        """Test nodes are created with kinds from the device type."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        assert len(topology) == 6
+        assert topology.get(GW).kind == 'gateway'
+        assert topology.get(AP1).kind == 'ap'
+        assert [n.mac for n in topology.roots()] == [GW]
+    
+    def test_paths(self):
+        """Test paths to root and between nodes."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        assert [n.mac for n in topology.path_to_root('aa:00:00:00:00:01')] == [
+            'aa:00:00:00:00:01', AP1, SW2, SW1, GW,
+        ]
+        assert [n.mac for n in topology.path('aa:00:00:00:00:01', 'aa:00:00:00:00:02')] == [
+            'aa:00:00:00:00:01', AP1, SW2, SW1, 'aa:00:00:00:00:02',
+        ]
+        assert topology.path(AP1, 'ff:ff:ff:ff:ff:ff') == []
+    
+    def test_blast_radius(self):
+        """Test everything downstream of a switch is affected."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        radius = topology.blast_radius(SW2)
+        assert radius['devices'] == [AP1]
+        assert radius['clients'] == ['aa:00:00:00:00:01']
+        assert radius['counts'] == {'ap': 1, 'client': 1}
+    
+    def test_incremental_move(self):
+        """Test re-linking a single device moves its whole subtree."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        assert topology.upsert_device(device(SW2, 'usw', 'edge', GW, 2)) == 'moved'
+        assert [n.mac for n in topology.path_to_root(AP1)] == [AP1, SW2, GW]
+        assert topology.upsert_device(device(SW2, 'usw', 'edge', GW, 2)) == 'updated'
+        # A link that would create a cycle is dropped
+        topology.upsert_device(device(GW, 'udm', 'gateway', AP1, 1))
+        assert topology.get(GW).uplink is None
+    
+    def test_child_before_parent(self):
+        """Test a node added before its uplink attaches when the uplink appears."""
+        topology = Topology()
+        topology.upsert_device(DEVICES[3])
+        topology.upsert_device(DEVICES[2])
+        assert [n.mac for n in topology.children(SW2)] == [AP1]
+    
+    def test_sync_removes_stale(self):
+        """Test full snapshots remove devices and clients that disappeared."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        changes = topology.sync(DEVICES[:3], CLIENTS[1:])
+        assert changes['removed'] == [AP1, 'aa:00:00:00:00:01']
+        assert len(topology) == 4
+    
+    def test_children_sets_only_for_parents(self):
+        """Test leaves get no children set and removed nodes leave none behind."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        assert set(topology._children) == {GW, SW1, SW2, AP1}
+        topology.sync(DEVICES[:3], CLIENTS[1:])
+        assert set(topology._children) == {GW, SW1}
+        topology.remove(SW2)
+        topology.remove(SW1)
+        assert set(topology._children) == {SW1}
+        topology.remove('aa:00:00:00:00:02')
+        assert topology._children == {}
+    
+    def test_port_utilization(self):
+        """Test port rates from successive counter samples."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        topology.upsert_device(device(SW1, 'usw', 'core', GW, 1, ports(rx_bytes=12_500_000), last_seen=110))
+        rows = {row['port']: row for row in topology.port_utilization(SW1)}
+        assert rows[1]['rx_rate'] == 1_250_000
+        assert rows[1]['utilization'] == 0.01
+        assert rows[1]['clients'] == 2
+        assert rows[2]['utilization'] is None
+    
+    def test_exports(self):
+        """Test Mermaid and GraphML rendering."""
+        topology = Topology.from_records(DEVICES, CLIENTS)
+        mermaid = topology.to_mermaid()
+        assert mermaid.startswith('graph TD')
+        assert 'n000000000001 -->|port 1| n000000000002' in mermaid
+        assert 'phone' not in mermaid
+        assert 'phone' in topology.to_graphml()
+        root = ElementTree.fromstring(topology.to_graphml())
+        ns = '{http://graphml.graphdrawing.org/xmlns}'
+        assert len(root.findall(f'{ns}graph/{ns}node')) == 6
+        assert len(root.findall(f'{ns}graph/{ns}edge')) == 5